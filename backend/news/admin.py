@@ -2,28 +2,58 @@ from django.contrib import admin
 from django.shortcuts import render, redirect
 from django.urls import path
 from django.utils.html import format_html
+from django.utils import timezone
+from django.db.models import Count
 from django import forms
 from modeltranslation.admin import TranslationAdmin
 from .models import (
     NewsPost, NewsMedia, Comment, NewsDiscoveryRun, NewsDiscoveryStatus,
-    SearchConfiguration, DiscoveryAPICall
+    SearchConfiguration, DiscoveryAPICall, DiscoveryBatchJob, DiscoveryJob, DiscoveryWorkItem, DiscoveryRawResponse,
+    FeedEntry
 )
+from .response_archive import response_text
+from .jobs import can_resume_run, enqueue_discovery_job
 from .services import NewsImportService, publish_news_post, publish_multiple_news_posts
 
+class NearDuplicateFilter(admin.SimpleListFilter):
+    """Скрывает почти-дубликаты: в списке остаются представители групп похожих новостей"""
+    title = 'похожие новости'
+    parameter_name = 'near_duplicate'
+    
+    def lookups(self, request, model_admin):
+        return (
+            ('representatives', 'Только представители'),
+            ('duplicates', 'Только похожие'),
+        )
+    
+    def queryset(self, request, queryset):
+        if self.value() == 'representatives':
+            return queryset.filter(near_duplicate_of__isnull=True)
+        if self.value() == 'duplicates':
+            return queryset.filter(near_duplicate_of__isnull=False)
+        return queryset
+
+
 class ImportNewsForm(forms.Form):
     zip_file = forms.FileField()
 
 @admin.register(NewsPost)
 class NewsPostAdmin(TranslationAdmin):
-    list_display = ('title', 'source_url_link', 'pub_date', 'author', 'status', 'is_no_news_found', 'created_at')
+    list_display = ('title', 'source_url_link', 'pub_date', 'author', 'status', 'is_no_news_found',
+                    'near_duplicates_display', 'created_at')
     search_fields = ('title',)
-    list_filter = ('status', 'source_language', 'is_no_news_found', 'created_at')
-    readonly_fields = ('source_url_link', 'created_at', 'updated_at', 'is_no_news_found')
+    list_filter = ('status', 'source_language', 'is_no_news_found', NearDuplicateFilter, 'created_at')
+    readonly_fields = ('source_url_link', 'created_at', 'updated_at', 'is_no_news_found',
+                       'near_duplicate_of', 'near_duplicate_score')
     actions = ['publish_selected_news', 'mark_as_draft']
     fieldsets = (
         ('Основная информация', {
             'fields': ('title', 'body', 'source_url', 'source_url_link', 'status', 'source_language', 'author', 'pub_date')
         }),
+        ('Похожие новости', {
+            'fields': ('near_duplicate_of', 'near_duplicate_score'),
+            'classes': ('collapse',)
+        }),
         ('Метаданные', {
             'fields': ('created_at', 'updated_at', 'is_no_news_found'),
             'classes': ('collapse',)
@@ -31,6 +61,18 @@ class NewsPostAdmin(TranslationAdmin):
     )
     change_list_template = "admin/news_changelist.html"
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(near_duplicates_count=Count('near_duplicates'))
+    
+    def near_duplicates_display(self, obj):
+        """Представитель: число похожих новостей; похожая: ссылка на представителя"""
+        if obj.near_duplicate_of_id:
+            return format_html('<a href="../{}/change/">≈ #{}</a>', obj.near_duplicate_of_id, obj.near_duplicate_of_id)
+        if obj.near_duplicates_count:
+            return format_html('<a href="?near_duplicate_of__id__exact={}">+{}</a>', obj.pk, obj.near_duplicates_count)
+        return '-'
+    near_duplicates_display.short_description = 'Похожие'
+    
     def source_url_link(self, obj):
         """Отображает source_url как кликабельную ссылку"""
         if obj.source_url:
@@ -174,10 +216,26 @@ class SearchConfigurationAdmin(admin.ModelAdmin):
             'fields': ('name', 'is_active')
         }),
         ('Провайдеры', {
-            'fields': ('primary_provider', 'fallback_chain')
+            'fields': ('primary_provider', 'fallback_chain', 'routing')
         }),
         ('Параметры LLM', {
-            'fields': ('temperature', 'timeout', 'max_news_per_resource', 'delay_between_requests')
+            'fields': ('temperature', 'timeout', 'stream_responses', 'prompt_caching', 'structured_output',
+                       'max_news_per_resource', 'output_cap', 'delay_between_requests')
+        }),
+        ('Параллельность', {
+            'fields': ('execution_mode', 'batch_api', 'max_workers', 'provider_concurrency', 'batching')
+        }),
+        ('Лимиты запросов', {
+            'fields': ('rate_limit_backend', 'rate_limits', 'circuit_breaker', 'hedging')
+        }),
+        ('Расписание поиска', {
+            'fields': ('scheduling', 'change_detection', 'feeds')
+        }),
+        ('Архив ответов', {
+            'fields': ('response_cache_ttl_hours',)
+        }),
+        ('Бюджет запуска', {
+            'fields': ('budget',)
         }),
         ('Grok Web Search', {
             'fields': ('max_search_results', 'search_context_size')
@@ -187,19 +245,20 @@ class SearchConfigurationAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Тарифы Grok (USD за 1M токенов)', {
-            'fields': ('grok_input_price', 'grok_output_price'),
+            'fields': ('grok_input_price', 'grok_cached_input_price', 'grok_output_price'),
             'classes': ('collapse',)
         }),
         ('Тарифы Anthropic (USD за 1M токенов)', {
-            'fields': ('anthropic_input_price', 'anthropic_output_price'),
+            'fields': ('anthropic_input_price', 'anthropic_cached_input_price', 'anthropic_cache_write_price',
+                       'anthropic_output_price'),
             'classes': ('collapse',)
         }),
         ('Тарифы Gemini (USD за 1M токенов)', {
-            'fields': ('gemini_input_price', 'gemini_output_price'),
+            'fields': ('gemini_input_price', 'gemini_cached_input_price', 'gemini_output_price'),
             'classes': ('collapse',)
         }),
         ('Тарифы OpenAI (USD за 1M токенов)', {
-            'fields': ('openai_input_price', 'openai_output_price'),
+            'fields': ('openai_input_price', 'openai_cached_input_price', 'openai_output_price'),
             'classes': ('collapse',)
         }),
         ('Метаданные', {
@@ -211,19 +270,22 @@ class SearchConfigurationAdmin(admin.ModelAdmin):
 
 @admin.register(NewsDiscoveryRun)
 class NewsDiscoveryRunAdmin(admin.ModelAdmin):
-    list_display = ('id', 'last_search_date', 'news_found', 'estimated_cost_display', 
-                    'duration_display', 'efficiency_display', 'created_at')
+    list_display = ('id', 'status', 'search_type', 'last_search_date', 'news_found', 'work_items_display',
+                    'estimated_cost_display', 'duration_display', 'efficiency_display', 'created_at')
     readonly_fields = ('created_at', 'updated_at', 'config_snapshot', 'provider_stats',
                        'started_at', 'finished_at', 'total_requests', 'total_input_tokens',
                        'total_output_tokens', 'estimated_cost_usd', 'news_found', 
-                       'news_duplicates', 'resources_processed', 'resources_failed',
-                       'duration_display', 'efficiency_display')
-    list_filter = ('last_search_date', 'created_at')
+                       'news_duplicates', 'resources_processed', 'resources_failed', 'resources_unchanged',
+                       'duration_display', 'efficiency_display', 'search_type', 'params',
+                       'work_items_display', 'planned_cost_usd', 'budget_usd', 'budget_mode',
+                       'budget_status', 'targets_over_budget')
+    list_filter = ('status', 'search_type', 'last_search_date', 'created_at')
+    actions = ['cancel_runs', 'resume_runs']
     
     fieldsets = (
         ('Результаты', {
-            'fields': ('last_search_date', 'news_found', 'news_duplicates', 
-                       'resources_processed', 'resources_failed')
+            'fields': ('status', 'search_type', 'last_search_date', 'news_found', 'news_duplicates', 
+                       'resources_processed', 'resources_failed', 'resources_unchanged', 'work_items_display')
         }),
         ('Время', {
             'fields': ('started_at', 'finished_at', 'duration_display')
@@ -232,12 +294,15 @@ class NewsDiscoveryRunAdmin(admin.ModelAdmin):
             'fields': ('estimated_cost_usd', 'total_requests', 'total_input_tokens', 
                        'total_output_tokens', 'efficiency_display')
         }),
+        ('Бюджет', {
+            'fields': ('planned_cost_usd', 'budget_usd', 'budget_mode', 'budget_status', 'targets_over_budget')
+        }),
         ('Статистика по провайдерам', {
             'fields': ('provider_stats',),
             'classes': ('collapse',)
         }),
         ('Конфигурация', {
-            'fields': ('config_snapshot',),
+            'fields': ('config_snapshot', 'params'),
             'classes': ('collapse',)
         }),
         ('Метаданные', {
@@ -246,6 +311,31 @@ class NewsDiscoveryRunAdmin(admin.ModelAdmin):
         }),
     )
     
+    @admin.action(description='Отменить запуск')
+    def cancel_runs(self, request, queryset):
+        # Воркер заметит отмену перед следующей целью; необработанные цели остаются 'pending'
+        updated = queryset.filter(status=NewsDiscoveryRun.STATUS_RUNNING).update(
+            status=NewsDiscoveryRun.STATUS_CANCELLED
+        )
+        self.message_user(request, f'Отменено запусков: {updated}')
+    
+    @admin.action(description='Продолжить запуск')
+    def resume_runs(self, request, queryset):
+        queued = 0
+        for run in queryset.exclude(status=NewsDiscoveryRun.STATUS_COMPLETED):
+            if can_resume_run(run):
+                enqueue_discovery_job(DiscoveryJob.JOB_TYPE_RESUME, user=request.user, discovery_run=run)
+                queued += 1
+        self.message_user(request, f'Поставлено в очередь продолжений: {queued}')
+    
+    def work_items_display(self, obj):
+        counts = dict(obj.work_items.order_by().values_list('status').annotate(n=Count('id')))
+        if not counts:
+            return "-"
+        return ", ".join(f"{status}: {counts[status]}" for status, _ in DiscoveryWorkItem.STATUS_CHOICES
+                         if status in counts)
+    work_items_display.short_description = 'Targets'
+    
     def estimated_cost_display(self, obj):
         return f"${obj.estimated_cost_usd:.4f}"
     estimated_cost_display.short_description = 'Cost (USD)'
@@ -267,9 +357,9 @@ class DiscoveryAPICallInline(admin.TabularInline):
     model = DiscoveryAPICall
     extra = 0
     readonly_fields = ('provider', 'model', 'input_tokens', 'output_tokens', 
-                       'cost_usd', 'duration_ms', 'success', 'news_extracted', 'created_at')
+                       'cost_usd', 'duration_ms', 'success', 'is_hedge', 'news_extracted', 'created_at')
     fields = ('provider', 'resource', 'input_tokens', 'output_tokens', 
-              'cost_usd', 'duration_ms', 'success', 'news_extracted')
+              'cost_usd', 'duration_ms', 'success', 'is_hedge', 'news_extracted')
     can_delete = False
     
     def has_add_permission(self, request, obj=None):
@@ -278,14 +368,17 @@ class DiscoveryAPICallInline(admin.TabularInline):
 
 @admin.register(DiscoveryAPICall)
 class DiscoveryAPICallAdmin(admin.ModelAdmin):
-    list_display = ('id', 'provider', 'model', 'resource_name', 'input_tokens', 
+    list_display = ('id', 'provider', 'model', 'resource_name', 'input_tokens', 'cached_input_tokens',
                     'output_tokens', 'cost_display', 'duration_ms', 'success', 
                     'news_extracted', 'created_at')
-    list_filter = ('provider', 'success', 'created_at')
+    list_filter = ('provider', 'success', 'parse_failed', 'is_hedge', 'batch_api', 'created_at')
     search_fields = ('resource__name', 'manufacturer__name', 'error_message')
     readonly_fields = ('discovery_run', 'resource', 'manufacturer', 'provider', 'model',
-                       'input_tokens', 'output_tokens', 'cost_usd', 'duration_ms',
-                       'success', 'error_message', 'news_extracted', 'created_at')
+                       'input_tokens', 'cached_input_tokens', 'cache_write_tokens', 'output_tokens',
+                       'cost_usd', 'duration_ms', 'success', 'parse_failed', 'is_hedge', 'batch_api', 'batch_size',
+                       'error_message',
+                       'news_extracted', 'max_output_tokens', 'output_tokens_saved', 'raw_response',
+                       'created_at')
     
     def resource_name(self, obj):
         if obj.resource:
@@ -301,13 +394,88 @@ class DiscoveryAPICallAdmin(admin.ModelAdmin):
     cost_display.admin_order_field = 'cost_usd'
 
 
+@admin.register(DiscoveryBatchJob)
+class DiscoveryBatchJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'discovery_run', 'provider', 'external_id', 'status', 'request_count',
+                    'succeeded', 'errored', 'polls', 'created_at', 'ended_at')
+    list_filter = ('status', 'provider', 'created_at')
+    search_fields = ('external_id',)
+    exclude = ('requests',)
+    readonly_fields = ('discovery_run', 'provider', 'model', 'external_id', 'status', 'request_count',
+                       'succeeded', 'errored', 'polls', 'error_message', 'created_at', 'ended_at')
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(DiscoveryRawResponse)
+class DiscoveryRawResponseAdmin(admin.ModelAdmin):
+    list_display = ('id', 'provider', 'model', 'target_name', 'search_start', 'search_end',
+                    'size_display', 'parsed', 'news_count', 'created_at')
+    list_filter = ('provider', 'parsed', 'created_at')
+    search_fields = ('cache_key', 'resource__name', 'manufacturer__name')
+    exclude = ('content',)
+    readonly_fields = ('cache_key', 'provider', 'model', 'resource', 'manufacturer', 'search_start',
+                       'search_end', 'compression', 'raw_size', 'size_display', 'parsed', 'news_count',
+                       'created_at', 'content_display')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def target_name(self, obj):
+        if obj.resource:
+            return obj.resource.name
+        if obj.manufacturer:
+            return f"[M] {obj.manufacturer.name}"
+        return "-"
+    target_name.short_description = 'Target'
+    
+    def size_display(self, obj):
+        return f"{obj.raw_size / 1024:.1f} KB → {len(obj.content) / 1024:.1f} KB"
+    size_display.short_description = 'Size'
+    
+    def content_display(self, obj):
+        return format_html('<pre style="white-space: pre-wrap">{}</pre>', response_text(obj))
+    content_display.short_description = 'Content'
+
+
+@admin.register(FeedEntry)
+class FeedEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'resource', 'link', 'published_at', 'news_post', 'created_at')
+    list_filter = ('created_at',)
+    search_fields = ('guid', 'link', 'resource__name')
+    raw_id_fields = ('news_post',)
+    readonly_fields = ('resource', 'guid_hash', 'guid', 'link', 'published_at', 'news_post', 'created_at')
+    
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(NewsDiscoveryStatus)
 class NewsDiscoveryStatusAdmin(admin.ModelAdmin):
     list_display = ('status', 'search_type', 'provider', 'processed_count', 'total_count', 
-                    'get_progress_percent_display', 'created_at', 'updated_at')
+                    'streamed_news_count', 'get_progress_percent_display', 'created_at', 'updated_at')
     readonly_fields = ('created_at', 'updated_at', 'get_progress_percent_display')
     list_filter = ('status', 'search_type', 'provider', 'created_at')
     
     def get_progress_percent_display(self, obj):
         return f"{obj.get_progress_percent()}%"
     get_progress_percent_display.short_description = 'Progress'
+
+
+@admin.register(DiscoveryJob)
+class DiscoveryJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'job_type', 'status', 'provider', 'attempts', 'locked_by',
+                    'created_at', 'started_at', 'finished_at')
+    list_filter = ('status', 'job_type', 'provider', 'created_at')
+    readonly_fields = ('attempts', 'locked_by', 'heartbeat_at', 'result', 'error_message',
+                       'created_at', 'started_at', 'finished_at')
+    actions = ['requeue_jobs']
+    
+    @admin.action(description='Вернуть в очередь')
+    def requeue_jobs(self, request, queryset):
+        updated = queryset.exclude(status=DiscoveryJob.STATUS_RUNNING).update(
+            status=DiscoveryJob.STATUS_QUEUED, attempts=0, run_after=timezone.now(),
+            locked_by='', error_message=''
+        )
+        self.message_user(request, f'Возвращено в очередь заданий: {updated}')
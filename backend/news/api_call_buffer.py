@@ -0,0 +1,116 @@
+"""
+Буфер записей о вызовах LLM API для одного запуска поиска.
+Записи сохраняются пачкой вместе с атомарным обновлением счетчиков запуска.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from django.db import transaction
+
+from .models import DiscoveryAPICall, NewsDiscoveryRun
+
+logger = logging.getLogger(__name__)
+
+# Сбрасывать буфер, когда в нем столько записей...
+FLUSH_BATCH_SIZE = 50
+# ...или прошло столько секунд с прошлого сброса
+FLUSH_INTERVAL = 5.0
+
+
+class APICallBuffer:
+    """Накопитель вызовов API запуска; потокобезопасен"""
+
+    def __init__(self, run: NewsDiscoveryRun, batch_size: int = FLUSH_BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self.run = run
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # Сбросы идут по одному: иначе пачки одного процесса конкурируют за строку запуска
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._calls: List[DiscoveryAPICall] = []
+        self._totals: Dict[str, float] = defaultdict(int)
+        self._provider_deltas: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+
+    def add(self, call: DiscoveryAPICall):
+        """Добавляет несохраненный DiscoveryAPICall; сбрасывает буфер, если пора"""
+        self.add_batch([call])
+
+    def add_batch(self, calls: List[DiscoveryAPICall]):
+        """
+        Добавляет записи одного запроса: пакетный запрос пишется долями по источникам,
+        в счетчик запросов он попадает один раз (первая доля).
+        """
+        with self._lock:
+            for index, call in enumerate(calls):
+                requests = 0 if index else 1
+                self._calls.append(call)
+                self._totals['total_requests'] += requests
+                self._totals['total_input_tokens'] += call.input_tokens
+                self._totals['total_output_tokens'] += call.output_tokens
+                self._totals['estimated_cost_usd'] += call.cost_usd
+                self._add_deltas(call.provider, NewsDiscoveryRun.api_call_stats(
+                    call.input_tokens, call.output_tokens, call.cost_usd, call.success, call.is_hedge,
+                    requests=requests, cached_input_tokens=call.cached_input_tokens,
+                    parse_failed=call.parse_failed, output_tokens_saved=call.output_tokens_saved,
+                ))
+            due = (
+                len(self._calls) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def record_hedge_win(self, provider: str):
+        with self._lock:
+            self._add_deltas(provider, {'hedge_wins': 1})
+
+    def record_news_dropped(self, provider: str, count: int):
+        """Новости сверх max_news_per_resource, отброшенные при разборе (news/output_cap.py)"""
+        with self._lock:
+            self._add_deltas(provider, {'news_dropped': count})
+
+    def _add_deltas(self, provider: str, stats: Dict[str, float]):
+        deltas = self._provider_deltas[provider]
+        for key, value in stats.items():
+            deltas[key] += value
+
+    def flush(self):
+        """Записывает накопленное в БД одной транзакцией; при ошибке данные остаются в буфере"""
+        with self._flush_lock:
+            with self._lock:
+                calls, totals, provider_deltas = self._calls, self._totals, self._provider_deltas
+                self._calls = []
+                self._totals = defaultdict(int)
+                self._provider_deltas = defaultdict(lambda: defaultdict(int))
+                self._last_flush = time.monotonic()
+            if not calls and not provider_deltas:
+                return
+
+            try:
+                with transaction.atomic():
+                    DiscoveryAPICall.objects.bulk_create(calls, batch_size=self.batch_size)
+                    self.run.apply_stats(
+                        totals=dict(totals),
+                        provider_deltas={provider: dict(deltas) for provider, deltas in provider_deltas.items()},
+                    )
+            except Exception as e:
+                logger.error(f"Discovery run #{self.run.id}: не удалось записать {len(calls)} вызовов API: {str(e)}")
+                self._restore(calls, totals, provider_deltas)
+                return
+            logger.debug(f"Discovery run #{self.run.id}: записано вызовов API: {len(calls)}")
+
+    def _restore(self, calls, totals, provider_deltas):
+        """Возвращает несохраненную пачку в буфер (попадет в следующий сброс)"""
+        with self._lock:
+            for call in calls:
+                call.pk = None
+            self._calls = calls + self._calls
+            for field, value in totals.items():
+                self._totals[field] += value
+            for provider, deltas in provider_deltas.items():
+                self._add_deltas(provider, deltas)
@@ -0,0 +1,200 @@
+"""
+Асинхронный путь поиска новостей (execution_mode = 'async').
+Запросы идут через асинхронные клиенты SDK, работа с БД — через sync_to_async.
+"""
+import asyncio
+import logging
+from datetime import date
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+
+from references.models import Manufacturer, NewsResource
+from .discovery_service import NewsDiscoveryService, ProviderConfigurationError
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncNewsDiscovery:
+    """
+    Асинхронные аналоги discover_news_for_resource / discover_news_for_manufacturer.
+    Создается на один проход (семафоры asyncio привязаны к event loop).
+    """
+
+    def __init__(self, service: NewsDiscoveryService):
+        self.service = service
+        self._provider_semaphores = {
+            provider: asyncio.Semaphore(int(limit))
+            for provider, limit in (service.config.provider_concurrency or {}).items()
+            if limit and int(limit) > 0
+        }
+
+    async def discover_news_for_resource(
+        self,
+        resource: NewsResource,
+        provider: str = 'auto',
+        last_search_date_override: Optional[date] = None,
+    ) -> Tuple[int, int, Optional[str]]:
+        """
+        Ищет новости для одного источника.
+
+        Returns:
+            Tuple[created_count, error_count, error_message]
+        """
+        service = self.service
+        if resource.is_feed:
+            return await sync_to_async(service._ingest_feed)(resource, last_search_date_override)
+        if resource.id in service._unchanged_resources:
+            return await sync_to_async(service._skip_unchanged_resource)(resource)
+
+        prompt, domain, last_search_date, today = await sync_to_async(service._prepare_resource_query)(
+            resource, last_search_date_override
+        )
+
+        try:
+            with service._target_context(resource=resource, window=(last_search_date, today)):
+                llm_response, provider_used, llm_error = await self._run_provider_chain(
+                    prompt, provider, f"ресурса {resource.id} ({resource.name})", domain=domain
+                )
+        except ProviderConfigurationError as e:
+            return await sync_to_async(service._handle_configuration_error)('resource', resource, e)
+
+        return await sync_to_async(service._ingest_response)(
+            'resource', resource, provider, llm_response, llm_error, last_search_date, today
+        )
+
+    async def discover_news_for_manufacturer(
+        self,
+        manufacturer: Manufacturer,
+        provider: str = 'auto',
+        last_search_date_override: Optional[date] = None,
+    ) -> Tuple[int, int, Optional[str]]:
+        """
+        Ищет новости о производителе.
+
+        Returns:
+            Tuple[created_count, error_count, error_message]
+        """
+        service = self.service
+        prompt, last_search_date, today = await sync_to_async(service._prepare_manufacturer_query)(
+            manufacturer, last_search_date_override
+        )
+
+        try:
+            with service._target_context(manufacturer=manufacturer, window=(last_search_date, today)):
+                llm_response, provider_used, llm_error = await self._run_provider_chain(
+                    prompt, provider, f"производителя {manufacturer.id} ({manufacturer.name})"
+                )
+        except ProviderConfigurationError as e:
+            return await sync_to_async(service._handle_configuration_error)('manufacturer', manufacturer, e)
+
+        return await sync_to_async(service._ingest_response)(
+            'manufacturer', manufacturer, provider, llm_response, llm_error, last_search_date, today
+        )
+
+    async def _call_provider(self, provider: str, prompt: str, domain: Optional[str] = None) -> Optional[Dict]:
+        """Выполняет асинхронный запрос к одному провайдеру с учетом лимита параллельности"""
+        service = self.service
+        if provider == 'grok':
+            query = partial(service._aquery_grok, prompt, domain=domain)
+        elif provider == 'anthropic':
+            query = partial(service._aquery_anthropic, prompt)
+        elif provider == 'openai':
+            query = partial(service._aquery_openai, prompt)
+        elif provider == 'gemini':
+            query = partial(service._aquery_gemini, prompt)
+        else:
+            raise ProviderConfigurationError(f"Неизвестный провайдер: {provider}")
+
+        semaphore = self._provider_semaphores.get(provider)
+        if semaphore is None:
+            return await query()
+        async with semaphore:
+            return await query()
+
+    async def _run_provider_chain(
+        self,
+        prompt: str,
+        provider: str,
+        target_label: str,
+        domain: Optional[str] = None,
+    ) -> Tuple[Optional[Dict], Optional[str], Optional[str]]:
+        """Асинхронный вариант NewsDiscoveryService._run_provider_chain"""
+        service = self.service
+        errors_chain = []
+        names = service._resolve_providers(provider)
+        cached = await sync_to_async(service._cached_response)(names, prompt)
+        if cached:
+            llm_response, name = cached
+            service._note_provider_used(name)
+            return llm_response, name, None
+        index = 0
+        while index < len(names):
+            name = names[index]
+            index += 1
+            if service._is_provider_tripped(provider, name, target_label, errors_chain):
+                continue
+            logger.info(f"[{service.PROVIDER_LABELS[name]}] Начинаю обработку {target_label}")
+            hedge = await sync_to_async(service._plan_hedge)(provider, names, index)
+            if hedge:
+                llm_response, name, hedged = await self._call_with_hedge(
+                    name, hedge[0], hedge[1], prompt, domain, target_label, errors_chain
+                )
+                index += int(hedged)
+            else:
+                try:
+                    llm_response = await self._call_provider(name, prompt, domain=domain)
+                except Exception as e:
+                    service._note_provider_error(name, target_label, e, errors_chain)
+                    continue
+            if llm_response:
+                logger.info(f"[{service.PROVIDER_LABELS[name]}] ✅ Успешно обработал {target_label}")
+                service._note_provider_used(name)
+                return llm_response, name, "; ".join(errors_chain) or None
+
+        return None, None, "; ".join(errors_chain) or None
+
+    async def _call_with_hedge(self, primary: str, backup: str, delay: float, prompt: str,
+                               domain: Optional[str], target_label: str,
+                               errors_chain: List[str]) -> Tuple[Optional[Dict], Optional[str], bool]:
+        """
+        Асинхронный вариант NewsDiscoveryService._call_with_hedge: проигравший запрос
+        отменяется сразу (задача asyncio прерывает ожидание ответа SDK).
+        """
+        service = self.service
+        tasks = {asyncio.ensure_future(self._hedged_provider_call(primary, prompt, domain, False)): primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and service.circuit_breakers.allow(backup):
+                logger.info(f"[{service.PROVIDER_LABELS[primary]}] Нет ответа за {delay:.1f}s — "
+                            f"хедж-запрос к {service.PROVIDER_LABELS[backup]} для {target_label}")
+                tasks[asyncio.ensure_future(self._hedged_provider_call(backup, prompt, domain, True))] = backup
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = tasks[task]
+                    try:
+                        llm_response = task.result()
+                    except Exception as e:
+                        service._note_provider_error(name, target_label, e, errors_chain)
+                        continue
+                    if llm_response:
+                        if name == backup:
+                            await sync_to_async(service._record_hedge_win)(backup)
+                        return llm_response, name, len(tasks) > 1
+            return None, None, len(tasks) > 1
+        finally:
+            unfinished = [task for task in tasks if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                await asyncio.gather(*unfinished, return_exceptions=True)
+
+    async def _hedged_provider_call(self, name: str, prompt: str, domain: Optional[str],
+                                    is_hedge: bool) -> Optional[Dict]:
+        # Задача asyncio работает в копии контекста: флаг не влияет на основной запрос
+        self.service._hedge_var.set(is_hedge)
+        return await self._call_provider(name, prompt, domain=domain)
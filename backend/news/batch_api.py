@@ -0,0 +1,311 @@
+"""
+Пакетные задания провайдеров: Batch API OpenAI и Message Batches Anthropic.
+"""
+import email.parser
+import email.policy
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+DEFAULT_SETTINGS = {
+    'provider': '',                 # Пусто — первый провайдер цепочки, поддерживающий Batch API
+    'max_requests_per_job': 1000,   # Запросов в одном пакетном задании
+    'poll_interval_seconds': 300,   # Пауза между проверками заданий (DiscoveryJob 'batch_poll')
+    'completion_window': '24h',     # Срок выполнения задания OpenAI
+    'price_factor': 0.5,            # Цена пакетного запроса относительно обычной
+    'base_urls': {},                # {'anthropic': 'http://127.0.0.1:8765'} — стенд вместо API провайдера
+}
+
+SUPPORTED_PROVIDERS = ('anthropic', 'openai')
+
+# Состояние задания у провайдера
+STATE_IN_PROGRESS = 'in_progress'
+STATE_ENDED = 'ended'
+
+OPENAI_ENDPOINT = '/v1/chat/completions'
+
+
+class BatchRequest(NamedTuple):
+    """Запрос пакетного задания: custom_id и параметры обычного запроса (без timeout)"""
+    custom_id: str
+    params: Dict
+
+
+class BatchResult(NamedTuple):
+    """Результат запроса: ответ в формате SDK (Message / ChatCompletion) или ошибка"""
+    custom_id: str
+    response: Any
+    error: str = ''
+
+
+class AnthropicBatchClient:
+    """Message Batches Anthropic"""
+
+    provider = 'anthropic'
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        batch = self.client.messages.batches.create(requests=[
+            {'custom_id': request.custom_id, 'params': request.params} for request in requests
+        ])
+        return batch.id
+
+    def state(self, batch_id: str) -> str:
+        batch = self.client.messages.batches.retrieve(batch_id)
+        return STATE_ENDED if batch.processing_status == 'ended' else STATE_IN_PROGRESS
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        for entry in self.client.messages.batches.results(batch_id):
+            result = entry.result
+            if result.type == 'succeeded':
+                yield BatchResult(entry.custom_id, result.message)
+                continue
+            error = getattr(getattr(result, 'error', None), 'error', None)
+            message = getattr(error, 'message', '') if error is not None else ''
+            yield BatchResult(entry.custom_id, None, f"{result.type}: {message}" if message else result.type)
+
+
+class OpenAIBatchClient:
+    """Batch API OpenAI (запросы Chat Completions)"""
+
+    provider = 'openai'
+
+    def __init__(self, client, completion_window: str = '24h'):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        lines = [
+            json.dumps({'custom_id': request.custom_id, 'method': 'POST', 'url': OPENAI_ENDPOINT,
+                        'body': request.params}, ensure_ascii=False)
+            for request in requests
+        ]
+        input_file = self.client.files.create(
+            file=('discovery_batch.jsonl', '\n'.join(lines).encode('utf-8')), purpose='batch'
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id, endpoint=OPENAI_ENDPOINT, completion_window=self.completion_window
+        )
+        return batch.id
+
+    def state(self, batch_id: str) -> str:
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status in ('completed', 'failed', 'expired', 'cancelled'):
+            return STATE_ENDED
+        return STATE_IN_PROGRESS
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        from openai.types.chat import ChatCompletion
+
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                response = row.get('response') or {}
+                body = response.get('body') or {}
+                if response.get('status_code') == 200:
+                    yield BatchResult(row['custom_id'], ChatCompletion.model_validate(body))
+                    continue
+                error = row.get('error') or body.get('error') or {}
+                yield BatchResult(row['custom_id'], None,
+                                  error.get('message') or f"HTTP {response.get('status_code')}")
+
+
+# ==================== ЛОКАЛЬНЫЙ СТЕНД ====================
+
+def _default_responder(provider: str, params: Dict) -> str:
+    return '{"news": []}'
+
+
+class BatchAPIStandIn:
+    """
+    Локальный HTTP-стенд пакетных API Anthropic и OpenAI для проверки режима batch_api
+    (тесты, команда batch_api_standin). Задание завершается после ready_after проверок
+    состояния; текст ответа на каждый запрос возвращает responder(provider, params).
+
+        with BatchAPIStandIn() as standin:
+            config.batch_api = {'base_urls': standin.base_urls}
+    """
+
+    def __init__(self, responder: Callable[[str, Dict], str] = _default_responder,
+                 ready_after: int = 0, host: str = '127.0.0.1', port: int = 0):
+        self.responder = responder
+        self.ready_after = ready_after
+        self.batches: Dict[str, Dict] = {}
+        self.files: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_urls(self) -> Dict[str, str]:
+        return {'anthropic': self.url, 'openai': f"{self.url}/v1"}
+
+    def start(self) -> 'BatchAPIStandIn':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='batch-api-standin', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # ---------- Состояние заданий ----------
+
+    def _create_batch(self, provider: str, requests: List[Dict]) -> Dict:
+        batch_id = f"{'msgbatch' if provider == 'anthropic' else 'batch'}_{uuid.uuid4().hex[:12]}"
+        batch = {'id': batch_id, 'provider': provider, 'requests': requests, 'polls': 0,
+                 'created_at': int(time.time()), 'results': None}
+        with self._lock:
+            self.batches[batch_id] = batch
+        return batch
+
+    def _poll(self, batch_id: str) -> Optional[Dict]:
+        """Проверка состояния: после ready_after проверок задание выполняется"""
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                return None
+            batch['polls'] += 1
+            if batch['results'] is None and batch['polls'] > self.ready_after:
+                batch['results'] = [self._result(batch['provider'], request) for request in batch['requests']]
+            return batch
+
+    def _result(self, provider: str, request: Dict) -> Dict:
+        params = request['params'] if provider == 'anthropic' else request['body']
+        text = self.responder(provider, params)
+        if provider == 'anthropic':
+            return {'custom_id': request['custom_id'], 'result': {'type': 'succeeded', 'message': {
+                'id': f"msg_{uuid.uuid4().hex[:12]}", 'type': 'message', 'role': 'assistant',
+                'model': params.get('model', ''), 'content': [{'type': 'text', 'text': text}],
+                'stop_reason': 'end_turn', 'stop_sequence': None,
+                'usage': {'input_tokens': 1000, 'output_tokens': 200},
+            }}}
+        return {'id': f"batch_req_{uuid.uuid4().hex[:12]}", 'custom_id': request['custom_id'], 'error': None,
+                'response': {'status_code': 200, 'request_id': uuid.uuid4().hex, 'body': {
+                    'id': f"chatcmpl-{uuid.uuid4().hex[:12]}", 'object': 'chat.completion',
+                    'created': int(time.time()), 'model': params.get('model', ''),
+                    'choices': [{'index': 0, 'finish_reason': 'stop', 'logprobs': None,
+                                 'message': {'role': 'assistant', 'content': text, 'refusal': None}}],
+                    'usage': {'prompt_tokens': 1000, 'completion_tokens': 200, 'total_tokens': 1200},
+                }}}
+
+    def _anthropic_batch(self, batch: Dict) -> Dict:
+        ended = batch['results'] is not None
+        count = len(batch['requests'])
+        return {
+            'id': batch['id'], 'type': 'message_batch',
+            'processing_status': 'ended' if ended else 'in_progress',
+            'request_counts': {'processing': 0 if ended else count, 'succeeded': count if ended else 0,
+                               'errored': 0, 'canceled': 0, 'expired': 0},
+            'created_at': '2026-01-01T00:00:00Z', 'expires_at': '2026-01-02T00:00:00Z',
+            'ended_at': '2026-01-01T01:00:00Z' if ended else None,
+            'archived_at': None, 'cancel_initiated_at': None,
+            'results_url': f"{self.url}/v1/messages/batches/{batch['id']}/results" if ended else None,
+        }
+
+    def _openai_batch(self, batch: Dict) -> Dict:
+        ended = batch['results'] is not None
+        output_file_id = f"file-out-{batch['id']}" if ended else None
+        if ended and output_file_id not in self.files:
+            self.files[output_file_id] = '\n'.join(json.dumps(row) for row in batch['results']).encode('utf-8')
+        count = len(batch['requests'])
+        return {
+            'id': batch['id'], 'object': 'batch', 'endpoint': OPENAI_ENDPOINT,
+            'input_file_id': batch.get('input_file_id', ''), 'completion_window': '24h',
+            'status': 'completed' if ended else 'in_progress', 'created_at': batch['created_at'],
+            'output_file_id': output_file_id, 'error_file_id': None,
+            'request_counts': {'total': count, 'completed': count if ended else 0, 'failed': 0},
+        }
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, payload: Any, content_type: str = 'application/json'):
+                body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+            def do_POST(self):
+                path = self.path.split('?')[0]
+                if path == '/v1/messages/batches':
+                    batch = standin._create_batch('anthropic', json.loads(self._body())['requests'])
+                    return self._send(200, standin._anthropic_batch(batch))
+                if path == '/v1/files':
+                    content = self._multipart_file(self._body())
+                    file_id = f"file-{uuid.uuid4().hex[:12]}"
+                    standin.files[file_id] = content
+                    return self._send(200, {'id': file_id, 'object': 'file', 'bytes': len(content),
+                                            'created_at': int(time.time()), 'filename': 'discovery_batch.jsonl',
+                                            'purpose': 'batch', 'status': 'processed'})
+                if path == '/v1/batches':
+                    params = json.loads(self._body())
+                    lines = standin.files[params['input_file_id']].decode('utf-8').splitlines()
+                    batch = standin._create_batch('openai', [json.loads(line) for line in lines if line.strip()])
+                    batch['input_file_id'] = params['input_file_id']
+                    return self._send(200, standin._openai_batch(batch))
+                self._send(404, {'error': {'message': f'Unknown path {path}'}})
+
+            def do_GET(self):
+                parts = self.path.split('?')[0].strip('/').split('/')
+                if parts[:3] == ['v1', 'messages', 'batches'] and len(parts) >= 4:
+                    batch = standin._poll(parts[3])
+                    if batch is None:
+                        return self._send(404, {'error': {'message': 'Batch not found'}})
+                    if len(parts) == 5 and parts[4] == 'results':
+                        lines = '\n'.join(json.dumps(row) for row in batch['results'] or [])
+                        return self._send(200, lines.encode('utf-8'), 'application/binary')
+                    return self._send(200, standin._anthropic_batch(batch))
+                if parts[:2] == ['v1', 'batches'] and len(parts) == 3:
+                    batch = standin._poll(parts[2])
+                    if batch is None:
+                        return self._send(404, {'error': {'message': 'Batch not found'}})
+                    return self._send(200, standin._openai_batch(batch))
+                if parts[:2] == ['v1', 'files'] and len(parts) == 4 and parts[3] == 'content':
+                    content = standin.files.get(parts[2])
+                    if content is None:
+                        return self._send(404, {'error': {'message': 'File not found'}})
+                    return self._send(200, content, 'application/octet-stream')
+                self._send(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+            def _multipart_file(self, body: bytes) -> bytes:
+                """Содержимое поля file из multipart/form-data"""
+                message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8') + body
+                )
+                for part in message.iter_parts():
+                    if part.get_param('name', header='content-disposition') == 'file':
+                        return part.get_payload(decode=True)
+                return b''
+
+        return Handler
@@ -0,0 +1,291 @@
+"""
+Поиск новостей пакетными заданиями провайдера (execution_mode = 'batch_api').
+"""
+import logging
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.utils import timezone
+
+from references.models import Manufacturer, NewsResource
+from . import batch_api
+from .checkpoints import RunCheckpoint
+from .discovery_executor import TargetResult
+from .discovery_service import NewsDiscoveryService
+from .models import DiscoveryBatchJob, DiscoveryWorkItem, NewsDiscoveryRun, NewsDiscoveryStatus
+from .prompt_cache import TokenUsage
+
+logger = logging.getLogger(__name__)
+
+
+class BatchAPIDiscovery:
+    """Отправка прохода пакетными заданиями и разбор их результатов"""
+
+    def __init__(self, service: NewsDiscoveryService):
+        self.service = service
+        self.settings = service.batch_api
+
+    # ---------- Провайдер ----------
+
+    def select_provider(self, provider: str) -> Optional[str]:
+        """Провайдер заданий прохода; None — ни один провайдер с ключом не поддерживает Batch API"""
+        service = self.service
+        if provider != 'auto':
+            candidates = [provider]
+        elif self.settings['provider']:
+            candidates = [self.settings['provider']]
+        else:
+            candidates = service.provider_chain
+        for name in candidates:
+            if name in batch_api.SUPPORTED_PROVIDERS and service._get_api_key(name):
+                return name
+        return None
+
+    def _model(self, provider: str) -> str:
+        return self.service._provider_model(provider)
+
+    def _client(self, provider: str):
+        """Клиент пакетных заданий; base_url — из batch_api['base_urls'] (локальный стенд)"""
+        service = self.service
+        base_url = (self.settings['base_urls'] or {}).get(provider) or None
+        key = service._get_api_key(provider)
+        if provider == 'anthropic':
+            return batch_api.AnthropicBatchClient(
+                service.clients.anthropic(key, base_url=base_url, timeout=service.timeout)
+            )
+        return batch_api.OpenAIBatchClient(
+            service.clients.openai(key, base_url=base_url, timeout=service.timeout),
+            completion_window=self.settings['completion_window'],
+        )
+
+    def _build_params(self, provider: str, prompt: str) -> Dict:
+        """Параметры запроса — как у обычного вызова; timeout относится к HTTP-клиенту, не к заданию"""
+        service = self.service
+        if provider == 'anthropic':
+            params = service._build_anthropic_request(prompt)
+            params.pop('timeout', None)
+            return params
+        return service._build_openai_request(prompt)
+
+    # ---------- Отправка ----------
+
+    def submit(self, checkpoint: RunCheckpoint, targets: List[Any], provider: str,
+               status_obj: Optional[NewsDiscoveryStatus] = None) -> Dict[str, int]:
+        """
+        Отправляет проход заданиями провайдера.
+
+        Returns:
+            Статистика целей, обработанных сразу, и batch_jobs_pending — число отправленных заданий
+        """
+        service = self.service
+        is_manufacturers = checkpoint.target_field == 'manufacturer'
+        stats = {'created': 0, 'errors': 0, 'total_processed': 0}
+        on_progress = service._progress_callback(status_obj)
+
+        requests: List[Tuple[batch_api.BatchRequest, Dict]] = []
+        for target in targets:
+            if not checkpoint.start(target):
+                continue
+            immediate = not is_manufacturers and (target.is_feed or target.id in service._unchanged_resources)
+            if immediate:
+                self._finish_target(checkpoint, target, stats,
+                                    service._checkpointed(service.discover_news_for_resource, checkpoint))
+                if on_progress:
+                    on_progress(stats['total_processed'])
+                continue
+            if is_manufacturers:
+                prompt, start, end = service._prepare_manufacturer_query(target, checkpoint.last_search_date_override)
+                context = service._target_context(manufacturer=target, window=(start, end))
+            else:
+                prompt, _domain, start, end = service._prepare_resource_query(target, checkpoint.last_search_date_override)
+                context = service._target_context(resource=target, window=(start, end))
+            with context:
+                params = self._build_params(provider, prompt)
+            custom_id = f"{checkpoint.target_field}-{target.id}"
+            requests.append((batch_api.BatchRequest(custom_id, params), {
+                'target_id': target.id, 'prompt': prompt,
+                'start_date': start.isoformat(), 'end_date': end.isoformat(),
+            }))
+
+        jobs = 0
+        if requests:
+            client = self._client(provider)
+            size = max(1, int(self.settings['max_requests_per_job']))
+            for offset in range(0, len(requests), size):
+                chunk = requests[offset:offset + size]
+                jobs += self._submit_job(checkpoint, client, provider, chunk, stats)
+            logger.info(f"Discovery run #{checkpoint.run.id}: отправлено {len(requests)} запросов "
+                        f"в {jobs} пакетных заданиях {service.PROVIDER_LABELS[provider]}")
+        stats['batch_requests'] = len(requests)
+        stats['batch_jobs_pending'] = jobs
+        return stats
+
+    def _submit_job(self, checkpoint: RunCheckpoint, client, provider: str,
+                    chunk: List[Tuple[batch_api.BatchRequest, Dict]], stats: Dict[str, int]) -> int:
+        """Отправляет одно задание; при ошибке отправки цели задания завершаются ошибкой. Returns: 1 или 0"""
+        job = DiscoveryBatchJob(
+            discovery_run=checkpoint.run,
+            provider=provider,
+            model=self._model(provider),
+            requests={request.custom_id: info for request, info in chunk},
+            request_count=len(chunk),
+        )
+        try:
+            job.external_id = client.submit([request for request, _info in chunk])
+        except Exception as e:
+            logger.error(f"Пакетное задание {self.service.PROVIDER_LABELS[provider]} не отправлено: {str(e)}")
+            job.status = DiscoveryBatchJob.STATUS_FAILED
+            job.error_message = str(e)
+            job.ended_at = timezone.now()
+            job.save()
+            for custom_id, info in job.requests.items():
+                self._process_result(checkpoint, job, custom_id, info, None, str(e), stats)
+            job.save(update_fields=['errored'])
+            return 0
+        job.save()
+        return 1
+
+    # ---------- Результаты ----------
+
+    def poll(self, run: NewsDiscoveryRun, status_obj: Optional[NewsDiscoveryStatus] = None) -> Dict[str, int]:
+        """
+        Проверяет отправленные задания запуска и разбирает результаты завершенных.
+        Когда заданий не осталось — завершает запуск.
+
+        Returns:
+            Статистика разобранных целей и batch_jobs_pending — задания, которые еще выполняются
+        """
+        service = self.service
+        checkpoint = RunCheckpoint(run)
+        stats = {'created': 0, 'errors': 0, 'total_processed': 0}
+        service.flush_api_calls()
+        service.current_run = run
+        service._status_obj = status_obj
+        service.budget.start(float(run.estimated_cost_usd or 0))
+        checkpoint.budget = service.budget
+        try:
+            pending = 0
+            for job in run.batch_jobs.filter(status=DiscoveryBatchJob.STATUS_SUBMITTED):
+                if not self._collect(checkpoint, job, stats):
+                    pending += 1
+            service.flush_api_calls()
+            stats['batch_jobs_pending'] = pending
+            if not pending:
+                checkpoint.complete()
+                if status_obj:
+                    status_obj.status = 'completed'
+                    status_obj.save()
+        finally:
+            service._status_obj = None
+            service.output_cap.clear()
+        if status_obj and stats['total_processed']:
+            NewsDiscoveryStatus.objects.filter(pk=status_obj.pk).update(
+                processed_count=run.work_items.filter(
+                    status__in=[DiscoveryWorkItem.STATUS_DONE, DiscoveryWorkItem.STATUS_FAILED]
+                ).count(),
+                updated_at=timezone.now(),
+            )
+        return stats
+
+    def _collect(self, checkpoint: RunCheckpoint, job: DiscoveryBatchJob, stats: Dict[str, int]) -> bool:
+        """Проверяет задание; завершенное — разбирает. Returns: True, если задание больше не ждет"""
+        client = self._client(job.provider)
+        job.polls += 1
+        try:
+            state = client.state(job.external_id)
+        except Exception as e:
+            # Сбой проверки — повторим при следующей
+            logger.warning(f"Пакетное задание {job.external_id}: ошибка проверки: {str(e)}")
+            job.save(update_fields=['polls'])
+            return False
+        if state != batch_api.STATE_ENDED:
+            job.save(update_fields=['polls'])
+            return False
+
+        results = {result.custom_id: result for result in client.results(job.external_id)}
+        for custom_id, info in job.requests.items():
+            result = results.get(custom_id)
+            if result is None:
+                self._process_result(checkpoint, job, custom_id, info, None, 'Нет результата в пакетном задании', stats)
+            else:
+                self._process_result(checkpoint, job, custom_id, info, result.response, result.error, stats)
+        job.status = DiscoveryBatchJob.STATUS_ENDED
+        job.ended_at = timezone.now()
+        job.save()
+        logger.info(f"Пакетное задание {job.external_id}: получено {job.succeeded} ответов, ошибок {job.errored}")
+        return True
+
+    def _process_result(self, checkpoint: RunCheckpoint, job: DiscoveryBatchJob, custom_id: str, info: Dict,
+                        response: Any, error: str, stats: Dict[str, int]):
+        """Разбирает результат одного запроса как ответ обычного вызова и завершает цель"""
+        service = self.service
+        is_manufacturers = checkpoint.target_field == 'manufacturer'
+        model_class = Manufacturer if is_manufacturers else NewsResource
+        target = model_class.objects.filter(pk=info['target_id']).first()
+        if target is None:
+            logger.warning(f"Пакетное задание {job.external_id}: цель {custom_id} удалена")
+            return
+        window = (date.fromisoformat(info['start_date']), date.fromisoformat(info['end_date']))
+        submitted_at = job.created_at.timestamp() if job.created_at else time.time()
+
+        def process(target):
+            llm_response, llm_error = None, error or None
+            if response is not None:
+                llm_response, llm_error = self._parse(job, response, info['prompt'], submitted_at)
+            elif error and job.external_id:
+                # Ошибка запроса внутри задания — неудачный вызов в истории провайдера
+                service._query_failed(job.provider, job.model, submitted_at, TokenUsage(0, 0),
+                                      RuntimeError(error), prompt=info['prompt'])
+            if llm_response is not None:
+                service._note_provider_used(job.provider)
+                job.succeeded += 1
+            else:
+                job.errored += 1
+            return service._ingest_response(
+                checkpoint.target_field, target, job.provider, llm_response, llm_error, *window
+            )
+
+        context = (service._target_context(manufacturer=target, window=window) if is_manufacturers
+                   else service._target_context(resource=target, window=window))
+        token = service._batch_api_var.set(True)
+        try:
+            with context:
+                self._finish_target(checkpoint, target, stats, service._checkpointed(process, checkpoint))
+        finally:
+            service._batch_api_var.reset(token)
+
+    def _parse(self, job: DiscoveryBatchJob, response: Any, prompt: str,
+               submitted_at: float) -> Tuple[Optional[Dict], Optional[str]]:
+        """Ответ из задания → (llm_response, llm_error) через _extract/_parse провайдера"""
+        service = self.service
+        if job.provider == 'anthropic':
+            extract, parse = service._extract_anthropic_response, service._parse_anthropic_content
+        else:
+            extract, parse = service._extract_openai_response, service._parse_openai_content
+        usage, content = TokenUsage(0, 0), None
+        try:
+            content, usage = extract(response)
+            result = parse(content)
+        except Exception as e:
+            error = service._query_failed(job.provider, job.model, submitted_at, usage, e,
+                                          content=content, prompt=prompt)
+            return None, str(error)
+        return service._query_succeeded(job.provider, job.model, submitted_at, usage, result,
+                                        content=content, prompt=prompt), None
+
+    @staticmethod
+    def _finish_target(checkpoint: RunCheckpoint, target: Any, stats: Dict[str, int], process) -> None:
+        """Обработка цели с записью итога в DiscoveryWorkItem (как on_result исполнителя)"""
+        result: Optional[TargetResult] = None
+        exc = None
+        try:
+            result = process(target)
+        except Exception as e:
+            logger.error(f"Ошибка обработки цели {target.pk}: {str(e)}", exc_info=True)
+            exc = e
+        checkpoint.finish(target, result, exc)
+        created, errors, _error_msg = result or (0, 1, None)
+        stats['created'] += created
+        stats['errors'] += errors
+        stats['total_processed'] += 1
@@ -0,0 +1,112 @@
+"""
+Пакетные запросы по нескольким малопродуктивным источникам.
+"""
+import threading
+from collections import defaultdict
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_SETTINGS = {
+    'enabled': False,
+    'max_batch_size': 5,        # Web search xAI принимает не больше 5 allowed_domains
+    'languages': ['en'],        # Языки источников, которые объединяются в пакеты
+    'max_ranking_score': 20,    # Только источники с ranking_score не выше (малопродуктивные)
+}
+
+# (llm_response, provider_used, llm_error) — как у _run_provider_chain
+BatchOutcome = Tuple[Optional[Dict], Optional[str], Optional[str]]
+
+
+class ResourceBatch:
+    """Источники одного пакетного запроса; запрос выполняется один раз, потокобезопасно"""
+
+    def __init__(self, resources: List[Any], domains: List[str], start_date: date, end_date: date):
+        self.resources = resources
+        self.domains = domains
+        self.start_date = start_date
+        self.end_date = end_date
+        self._lock = threading.Lock()
+        self._fetched = False
+        self._pending = {resource.id for resource in resources}
+        self._outcomes: Dict[int, BatchOutcome] = {}
+        self._error: Optional[Exception] = None
+
+    def __len__(self):
+        return len(self.resources)
+
+    def take(self, resource: Any, fetch: Callable[['ResourceBatch'], Dict[int, BatchOutcome]]) -> Optional[BatchOutcome]:
+        """
+        Часть пакетного ответа для источника; первый вызов выполняет fetch(batch).
+        None — источник свою часть уже получил (повтор идет одиночным запросом).
+        Ошибка fetch пробрасывается каждому участнику.
+        """
+        with self._lock:
+            if resource.id not in self._pending:
+                return None
+            if not self._fetched:
+                self._fetched = True
+                try:
+                    self._outcomes = fetch(self)
+                except Exception as e:
+                    self._error = e
+            self._pending.discard(resource.id)
+            if self._error is not None:
+                raise self._error
+            return self._outcomes[resource.id]
+
+
+class ResourceBatching:
+    """Разбиение источников прохода на пакеты; настройки — SearchConfiguration.batching"""
+
+    def __init__(self, settings: Optional[Dict] = None):
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.enabled = bool(self.settings['enabled']) and int(self.settings['max_batch_size'] or 0) > 1
+
+    def is_eligible(self, resource: Any, ranking_score: float) -> bool:
+        return (
+            (resource.language or 'en') in self.settings['languages']
+            and not resource.custom_search_instructions
+            and ranking_score <= float(self.settings['max_ranking_score'])
+        )
+
+    def plan(self, resources: List[Any], ranking_scores: Dict[int, float],
+             search_start: Callable[[Any], date], end_date: date,
+             domain_of: Callable[[Any], str]) -> Dict[int, ResourceBatch]:
+        """
+        Пакеты источников одного языка, раздела и начала периода поиска.
+        Одиночные остатки в пакеты не попадают.
+
+        Returns:
+            {resource.id: пакет этого источника}
+        """
+        if not self.enabled:
+            return {}
+        groups: Dict[Tuple[str, str, date], List[Any]] = defaultdict(list)
+        for resource in resources:
+            if self.is_eligible(resource, ranking_scores.get(resource.id, 0.0)):
+                groups[(resource.language or 'en', resource.section or '', search_start(resource))].append(resource)
+
+        size = int(self.settings['max_batch_size'])
+        batches: Dict[int, ResourceBatch] = {}
+        for (_, _, start_date), members in groups.items():
+            for chunk in self._chunk_by_domain(members, domain_of, size):
+                if len(chunk) < 2:
+                    continue
+                batch = ResourceBatch(chunk, [domain_of(resource) for resource in chunk], start_date, end_date)
+                for resource in chunk:
+                    batches[resource.id] = batch
+        return batches
+
+    @staticmethod
+    def _chunk_by_domain(members: List[Any], domain_of: Callable[[Any], str], size: int) -> List[List[Any]]:
+        """Пакеты не больше size; домен — ключ ответа, поэтому в пакете домены не повторяются"""
+        chunks: List[List[Any]] = []
+        for resource in members:
+            domain = domain_of(resource)
+            for chunk in chunks:
+                if len(chunk) < size and all(domain_of(other) != domain for other in chunk):
+                    chunk.append(resource)
+                    break
+            else:
+                chunks.append([resource])
+        return chunks
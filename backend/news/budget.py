@@ -0,0 +1,208 @@
+"""
+Бюджет запуска поиска (RunBudget) и оценка его стоимости до запуска (CostEstimator).
+"""
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from django.db.models import Avg, Count, Sum
+from django.utils import timezone
+
+from .models import DiscoveryAPICall
+from .prompt_cache import TokenUsage, call_cost
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'limit_usd': 0,                # Бюджет запуска в USD (0 — без бюджета)
+    'mode': 'soft',                # soft — после бюджета только самый дешевый провайдер; hard — остановка
+    'downgrade_at': 0.8,           # Доля бюджета, после которой первым идет самый дешевый провайдер
+    'history_days': 30,            # Период истории DiscoveryAPICall для оценки
+    'default_input_tokens': 3000,  # Поиск цели без истории
+    'default_output_tokens': 1500,
+}
+
+MODE_SOFT = 'soft'
+MODE_HARD = 'hard'
+
+# Состояние бюджета запуска (NewsDiscoveryRun.budget_status)
+STATE_OK = 'ok'
+STATE_DOWNGRADED = 'downgraded'
+STATE_EXHAUSTED = 'exhausted'
+
+
+class TargetEstimate(NamedTuple):
+    """Оценка поиска одной цели"""
+    target_id: int
+    input_tokens: int
+    output_tokens: int
+    cost_usd: float
+    basis: str  # target — история цели, average — среднее по целям, default — без истории
+
+
+class CostEstimator:
+    """Оценка стоимости поиска целей по истории DiscoveryAPICall и текущим ценам"""
+
+    def __init__(self, config, settings: Optional[Dict] = None):
+        self.config = config
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self._call_costs: Optional[Dict[str, float]] = None
+
+    def _since(self):
+        return timezone.now() - timedelta(days=float(self.settings['history_days']))
+
+    def price(self, provider: str, input_tokens: float, output_tokens: float,
+              cached_input_tokens: float = 0, cache_write_tokens: float = 0) -> float:
+        """Стоимость токенов по текущим ценам, кэшированные — по своей цене (news/prompt_cache.py)"""
+        return call_cost(self.config, provider, TokenUsage(
+            input_tokens, output_tokens, cached_input_tokens, cache_write_tokens
+        ))
+
+    def prefetch(self):
+        """
+        Средняя стоимость вызова провайдеров — до начала прохода: выбор дешевого провайдера
+        идет и из event loop (режим async), где запросы к БД недоступны.
+        """
+        averages = (
+            DiscoveryAPICall.objects.filter(created_at__gte=self._since())
+            .values('provider')
+            .annotate(input=Avg('input_tokens'), output=Avg('output_tokens'),
+                      cached=Avg('cached_input_tokens'), written=Avg('cache_write_tokens'))
+            .order_by()
+        )
+        self._call_costs = {
+            row['provider']: self.price(row['provider'], row['input'] or 0, row['output'] or 0,
+                                        row['cached'] or 0, row['written'] or 0)
+            for row in averages
+        }
+
+    def clear(self):
+        """Конец прохода: история — заново в следующем"""
+        self._call_costs = None
+
+    def call_cost(self, provider: str) -> float:
+        """Средняя стоимость одного вызова провайдера по текущим ценам (для выбора дешевого)"""
+        if self._call_costs is None:
+            self.prefetch()
+        cost = self._call_costs.get(provider)
+        if cost is None:
+            cost = self.price(provider, self.settings['default_input_tokens'], self.settings['default_output_tokens'])
+        return cost
+
+    def cheapest_first(self, providers: List[str]) -> List[str]:
+        """Провайдеры по возрастанию стоимости вызова (при равенстве — порядок цепочки)"""
+        return sorted(providers, key=self.call_cost)
+
+    def estimate(self, targets: List[Any], field: str, providers: List[str]) -> List[TargetEstimate]:
+        """
+        Оценка поиска каждой цели.
+
+        Args:
+            field: 'resource' или 'manufacturer'
+            providers: цепочка провайдеров (один провайдер — учитывается только его история)
+        """
+        history = DiscoveryAPICall.objects.filter(created_at__gte=self._since(), **{f'{field}__isnull': False})
+        if len(providers) == 1:
+            history = history.filter(provider=providers[0])
+        searches = dict(
+            history.values_list(field).annotate(n=Count('discovery_run', distinct=True)).order_by()
+        )
+        tokens: Dict[int, List[float]] = defaultdict(lambda: [0, 0, 0.0])
+        rows = history.values(field, 'provider').annotate(
+            input=Sum('input_tokens'), output=Sum('output_tokens'),
+            cached=Sum('cached_input_tokens'), written=Sum('cache_write_tokens'),
+        ).order_by()
+        for row in rows:
+            totals = tokens[row[field]]
+            totals[0] += row['input'] or 0
+            totals[1] += row['output'] or 0
+            totals[2] += self.price(row['provider'], row['input'] or 0, row['output'] or 0,
+                                    row['cached'] or 0, row['written'] or 0)
+        per_search = {
+            target_id: [value / searches[target_id] for value in totals]
+            for target_id, totals in tokens.items() if searches.get(target_id)
+        }
+
+        if per_search:
+            average = [sum(values[i] for values in per_search.values()) / len(per_search) for i in range(3)]
+            fallback_basis = 'average'
+        else:
+            input_tokens = self.settings['default_input_tokens']
+            output_tokens = self.settings['default_output_tokens']
+            average = [input_tokens, output_tokens, self.price(providers[0], input_tokens, output_tokens) if providers else 0.0]
+            fallback_basis = 'default'
+
+        estimates = []
+        for target in targets:
+            values = per_search.get(target.id)
+            basis = 'target' if values else fallback_basis
+            values = values or average
+            estimates.append(TargetEstimate(target.id, round(values[0]), round(values[1]), values[2], basis))
+        return estimates
+
+
+class RunBudget:
+    """Расход запуска и его состояние относительно бюджета; потокобезопасно"""
+
+    def __init__(self, settings: Optional[Dict] = None):
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.limit = float(self.settings['limit_usd'] or 0)
+        self.enabled = self.limit > 0
+        self.mode = MODE_HARD if self.settings['mode'] == MODE_HARD else MODE_SOFT
+        self.downgrade_at = float(self.settings['downgrade_at'])
+        self._lock = threading.Lock()
+        self.spent = 0.0
+        self.state = STATE_OK
+
+    def start(self, spent: float = 0.0):
+        """Начало прохода; spent — уже потрачено в запуске (продолжение)"""
+        with self._lock:
+            self.spent = float(spent)
+            self.state = self._state_for(self.spent)
+
+    def _state_for(self, spent: float) -> str:
+        if not self.enabled:
+            return STATE_OK
+        if spent >= self.limit:
+            return STATE_EXHAUSTED
+        if spent >= self.limit * self.downgrade_at:
+            return STATE_DOWNGRADED
+        return STATE_OK
+
+    def spend(self, cost: float) -> Optional[str]:
+        """
+        Учитывает стоимость вызова.
+
+        Returns:
+            Новое состояние бюджета, если оно изменилось, иначе None
+        """
+        if not self.enabled or not cost:
+            return None
+        with self._lock:
+            self.spent += cost
+            state = self._state_for(self.spent)
+            if state == self.state:
+                return None
+            self.state = state
+        logger.warning(f"Бюджет запуска: потрачено ${self.spent:.4f} из ${self.limit:.2f} → {state}")
+        return state
+
+    @property
+    def allows_new_target(self) -> bool:
+        """Можно ли начинать следующую цель (жесткий бюджет исчерпан — нельзя)"""
+        return not (self.mode == MODE_HARD and self.state == STATE_EXHAUSTED)
+
+    @property
+    def allows_hedging(self) -> bool:
+        return self.state == STATE_OK
+
+    def providers(self, chain: List[str], cheapest_first: Callable[[List[str]], List[str]]) -> List[str]:
+        """Цепочка 'auto' с учетом бюджета: дешевые провайдеры первыми, после бюджета — только самый дешевый"""
+        if self.state == STATE_OK or not chain:
+            return chain
+        ordered = cheapest_first(chain)
+        if self.state == STATE_EXHAUSTED:
+            return ordered[:1]
+        return ordered
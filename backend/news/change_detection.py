@@ -0,0 +1,162 @@
+"""
+Проверка изменений сайта источника условным GET перед запросом к LLM.
+"""
+import hashlib
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'enabled': False,
+    'timeout_seconds': 5,          # Таймаут одного HTTP-запроса
+    'max_workers': 32,             # Параллельных проверок (и размер пула соединений)
+    'check_sitemap': True,         # Проверять и sitemap (из robots.txt или /sitemap.xml)
+    'max_unchanged_days': 14,      # Дольше без поиска нельзя, даже если сайт не изменился
+    'user_agent': 'Mozilla/5.0 (compatible; HVACNewsBot/1.0)',
+}
+
+_HREF = re.compile(rb'href\s*=\s*["\']([^"\'#]+)', re.IGNORECASE)
+_SITEMAP_ENTRY = re.compile(rb'<(?:loc|lastmod)>\s*([^<\s]+)\s*</', re.IGNORECASE)
+_ROBOTS_SITEMAP = re.compile(r'^\s*sitemap\s*:\s*(\S+)', re.IGNORECASE | re.MULTILINE)
+
+
+def pooled_session(pool_size: int, user_agent: str) -> requests.Session:
+    """Сессия requests с пулом keep-alive соединений на pool_size потоков (без повторов)"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = user_agent
+    return session
+
+
+def content_digest(body: bytes, is_sitemap: bool = False) -> str:
+    """SHA-256 от набора ссылок страницы (у sitemap — записей <loc>/<lastmod>); без ссылок — от всего тела"""
+    entries = (_SITEMAP_ENTRY if is_sitemap else _HREF).findall(body)
+    payload = b'\n'.join(sorted(set(entries))) if entries else body
+    return hashlib.sha256(payload).hexdigest()
+
+
+class ChangeDetector:
+    """Условные GET страниц источников; настройки — SearchConfiguration.change_detection"""
+
+    def __init__(self, settings: Optional[Dict] = None):
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.enabled = bool(self.settings['enabled'])
+        self.timeout = float(self.settings['timeout_seconds'])
+
+    def _session(self) -> requests.Session:
+        """Сессия с пулом keep-alive соединений на все потоки проверки"""
+        return pooled_session(int(self.settings['max_workers']), self.settings['user_agent'])
+
+    def check_url(self, session: requests.Session, url: str, previous: Optional[Dict],
+                  is_sitemap: bool = False) -> Tuple[Optional[bool], Dict]:
+        """
+        Условный GET одной страницы.
+
+        Returns:
+            (изменилась ли страница: True / False / None — неизвестно, новый отпечаток)
+        """
+        previous = previous or {}
+        headers = {}
+        if previous.get('etag'):
+            headers['If-None-Match'] = previous['etag']
+        if previous.get('last_modified'):
+            headers['If-Modified-Since'] = previous['last_modified']
+        try:
+            response = session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.debug(f"Проверка изменений {url}: {str(e)}")
+            return None, previous
+        if response.status_code == 304:
+            return False, previous
+        if response.status_code != 200:
+            return None, previous
+        fingerprint = {
+            'etag': response.headers.get('ETag', ''),
+            'last_modified': response.headers.get('Last-Modified', ''),
+            'sha256': content_digest(response.content, is_sitemap),
+        }
+        if not previous.get('sha256'):
+            return None, fingerprint
+        return fingerprint['sha256'] != previous['sha256'], fingerprint
+
+    def find_sitemap(self, session: requests.Session, url: str) -> str:
+        """URL sitemap сайта: из robots.txt, иначе /sitemap.xml; '' — sitemap нет"""
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme or 'https'}://{parsed.netloc}"
+        try:
+            robots = session.get(urljoin(origin, '/robots.txt'), timeout=self.timeout)
+            if robots.status_code == 200:
+                match = _ROBOTS_SITEMAP.search(robots.text)
+                if match:
+                    return match.group(1)
+            sitemap = session.head(urljoin(origin, '/sitemap.xml'), timeout=self.timeout, allow_redirects=True)
+            if sitemap.status_code == 200:
+                return sitemap.url
+        except requests.RequestException as e:
+            logger.debug(f"Поиск sitemap {origin}: {str(e)}")
+        return ''
+
+    def check_resource(self, session: requests.Session, url: str, fingerprint: Optional[Dict]) -> Tuple[bool, Dict]:
+        """
+        Проверка источника: страница и sitemap.
+
+        Returns:
+            (сайт точно не изменился, новый отпечаток)
+        """
+        fingerprint = dict(fingerprint or {})
+        page_changed, fingerprint['page'] = self.check_url(session, url, fingerprint.get('page'))
+        results = [page_changed]
+        if self.settings['check_sitemap']:
+            if 'sitemap_url' not in fingerprint:
+                fingerprint['sitemap_url'] = self.find_sitemap(session, url)
+            if fingerprint['sitemap_url']:
+                sitemap_changed, fingerprint['sitemap'] = self.check_url(
+                    session, fingerprint['sitemap_url'], fingerprint.get('sitemap'), is_sitemap=True
+                )
+                results.append(sitemap_changed)
+        return all(changed is False for changed in results), fingerprint
+
+    def check(self, targets: List[Tuple[int, str, Optional[Dict], Optional[datetime]]],
+              now: datetime) -> Dict[int, Tuple[bool, Dict]]:
+        """
+        Параллельная проверка источников.
+
+        Args:
+            targets: (id источника, URL, прежний отпечаток, время последнего поиска LLM)
+
+        Returns:
+            {id источника: (запрос к LLM можно пропустить, новый отпечаток)}
+        """
+        if not targets:
+            return {}
+        max_age = timedelta(days=float(self.settings['max_unchanged_days']))
+        started = time.time()
+        session = self._session()
+        try:
+            workers = max(1, min(int(self.settings['max_workers']), len(targets)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='change-check') as pool:
+                checked = list(pool.map(lambda target: self.check_resource(session, target[1], target[2]), targets))
+        finally:
+            session.close()
+
+        results = {}
+        for (resource_id, _, _, last_search), (unchanged, fingerprint) in zip(targets, checked):
+            # Давно не искали — спрашиваем LLM, даже если сайт не изменился
+            if last_search is None or now - last_search > max_age:
+                unchanged = False
+            results[resource_id] = (unchanged, fingerprint)
+        skipped = sum(1 for unchanged, _ in results.values() if unchanged)
+        logger.info(f"Проверка изменений: {len(targets)} источников за {time.time() - started:.1f} с, "
+                    f"без изменений (без запроса к LLM): {skipped}")
+        return results
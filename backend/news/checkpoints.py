@@ -0,0 +1,174 @@
+"""
+Чекпоинты запуска поиска: состояние каждой цели в DiscoveryWorkItem.
+"""
+import logging
+import time
+from datetime import date
+from typing import Any, List, Optional
+
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .discovery_executor import TargetResult
+from .models import DiscoveryWorkItem, NewsDiscoveryRun
+
+logger = logging.getLogger(__name__)
+
+# Как часто проверять, не отменен ли запуск (секунды)
+CANCEL_CHECK_INTERVAL = 5.0
+
+
+class RunCheckpoint:
+    """Запись прогресса целей одного NewsDiscoveryRun"""
+
+    def __init__(self, run: NewsDiscoveryRun):
+        self.run = run
+        self.target_field = (
+            'manufacturer' if run.search_type == NewsDiscoveryRun.SEARCH_TYPE_MANUFACTURERS else 'resource'
+        )
+        self._cancelled = False
+        self._cancel_checked_at = 0.0
+        # ID цели -> итог ее обработки: провайдер, дубликаты (пишется из потоков-воркеров)
+        self._outcomes = {}
+        # Бюджет прохода (RunBudget); цели, не начатые из-за него
+        self.budget = None
+        self._over_budget = set()
+
+    @classmethod
+    def begin(cls, run: NewsDiscoveryRun, search_type: str, targets: List[Any], provider: str,
+              last_search_date_override: Optional[date] = None) -> 'RunCheckpoint':
+        """Сохраняет параметры прохода и создает записи целей в статусе 'pending'"""
+        run.search_type = search_type
+        run.status = NewsDiscoveryRun.STATUS_RUNNING
+        run.params = {
+            'provider': provider,
+            'last_search_date': last_search_date_override.isoformat() if last_search_date_override else None,
+        }
+        run.save(update_fields=['search_type', 'status', 'params', 'updated_at'])
+
+        checkpoint = cls(run)
+        DiscoveryWorkItem.objects.bulk_create(
+            [DiscoveryWorkItem(discovery_run=run, **{checkpoint.target_field: target}) for target in targets],
+            ignore_conflicts=True,
+        )
+        return checkpoint
+
+    @property
+    def provider(self) -> str:
+        return (self.run.params or {}).get('provider') or 'auto'
+
+    @property
+    def last_search_date_override(self) -> Optional[date]:
+        value = (self.run.params or {}).get('last_search_date')
+        return date.fromisoformat(value) if value else None
+
+    def reopen(self) -> List[Any]:
+        """
+        Готовит запуск к продолжению.
+        Returns:
+            Цели, которые еще не обработаны успешно (по возрастанию ID).
+        """
+        items = self.run.work_items
+        # 'in_flight' без воркера — запрос оборвался вместе с процессом
+        items.filter(status=DiscoveryWorkItem.STATUS_IN_FLIGHT).update(status=DiscoveryWorkItem.STATUS_PENDING)
+        self.run.status = NewsDiscoveryRun.STATUS_RUNNING
+        self.run.finished_at = None
+        self.run.save(update_fields=['status', 'finished_at', 'updated_at'])
+
+        remaining = (
+            items.exclude(status=DiscoveryWorkItem.STATUS_DONE)
+            .select_related(self.target_field)
+            .order_by(f'{self.target_field}_id')
+        )
+        return [getattr(item, self.target_field) for item in remaining]
+
+    def _items_for(self, target: Any):
+        return DiscoveryWorkItem.objects.filter(discovery_run=self.run, **{self.target_field: target})
+
+    def start(self, target: Any) -> bool:
+        """
+        Отмечает цель как выполняемую.
+        Returns:
+            False, если запуск отменен или исчерпан жесткий бюджет: цель не обрабатывается
+            и остается 'pending'.
+        """
+        if self.is_cancelled():
+            return False
+        if self.budget is not None and not self.budget.allows_new_target:
+            self._over_budget.add(target.pk)
+            return False
+        self._items_for(target).update(
+            status=DiscoveryWorkItem.STATUS_IN_FLIGHT,
+            attempts=F('attempts') + 1,
+            started_at=timezone.now(),
+        )
+        return True
+
+    def note_outcome(self, target: Any, outcome: dict):
+        self._outcomes[target.pk] = outcome
+
+    def finish(self, target: Any, result: Optional[TargetResult] = None, exc: Optional[Exception] = None):
+        """Сохраняет результат цели: 'done' или 'failed' (ошибка API или исключение)"""
+        created, errors, error_msg = result or (0, 0, None)
+        error = str(exc) if exc is not None else (error_msg or '')
+        outcome = self._outcomes.pop(target.pk, {})
+        self._items_for(target).update(
+            status=DiscoveryWorkItem.STATUS_FAILED if error else DiscoveryWorkItem.STATUS_DONE,
+            provider=outcome.get('provider', ''),
+            duplicates=outcome.get('duplicates', 0),
+            unchanged=outcome.get('unchanged', False),
+            news_created=created,
+            errors=errors,
+            error_message=error,
+            finished_at=timezone.now(),
+        )
+
+    def is_cancelled(self) -> bool:
+        """Отмену запуска (админка / API) проверяем не чаще раза в CANCEL_CHECK_INTERVAL секунд"""
+        now = time.monotonic()
+        if not self._cancelled and now - self._cancel_checked_at >= CANCEL_CHECK_INTERVAL:
+            self._cancel_checked_at = now
+            status = NewsDiscoveryRun.objects.filter(pk=self.run.pk).values_list('status', flat=True).first()
+            self._cancelled = status == NewsDiscoveryRun.STATUS_CANCELLED
+        return self._cancelled
+
+    def complete(self, failed: bool = False) -> str:
+        """
+        Итог прохода: счетчики запуска по целям и статус
+        (completed, cancelled — если запуск отменили, budget_exhausted — не все цели начаты
+        из-за жесткого бюджета, failed — при критической ошибке).
+        """
+        self._cancel_checked_at = 0.0
+        if failed:
+            status = NewsDiscoveryRun.STATUS_FAILED
+        elif self.is_cancelled():
+            status = NewsDiscoveryRun.STATUS_CANCELLED
+        elif self._over_budget:
+            status = NewsDiscoveryRun.STATUS_BUDGET_EXHAUSTED
+        else:
+            status = NewsDiscoveryRun.STATUS_COMPLETED
+
+        totals = self.run.work_items.aggregate(
+            news=Sum('news_created'),
+            duplicates=Sum('duplicates'),
+            unchanged=Count('id', filter=Q(unchanged=True)),
+            processed=Count('id', filter=Q(status__in=[DiscoveryWorkItem.STATUS_DONE, DiscoveryWorkItem.STATUS_FAILED])),
+            failed=Count('id', filter=Q(status=DiscoveryWorkItem.STATUS_FAILED)),
+        )
+        self.run.status = status
+        self.run.news_found = totals['news'] or 0
+        self.run.news_duplicates = totals['duplicates'] or 0
+        self.run.resources_processed = totals['processed']
+        self.run.resources_failed = totals['failed']
+        self.run.resources_unchanged = totals['unchanged']
+        update_fields = ['status', 'news_found', 'news_duplicates', 'resources_processed', 'resources_failed',
+                         'resources_unchanged', 'updated_at']
+        if self.budget is not None and self.budget.enabled:
+            self.run.budget_status = self.budget.state
+            self.run.targets_over_budget = len(self._over_budget)
+            update_fields += ['budget_status', 'targets_over_budget']
+        self.run.save(update_fields=update_fields)
+        logger.info(f"Discovery run #{self.run.id}: {status}, целей {totals['processed']}, "
+                    f"ошибок {totals['failed']}, новостей {self.run.news_found}, "
+                    f"дубликатов {self.run.news_duplicates}")
+        return status
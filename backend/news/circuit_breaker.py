@@ -0,0 +1,169 @@
+"""
+Circuit breaker провайдеров LLM в пределах одного запуска поиска.
+"""
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+DEFAULT_SETTINGS = {
+    'enabled': True,
+    'window': 10,             # Сколько последних вызовов учитывать
+    'min_calls': 3,           # Минимум вызовов в окне, чтобы breaker мог сработать
+    'failure_rate': 0.5,      # Доля ошибок для перехода в open
+    'slow_call_ratio': 0.8,   # Вызов дольше timeout * ratio считается ошибкой (0 = не учитывать)
+    'cooldown_seconds': 300,  # Сколько провайдер пропускается после срабатывания
+}
+
+
+class CircuitBreaker:
+    """Breaker одного провайдера (потокобезопасен)"""
+
+    def __init__(self, provider: str, window: int, min_calls: int, failure_rate: float,
+                 slow_call_ms: int, cooldown_seconds: float, clock=time.monotonic):
+        self.provider = provider
+        self.min_calls = max(1, int(min_calls))
+        self.failure_rate_threshold = float(failure_rate)
+        self.slow_call_ms = int(slow_call_ms or 0)
+        self.cooldown_seconds = float(cooldown_seconds)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: Deque[bool] = deque(maxlen=max(1, int(window)))
+        self._trial_in_flight = False
+
+        self.state = STATE_CLOSED
+        self.opened_at: Optional[float] = None
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.skipped = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос. В half_open пропускается один пробный вызов."""
+        with self._lock:
+            if self.state == STATE_OPEN:
+                if self._clock() - self.opened_at < self.cooldown_seconds:
+                    self.skipped += 1
+                    return False
+                self.state = STATE_HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == STATE_HALF_OPEN:
+                if self._trial_in_flight:
+                    self.skipped += 1
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def record(self, success: bool, duration_ms: int = 0) -> bool:
+        """
+        Учитывает результат вызова.
+        Returns:
+            True, если состояние breaker изменилось.
+        """
+        is_slow = bool(self.slow_call_ms and duration_ms > self.slow_call_ms)
+        failed = not success or is_slow
+        with self._lock:
+            previous = self.state
+            self.calls += 1
+            self.failures += int(not success)
+            self.slow_calls += int(success and is_slow)
+
+            if self.state == STATE_HALF_OPEN:
+                self._trial_in_flight = False
+                if failed:
+                    self._open()
+                else:
+                    self.state = STATE_CLOSED
+                    self._outcomes.clear()
+            elif self.state == STATE_CLOSED:
+                self._outcomes.append(failed)
+                if len(self._outcomes) >= self.min_calls and self.failure_rate >= self.failure_rate_threshold:
+                    self._open()
+            # В open результаты запущенных ранее вызовов только учитываются в счетчиках
+            return self.state != previous
+
+    def release(self):
+        """Вызов отменен без результата: в half_open снова разрешается пробный вызов"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    @property
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / len(self._outcomes)
+
+    def _open(self):
+        self.state = STATE_OPEN
+        self.opened_at = self._clock()
+        self.times_opened += 1
+        self._outcomes.clear()
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'calls': self.calls,
+                'failures': self.failures,
+                'slow_calls': self.slow_calls,
+                'skipped': self.skipped,
+                'times_opened': self.times_opened,
+                'window_failure_rate': round(self.failure_rate, 3),
+            }
+
+
+class CircuitBreakerSet:
+    """Breakers всех провайдеров запуска; настройки — SearchConfiguration.circuit_breaker"""
+
+    def __init__(self, settings: Optional[Dict] = None, timeout_seconds: float = 0, clock=time.monotonic):
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.enabled = bool(self.settings['enabled'])
+        ratio = float(self.settings['slow_call_ratio'] or 0)
+        self.slow_call_ms = int(timeout_seconds * 1000 * ratio) if timeout_seconds and ratio else 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(provider)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    provider,
+                    window=self.settings['window'],
+                    min_calls=self.settings['min_calls'],
+                    failure_rate=self.settings['failure_rate'],
+                    slow_call_ms=self.slow_call_ms,
+                    cooldown_seconds=self.settings['cooldown_seconds'],
+                    clock=self._clock,
+                )
+                self._breakers[provider] = breaker
+            return breaker
+
+    def allow(self, provider: str) -> bool:
+        if not self.enabled:
+            return True
+        return self.get(provider).allow()
+
+    def record(self, provider: str, success: bool, duration_ms: int = 0) -> bool:
+        if not self.enabled:
+            return False
+        return self.get(provider).record(success, duration_ms)
+
+    def release(self, provider: str):
+        if self.enabled:
+            self.get(provider).release()
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.provider: breaker.to_dict() for breaker in breakers}
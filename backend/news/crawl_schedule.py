@@ -0,0 +1,64 @@
+"""
+Адаптивное расписание поиска по источникам и производителям.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from django.db.models import Q
+
+DEFAULT_SETTINGS = {
+    'enabled': True,
+    'base_interval_hours': 24,        # Интервал после поиска с новостями
+    'min_interval_hours': 12,         # Интервал продуктивных целей и повтора после ошибки
+    'max_interval_hours': 24 * 14,    # Предел back-off для целей без новостей
+    'backoff_factor': 2,              # Множитель интервала за каждый поиск подряд без новостей
+    'promote_news_per_search': 3,     # Столько новостей за поиск — цель продуктивна
+    'promote_news_last_30_days': 10,  # ...или столько за последние 30 дней
+    'due_slack_hours': 6,             # Цель, которой срок наступит в ближайшие часы, берется в текущий проход
+}
+
+
+class CrawlSchedule:
+    """Расписание поиска; настройки — SearchConfiguration.scheduling"""
+
+    def __init__(self, settings: Optional[Dict] = None):
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.enabled = bool(self.settings['enabled'])
+
+    def due_filter(self, now: datetime, prefix: str = 'statistics') -> Q:
+        """
+        Условие «цель пора искать» для выборки источников или производителей
+        (prefix — связь со статистикой). Цели без статистики или без срока — всегда.
+        """
+        deadline = now + timedelta(hours=float(self.settings['due_slack_hours'] or 0))
+        return (
+            Q(**{f'{prefix}__isnull': True})
+            | Q(**{f'{prefix}__next_search_at__isnull': True})
+            | Q(**{f'{prefix}__next_search_at__lte': deadline})
+        )
+
+    def interval(self, stats, news_count: int, is_no_news: bool, has_errors: bool) -> timedelta:
+        """Интервал до следующего поиска по итогу текущего; обновляет stats.empty_search_streak"""
+        settings = self.settings
+        if news_count <= 0 and has_errors and not is_no_news:
+            # Провайдеры не ответили — о цели ничего не узнали
+            hours = settings['min_interval_hours']
+        elif news_count <= 0:
+            # «Новостей нет» или только уже сохраненные
+            stats.empty_search_streak += 1
+            hours = min(
+                float(settings['base_interval_hours']) * float(settings['backoff_factor']) ** stats.empty_search_streak,
+                float(settings['max_interval_hours']),
+            )
+        else:
+            stats.empty_search_streak = 0
+            productive = (
+                news_count >= int(settings['promote_news_per_search'])
+                or stats.news_last_30_days >= int(settings['promote_news_last_30_days'])
+            )
+            hours = settings['min_interval_hours'] if productive else settings['base_interval_hours']
+        return timedelta(hours=float(hours))
+
+    def plan(self, stats, now: datetime, news_count: int, is_no_news: bool, has_errors: bool):
+        """Назначает stats.next_search_at (сохраняет вызывающий код)"""
+        stats.next_search_at = now + self.interval(stats, news_count, is_no_news, has_errors)
@@ -0,0 +1,94 @@
+"""
+Дедупликация новостей по URL статьи и отпечатку заголовка при создании из ответов LLM.
+"""
+import hashlib
+import re
+from datetime import timedelta
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import NewsPost
+
+# Совпадение заголовков учитываем только среди новостей за этот период
+TITLE_WINDOW_DAYS = 90
+# Нормализованный заголовок короче этого не получает отпечаток
+MIN_TITLE_LENGTH = 12
+
+# Параметры ссылок, не влияющие на содержимое страницы
+TRACKING_PARAMS = {'fbclid', 'gclid', 'yclid', 'mc_cid', 'mc_eid', 'ref', 'from', '_openstat'}
+
+_NON_WORD_RE = re.compile(r'[^\w]+', re.UNICODE)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Каноническая форма URL: https, хост без www в нижнем регистре, без фрагмента,
+    трекинговых параметров (utm_* и TRACKING_PARAMS) и завершающего слеша.
+    """
+    parts = urlsplit((url or '').strip())
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip('/')
+    return urlunsplit(('https', host, path, urlencode(query), ''))
+
+
+def url_hash(url: Optional[str]) -> str:
+    """SHA-256 канонического URL статьи; пустая строка для главной страницы или пустого URL"""
+    if not url:
+        return ''
+    canonical = canonicalize_url(url)
+    parts = urlsplit(canonical)
+    if not parts.netloc or (not parts.path and not parts.query):
+        return ''
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def normalize_title(title: Optional[str]) -> str:
+    """Заголовок в нижнем регистре, ё → е, без пунктуации и лишних пробелов"""
+    normalized = (title or '').lower().replace('ё', 'е')
+    return ' '.join(_NON_WORD_RE.sub(' ', normalized).split())
+
+
+def title_fingerprint(title: Optional[str]) -> str:
+    """SHA-256 нормализованного заголовка; пустая строка для слишком коротких заголовков"""
+    normalized = normalize_title(title)
+    if len(normalized) < MIN_TITLE_LENGTH:
+        return ''
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def find_duplicate(source_url_hash: str, fingerprint: str) -> Optional[NewsPost]:
+    """Ранее сохраненная новость с тем же URL статьи или заголовком (самая свежая)"""
+    condition = Q()
+    if source_url_hash:
+        condition |= Q(source_url_hash=source_url_hash)
+    if fingerprint:
+        since = timezone.now() - timedelta(days=TITLE_WINDOW_DAYS)
+        condition |= Q(title_fingerprint=fingerprint, created_at__gte=since)
+    if not condition:
+        return None
+    return NewsPost.objects.filter(condition).order_by('-created_at').first()
+
+
+def merge_duplicate(existing: NewsPost, source_url: Optional[str], source_url_hash: str) -> bool:
+    """
+    Дополняет найденную новость данными дубликата: если у нее нет ссылки на статью,
+    а у дубликата есть — сохраняем ссылку.
+
+    Returns:
+        True, если новость обновлена.
+    """
+    if existing.source_url_hash or not source_url_hash:
+        return False
+    NewsPost.objects.filter(pk=existing.pk).update(source_url=source_url, source_url_hash=source_url_hash)
+    return True
@@ -0,0 +1,199 @@
+"""
+Параллельное выполнение поиска новостей по списку целей (источники или производители).
+DiscoveryExecutor — пул потоков, AsyncDiscoveryExecutor — тот же проход на asyncio.
+"""
+import asyncio
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# (created_count, error_count, error_message) — результат discover_news_for_*
+TargetResult = Tuple[int, int, Optional[str]]
+
+
+class DiscoveryExecutor:
+    """
+    Обрабатывает цели в ограниченном пуле потоков.
+
+    Семантика очереди повторов как у последовательного прохода: цели, завершившиеся
+    ошибкой API, повторяются после основного прохода (не более max_retries раз).
+    Прогресс сообщается из управляющего потока, поэтому NewsDiscoveryStatus
+    обновляется без гонок между воркерами.
+
+    on_start(target) и on_result(target, result, exc) тоже вызываются из управляющего
+    потока: перед отправкой цели воркеру (False — цель пропускается) и после ее обработки.
+    В пул одновременно отправляется не больше max_workers целей, поэтому on_start
+    совпадает с фактическим началом обработки.
+    """
+
+    def __init__(
+        self,
+        process_target: Callable[[Any], TargetResult],
+        max_workers: int = 1,
+        max_retries: int = 1,
+        on_progress: Optional[Callable[[int], None]] = None,
+        target_name: str = 'Target',
+        on_start: Optional[Callable[[Any], bool]] = None,
+        on_result: Optional[Callable[[Any, Optional[TargetResult], Optional[Exception]], None]] = None,
+    ):
+        self.process_target = process_target
+        self.max_workers = max(1, int(max_workers or 1))
+        self.max_retries = max(0, int(max_retries or 0))
+        self.on_progress = on_progress
+        self.target_name = target_name
+        self.on_start = on_start
+        self.on_result = on_result
+
+    def run(self, targets: List[Any]) -> Dict[str, int]:
+        """
+        Обрабатывает все цели.
+
+        Returns:
+            Dict: {'created': int, 'errors': int, 'total_processed': int}
+        """
+        stats = {'created': 0, 'errors': 0, 'total_processed': 0}
+        pending = list(targets)
+        attempt = 0
+        while pending:
+            retry_queue = []
+            for target, result, exc in self._run_round(pending):
+                self._record_result(stats, retry_queue, target, result, exc)
+                if self.on_result:
+                    self.on_result(target, result, exc)
+                if self.on_progress:
+                    self.on_progress(stats['total_processed'])
+
+            pending = self._next_round(retry_queue, attempt)
+            attempt += 1
+
+        return stats
+
+    def _record_result(self, stats: Dict[str, int], retry_queue: List[Any], target: Any,
+                       result: Optional[TargetResult], exc: Optional[Exception]):
+        """Учитывает результат цели; цели с ошибкой попадают в очередь повторов"""
+        stats['total_processed'] += 1
+
+        if exc is not None:
+            logger.error(f"Unexpected error processing {self.target_name.lower()} {target.id}: {str(exc)}")
+            stats['errors'] += 1
+            retry_queue.append(target)
+            return
+
+        created, errors, error_msg = result
+        stats['created'] += created
+        stats['errors'] += errors
+        if error_msg:
+            # Ошибка API - повторим после основного прохода
+            retry_queue.append(target)
+
+    def _next_round(self, retry_queue: List[Any], attempt: int) -> List[Any]:
+        """Цели для следующего прохода (пусто, если повторы исчерпаны)"""
+        if not retry_queue or attempt >= self.max_retries:
+            return []
+        logger.info(f"{len(retry_queue)} {self.target_name.lower()}(s) added to retry queue due to API error")
+        return retry_queue
+
+    def _run_round(self, targets: List[Any]) -> Iterator[Tuple[Any, Optional[TargetResult], Optional[Exception]]]:
+        """Один проход по списку целей: последовательно или в пуле потоков"""
+        workers = min(self.max_workers, len(targets))
+        if workers <= 1:
+            for target in targets:
+                if self._should_start(target):
+                    yield (target, *self._process(target, threaded=False))
+            return
+
+        remaining = iter(targets)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='discovery') as pool:
+            futures = {}
+
+            def submit_next():
+                for target in remaining:
+                    if self._should_start(target):
+                        futures[pool.submit(self._process, target, True)] = target
+                        return
+
+            for _ in range(workers):
+                submit_next()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    target = futures.pop(future)
+                    submit_next()
+                    yield (target, *future.result())
+
+    def _should_start(self, target: Any) -> bool:
+        return self.on_start is None or self.on_start(target)
+
+    def _process(self, target: Any, threaded: bool) -> Tuple[Optional[TargetResult], Optional[Exception]]:
+        try:
+            return self.process_target(target), None
+        except Exception as e:
+            return None, e
+        finally:
+            if threaded:
+                # Каждый поток открывает собственное соединение с БД - закрываем его
+                close_old_connections()
+
+
+class AsyncDiscoveryExecutor(DiscoveryExecutor):
+    """
+    Обрабатывает цели в одном event loop: process_target — корутинная функция,
+    одновременно выполняется не более max_workers корутин.
+    Семантика повторов и прогресса как у DiscoveryExecutor.
+
+    run() остается синхронным (async_to_sync), поэтому вызывающий код не меняется.
+    Синхронная работа с БД внутри корутин должна идти через sync_to_async.
+    """
+
+    def run(self, targets: List[Any]) -> Dict[str, int]:
+        return async_to_sync(self.arun)(targets)
+
+    async def arun(self, targets: List[Any]) -> Dict[str, int]:
+        """Асинхронный вариант run()"""
+        on_progress = sync_to_async(self.on_progress) if self.on_progress else None
+        on_result = sync_to_async(self.on_result) if self.on_result else None
+        stats = {'created': 0, 'errors': 0, 'total_processed': 0}
+        pending = list(targets)
+        attempt = 0
+        while pending:
+            retry_queue = []
+            async for target, result, exc in self._arun_round(pending):
+                self._record_result(stats, retry_queue, target, result, exc)
+                if on_result:
+                    await on_result(target, result, exc)
+                if on_progress:
+                    await on_progress(stats['total_processed'])
+
+            pending = self._next_round(retry_queue, attempt)
+            attempt += 1
+
+        return stats
+
+    async def _arun_round(self, targets: List[Any]) -> AsyncIterator[Tuple[Any, Optional[TargetResult], Optional[Exception]]]:
+        """Один проход: все цели запускаются сразу, семафор ограничивает число активных"""
+        semaphore = asyncio.Semaphore(self.max_workers)
+        on_start = sync_to_async(self.on_start) if self.on_start else None
+
+        async def process(target):
+            async with semaphore:
+                if on_start and not await on_start(target):
+                    return None
+                try:
+                    return target, await self.process_target(target), None
+                except Exception as e:
+                    return target, None, e
+
+        tasks = [asyncio.ensure_future(process(target)) for target in targets]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                outcome = await next_done
+                if outcome is not None:
+                    yield outcome
+        finally:
+            for task in tasks:
+                task.cancel()
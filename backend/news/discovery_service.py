@@ -4,23 +4,58 @@
 Anthropic Claude Haiku 4.5 используется как дополнительный провайдер.
 OpenAI GPT-5.2 с Responses API используется как резервный вариант.
 """
+import asyncio
+import contextvars
 import logging
 import json
 import re
-from typing import Any, List, Dict, Optional, Tuple
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Awaitable, Callable, List, Dict, Optional, Set, Tuple, Union
 from datetime import date, timedelta
+from decimal import Decimal
 from urllib.parse import urlparse
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from references.models import NewsResource, NewsResourceStatistics, Manufacturer, ManufacturerStatistics
-from .models import NewsPost, NewsDiscoveryRun, NewsDiscoveryStatus, SearchConfiguration, DiscoveryAPICall
+from .models import (
+    NewsPost, NewsDiscoveryRun, NewsDiscoveryStatus, SearchConfiguration, DiscoveryAPICall, DiscoveryBatchJob, FeedEntry,
+)
+from .discovery_executor import AsyncDiscoveryExecutor, DiscoveryExecutor
+from .llm_clients import get_client_registry
+from .rate_limiter import RateLimiter
+from .circuit_breaker import CircuitBreakerSet
+from .hedging import HedgePolicy
+from .crawl_schedule import CrawlSchedule
+from .batching import BatchOutcome, ResourceBatch, ResourceBatching
+from .streaming import StreamedNews
+from .change_detection import ChangeDetector
+from .budget import CostEstimator, RunBudget, TargetEstimate
+from .output_cap import ANTHROPIC_MAX_TOKENS, OutputCap
+from .routing import ProviderRouter
+from .prompt_cache import TokenUsage, anthropic_system, call_cost, prefix_key, usage_count
+from .feeds import MAX_SUMMARY_CHARS, FeedItem, FeedPoll, FeedPoller, guid_hash
+from .translation_service import TranslationService
+from .checkpoints import RunCheckpoint
+from .api_call_buffer import APICallBuffer
+from . import batch_api, dedup, json_extract, near_duplicates, response_archive, structured_output
 from users.models import User
 import time
 
 logger = logging.getLogger(__name__)
 
 
+class ProviderConfigurationError(Exception):
+    """Провайдер неизвестен или для него не настроен API ключ"""
+
+
 class NewsDiscoveryService:
     """
     Сервис для автоматического поиска новостей через LLM API.
@@ -28,6 +63,7 @@ class NewsDiscoveryService:
     """
     
     SUPPORTED_LANGUAGES = ['ru', 'en', 'de', 'pt']
+    MAX_RETRIES = 1  # Одна повторная попытка для источников с ошибкой API
     
     @staticmethod
     def _extract_domain(url: str) -> str:
@@ -76,15 +112,70 @@ class NewsDiscoveryService:
         
         # Параметры из конфигурации
         self.timeout = self.config.timeout
+        self.stream_responses = bool(self.config.stream_responses)
         self.temperature = self.config.temperature
         self.max_search_results = self.config.max_search_results
         self.search_context_size = self.config.search_context_size
         self.max_news_per_resource = self.config.max_news_per_resource
+        # max_news_per_resource в промпте, лимите выходных токенов и при разборе ответа (news/output_cap.py)
+        self.output_cap = OutputCap(self.max_news_per_resource, self.config.output_cap)
         self.delay_between_requests = self.config.delay_between_requests
         
-        # Определяем какие провайдеры использовать
+        # Параллельность: размер пула потоков и лимиты одновременных запросов по провайдерам
+        self.max_workers = max(1, self.config.max_workers or 1)
+        self._provider_semaphores = {
+            provider: threading.BoundedSemaphore(int(limit))
+            for provider, limit in (self.config.provider_concurrency or {}).items()
+            if limit and int(limit) > 0
+        }
+        
+        # Клиенты SDK берем из общего реестра; пул соединений — не меньше числа воркеров
+        self.clients = get_client_registry()
+        self.http_pool_size = self.max_workers
+        
+        # Лимиты rpm/tpm и delay_between_requests по провайдерам (общие для потоков и процессов)
+        self.rate_limiter = RateLimiter(self.config)
+        
+        # Circuit breaker провайдеров для режима 'auto' (сбрасывается в start_discovery_run)
+        self.circuit_breakers = CircuitBreakerSet(self.config.circuit_breaker, timeout_seconds=self.timeout)
+        
+        # Хеджирование медленных запросов в режиме 'auto' (задержки пересчитываются в start_discovery_run)
+        self.hedging = HedgePolicy(self.config.hedging, timeout_seconds=self.timeout)
+        
+        # Расписание: полный проход берет только цели, которым пора искать
+        self.schedule = CrawlSchedule(self.config.scheduling)
+        
+        # Пакетные запросы по малопродуктивным источникам (план — на время прохода)
+        self.batching = ResourceBatching(self.config.batching)
+        self._resource_batches: Dict[int, ResourceBatch] = {}
+        
+        # Условный GET страниц источников перед проходом (id источников без изменений — на время прохода)
+        self.change_detection = ChangeDetector(self.config.change_detection)
+        self._unchanged_resources: set = set()
+        
+        # RSS/Atom ленты источников source_type = feed (результаты опроса — на время прохода)
+        self.feeds = FeedPoller(self.config.feeds)
+        # Кэш общего начала запросов у провайдеров (news/prompt_cache.py)
+        self.prompt_caching = self.config.prompt_caching
+        # Ответ по JSON-схеме штатным механизмом провайдера (news/structured_output.py)
+        self.structured_output = self.config.structured_output
+        # Пакетные задания провайдера в режиме execution_mode = batch_api (news/batch_discovery.py)
+        self.batch_api = {**batch_api.DEFAULT_SETTINGS, **(self.config.batch_api or {})}
+        self._feed_polls: Dict[int, FeedPoll] = {}
+        self._translation_service: Optional[TranslationService] = None
+        
+        # Бюджет запуска и оценка стоимости целей по истории (news/budget.py)
+        self.budget = RunBudget(self.config.budget)
+        self.cost_estimator = CostEstimator(self.config, self.budget.settings)
+        
+        # Определяем какие провайдеры использовать: основной, затем резервные в сохраненном порядке
         self.primary_provider = self.config.primary_provider
         self.fallback_chain = self.config.fallback_chain or []
+        self.provider_chain = list(dict.fromkeys(
+            name for name in [self.primary_provider, *self.fallback_chain] if name in self.PROVIDER_LABELS
+        ))
+        # Порядок цепочки 'auto' для каждой цели по ее истории (news/routing.py)
+        self.router = ProviderRouter(self.config.routing)
         
         # Для совместимости со старым кодом
         self.use_grok = self.primary_provider == 'grok' or 'grok' in self.fallback_chain
@@ -94,56 +185,549 @@ class NewsDiscoveryService:
         
         # Текущий запуск поиска (для трекинга метрик)
         self.current_run: Optional[NewsDiscoveryRun] = None
-        self.current_resource: Optional[NewsResource] = None
-        self.current_manufacturer: Optional[Manufacturer] = None
+        self._run_lock = threading.Lock()
+        # Проигравшие хедж-запросы, которые еще выполняются (см. _call_with_hedge)
+        self._hedge_losers: Set[Future] = set()
+        # Вызовы API текущего запуска пишутся в БД пачками (см. _track_api_call)
+        self._api_calls: Optional[APICallBuffer] = None
+        # Текущий источник/производитель и период поиска — свои для каждого потока (см. _target_context)
+        self._target_var = contextvars.ContextVar(f'discovery_target_{id(self)}', default=(None, None, None))
+        # Итог текущей цели: ответивший провайдер, дубликаты (см. _checkpointed)
+        self._target_outcome_var = contextvars.ContextVar(f'discovery_target_outcome_{id(self)}', default=None)
+        # Проверка дубликата и создание новости не должны перемежаться между потоками
+        self._dedupe_lock = threading.Lock()
+        # Источники пакетного запроса, который сейчас выполняется (см. _query_resource_batch)
+        self._batch_var = contextvars.ContextVar(f'discovery_batch_{id(self)}', default=None)
+        # True внутри хедж-запроса (см. _call_with_hedge)
+        self._hedge_var = contextvars.ContextVar(f'discovery_hedge_{id(self)}', default=False)
+        # True при разборе результата пакетного задания провайдера (см. batch_discovery)
+        self._batch_api_var = contextvars.ContextVar(f'discovery_batch_api_{id(self)}', default=False)
+        # Новости текущей цели из потокового ответа (см. _streaming_context)
+        self._stream_var = contextvars.ContextVar(f'discovery_stream_{id(self)}', default=None)
+        # NewsDiscoveryStatus текущего прохода: счетчик новостей из потока
+        self._status_obj: Optional[NewsDiscoveryStatus] = None
     
     def start_discovery_run(self) -> NewsDiscoveryRun:
         """Начинает новый запуск поиска с текущей конфигурацией"""
+        self.flush_api_calls()
         self.current_run = NewsDiscoveryRun.start_new_run(self.config)
+        self.circuit_breakers.reset()
+        self.hedging.reset()
         logger.info(f"Started discovery run #{self.current_run.id} with config '{self.config.name}'")
         return self.current_run
     
     def finish_discovery_run(self):
-        """Завершает текущий запуск поиска"""
+        """Завершает текущий запуск поиска; запуск с невыполненными пакетными заданиями завершит их разбор"""
         if self.current_run:
+            self.flush_api_calls()
+            self._save_circuit_breaker_states()
+            if self.has_pending_batch_jobs(self.current_run):
+                logger.info(f"Discovery run #{self.current_run.id}: ожидает результатов пакетных заданий")
+                return
             self.current_run.finish()
             logger.info(f"Finished discovery run #{self.current_run.id}: "
                        f"{self.current_run.news_found} news, ${self.current_run.estimated_cost_usd:.4f}")
     
+    @staticmethod
+    def has_pending_batch_jobs(run: NewsDiscoveryRun) -> bool:
+        """Есть ли у запуска отправленные, но не разобранные пакетные задания (news/batch_discovery.py)"""
+        return DiscoveryBatchJob.objects.filter(discovery_run=run, status=DiscoveryBatchJob.STATUS_SUBMITTED).exists()
+
     def _track_api_call(self, provider: str, model: str, input_tokens: int, output_tokens: int,
                         duration_ms: int, success: bool, error_message: str = '', 
-                        news_extracted: int = 0) -> float:
+                        news_extracted: int = 0, raw_response=None,
+                        news_per_resource: Optional[Dict[int, int]] = None,
+                        cached_input_tokens: int = 0, cache_write_tokens: int = 0,
+                        parse_failed: bool = False) -> float:
         """
         Отслеживает вызов API и рассчитывает стоимость.
         Возвращает стоимость вызова в USD.
+
+        input_tokens — все входные токены; cached_input_tokens и cache_write_tokens — их часть,
+        прочитанная из кэша промпта и записанная в него (news/prompt_cache.py), со своими ценами.
+        Пакетный запрос записывается долями: по записи на источник, токены и стоимость
+        делятся поровну, news_extracted — из news_per_resource.
+        Запрос из пакетного задания провайдера стоит price_factor от обычной цены.
         """
         # Рассчитываем стоимость
-        input_price = self.config.get_price(provider, 'input')
-        output_price = self.config.get_price(provider, 'output')
-        cost = (input_tokens * input_price + output_tokens * output_price) / 1_000_000
-        
-        # Записываем в детальную историю
+        cost = call_cost(self.config, provider, TokenUsage(
+            input_tokens, output_tokens, cached_input_tokens, cache_write_tokens
+        ))
+        is_hedge = self._hedge_var.get()
+        is_batch_api = self._batch_api_var.get()
+        if is_batch_api:
+            cost *= float(self.batch_api['price_factor'])
+        
+        budget_state = self.budget.spend(cost)
+        if budget_state and self.current_run:
+            NewsDiscoveryRun.objects.filter(pk=self.current_run.pk).update(budget_status=budget_state)
+        
+        # Детальная история и агрегаты запуска пишутся пачками (APICallBuffer)
         if self.current_run:
-            DiscoveryAPICall.objects.create(
-                discovery_run=self.current_run,
-                resource=self.current_resource,
-                manufacturer=self.current_manufacturer,
-                provider=provider,
-                model=model,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                cost_usd=cost,
-                duration_ms=duration_ms,
-                success=success,
-                error_message=error_message,
-                news_extracted=news_extracted
-            )
-            
-            # Обновляем агрегированную статистику
-            self.current_run.add_api_call(provider, input_tokens, output_tokens, cost, success)
+            batch = self._batch_var.get()
+            resources = batch or [self.current_resource]
+            shares = len(resources)
+            max_output_tokens = self._max_output_tokens(provider) or 0
+            output_tokens_saved = 0
+            if max_output_tokens and success and not batch:
+                output_tokens_saved = self.output_cap.tokens_saved(*self._target_key(), output_tokens)
+            self._get_api_call_buffer().add_batch([
+                DiscoveryAPICall(
+                    discovery_run=self.current_run,
+                    resource=resource,
+                    manufacturer=self.current_manufacturer,
+                    provider=provider,
+                    model=model,
+                    input_tokens=self._token_share(input_tokens, shares, index),
+                    cached_input_tokens=self._token_share(cached_input_tokens, shares, index),
+                    cache_write_tokens=self._token_share(cache_write_tokens, shares, index),
+                    output_tokens=self._token_share(output_tokens, shares, index),
+                    cost_usd=cost / shares,
+                    duration_ms=duration_ms,
+                    success=success,
+                    error_message=error_message,
+                    parse_failed=parse_failed,
+                    news_extracted=(news_per_resource or {}).get(resource.id, 0) if batch else news_extracted,
+                    is_hedge=is_hedge,
+                    batch_api=is_batch_api,
+                    batch_size=shares,
+                    max_output_tokens=max_output_tokens,
+                    output_tokens_saved=output_tokens_saved,
+                    raw_response=raw_response
+                )
+                for index, resource in enumerate(resources)
+            ])
         
         return cost
+
+    @staticmethod
+    def _token_share(tokens: int, shares: int, index: int) -> int:
+        """Доля токенов пакетного запроса; остаток от деления — первой доле"""
+        return tokens // shares + (tokens % shares if index == 0 else 0)
+    
+    def _get_api_call_buffer(self) -> APICallBuffer:
+        with self._run_lock:
+            if self._api_calls is None or self._api_calls.run is not self.current_run:
+                self._api_calls = APICallBuffer(self.current_run)
+            return self._api_calls
     
+    def flush_api_calls(self):
+        """Записывает в БД накопленные вызовы API текущего запуска"""
+        self._join_hedge_losers()
+        if self._api_calls is not None:
+            self._api_calls.flush()
+    
+    # ==================== ЦЕПОЧКА ПРОВАЙДЕРОВ ====================
+
+    PROVIDER_LABELS = {
+        'grok': 'Grok',
+        'anthropic': 'Anthropic',
+        'openai': 'OpenAI',
+        'gemini': 'Gemini',
+    }
+
+    def _get_api_key(self, provider: str) -> str:
+        """Возвращает API ключ провайдера (пустая строка, если не настроен)"""
+        return {
+            'grok': self.grok_api_key,
+            'anthropic': self.anthropic_api_key,
+            'openai': self.openai_api_key,
+            'gemini': self.gemini_api_key,
+        }.get(provider, '')
+
+    def _get_auto_chain(self) -> List[str]:
+        """
+        Порядок провайдеров для режима 'auto': primary_provider, затем fallback_chain
+        в сохраненном порядке. В цепочку попадают только провайдеры с настроенным ключом.
+        """
+        return [p for p in self.provider_chain if self._get_api_key(p)]
+
+    def _route_chain(self, chain: List[str]) -> List[str]:
+        """Цепочка для текущей цели по ее истории вызовов; пакетный запрос — без изменений"""
+        if self._batch_var.get():
+            return chain
+        if self.current_resource is not None:
+            return self.router.order(chain, 'resource', self.current_resource.id)
+        if self.current_manufacturer is not None:
+            return self.router.order(chain, 'manufacturer', self.current_manufacturer.id)
+        return chain
+
+    @contextmanager
+    def _provider_slot(self, provider: str):
+        """
+        Ограничивает количество одновременных запросов к провайдеру
+        (SearchConfiguration.provider_concurrency). Без лимита — не блокирует.
+        """
+        semaphore = self._provider_semaphores.get(provider)
+        if semaphore is None:
+            yield
+            return
+        with semaphore:
+            yield
+
+    def _call_provider(self, provider: str, prompt: str, domain: Optional[Union[str, List[str]]] = None) -> Optional[Dict]:
+        """
+        Выполняет запрос к одному провайдеру с учетом лимита параллельности.
+        domain — домен источника или список доменов пакетного запроса (ограничение веб-поиска).
+        """
+        with self._provider_slot(provider):
+            if provider == 'grok':
+                return self._query_grok(prompt, domain=domain)
+            if provider == 'anthropic':
+                if isinstance(domain, list):
+                    # Пакетный запрос: домены всех источников пакета
+                    return self._query_anthropic(prompt, domains=domain)
+                return self._query_anthropic(prompt)
+            if provider == 'openai':
+                return self._query_openai(prompt)
+            if provider == 'gemini':
+                return self._query_gemini(prompt)
+        raise ProviderConfigurationError(f"Неизвестный провайдер: {provider}")
+
+    def _resolve_providers(self, provider: str) -> List[str]:
+        """
+        Список провайдеров для запроса: цепочка для 'auto', иначе — один провайдер.
+
+        Raises:
+            ProviderConfigurationError: неизвестный провайдер или не настроен API ключ
+        """
+        if provider == 'auto':
+            # Бюджет на исходе — дешевые провайдеры первыми (news/budget.py)
+            return self.budget.providers(self._route_chain(self._get_auto_chain()), self.cost_estimator.cheapest_first)
+        if provider in self.PROVIDER_LABELS:
+            if not self._get_api_key(provider):
+                raise ProviderConfigurationError(f"{self.PROVIDER_LABELS[provider]} API key не настроен")
+            return [provider]
+        raise ProviderConfigurationError(f"Неизвестный провайдер: {provider}")
+
+    def _provider_model(self, provider: str) -> str:
+        """Модель, которой отвечает провайдер (часть ключа архива ответов)"""
+        return {
+            'grok': self.grok_model,
+            'anthropic': self.anthropic_model,
+            'openai': self.OPENAI_SEARCH_MODEL,
+            'gemini': self.gemini_model,
+        }[provider]
+
+    def _content_parser(self, provider: str) -> Callable[[str], Dict]:
+        """Разбор текста ответа провайдера (тот же, что при запросе)"""
+        return {
+            'grok': self._parse_grok_content,
+            'anthropic': self._parse_anthropic_content,
+            'openai': self._parse_openai_content,
+            'gemini': self._parse_gemini_content,
+        }[provider]
+
+    def _cached_response(self, names: List[str], prompt: str) -> Optional[Tuple[Dict, str]]:
+        """
+        Ответ из архива на такой же запрос за последние response_cache_ttl_hours
+        (провайдеры — в порядке цепочки).
+
+        Returns:
+            Tuple[llm_response, provider] или None
+        """
+        ttl_hours = self.config.response_cache_ttl_hours
+        if not ttl_hours or not names:
+            return None
+        archived = response_archive.find_cached(
+            [(name, self._provider_model(name)) for name in names],
+            prompt, self.current_search_window, ttl_hours,
+        )
+        if archived is None:
+            return None
+        try:
+            llm_response = self._content_parser(archived.provider)(response_archive.response_text(archived))
+        except Exception as e:
+            logger.warning(f"Ответ #{archived.id} из архива не разобран, запрашиваем провайдера: {str(e)}")
+            return None
+        self._cap_news(archived.provider, llm_response)
+        logger.info(f"[{self.PROVIDER_LABELS[archived.provider]}] Ответ из архива #{archived.id} "
+                    f"от {archived.created_at:%Y-%m-%d %H:%M}")
+        return llm_response, archived.provider
+
+    def _run_provider_chain(
+        self,
+        prompt: str,
+        provider: str,
+        target_label: str,
+        domain: Optional[str] = None,
+    ) -> Tuple[Optional[Dict], Optional[str], Optional[str]]:
+        """
+        Запрашивает LLM: в режиме 'auto' по цепочке провайдеров, иначе — конкретный провайдер.
+
+        Returns:
+            Tuple[llm_response, provider_used, llm_error]. llm_error содержит ошибки
+            провайдеров, которые не сработали (даже если следующий в цепочке ответил).
+
+        Raises:
+            ProviderConfigurationError: неизвестный провайдер или не настроен API ключ
+        """
+        errors_chain = []
+        names = self._resolve_providers(provider)
+        cached = self._cached_response(names, prompt)
+        if cached:
+            llm_response, name = cached
+            self._note_provider_used(name)
+            return llm_response, name, None
+        index = 0
+        while index < len(names):
+            name = names[index]
+            index += 1
+            if self._is_provider_tripped(provider, name, target_label, errors_chain):
+                continue
+            logger.info(f"[{self.PROVIDER_LABELS[name]}] Начинаю обработку {target_label}")
+            hedge = self._plan_hedge(provider, names, index)
+            if hedge:
+                llm_response, name, hedged = self._call_with_hedge(
+                    name, hedge[0], hedge[1], prompt, domain, target_label, errors_chain
+                )
+                # Провайдер хеджа уже опрошен — в цепочке его не повторяем
+                index += int(hedged)
+            else:
+                try:
+                    llm_response = self._call_provider(name, prompt, domain=domain)
+                except Exception as e:
+                    self._note_provider_error(name, target_label, e, errors_chain)
+                    continue
+            if llm_response:
+                logger.info(f"[{self.PROVIDER_LABELS[name]}] ✅ Успешно обработал {target_label}")
+                self._note_provider_used(name)
+                return llm_response, name, "; ".join(errors_chain) or None
+
+        return None, None, "; ".join(errors_chain) or None
+
+    def _note_provider_error(self, name: str, target_label: str, error: Exception, errors_chain: List[str]):
+        label = self.PROVIDER_LABELS[name]
+        logger.warning(f"[{label}] ❌ Ошибка для {target_label}: {str(error)}")
+        errors_chain.append(f"{label}: {str(error)}")
+
+    def _is_provider_tripped(self, provider: str, name: str, target_label: str, errors_chain: List[str]) -> bool:
+        """
+        В режиме 'auto' провайдер с открытым circuit breaker пропускается,
+        чтобы не ждать очередной таймаут. Явно выбранный провайдер вызывается всегда.
+        """
+        if provider != 'auto' or self.circuit_breakers.allow(name):
+            return False
+        label = self.PROVIDER_LABELS[name]
+        logger.warning(f"[{label}] ⏸ Пропущен для {target_label}: circuit breaker открыт")
+        errors_chain.append(f"{label}: circuit breaker open")
+        return True
+
+    def _record_provider_outcome(self, provider: str, success: bool, duration_ms: int):
+        """Передает результат вызова в circuit breaker; смена состояния сохраняется в запуск"""
+        if self._batch_api_var.get():
+            # Задание выполняется часами: длительность не говорит о состоянии провайдера
+            return
+        if self.circuit_breakers.record(provider, success, duration_ms):
+            state = self.circuit_breakers.get(provider).state
+            logger.warning(f"[{self.PROVIDER_LABELS.get(provider, provider)}] Circuit breaker → {state}")
+            self._save_circuit_breaker_states()
+
+    def _save_circuit_breaker_states(self):
+        """Состояние breakers → NewsDiscoveryRun.provider_stats[provider]['circuit_breaker']"""
+        states = self.circuit_breakers.snapshot()
+        if self.current_run and states:
+            with self._run_lock:
+                self.current_run.set_circuit_breaker_states(states)
+
+    @staticmethod
+    def _chain_error_message(provider: str, llm_error: Optional[str]) -> str:
+        """Формирует текст ошибки, когда ни один провайдер не вернул ответ"""
+        if provider != 'auto':
+            return f"Ошибка {llm_error or provider}"
+        if llm_error:
+            return f"Ошибка всех провайдеров: {llm_error}"
+        return "Не настроен ни один провайдер LLM (Grok, Anthropic или OpenAI)"
+
+    # ==================== ХЕДЖИРОВАНИЕ ====================
+
+    def _plan_hedge(self, provider: str, names: List[str], index: int) -> Optional[Tuple[str, float]]:
+        """
+        Провайдер и задержка хеджа для names[index - 1] (только режим 'auto'):
+        следующий провайдер цепочки и перцентиль duration_ms основного.
+        None — запрос без хеджа.
+        """
+        if provider != 'auto' or not self.hedging.enabled or index >= len(names):
+            return None
+        if not self.budget.allows_hedging:
+            return None
+        delay = self.hedging.get_delay(names[index - 1])
+        if delay is None:
+            return None
+        return names[index], delay
+
+    def _call_with_hedge(self, primary: str, backup: str, delay: float, prompt: str,
+                         domain: Optional[str], target_label: str,
+                         errors_chain: List[str]) -> Tuple[Optional[Dict], Optional[str], bool]:
+        """
+        Запрос к primary; если он не ответил за delay секунд — параллельный запрос к backup.
+        Возвращается первый непустой ответ. Проигравший запрос, который еще не начат,
+        отменяется; начатый синхронный вызов SDK прервать нельзя — он доработает
+        в фоне (не дольше timeout), а ответ отброшен. flush_api_calls дожидается его,
+        поэтому вызов попадает в DiscoveryAPICall своего запуска.
+
+        Returns:
+            Tuple[llm_response, provider_used, hedged] — hedged: был ли запущен backup
+        """
+        pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='discovery-hedge')
+        try:
+            futures = {self._submit_provider_call(pool, primary, prompt, domain, False): primary}
+            done, _ = wait(futures, timeout=delay)
+            if not done and self.circuit_breakers.allow(backup):
+                logger.info(f"[{self.PROVIDER_LABELS[primary]}] Нет ответа за {delay:.1f}s — "
+                            f"хедж-запрос к {self.PROVIDER_LABELS[backup]} для {target_label}")
+                futures[self._submit_provider_call(pool, backup, prompt, domain, True)] = backup
+
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures[future]
+                    try:
+                        llm_response = future.result()
+                    except Exception as e:
+                        self._note_provider_error(name, target_label, e, errors_chain)
+                        continue
+                    if llm_response:
+                        if name == backup:
+                            self._record_hedge_win(backup)
+                        return llm_response, name, len(futures) > 1
+            return None, None, len(futures) > 1
+        finally:
+            for future in futures:
+                if not future.cancel() and not future.done():
+                    self._track_hedge_loser(future)
+            pool.shutdown(wait=False)
+
+    def _track_hedge_loser(self, future: Future):
+        with self._run_lock:
+            self._hedge_losers.add(future)
+        future.add_done_callback(self._forget_hedge_loser)
+
+    def _forget_hedge_loser(self, future: Future):
+        with self._run_lock:
+            self._hedge_losers.discard(future)
+
+    def _join_hedge_losers(self):
+        """Ждет проигравшие хедж-запросы, чтобы их вызовы API попали в буфер до записи"""
+        with self._run_lock:
+            losers = list(self._hedge_losers)
+        if losers:
+            logger.info(f"Ожидание проигравших хедж-запросов: {len(losers)}")
+            wait(losers)
+
+    def _submit_provider_call(self, pool: ThreadPoolExecutor, name: str, prompt: str,
+                              domain: Optional[str], is_hedge: bool):
+        """Запускает _call_provider в пуле хеджа с контекстом текущего источника"""
+        context = contextvars.copy_context()
+        return pool.submit(context.run, self._hedged_provider_call, name, prompt, domain, is_hedge)
+
+    def _hedged_provider_call(self, name: str, prompt: str, domain: Optional[str], is_hedge: bool) -> Optional[Dict]:
+        self._hedge_var.set(is_hedge)
+        try:
+            return self._call_provider(name, prompt, domain=domain)
+        finally:
+            close_old_connections()
+
+    def _target_key(self) -> Tuple[Optional[str], Optional[int]]:
+        """Текущая цель как (поле DiscoveryAPICall, id); без цели — (None, None)"""
+        if self.current_resource is not None:
+            return 'resource', self.current_resource.id
+        if self.current_manufacturer is not None:
+            return 'manufacturer', self.current_manufacturer.id
+        return None, None
+
+    def _max_output_tokens(self, provider: str) -> Optional[int]:
+        """Лимит выходных токенов запроса (news/output_cap.py): пакетный — на все источники пакета"""
+        batch = self._batch_var.get()
+        return self.output_cap.max_output_tokens(provider, len(batch) if batch else 1)
+
+    def _cap_news(self, provider: str, result: Optional[Dict]):
+        """Не больше max_news_per_resource новостей на цель (на месте); отброшенные — в provider_stats"""
+        if not isinstance(result, dict) or not self.output_cap.enabled:
+            return
+        batch = self._batch_var.get()
+        if batch:
+            parts = self._split_batch_response(result, batch).values()
+        else:
+            parts = [result] if isinstance(result.get('news'), list) else []
+        dropped = sum(self.output_cap.truncate(part['news']) for part in parts)
+        if dropped:
+            logger.info(f"[{self.PROVIDER_LABELS[provider]}] Отброшено новостей сверх лимита "
+                        f"{self.output_cap.max_news}: {dropped}")
+            if self.current_run:
+                self._get_api_call_buffer().record_news_dropped(provider, dropped)
+
+    def _record_hedge_win(self, provider: str):
+        """Хедж-запрос ответил первым: provider_stats[provider]['hedge_wins']"""
+        logger.info(f"[{self.PROVIDER_LABELS[provider]}] Хедж-запрос ответил первым")
+        if self.current_run:
+            self._get_api_call_buffer().record_hedge_win(provider)
+
+    @contextmanager
+    def _target_context(self, resource: Optional[NewsResource] = None,
+                        manufacturer: Optional[Manufacturer] = None,
+                        window: Optional[Tuple[date, date]] = None):
+        """
+        Привязывает вызовы API к текущему источнику/производителю и периоду поиска
+        (window входит в ключ архива ответов). Хранится в ContextVar, поэтому
+        параллельные потоки не мешают друг другу.
+        """
+        token = self._target_var.set((resource, manufacturer, window))
+        try:
+            yield
+        finally:
+            self._target_var.reset(token)
+
+    @property
+    def current_resource(self) -> Optional[NewsResource]:
+        return self._target_var.get()[0]
+
+    @property
+    def current_manufacturer(self) -> Optional[Manufacturer]:
+        return self._target_var.get()[1]
+
+    @property
+    def current_search_window(self) -> Tuple[Optional[date], Optional[date]]:
+        return self._target_var.get()[2] or (None, None)
+
+    @contextmanager
+    def _streaming_context(self, target_label: str, create: Callable[[Dict], bool]):
+        """
+        Потоковый режим для запроса одной цели (SearchConfiguration.stream_responses):
+        новости создаются create() по мере получения ответа (news/streaming.py).
+        Возвращает StreamedNews или None, если поток выключен.
+        """
+        if not self.stream_responses:
+            yield None
+            return
+        streamed = StreamedNews(create, target_label, on_created=self._count_streamed_news,
+                                limit=self.output_cap.max_news if self.output_cap.enabled else None)
+        token = self._stream_var.set(streamed)
+        try:
+            yield streamed
+        finally:
+            streamed.close()
+            self._stream_var.reset(token)
+
+    def _count_streamed_news(self):
+        """Новость создана по ходу потока: NewsDiscoveryStatus.streamed_news_count"""
+        if self._status_obj is not None:
+            NewsDiscoveryStatus.objects.filter(pk=self._status_obj.pk).update(
+                streamed_news_count=F('streamed_news_count') + 1, updated_at=timezone.now()
+            )
+
+    def _stream_consumer(self, provider: str, streamed: StreamedNews, parts: List[str]) -> Callable[[str], None]:
+        """Обработчик фрагментов текста потока: копит текст и передает завершенные новости в streamed"""
+        items = json_extract.NewsItemStream()
+
+        def on_text(delta: str):
+            parts.append(delta)
+            for news_item in items.feed(delta):
+                streamed.accept(provider, news_item)
+
+        return on_text
+
     def discover_news_for_resource(
         self,
         resource: NewsResource,
@@ -152,241 +736,480 @@ class NewsDiscoveryService:
     ) -> Tuple[int, int, Optional[str]]:
         """
         Ищет новости для одного источника.
-        
+
         Args:
             resource: Источник новостей
-            provider: Провайдер LLM ('auto', 'grok', 'anthropic', 'openai')
-            
+            provider: Провайдер LLM ('auto', 'grok', 'anthropic', 'openai', 'gemini')
+
         Returns:
             Tuple[created_count, error_count, error_message]
         """
+        if resource.is_feed:
+            return self._ingest_feed(resource, last_search_date_override)
+        if resource.id in self._unchanged_resources:
+            return self._skip_unchanged_resource(resource)
+
+        prompt, domain, last_search_date, today = self._prepare_resource_query(resource, last_search_date_override)
+
+        streamed = None
+        try:
+            batch = self._resource_batches.get(resource.id)
+            outcome = batch.take(resource, partial(self._query_resource_batch, provider=provider)) if batch else None
+            if outcome is not None:
+                llm_response, provider_used, llm_error = outcome
+                if provider_used:
+                    self._note_provider_used(provider_used)
+            else:
+                target_label = f"ресурса {resource.id} ({resource.name})"
+                with self._target_context(resource=resource, window=(last_search_date, today)), \
+                        self._streaming_context(target_label, lambda item: self._create_news_post(item, resource)) as streamed:
+                    llm_response, provider_used, llm_error = self._run_provider_chain(
+                        prompt, provider, target_label, domain=domain
+                    )
+        except ProviderConfigurationError as e:
+            return self._handle_configuration_error('resource', resource, e)
+
+        return self._ingest_response(
+            'resource', resource, provider, llm_response, llm_error, last_search_date, today, streamed=streamed
+        )
+
+    # ==================== ПРОВЕРКА ИЗМЕНЕНИЙ САЙТА ====================
+
+    def _detect_unchanged_resources(self, resources: List[NewsResource],
+                                    last_search_date_override: Optional[date] = None) -> set:
+        """
+        Условный GET страниц источников прохода (news/change_detection.py), параллельно для всех.
+        Новые отпечатки сохраняются в NewsResourceStatistics.page_fingerprint_pending и становятся
+        page_fingerprint только после успешного поиска (_update_resource_statistics): иначе
+        неудачный или не начатый поиск выглядел бы в следующем проходе как «сайт не изменился».
+
+        Returns:
+            id источников, сайт которых не изменился (запрос к LLM не нужен)
+        """
+        # Поиск за заданный вручную период выполняется в любом случае
+        if not self.change_detection.enabled or last_search_date_override or not resources:
+            return set()
+        stats_by_resource = {
+            stats.resource_id: stats
+            for stats in NewsResourceStatistics.objects.filter(resource__in=resources)
+        }
+        now = timezone.now()
+        try:
+            results = self.change_detection.check([
+                (
+                    resource.id,
+                    resource.url,
+                    getattr(stats_by_resource.get(resource.id), 'page_fingerprint', None),
+                    getattr(stats_by_resource.get(resource.id), 'last_search_date', None),
+                )
+                for resource in resources
+            ], now)
+        except Exception as e:
+            # Без проверки изменений проход просто спрашивает LLM по всем источникам
+            logger.error(f"Проверка изменений сайтов не выполнена: {str(e)}")
+            return set()
+
+        changed_stats = []
+        for resource in resources:
+            _, fingerprint = results[resource.id]
+            stats = stats_by_resource.get(resource.id)
+            if stats is None:
+                NewsResourceStatistics.objects.create(
+                    resource=resource, page_fingerprint_pending=fingerprint, page_checked_at=now
+                )
+                continue
+            stats.page_fingerprint_pending = fingerprint
+            stats.page_checked_at = now
+            changed_stats.append(stats)
+        NewsResourceStatistics.objects.bulk_update(
+            changed_stats, ['page_fingerprint_pending', 'page_checked_at'], batch_size=500
+        )
+        return {resource_id for resource_id, (unchanged, _) in results.items() if unchanged}
+
+    def _skip_unchanged_resource(self, resource: NewsResource) -> Tuple[int, int, Optional[str]]:
+        """
+        Сайт не изменился с прошлого успешного поиска: запрос к LLM не выполняется.
+        Интервал до следующего поиска растет, как при «новостей нет». Период поиска
+        (search_watermark) не сдвигается: следующий поиск LLM начнется с даты, по которую
+        поиск действительно прошел.
+        """
+        logger.info(f"Ресурс {resource.id} ({resource.name}): сайт не изменился, поиск пропущен")
+        outcome = self._target_outcome_var.get()
+        if outcome is not None:
+            outcome['unchanged'] = True
+        try:
+            stats, _ = NewsResourceStatistics.objects.get_or_create(resource=resource)
+            now = timezone.now()
+            stats.total_unchanged += 1
+            self.schedule.plan(stats, now, 0, True, False)
+            stats.save(update_fields=['total_unchanged', 'next_search_at', 'empty_search_streak', 'updated_at'])
+        except Exception as e:
+            logger.error(f"Error updating statistics for unchanged resource {resource.id}: {str(e)}")
+        return 0, 0, None
+
+    # ==================== RSS/ATOM ЛЕНТЫ ====================
+
+    def _poll_feeds(self, resources: List[NewsResource]) -> Dict[int, FeedPoll]:
+        """
+        Условный GET лент источников прохода (news/feeds.py), параллельно для всех.
+        Источник без результата опрашивается сам при обработке (_ingest_feed).
+        """
+        if not resources:
+            return {}
+        validators = {
+            resource_id: (etag, last_modified)
+            for resource_id, etag, last_modified in NewsResourceStatistics.objects.filter(
+                resource__in=resources
+            ).values_list('resource_id', 'feed_etag', 'feed_last_modified')
+        }
+        try:
+            return self.feeds.poll([
+                (resource.id, resource.feed_url, *validators.get(resource.id, ('', '')))
+                for resource in resources
+            ])
+        except Exception as e:
+            logger.error(f"Опрос лент не выполнен: {str(e)}")
+            return {}
+
+    def _ingest_feed(self, resource: NewsResource,
+                     last_search_date_override: Optional[date] = None) -> Tuple[int, int, Optional[str]]:
+        """
+        Новости источника из его RSS/Atom ленты, без поиска LLM.
+        Записи, уже бывшие в ленте (FeedEntry), и записи старше начала периода поиска
+        пропускаются; новые сохраняются черновиками после перевода (_summarize_feed_items).
+
+        Returns:
+            Tuple[created_count, error_count, error_message]
+        """
+        self._note_provider_used('feed')
+        stats, _ = NewsResourceStatistics.objects.get_or_create(resource=resource)
+        poll = self._feed_polls.get(resource.id)
+        if poll is None:
+            session = self.feeds._session()
+            try:
+                poll = self.feeds.poll_url(session, resource.feed_url, stats.feed_etag, stats.feed_last_modified)
+            finally:
+                session.close()
+        NewsResourceStatistics.objects.filter(pk=stats.pk).update(feed_polled_at=timezone.now())
+
+        if poll.error:
+            logger.error(f"❌ {poll.error} для ресурса {resource.id}")
+            self._create_error_news(resource, poll.error)
+            self._update_resource_statistics(resource=resource, news_count=0, error_count=1, has_errors=True)
+            return 0, 1, poll.error
+
+        today = timezone.now().date()
+        search_start = last_search_date_override or self._get_search_start(
+            NewsResourceStatistics.objects.filter(resource=resource)
+        )
+        items = {guid_hash(item.guid): item for item in reversed(poll.items)}
+        seen = set(
+            FeedEntry.objects.filter(resource=resource, guid_hash__in=list(items)).values_list('guid_hash', flat=True)
+        )
+        fresh, stale = [], []
+        for key, item in items.items():
+            if key in seen:
+                continue
+            if item.published is not None and item.published.date() < search_start:
+                stale.append((key, item))
+            else:
+                fresh.append((key, item))
+
+        entries = [self._feed_entry(resource, key, item) for key, item in stale]
+        created_count = duplicate_count = error_count = 0
+        for (key, item), news_item in zip(fresh, self._summarize_feed_items(resource, [item for _, item in fresh])):
+            article_url = item.link or None
+            try:
+                news_post = self._store_discovered_post(
+                    article_url,
+                    title=news_item['title'][:255],
+                    body=news_item['summary'],
+                    source_url=article_url or resource.url,
+                    status='draft',
+                    source_language=resource.language or 'en',
+                    author=self.user,
+                    pub_date=timezone.now(),
+                )
+            except Exception as e:
+                # Запись не попадает в индекс; валидаторы ленты сбрасываются ниже,
+                # поэтому следующий опрос получит ленту целиком и обработает ее снова
+                logger.error(f"Error creating news post from feed: {str(e)}")
+                error_count += 1
+                continue
+            if news_post is None:
+                duplicate_count += 1
+            else:
+                created_count += 1
+            entries.append(self._feed_entry(resource, key, item, news_post))
+        FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+        self._note_duplicates(duplicate_count)
+        # ETag / Last-Modified — только если все записи обработаны: иначе следующий
+        # условный GET получил бы 304 и необработанные записи не повторились бы
+        if error_count:
+            NewsResourceStatistics.objects.filter(pk=stats.pk).update(feed_etag='', feed_last_modified='')
+        else:
+            NewsResourceStatistics.objects.filter(pk=stats.pk).update(
+                feed_etag=poll.etag[:255], feed_last_modified=poll.last_modified[:64]
+            )
+
+        logger.info(f"Лента ресурса {resource.id} ({resource.name}): "
+                    f"{'без изменений' if poll.not_modified else f'записей {len(poll.items)}'}, "
+                    f"новых {len(fresh)}, создано новостей {created_count}")
+        self._update_resource_statistics(
+            resource=resource,
+            news_count=created_count,
+            error_count=error_count,
+            is_no_news=created_count == 0 and error_count == 0,
+            has_errors=error_count > 0,
+            searched_until=today if error_count == 0 else None,
+        )
+        return created_count, error_count, None
+
+    @staticmethod
+    def _feed_entry(resource: NewsResource, key: str, item: FeedItem,
+                    news_post: Optional[NewsPost] = None) -> FeedEntry:
+        return FeedEntry(
+            resource=resource, guid_hash=key, guid=item.guid, link=item.link[:1000],
+            published_at=item.published, news_post=news_post,
+        )
+
+    def _summarize_feed_items(self, resource: NewsResource, items: List[FeedItem]) -> List[Dict]:
+        """
+        Заголовок и текст записей для новостей: перевод и пересказ на русский пачками
+        по summary_batch_size (TranslationService); без перевода — текст ленты как есть.
+        """
+        originals = [
+            {'title': item.title or item.link, 'summary': item.summary[:MAX_SUMMARY_CHARS]}
+            for item in items
+        ]
+        if not originals or not self.feeds.summarize or resource.language == 'ru':
+            return originals
+        if self._translation_service is None:
+            self._translation_service = TranslationService()
+        summarized = []
+        size = self.feeds.summary_batch_size
+        for start in range(0, len(originals), size):
+            chunk = originals[start:start + size]
+            summarized.extend(self._translation_service.summarize_news_items(chunk, resource.language) or chunk)
+        return summarized
+
+    # ==================== ПАКЕТНЫЕ ЗАПРОСЫ ====================
+
+    def _plan_resource_batches(self, resources: List[NewsResource],
+                               last_search_date_override: Optional[date] = None) -> Dict[int, ResourceBatch]:
+        """Пакеты источников прохода (news/batching.py); в режимах async и batch_api пакеты не используются"""
+        if not self.batching.enabled:
+            return {}
+        if self.config.execution_mode in (SearchConfiguration.EXECUTION_MODE_ASYNC,
+                                          SearchConfiguration.EXECUTION_MODE_BATCH_API):
+            logger.info(f"Пакетные запросы не используются в режиме {self.config.execution_mode}")
+            return {}
+        ranking_scores = dict(
+            NewsResourceStatistics.objects.filter(resource__in=resources).values_list('resource_id', 'ranking_score')
+        )
+        batches = self.batching.plan(
+            resources,
+            ranking_scores,
+            search_start=lambda resource: last_search_date_override or self._get_search_start(
+                NewsResourceStatistics.objects.filter(resource=resource)
+            ),
+            end_date=timezone.now().date(),
+            domain_of=lambda resource: self._extract_domain(resource.url),
+        )
+        if batches:
+            logger.info(f"Пакетные запросы: {len(batches)} источников в {len(set(map(id, batches.values())))} пакетах")
+        return batches
+
+    def _query_resource_batch(self, batch: ResourceBatch, provider: str) -> Dict[int, BatchOutcome]:
+        """
+        Один запрос по всем источникам пакета.
+
+        Returns:
+            {resource.id: (llm_response источника, provider_used, llm_error)}
+        """
+        prompt = self._build_batch_search_prompt(batch)
+        token = self._batch_var.set(batch.resources)
+        try:
+            with self._target_context(window=(batch.start_date, batch.end_date)):
+                llm_response, provider_used, llm_error = self._run_provider_chain(
+                    prompt, provider, f"пакета из {len(batch)} источников ({', '.join(batch.domains)})",
+                    domain=list(batch.domains),
+                )
+        finally:
+            self._batch_var.reset(token)
+
+        parts = self._split_batch_response(llm_response, batch.resources) if llm_response else {}
+        return {
+            resource.id: (parts.get(resource.id), provider_used, llm_error)
+            for resource in batch.resources
+        }
+
+    def _split_batch_response(self, llm_response: Optional[Dict], resources: List[NewsResource]) -> Dict[int, Dict]:
+        """Раскладывает ответ {"results": {"<домен>": {"news": [...]}}} по источникам пакета"""
+        results = {}
+        if isinstance(llm_response, dict):
+            results = llm_response.get('results', llm_response)
+        if not isinstance(results, dict):
+            results = {}
+        parts = {}
+        for resource in resources:
+            domain = self._extract_domain(resource.url)
+            part = results.get(domain, results.get(str(resource.id)))
+            if isinstance(part, list):
+                part = {'news': part}
+            if not isinstance(part, dict) or not isinstance(part.get('news'), list):
+                part = {'news': []}
+            parts[resource.id] = part
+        return parts
+
+    def _get_search_start(self, statistics_qs) -> date:
+        """
+        Начало периода поиска цели: ее водяной знак (search_watermark — дата последнего
+        успешного поиска), а для целей без него — NewsDiscoveryRun.DEFAULT_SEARCH_LOOKBACK
+        до сегодня. Неудачный поиск знак не сдвигает, поэтому период цели не теряется.
+        """
+        watermark = statistics_qs.values_list('search_watermark', flat=True).first()
+        return watermark or NewsDiscoveryRun.default_search_start()
+
+    def _prepare_resource_query(
+        self,
+        resource: NewsResource,
+        last_search_date_override: Optional[date] = None,
+    ) -> Tuple[str, str, date, date]:
+        """
+        Готовит запрос для источника.
+
+        Returns:
+            Tuple[prompt, domain, last_search_date, today]
+        """
         # Получаем период поиска (можно override для текущего запуска)
-        last_search_date = last_search_date_override or NewsDiscoveryRun.get_last_search_date()
+        last_search_date = last_search_date_override or self._get_search_start(
+            NewsResourceStatistics.objects.filter(resource=resource)
+        )
         today = timezone.now().date()
-        
+
         # Формируем промпт для LLM
         prompt = self._build_search_prompt(resource, last_search_date, today)
-        
+
         # Извлекаем домен для ограничения веб-поиска
         domain = self._extract_domain(resource.url)
-        
-        # Получаем ответ от LLM (с учетом выбранного провайдера)
-        llm_response = None
-        llm_error = None
-        provider_used = None
-        errors_chain = []
-        
-        # Если provider='auto' - используем цепочку провайдеров
-        if provider == 'auto':
-            # Пробуем сначала Grok, если включен
-            if self.use_grok and self.grok_api_key:
-                try:
-                    logger.info(f"[Grok] Начинаю обработку ресурса {resource.id} ({resource.name})")
-                    llm_response = self._query_grok(prompt, domain=domain)
-                    provider_used = 'Grok'
-                    logger.info(f"[Grok] ✅ Успешно обработал ресурс {resource.id} ({resource.name})")
-                except Exception as e:
-                    logger.warning(f"[Grok] ❌ Ошибка для ресурса {resource.id}: {str(e)}")
-                    errors_chain.append(f"Grok: {str(e)}")
-                    llm_error = "; ".join(errors_chain)
-            
-            # Если Grok не сработал, пробуем Anthropic (если включен)
-            if not llm_response and self.use_anthropic and self.anthropic_api_key:
-                try:
-                    logger.info(f"[Anthropic] Пробую обработать ресурс {resource.id} ({resource.name})")
-                    llm_response = self._query_anthropic(prompt)
-                    provider_used = 'Anthropic'
-                    logger.info(f"[Anthropic] ✅ Успешно обработал ресурс {resource.id} ({resource.name})")
-                except Exception as e:
-                    logger.warning(f"[Anthropic] ❌ Ошибка для ресурса {resource.id}: {str(e)}")
-                    errors_chain.append(f"Anthropic: {str(e)}")
-                    llm_error = "; ".join(errors_chain)
-            
-            # Если Grok и Anthropic не сработали, пробуем OpenAI как резервный
-            if not llm_response and self.use_openai_fallback and self.openai_api_key:
-                try:
-                    logger.info(f"[OpenAI Fallback] Пробую обработать ресурс {resource.id} ({resource.name})")
-                    llm_response = self._query_openai(prompt)
-                    provider_used = 'OpenAI (fallback)'
-                    logger.info(f"[OpenAI Fallback] ✅ Успешно обработал ресурс {resource.id} ({resource.name})")
-                except Exception as e:
-                    logger.error(f"[OpenAI Fallback] ❌ Ошибка для ресурса {resource.id}: {str(e)}")
-                    errors_chain.append(f"OpenAI fallback: {str(e)}")
-                    llm_error = "; ".join(errors_chain)
+        return prompt, domain, last_search_date, today
+
+    def _handle_configuration_error(
+        self, target_field: str, target: Any, error: ProviderConfigurationError
+    ) -> Tuple[int, int, Optional[str]]:
+        error_msg = str(error)
+        if target_field == 'manufacturer':
+            logger.error(f"❌ {error_msg} для производителя {target.id}")
+            self._create_error_manufacturer(target, error_msg)
         else:
-            # Используем конкретный провайдер
-            if provider == 'grok':
-                if not self.grok_api_key:
-                    error_msg = "Grok API key не настроен"
-                    logger.error(f"❌ {error_msg} для ресурса {resource.id}")
-                    self._create_error_news(resource, error_msg)
-                    return 0, 1, error_msg
-                try:
-                    logger.info(f"[Grok] Начинаю обработку ресурса {resource.id} ({resource.name})")
-                    llm_response = self._query_grok(prompt, domain=domain)
-                    provider_used = 'Grok'
-                    logger.info(f"[Grok] ✅ Успешно обработал ресурс {resource.id} ({resource.name})")
-                except Exception as e:
-                    error_msg = f"Ошибка Grok: {str(e)}"
-                    logger.error(f"❌ {error_msg} для ресурса {resource.id}")
-                    self._create_error_news(resource, error_msg)
-                    self._update_resource_statistics(
-                        resource=resource,
-                        news_count=0,
-                        error_count=1,
-                        is_no_news=False,
-                        has_errors=True
-                    )
-                    return 0, 1, error_msg
-            
-            elif provider == 'anthropic':
-                if not self.anthropic_api_key:
-                    error_msg = "Anthropic API key не настроен"
-                    logger.error(f"❌ {error_msg} для ресурса {resource.id}")
-                    self._create_error_news(resource, error_msg)
-                    return 0, 1, error_msg
-                try:
-                    logger.info(f"[Anthropic] Начинаю обработку ресурса {resource.id} ({resource.name})")
-                    llm_response = self._query_anthropic(prompt)
-                    provider_used = 'Anthropic'
-                    logger.info(f"[Anthropic] ✅ Успешно обработал ресурс {resource.id} ({resource.name})")
-                except Exception as e:
-                    error_msg = f"Ошибка Anthropic: {str(e)}"
-                    logger.error(f"❌ {error_msg} для ресурса {resource.id}")
-                    self._create_error_news(resource, error_msg)
-                    self._update_resource_statistics(
-                        resource=resource,
-                        news_count=0,
-                        error_count=1,
-                        is_no_news=False,
-                        has_errors=True
-                    )
-                    return 0, 1, error_msg
-            
-            elif provider == 'openai':
-                if not self.openai_api_key:
-                    error_msg = "OpenAI API key не настроен"
-                    logger.error(f"❌ {error_msg} для ресурса {resource.id}")
-                    self._create_error_news(resource, error_msg)
-                    return 0, 1, error_msg
-                try:
-                    logger.info(f"[OpenAI] Начинаю обработку ресурса {resource.id} ({resource.name})")
-                    llm_response = self._query_openai(prompt)
-                    provider_used = 'OpenAI'
-                    logger.info(f"[OpenAI] ✅ Успешно обработал ресурс {resource.id} ({resource.name})")
-                except Exception as e:
-                    error_msg = f"Ошибка OpenAI: {str(e)}"
-                    logger.error(f"❌ {error_msg} для ресурса {resource.id}")
-                    self._create_error_news(resource, error_msg)
-                    self._update_resource_statistics(
-                        resource=resource,
-                        news_count=0,
-                        error_count=1,
-                        is_no_news=False,
-                        has_errors=True
-                    )
-                    return 0, 1, error_msg
-            
-            elif provider == 'gemini':
-                if not self.gemini_api_key:
-                    error_msg = "Gemini API key не настроен"
-                    logger.error(f"❌ {error_msg} для ресурса {resource.id}")
-                    self._create_error_news(resource, error_msg)
-                    return 0, 1, error_msg
-                try:
-                    logger.info(f"[Gemini] Начинаю обработку ресурса {resource.id} ({resource.name})")
-                    llm_response = self._query_gemini(prompt)
-                    provider_used = 'Gemini'
-                    logger.info(f"[Gemini] ✅ Успешно обработал ресурс {resource.id} ({resource.name})")
-                except Exception as e:
-                    error_msg = f"Ошибка Gemini: {str(e)}"
-                    logger.error(f"❌ {error_msg} для ресурса {resource.id}")
-                    self._create_error_news(resource, error_msg)
-                    self._update_resource_statistics(
-                        resource=resource,
-                        news_count=0,
-                        error_count=1,
-                        is_no_news=False,
-                        has_errors=True
-                    )
-                    return 0, 1, error_msg
-            
-            else:
-                error_msg = f"Неизвестный провайдер: {provider}"
-                logger.error(f"❌ {error_msg} для ресурса {resource.id}")
-                self._create_error_news(resource, error_msg)
-                return 0, 1, error_msg
-        
-        # Если ни один провайдер не сработал
-        if not llm_response:
-            if errors_chain:
-                error_msg = f"Ошибка всех провайдеров: {llm_error}"
-            else:
-                error_msg = "Не настроен ни один провайдер LLM (Grok, Anthropic или OpenAI)"
-            logger.error(f"❌ {error_msg} для ресурса {resource.id}")
-            self._create_error_news(resource, error_msg)
-            self._update_resource_statistics(
-                resource=resource,
-                news_count=0,
-                error_count=1,
-                is_no_news=False,
-                has_errors=True
-            )
-            return 0, 1, error_msg
-        
-        # Если LLM не вернул ответ - создаем новость об ошибке
+            logger.error(f"❌ {error_msg} для ресурса {target.id}")
+            self._create_error_news(target, error_msg)
+        return 0, 1, error_msg
+
+    def _ingest_response(
+        self,
+        target_field: str,
+        target: Any,
+        provider: str,
+        llm_response: Optional[Dict],
+        llm_error: Optional[str],
+        last_search_date: date,
+        today: date,
+        streamed: Optional[StreamedNews] = None,
+    ) -> Tuple[int, int, Optional[str]]:
+        """
+        Создает новости из ответа LLM и обновляет статистику цели
+        (target_field — 'resource' или 'manufacturer').
+        Общая часть синхронного, асинхронного (async_discovery) и пакетного (batch_discovery) путей.
+        streamed — новости, уже созданные по ходу потокового ответа (news/streaming.py).
+
+        Returns:
+            Tuple[created_count, error_count, error_message]
+        """
+        if target_field == 'manufacturer':
+            target_label = f"производителя {target.id}"
+            create_post, create_no_news = self._create_manufacturer_news_post, self._create_no_news_manufacturer
+            create_error, update_statistics = self._create_error_manufacturer, self._update_manufacturer_statistics
+        else:
+            target_label = f"ресурса {target.id}"
+            create_post, create_no_news = self._create_news_post, self._create_no_news_news
+            create_error, update_statistics = self._create_error_news, self._update_resource_statistics
+
+        partial_response = False
+        if not llm_response and streamed is not None and streamed.items:
+            # Запрос упал в конце ответа: новости, полученные до ошибки, уже сохранены
+            logger.warning(f"⚠️ {self._chain_error_message(provider, llm_error)} для {target_label}, "
+                           f"сохранено новостей из потока: {len(streamed.items)}")
+            llm_response = {'news': list(streamed.items)}
+            partial_response = True
+
+        # Если ни один провайдер не сработал - создаем новость об ошибке
         if not llm_response:
-            error_msg = f"{provider_used or 'LLM'} не вернул ответ: {llm_error or 'Неизвестная ошибка'}"
-            self._create_error_news(resource, error_msg)
-            # Обновляем статистику при ошибке
-            self._update_resource_statistics(
-                resource=resource,
+            error_msg = self._chain_error_message(provider, llm_error)
+            logger.error(f"❌ {error_msg} для {target_label}")
+            create_error(target, error_msg)
+            update_statistics(
+                target,
                 news_count=0,
                 error_count=1,
                 is_no_news=False,
                 has_errors=True
             )
             return 0, 1, error_msg
-        
+
         # Обрабатываем ответ от LLM
         final_news = []
         if isinstance(llm_response, dict) and 'news' in llm_response:
             final_news = llm_response['news']
-        
-        # Создаем новости
+
+        # Создаем новости (уже сохраненные ранее пропускаем)
         created_count = 0
+        duplicate_count = 0
         error_count = 0
         is_no_news = False
-        
-        if not final_news or len(final_news) == 0:
+
+        # Новости из потока провайдера, который не дал итоговый ответ (ответил другой провайдер)
+        streamed_extra = streamed.unreported(final_news or []) if streamed is not None else None
+
+        if not final_news and not (streamed_extra and any(streamed_extra.values())):
             # Если новостей нет - создаем новость об этом
-            self._create_no_news_news(resource, last_search_date, today)
+            create_no_news(target, last_search_date, today)
             created_count = 1
             is_no_news = True
         else:
-            for news_item in final_news:
+            for news_item in final_news or []:
                 try:
-                    self._create_news_post(news_item, resource)
-                    created_count += 1
+                    created = streamed.create(news_item) if streamed is not None else create_post(news_item, target)
+                    if created:
+                        created_count += 1
+                    else:
+                        duplicate_count += 1
                 except Exception as e:
-                    logger.error(f"Error creating news post: {str(e)}")
+                    logger.error(f"Error creating news post for {target_field} {target.id}: {str(e)}")
                     error_count += 1
-        
-        # Обновляем статистику источника
-        self._update_resource_statistics(
-            resource=resource,
+            if streamed_extra:
+                created_count += streamed_extra['created']
+                duplicate_count += streamed_extra['duplicates']
+                error_count += streamed_extra['errors']
+            self._note_duplicates(duplicate_count)
+
+        # Обновляем статистику цели; период сдвигаем, только если все новости сохранены
+        update_statistics(
+            target,
             news_count=created_count if not is_no_news else 0,
             error_count=error_count,
             is_no_news=is_no_news,
-            has_errors=(error_count > 0 or llm_error is not None)
+            has_errors=(error_count > 0 or llm_error is not None),
+            searched_until=today if error_count == 0 and not partial_response else None,
         )
-        
+
         return created_count, error_count, None
-    
+
     # Дефолтные промпты (используются если в конфиге промпты не заданы)
     DEFAULT_SEARCH_PROMPTS = {
         'ru': {
-            'main': """Найди все свежие новости на сайте {url} ({name}) за последние 2 недели.
+            'main': """Найди все новости, опубликованные на сайте {url} ({name}) с {start_date} по {end_date}.
 
 Используй веб-поиск. Ищи все статьи, публикации, пресс-релизы, новости на сайте. Для каждой найденной новости верни заголовок, текст новости (1 абзац) и ссылку на источник.""",
             'json_format': """Верни ответ СТРОГО в JSON формате:
@@ -406,7 +1229,7 @@ class NewsDiscoveryService:
 Верни ТОЛЬКО JSON, без комментариев."""
         },
         'en': {
-            'main': """Find all recent news on website {url} ({name}) from the last 2 weeks.
+            'main': """Find all news published on website {url} ({name}) from {start_date} to {end_date}.
 
 Use web search. Look for all articles, publications, press releases, news on the website. For each news item, provide title, summary (1 paragraph) and source link.
 
@@ -480,6 +1303,46 @@ Use web search. Sources: industry publications, press releases. **Translate to R
 {json_format}"""
     }
     
+    # Пакетный запрос по нескольким источникам (news/batching.py): ответ — по ключу домена
+    DEFAULT_BATCH_SEARCH_PROMPTS = {
+        'ru': {
+            'main': """Найди все новости, опубликованные на каждом из этих сайтов с {start_date} по {end_date}:
+
+{sites}
+
+Используй веб-поиск по этим сайтам. Для каждой новости верни заголовок, текст новости (1 абзац) и ссылку на источник. Относи новость к сайту, на котором она опубликована.""",
+            'json_format': """Верни ответ СТРОГО в JSON формате, ключ — домен сайта:
+
+{{
+  "results": {{
+    "example.com": {{"news": [{{"title": "Заголовок новости", "summary": "Текст новости (1 абзац). Пиши напрямую, как журналист, от третьего лица.", "source_url": "https://example.com/news/article"}}]}},
+    "example.org": {{"news": []}}
+  }}
+}}
+
+Для сайта без новостей верни {{"news": []}}. Верни ТОЛЬКО JSON, без комментариев."""
+        },
+        'en': {
+            'main': """Find all news published on each of these websites from {start_date} to {end_date}:
+
+{sites}
+
+Use web search on these websites. For each news item, provide title, summary (1 paragraph) and source link. Attribute each news item to the website it was published on.
+
+**IMPORTANT: Translate all news to Russian. Return only Russian text.**""",
+            'json_format': """Return STRICTLY in JSON format, keyed by website domain:
+
+{{
+  "results": {{
+    "example.com": {{"news": [{{"title": "Заголовок новости на русском", "summary": "Текст новости на русском (1 абзац). Пиши напрямую, как журналист, от третьего лица.", "source_url": "https://example.com/news/article"}}]}},
+    "example.org": {{"news": []}}
+  }}
+}}
+
+For a website without news return {{"news": []}}. Return ONLY JSON in Russian, no comments."""
+        },
+    }
+    
     def _get_prompt_templates(self, language: str) -> Dict[str, str]:
         """
         Возвращает шаблоны промпта на указанном языке.
@@ -497,6 +1360,14 @@ Use web search. Sources: industry publications, press releases. **Translate to R
         # Fallback на дефолтные
         return self.DEFAULT_SEARCH_PROMPTS.get(language, self.DEFAULT_SEARCH_PROMPTS['en'])
     
+    def _get_batch_prompt_templates(self, language: str) -> Dict[str, str]:
+        """Шаблоны пакетного промпта: prompts['batch_search_prompts'] конфигурации или дефолтные"""
+        config_prompts = getattr(self.config, 'prompts', None) or {}
+        lang_prompts = config_prompts.get('batch_search_prompts', {}).get(language) or {}
+        if lang_prompts.get('main') and lang_prompts.get('json_format'):
+            return lang_prompts
+        return self.DEFAULT_BATCH_SEARCH_PROMPTS.get(language, self.DEFAULT_BATCH_SEARCH_PROMPTS['en'])
+    
     def _get_system_prompt(self, provider: str) -> str:
         """
         Возвращает системный промпт для провайдера.
@@ -530,21 +1401,274 @@ Use web search. Sources: industry publications, press releases. **Translate to R
             start_date_str = start_date.strftime('%Y-%m-%d')
             end_date_str = end_date.strftime('%Y-%m-%d')
         
+        limit = self.output_cap.prompt(language)
+
         # Если есть кастомные инструкции - используем их
         if resource.custom_search_instructions:
-            return f"""{resource.custom_search_instructions}
-
-{templates['json_format']}"""
+            return self._compose_prompt(templates['json_format'], resource.custom_search_instructions, limit)
 
         # Стандартный промпт на языке источника (теперь даты уже в main)
-        return f"""{templates['main'].format(
+        return self._compose_prompt(templates['json_format'], templates['main'].format(
             url=resource.url,
             name=resource.name,
             start_date=start_date_str,
             end_date=end_date_str
-        )}
+        ), limit)
+
+    def _compose_prompt(self, static: str, variable: str, limit: str = '') -> str:
+        """
+        Промпт от постоянного к переменному: формат ответа и лимит новостей (одинаковые
+        для всех целей одного языка) — в начале, источник и период — в конце. Общее начало
+        запросов кэшируется провайдерами (news/prompt_cache.py). С ответом по схеме
+        (news/structured_output.py) формат в промпт не добавляется.
+        """
+        if self.structured_output:
+            static = ''
+        return "\n\n".join(part for part in (static, limit, variable) if part)
+
+    def _build_batch_search_prompt(self, batch: ResourceBatch) -> str:
+        """Промпт пакетного запроса: список сайтов и ответ по ключу домена"""
+        language = batch.resources[0].language or 'en'
+        templates = self._get_batch_prompt_templates(language)
+        date_format = '%d.%m.%Y' if language == 'ru' else '%Y-%m-%d'
+        sites = "\n".join(
+            f"- {domain}: {resource.url} ({resource.name})"
+            for domain, resource in zip(batch.domains, batch.resources)
+        )
+        return self._compose_prompt(templates['json_format'], templates['main'].format(
+            sites=sites,
+            start_date=batch.start_date.strftime(date_format),
+            end_date=batch.end_date.strftime(date_format)
+        ), self.output_cap.prompt(language, batch=True))
+
+    # ==================== ЗАПРОСЫ К ПРОВАЙДЕРАМ ====================
+    #
+    # Каждый провайдер разбит на три части: сборка параметров запроса (_build_*_request),
+    # извлечение текста и токенов из ответа (_extract_*_response) и разбор JSON (_parse_*_content).
+    # Синхронные _query_* и асинхронные _aquery_* отличаются только клиентом SDK,
+    # общая обработка (тайминг, трекинг, ошибки) — в _execute_query / _aexecute_query.
+
+    OPENAI_SEARCH_MODEL = 'gpt-4o-search-preview'
+    XAI_BASE_URL = 'https://api.x.ai/v1'
+
+    def _query_succeeded(self, provider: str, model: str, start_time: float,
+                         usage: TokenUsage, result: Optional[Dict],
+                         content: Optional[str] = None, prompt: str = '') -> Optional[Dict]:
+        """Логирует и трекает успешный вызов API, сохраняет ответ в архив"""
+        duration_ms = int((time.time() - start_time) * 1000)
+        cached = f" ({usage.cached_input_tokens} из кэша)" if usage.cached_input_tokens else ""
+        logger.info(f"{self.PROVIDER_LABELS[provider]} ({model}): {usage.input_tokens} in{cached}, "
+                    f"{usage.output_tokens} out, {duration_ms}ms")
+
+        self._cap_news(provider, result)
+        news_per_resource = None
+        batch = self._batch_var.get()
+        if batch:
+            parts = self._split_batch_response(result, batch)
+            news_per_resource = {resource_id: len(part['news']) for resource_id, part in parts.items()}
+            news_count = sum(news_per_resource.values())
+        else:
+            news_count = len(result.get('news', [])) if result else 0
+        raw_response = self._archive_response(provider, model, prompt, content, parsed=True, news_count=news_count)
+        self._track_api_call(
+            provider=provider,
+            model=model,
+            input_tokens=usage.input_tokens,
+            output_tokens=usage.output_tokens,
+            duration_ms=duration_ms,
+            success=True,
+            news_extracted=news_count,
+            raw_response=raw_response,
+            news_per_resource=news_per_resource,
+            cached_input_tokens=usage.cached_input_tokens,
+            cache_write_tokens=usage.cache_write_tokens,
+        )
+        self._record_provider_outcome(provider, True, duration_ms)
+        return result
+
+    def _query_failed(self, provider: str, model: str, start_time: float,
+                      usage: TokenUsage, error: Exception,
+                      content: Optional[str] = None, prompt: str = '') -> Exception:
+        """
+        Трекает неудачный вызов API; полученный, но не разобранный ответ сохраняет в архив.
+        Возвращает исключение, которое нужно пробросить: некорректный JSON превращается в ValueError.
+        """
+        label = self.PROVIDER_LABELS[provider]
+        duration_ms = int((time.time() - start_time) * 1000)
+        is_json_error = isinstance(error, json.JSONDecodeError)
+        raw_response = self._archive_response(provider, model, prompt, content, parsed=False)
+        self._track_api_call(
+            provider=provider,
+            model=model,
+            input_tokens=usage.input_tokens,
+            output_tokens=usage.output_tokens,
+            duration_ms=duration_ms,
+            success=False,
+            error_message=f"Invalid JSON: {str(error)}" if is_json_error else str(error),
+            raw_response=raw_response,
+            cached_input_tokens=usage.cached_input_tokens,
+            cache_write_tokens=usage.cache_write_tokens,
+            parse_failed=is_json_error,
+        )
+        self._record_provider_outcome(provider, False, duration_ms)
+        if is_json_error:
+            logger.error(f"{label} returned invalid JSON: {str(error)}")
+            return ValueError(f"Invalid JSON response from {label}: {str(error)}")
+        logger.error(f"{label} API error: {str(error)}")
+        return error
+
+    def _archive_response(self, provider: str, model: str, prompt: str, content: Optional[str],
+                          parsed: bool, news_count: int = 0):
+        """Сохраняет сырой ответ в архив; ошибка архива не прерывает поиск"""
+        if content is None:
+            return None
+        try:
+            return response_archive.store(
+                provider, model, prompt, content, self.current_search_window,
+                resource=self.current_resource, manufacturer=self.current_manufacturer,
+                parsed=parsed, news_count=news_count,
+            )
+        except Exception as e:
+            logger.error(f"Не удалось сохранить ответ {self.PROVIDER_LABELS[provider]} в архив: {str(e)}")
+            return None
+
+    def _query_cancelled(self, provider: str, model: str, start_time: float):
+        """Запрос отменен (другой провайдер ответил раньше): освобождает пробный вызов circuit breaker"""
+        duration_ms = int((time.time() - start_time) * 1000)
+        logger.info(f"{self.PROVIDER_LABELS[provider]} ({model}): запрос отменен через {duration_ms}ms")
+        self.circuit_breakers.release(provider)
+
+    def _execute_query(self, provider: str, model: str, send: Callable[[], Any],
+                       extract: Callable[[Any], Tuple[str, TokenUsage]],
+                       parse: Callable[[str], Optional[Dict]], estimated_tokens: int = 0,
+                       prompt: str = '',
+                       stream: Optional[Callable[[Callable[[str], None]], Tuple[str, TokenUsage]]] = None) -> Optional[Dict]:
+        """
+        Выполняет запрос к провайдеру: ожидание лимита (rate_limiter), отправка,
+        разбор ответа, трекинг. estimated_tokens — резерв токенов до получения ответа,
+        prompt — для ключа архива ответов. stream — потоковый вариант send + extract
+        (передает фрагменты текста в обработчик); используется, если для цели включен поток.
+        """
+        reservation = self.rate_limiter.acquire(provider, estimated_tokens)
+        start_time = time.time()
+        usage = TokenUsage(0, 0)
+        content = None
+        streamed = self._stream_var.get() if stream is not None else None
+        parts: List[str] = []
+        try:
+            if streamed is not None:
+                content, usage = stream(self._stream_consumer(provider, streamed, parts))
+            else:
+                response = send()
+                content, usage = extract(response)
+            self.rate_limiter.settle(reservation, usage.input_tokens + usage.output_tokens)
+            result = parse(content)
+        except Exception as e:
+            if content is None and parts:
+                # Поток оборвался: полученная часть ответа сохраняется в архив
+                content = ''.join(parts)
+            error = self._query_failed(provider, model, start_time, usage, e, content=content, prompt=prompt)
+            if error is e:
+                raise
+            raise error from e
+        return self._query_succeeded(provider, model, start_time, usage, result, content=content, prompt=prompt)
+
+    async def _aexecute_query(self, provider: str, model: str, send: Callable[[], Awaitable[Any]],
+                              extract: Callable[[Any], Tuple[str, TokenUsage]],
+                              parse: Callable[[str], Optional[Dict]], estimated_tokens: int = 0,
+                              prompt: str = '') -> Optional[Dict]:
+        """Асинхронный вариант _execute_query: ждет ответ без блокировки потока, трекинг пишет в БД через sync_to_async"""
+        reservation = await self.rate_limiter.aacquire(provider, estimated_tokens)
+        start_time = time.time()
+        usage = TokenUsage(0, 0)
+        content = None
+        try:
+            response = await send()
+            content, usage = extract(response)
+            await self.rate_limiter.asettle(reservation, usage.input_tokens + usage.output_tokens)
+            result = parse(content)
+        except asyncio.CancelledError:
+            # Отменен хеджем: ответа нет, токены неизвестны — в DiscoveryAPICall не пишется
+            self._query_cancelled(provider, model, start_time)
+            raise
+        except Exception as e:
+            error = await sync_to_async(self._query_failed)(
+                provider, model, start_time, usage, e, content=content, prompt=prompt
+            )
+            if error is e:
+                raise
+            raise error from e
+        return await sync_to_async(self._query_succeeded)(
+            provider, model, start_time, usage, result, content=content, prompt=prompt
+        )
+
+    def _response_schema(self) -> Dict:
+        """JSON-схема ответа: для пакетного запроса — по доменам пакета"""
+        batch = self._batch_var.get()
+        if batch:
+            return structured_output.batch_schema([self._extract_domain(resource.url) for resource in batch])
+        return structured_output.NEWS_SCHEMA
+
+    def _parse_structured(self, content: str) -> Dict:
+        """Ответ по схеме; ответ не по схеме — json.JSONDecodeError (ошибка провайдера)"""
+        return structured_output.parse(content, 'results' if self._batch_var.get() else 'news')
+
+    def _parse_news_json(self, content: str, provider_label: str) -> Dict:
+        """
+        Разбирает JSON с новостями из ответа LLM (news/json_extract.py): чистый JSON,
+        JSON внутри текста или markdown, оборванный по max_tokens ответ — до последней
+        завершенной новости. Если JSON не найден — возвращает {"news": []}.
+        С ответом по схеме (structured_output) — только JSON по схеме.
+        """
+        if self.structured_output:
+            return self._parse_structured(content)
+        result, truncated = json_extract.extract(content)
+        if result is None:
+            logger.warning(f"{provider_label} вернул текст вместо JSON: {content[:500]}")
+            return {"news": []}
+        if truncated:
+            logger.warning(f"{provider_label}: ответ оборван, восстановлен до последней завершенной новости")
+        return result
+
+    # ---------- OpenAI ----------
 
-{templates['json_format']}"""
+    def _build_openai_request(self, prompt: str) -> Dict:
+        """
+        Параметры запроса к OpenAI Chat Completions с gpt-4o-search-preview.
+        Эта модель автоматически выполняет веб-поиск.
+        ВАЖНО: gpt-4o-search-preview НЕ поддерживает параметр temperature
+        """
+        openai_system_prompt = self._get_system_prompt('openai').format(
+            current_date=date.today().strftime('%Y-%m-%d')
+        )
+        request = {
+            'model': self.OPENAI_SEARCH_MODEL,
+            'messages': [
+                {"role": "system", "content": openai_system_prompt},
+                {"role": "user", "content": prompt},
+            ],
+        }
+        if self.structured_output:
+            request['response_format'] = structured_output.chat_response_format(self._response_schema())
+        max_output_tokens = self._max_output_tokens('openai')
+        if max_output_tokens:
+            request['max_completion_tokens'] = max_output_tokens
+        return request
+
+    @staticmethod
+    def _extract_openai_response(response) -> Tuple[str, TokenUsage]:
+        usage = TokenUsage(0, 0)
+        if getattr(response, 'usage', None):
+            # prompt_tokens включает кэшированные (автоматический кэш префикса OpenAI)
+            usage = TokenUsage(
+                response.usage.prompt_tokens or 0,
+                response.usage.completion_tokens or 0,
+                usage_count(response.usage, 'prompt_tokens_details', 'cached_tokens'),
+            )
+        return (response.choices[0].message.content or '').strip(), usage
+
+    def _parse_openai_content(self, content: str) -> Dict:
+        return self._parse_news_json(content, 'OpenAI')
 
     def _query_openai(self, prompt: str) -> Optional[Dict]:
         """
@@ -553,106 +1677,108 @@ Use web search. Sources: industry publications, press releases. **Translate to R
         """
         if not self.openai_api_key:
             raise ValueError("OpenAI API key is not set")
-        
-        start_time = time.time()
-        input_tokens = 0
-        output_tokens = 0
-        
         try:
-            from openai import OpenAI
-            
-            client = OpenAI(api_key=self.openai_api_key)
-            
-            # Используем Chat Completions API с gpt-4o-search-preview
-            # Эта модель автоматически выполняет веб-поиск
-            # ВАЖНО: gpt-4o-search-preview НЕ поддерживает параметр temperature
-            openai_system_prompt = self._get_system_prompt('openai').format(
-                current_date=date.today().strftime('%Y-%m-%d')
-            )
-            response = client.chat.completions.create(
-                model="gpt-4o-search-preview",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": openai_system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-            )
-            
-            # Извлекаем метрики токенов
-            if hasattr(response, 'usage'):
-                input_tokens = response.usage.prompt_tokens or 0
-                output_tokens = response.usage.completion_tokens or 0
-            
-            content = response.choices[0].message.content.strip()
-            logger.info("OpenAI использовал gpt-4o-search-preview с веб-поиском")
-            
-            # Парсим JSON ответ
-            try:
-                result = json.loads(content)
-            except json.JSONDecodeError:
-                # Пытаемся извлечь JSON из текста
-                json_match = re.search(r'\{[^{}]*"news"[^{}]*\[.*?\]\s*\}', content, re.DOTALL)
-                if json_match:
-                    try:
-                        result = json.loads(json_match.group(0))
-                    except json.JSONDecodeError:
-                        logger.warning(f"OpenAI вернул некорректный JSON: {content[:200]}")
-                        result = {"news": []}
-                else:
-                    logger.warning(f"OpenAI вернул текст вместо JSON: {content[:200]}")
-                    result = {"news": []}
-            
-            duration_ms = int((time.time() - start_time) * 1000)
-            logger.info(f"OpenAI (gpt-4o-search-preview): {input_tokens} in, {output_tokens} out, {duration_ms}ms")
-            
-            # Трекинг API вызова
-            news_count = len(result.get('news', [])) if result else 0
-            self._track_api_call(
-                provider='openai',
-                model='gpt-4o-search-preview',
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                duration_ms=duration_ms,
-                success=True,
-                news_extracted=news_count
-            )
-            
-            return result
-            
+            client = self.clients.openai(self.openai_api_key, timeout=self.timeout, pool_size=self.http_pool_size)
         except ImportError:
             raise ImportError("OpenAI library is not installed. Install it with: pip install openai")
-        except json.JSONDecodeError as e:
-            duration_ms = int((time.time() - start_time) * 1000)
-            self._track_api_call(
-                provider='openai',
-                model=self.openai_model,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                duration_ms=duration_ms,
-                success=False,
-                error_message=f"Invalid JSON: {str(e)}"
-            )
-            logger.error(f"OpenAI returned invalid JSON: {str(e)}")
-            raise ValueError(f"Invalid JSON response from OpenAI: {str(e)}")
-        except Exception as e:
-            duration_ms = int((time.time() - start_time) * 1000)
-            self._track_api_call(
-                provider='openai',
-                model='gpt-4o-search-preview',
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                duration_ms=duration_ms,
-                success=False,
-                error_message=str(e)
+        request = self._build_openai_request(prompt)
+        return self._execute_query(
+            'openai', self.OPENAI_SEARCH_MODEL,
+            lambda: client.chat.completions.create(**request),
+            self._extract_openai_response,
+            self._parse_openai_content,
+            estimated_tokens=self.rate_limiter.estimate_tokens(prompt),
+            prompt=prompt,
+        )
+
+    async def _aquery_openai(self, prompt: str) -> Optional[Dict]:
+        """Асинхронный вариант _query_openai (AsyncOpenAI)"""
+        if not self.openai_api_key:
+            raise ValueError("OpenAI API key is not set")
+        try:
+            client = self.clients.async_openai(self.openai_api_key, timeout=self.timeout, pool_size=self.http_pool_size)
+        except ImportError:
+            raise ImportError("OpenAI library is not installed. Install it with: pip install openai")
+        request = self._build_openai_request(prompt)
+        return await self._aexecute_query(
+            'openai', self.OPENAI_SEARCH_MODEL,
+            lambda: client.chat.completions.create(**request),
+            self._extract_openai_response,
+            self._parse_openai_content,
+            estimated_tokens=self.rate_limiter.estimate_tokens(prompt),
+            prompt=prompt,
+        )
+
+    # ---------- Grok (xAI) ----------
+
+    def _build_grok_request(self, prompt: str, domain: Optional[Union[str, List[str]]] = None) -> Dict:
+        """
+        Параметры запроса к Responses API xAI с инструментом web_search
+        (замена deprecated Live Search / chat.completions).
+        """
+        # Настройки инструмента web_search (Responses API)
+        web_search_tool: Dict = {"type": "web_search"}
+        if domain:
+            # Пакетный запрос (news/batching.py) передает список доменов
+            web_search_tool["allowed_domains"] = domain if isinstance(domain, list) else [domain]
+
+        # ВАЖНО: Указываем актуальную дату, т.к. модели обучены на старых данных
+        from datetime import datetime
+        current_date = datetime.now().strftime("%B %d, %Y")  # "February 26, 2026"
+
+        system_prompt = self._get_system_prompt('grok').format(current_date=current_date)
+        request = {
+            'model': self.grok_model,
+            'input': [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt},
+            ],
+            'tools': [web_search_tool],
+            'temperature': self.temperature,
+        }
+        if self.structured_output:
+            request['text'] = structured_output.responses_text_format(self._response_schema())
+        max_output_tokens = self._max_output_tokens('grok')
+        if max_output_tokens:
+            request['max_output_tokens'] = max_output_tokens
+        if self.prompt_caching:
+            # Запросы с общим началом (системный промпт и формат ответа) — на один сервер xAI,
+            # где префикс уже в кэше
+            request['extra_headers'] = {'x-grok-conv-id': prefix_key(system_prompt, prompt.split('\n\n', 1)[0])}
+        return request
+
+    @staticmethod
+    def _extract_responses_api_response(response) -> Tuple[str, TokenUsage]:
+        """Текст и токены из ответа Responses API (output_text); input_tokens включает кэшированные"""
+        usage = TokenUsage(0, 0)
+        if response and response.usage:
+            usage = TokenUsage(
+                getattr(response.usage, 'input_tokens', 0) or 0,
+                getattr(response.usage, 'output_tokens', 0) or 0,
+                usage_count(response.usage, 'input_tokens_details', 'cached_tokens'),
             )
-            logger.error(f"OpenAI API error: {str(e)}")
-            raise
-    
+        return (response.output_text or "").strip(), usage
+
+    def _stream_responses_api(self, client, request: Dict, on_text: Callable[[str], None]) -> Tuple[str, TokenUsage]:
+        """Потоковый запрос к Responses API: текст по событиям output_text.delta, токены — из response.completed"""
+        completed = None
+        with client.responses.create(**request, stream=True) as events:
+            for event in events:
+                if event.type == 'response.output_text.delta':
+                    on_text(event.delta)
+                elif event.type == 'response.completed':
+                    completed = event.response
+                elif event.type in ('response.failed', 'error'):
+                    raise ValueError(f"Поток Responses API прерван: {getattr(event, 'message', None) or event.type}")
+        if completed is None:
+            raise ValueError("Поток Responses API завершился без response.completed")
+        return self._extract_responses_api_response(completed)
+
+    def _parse_grok_content(self, content: str) -> Dict:
+        # Полный ответ сохраняется в архиве (DiscoveryRawResponse)
+        logger.debug(f"Grok raw output (первые 1000 символов): {content[:1000]}")
+        return self._parse_news_json(content, 'Grok')
+
     def _query_grok(self, prompt: str, domain: str = None) -> Optional[Dict]:
         """
         Запрос к Grok (xAI) API с веб-поиском.
@@ -665,136 +1791,136 @@ Use web search. Sources: industry publications, press releases. **Translate to R
         """
         if not self.grok_api_key:
             raise ValueError("Grok API key is not set")
-
-        start_time = time.time()
-        input_tokens = 0
-        output_tokens = 0
-
+        # xAI предоставляет OpenAI-совместимый API
         try:
-            from openai import OpenAI
+            client = self.clients.openai(
+                self.grok_api_key, base_url=self.XAI_BASE_URL, timeout=self.timeout,
+                pool_size=self.http_pool_size, provider='grok',
+            )
+        except ImportError:
+            raise ImportError("OpenAI library is not installed. Install it with: pip install openai")
+        request = self._build_grok_request(prompt, domain)
+        return self._execute_query(
+            'grok', self.grok_model,
+            lambda: client.responses.create(**request),
+            self._extract_responses_api_response,
+            self._parse_grok_content,
+            estimated_tokens=self.rate_limiter.estimate_tokens(prompt),
+            prompt=prompt,
+            stream=partial(self._stream_responses_api, client, request),
+        )
 
-            # xAI предоставляет OpenAI-совместимый API
-            client = OpenAI(
-                api_key=self.grok_api_key,
-                base_url="https://api.x.ai/v1",
+    async def _aquery_grok(self, prompt: str, domain: str = None) -> Optional[Dict]:
+        """Асинхронный вариант _query_grok (AsyncOpenAI с base_url xAI)"""
+        if not self.grok_api_key:
+            raise ValueError("Grok API key is not set")
+        try:
+            client = self.clients.async_openai(
+                self.grok_api_key, base_url=self.XAI_BASE_URL, timeout=self.timeout,
+                pool_size=self.http_pool_size, provider='grok',
             )
+        except ImportError:
+            raise ImportError("OpenAI library is not installed. Install it with: pip install openai")
+        request = self._build_grok_request(prompt, domain)
+        return await self._aexecute_query(
+            'grok', self.grok_model,
+            lambda: client.responses.create(**request),
+            self._extract_responses_api_response,
+            self._parse_grok_content,
+            estimated_tokens=self.rate_limiter.estimate_tokens(prompt),
+            prompt=prompt,
+        )
 
-            # Настройки инструмента web_search (Responses API)
-            web_search_tool: Dict = {"type": "web_search"}
-            if domain:
-                web_search_tool["allowed_domains"] = [domain]
+    # ---------- Anthropic ----------
 
-            # ВАЖНО: Указываем актуальную дату, т.к. модели обучены на старых данных
-            from datetime import datetime
-            current_date = datetime.now().strftime("%B %d, %Y")  # "February 26, 2026"
+    def _build_anthropic_request(self, prompt: str, domains: Optional[List[str]] = None) -> Dict:
+        """
+        Параметры запроса к Anthropic Messages API с инструментом web_search.
+        domains — домены пакетного запроса: промпт уже содержит формат ответа по доменам.
+        """
+        # Извлекаем домен из промпта для ограничения поиска
+        url_match = re.search(r'https?://([^/\s]+)', prompt)
+        domain = None
+        if url_match and not domains:
+            domain = url_match.group(1).replace('www.', '')
 
-            system_prompt = self._get_system_prompt('grok').format(current_date=current_date)
+        # Формируем промпт для Anthropic: сайт — в конце, чтобы начало промпта было общим
+        if domain and self.structured_output:
+            anthropic_prompt = f"""{prompt}
 
-            response = None
-            try:
-                # Responses API (замена deprecated Live Search / chat.completions)
-                response = client.responses.create(
-                    model=self.grok_model,
-                    input=[
-                        {
-                            "role": "system",
-                            "content": system_prompt
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    tools=[web_search_tool],
-                    temperature=self.temperature,
-                )
-            except Exception as e:
-                logger.error(f"Grok API call failed: {str(e)}")
-                raise
+Используй веб-поиск для поиска новостей на сайте {domain}."""
+        elif domain:
+            anthropic_prompt = f"""{prompt}
 
-            # Извлекаем метрики токенов (Responses API формат)
-            if response and response.usage:
-                input_tokens = getattr(response.usage, 'input_tokens', 0) or 0
-                output_tokens = getattr(response.usage, 'output_tokens', 0) or 0
+ФОРМАТ ОТВЕТА:
+Верни ответ ТОЛЬКО в формате JSON, БЕЗ объяснений.
+Формат: {{"news": [{{"source_url": "...", "title": {{"ru": "...", "en": "..."}}, "summary": {{"ru": "...", "en": "..."}}}}, ...]}}
 
-            # Извлекаем контент (Responses API — output_text)
-            content = (response.output_text or "").strip()
-            
-            duration_ms = int((time.time() - start_time) * 1000)
-            
-            logger.info(f"Grok: {input_tokens} in, {output_tokens} out, {duration_ms}ms")
-            logger.info(f"Grok raw output (первые 1000 символов): {content[:1000]}")
-            
-            # Парсим JSON из ответа
-            result = None
-            try:
-                result = json.loads(content)
-            except json.JSONDecodeError:
-                # Ищем JSON блок в тексте
-                json_match = re.search(r'\{[^{}]*"news"[^{}]*\[.*?\]\s*\}', content, re.DOTALL)
-                if json_match:
-                    try:
-                        result = json.loads(json_match.group(0))
-                    except json.JSONDecodeError:
-                        pass
-                
-                # Пробуем найти JSON в markdown блоке
-                if not result:
-                    json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', content, re.DOTALL)
-                    if json_match:
-                        try:
-                            result = json.loads(json_match.group(1))
-                        except json.JSONDecodeError:
-                            pass
-                
-                if not result:
-                    logger.warning(f"Grok вернул текст вместо JSON: {content[:200]}")
-                    result = {"news": []}
-            
-            # Трекинг API вызова
-            news_count = len(result.get('news', [])) if result else 0
-            self._track_api_call(
-                provider='grok',
-                model=self.grok_model,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                duration_ms=duration_ms,
-                success=True,
-                news_extracted=news_count
-            )
-            
-            return result
-            
-        except ImportError:
-            raise ImportError("OpenAI library is not installed. Install it with: pip install openai")
-        except json.JSONDecodeError as e:
-            duration_ms = int((time.time() - start_time) * 1000)
-            self._track_api_call(
-                provider='grok',
-                model=self.grok_model,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                duration_ms=duration_ms,
-                success=False,
-                error_message=f"Invalid JSON: {str(e)}"
-            )
-            logger.error(f"Grok returned invalid JSON: {str(e)}")
-            raise ValueError(f"Invalid JSON response from Grok: {str(e)}")
-        except Exception as e:
-            duration_ms = int((time.time() - start_time) * 1000)
-            self._track_api_call(
-                provider='grok',
-                model=self.grok_model,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                duration_ms=duration_ms,
-                success=False,
-                error_message=str(e)
+Используй веб-поиск для поиска новостей на сайте {domain}."""
+        else:
+            anthropic_prompt = prompt
+
+        # Параметры для веб-поиска
+        web_search_tool = {
+            "type": "web_search_20250305",
+            "name": "web_search",
+            "max_uses": self.max_search_results,
+        }
+
+        if domains:
+            web_search_tool["allowed_domains"] = domains
+        elif domain:
+            web_search_tool["allowed_domains"] = [domain]
+
+        tools = [web_search_tool]
+        if self.structured_output:
+            # Новости — аргументами вызова record_news по схеме (после веб-поиска, поэтому без tool_choice)
+            tools.append(structured_output.anthropic_tool(self._response_schema()))
+
+        return {
+            'model': self.anthropic_model,
+            'max_tokens': min(ANTHROPIC_MAX_TOKENS, self._max_output_tokens('anthropic') or ANTHROPIC_MAX_TOKENS),
+            # Системный промпт — метка кэша промпта (cache_control)
+            'system': anthropic_system(self._get_system_prompt('anthropic'), self.prompt_caching),
+            'messages': [{"role": "user", "content": anthropic_prompt}],
+            'tools': tools,
+            'temperature': self.temperature,
+            'timeout': self.timeout,
+        }
+
+    @staticmethod
+    def _extract_anthropic_response(response) -> Tuple[str, TokenUsage]:
+        usage = TokenUsage(0, 0)
+        if getattr(response, 'usage', None):
+            # input_tokens Anthropic — только токены после последней метки кэша:
+            # прочитанные из кэша и записанные в него считаются отдельно
+            cache_read = usage_count(response.usage, 'cache_read_input_tokens')
+            cache_write = usage_count(response.usage, 'cache_creation_input_tokens')
+            usage = TokenUsage(
+                (getattr(response.usage, 'input_tokens', 0) or 0) + cache_read + cache_write,
+                getattr(response.usage, 'output_tokens', 0) or 0,
+                cache_read,
+                cache_write,
             )
-            logger.error(f"Grok API error: {str(e)}")
-            raise
-    
-    def _query_anthropic(self, prompt: str) -> Optional[Dict]:
+        for block in response.content:
+            # Ответ по схеме (structured_output) — аргументы вызова record_news
+            if block.type == "tool_use" and block.name == structured_output.ANTHROPIC_TOOL_NAME:
+                return json.dumps(block.input, ensure_ascii=False), usage
+        content = "".join(block.text for block in response.content if block.type == "text")
+        return content.strip(), usage
+
+    def _stream_anthropic(self, client, request: Dict, on_text: Callable[[str], None]) -> Tuple[str, TokenUsage]:
+        """Потоковый запрос к Messages API: текст по text_stream, токены — из итогового сообщения"""
+        with client.messages.stream(**request) as stream:
+            for text in stream.text_stream:
+                on_text(text)
+            final_message = stream.get_final_message()
+        return self._extract_anthropic_response(final_message)
+
+    def _parse_anthropic_content(self, content: str) -> Dict:
+        return self._parse_news_json(content, 'Anthropic')
+
+    def _query_anthropic(self, prompt: str, domains: Optional[List[str]] = None) -> Optional[Dict]:
         """
         Запрос к Anthropic (Claude) API с веб-поиском.
         Использует Claude Haiku 4.5 с инструментом web_search.
@@ -802,147 +1928,83 @@ Use web search. Sources: industry publications, press releases. **Translate to R
         """
         if not self.anthropic_api_key:
             raise ValueError("Anthropic API key is not set")
-        
-        start_time = time.time()
-        input_tokens = 0
-        output_tokens = 0
-        
         try:
-            from anthropic import Anthropic
-            
-            client = Anthropic(api_key=self.anthropic_api_key)
-            
-            # Извлекаем домен из промпта для ограничения поиска
-            url_match = re.search(r'https?://([^/\s]+)', prompt)
-            domain = None
-            if url_match:
-                domain = url_match.group(1).replace('www.', '')
-            
-            # Формируем промпт для Anthropic
-            if domain:
-                anthropic_prompt = f"""Используй веб-поиск для поиска новостей на сайте {domain}.
-
-{prompt}
+            client = self.clients.anthropic(self.anthropic_api_key, timeout=self.timeout, pool_size=self.http_pool_size)
+        except ImportError:
+            raise ImportError("Anthropic library is not installed. Install it with: pip install anthropic")
+        request = self._build_anthropic_request(prompt, domains=domains)
+        return self._execute_query(
+            'anthropic', self.anthropic_model,
+            lambda: client.messages.create(**request),
+            self._extract_anthropic_response,
+            self._parse_anthropic_content,
+            estimated_tokens=self.rate_limiter.estimate_tokens(prompt),
+            prompt=prompt,
+            stream=partial(self._stream_anthropic, client, request),
+        )
 
-ФОРМАТ ОТВЕТА:
-Верни ответ ТОЛЬКО в формате JSON, БЕЗ объяснений.
-Формат: {{"news": [{{"source_url": "...", "title": {{"ru": "...", "en": "..."}}, "summary": {{"ru": "...", "en": "..."}}}}, ...]}}"""
-            else:
-                anthropic_prompt = prompt
-            
-            # Параметры для веб-поиска
-            web_search_tool = {
-                "type": "web_search_20250305",
-                "name": "web_search",
-                "max_uses": self.max_search_results,
-            }
-            
-            if domain:
-                web_search_tool["allowed_domains"] = [domain]
-            
-            system_message = self._get_system_prompt('anthropic')
-            
-            response = client.messages.create(
-                model=self.anthropic_model,
-                max_tokens=4000,  # Claude 3 Haiku limit
-                system=system_message,
-                messages=[{"role": "user", "content": anthropic_prompt}],
-                tools=[web_search_tool],
-                temperature=self.temperature,
-                timeout=self.timeout
-            )
-            
-            # Извлекаем метрики токенов
-            if hasattr(response, 'usage'):
-                input_tokens = getattr(response.usage, 'input_tokens', 0) or 0
-                output_tokens = getattr(response.usage, 'output_tokens', 0) or 0
-            
-            # Извлекаем контент
-            content = ""
-            for block in response.content:
-                if block.type == "text":
-                    content += block.text
-            content = content.strip()
-            
-            duration_ms = int((time.time() - start_time) * 1000)
-            logger.info(f"Anthropic: {input_tokens} in, {output_tokens} out, {duration_ms}ms")
-            
-            # Парсим JSON
-            result = None
-            try:
-                result = json.loads(content)
-            except json.JSONDecodeError:
-                # Ищем JSON в markdown блоке
-                json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', content, re.DOTALL)
-                if json_match:
-                    try:
-                        result = json.loads(json_match.group(1).strip())
-                    except json.JSONDecodeError:
-                        pass
-                
-                if not result:
-                    json_match = re.search(r'\{\s*"news"\s*:\s*\[.*?\]\s*\}', content, re.DOTALL)
-                    if json_match:
-                        try:
-                            result = json.loads(json_match.group(0))
-                        except json.JSONDecodeError:
-                            pass
-                
-                if not result:
-                    # Рекурсивный поиск
-                    brace_count = 0
-                    start_idx = -1
-                    for i, char in enumerate(content):
-                        if char == '{':
-                            if start_idx == -1:
-                                start_idx = i
-                            brace_count += 1
-                        elif char == '}':
-                            brace_count -= 1
-                            if brace_count == 0 and start_idx != -1:
-                                try:
-                                    parsed = json.loads(content[start_idx:i+1])
-                                    if 'news' in parsed:
-                                        result = parsed
-                                        break
-                                except json.JSONDecodeError:
-                                    pass
-                                start_idx = -1
-                
-                if not result:
-                    logger.warning(f"Anthropic вернул текст вместо JSON: {content[:500]}")
-                    result = {"news": []}
-            
-            # Трекинг API вызова
-            news_count = len(result.get('news', [])) if result else 0
-            self._track_api_call(
-                provider='anthropic',
-                model=self.anthropic_model,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                duration_ms=duration_ms,
-                success=True,
-                news_extracted=news_count
-            )
-            
-            return result
-            
+    async def _aquery_anthropic(self, prompt: str) -> Optional[Dict]:
+        """Асинхронный вариант _query_anthropic (AsyncAnthropic)"""
+        if not self.anthropic_api_key:
+            raise ValueError("Anthropic API key is not set")
+        try:
+            client = self.clients.async_anthropic(self.anthropic_api_key, timeout=self.timeout, pool_size=self.http_pool_size)
         except ImportError:
             raise ImportError("Anthropic library is not installed. Install it with: pip install anthropic")
-        except Exception as e:
-            duration_ms = int((time.time() - start_time) * 1000)
-            self._track_api_call(
-                provider='anthropic',
-                model=self.anthropic_model,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                duration_ms=duration_ms,
-                success=False,
-                error_message=str(e)
+        request = self._build_anthropic_request(prompt)
+        return await self._aexecute_query(
+            'anthropic', self.anthropic_model,
+            lambda: client.messages.create(**request),
+            self._extract_anthropic_response,
+            self._parse_anthropic_content,
+            estimated_tokens=self.rate_limiter.estimate_tokens(prompt),
+            prompt=prompt,
+        )
+
+    # ---------- Gemini ----------
+
+    def _get_gemini_model(self):
+        """GenerativeModel Gemini из общего реестра (genai.configure — только при смене ключа)"""
+        try:
+            return self.clients.gemini_model(self.gemini_api_key, self.gemini_model)
+        except ImportError:
+            raise ImportError("Google Generative AI library is not installed. Install it with: pip install google-generativeai")
+
+    def _build_gemini_generation_config(self) -> Dict:
+        generation_config = {
+            "temperature": self.temperature,
+            "response_mime_type": "application/json",
+        }
+        if self.structured_output:
+            generation_config["response_schema"] = structured_output.gemini_schema(self._response_schema())
+        max_output_tokens = self._max_output_tokens('gemini')
+        if max_output_tokens:
+            generation_config["max_output_tokens"] = max_output_tokens
+        return generation_config
+
+    @staticmethod
+    def _extract_gemini_response(response) -> Tuple[str, TokenUsage]:
+        usage = TokenUsage(0, 0)
+        if getattr(response, 'usage_metadata', None):
+            # prompt_token_count включает неявно кэшированные токены
+            usage = TokenUsage(
+                getattr(response.usage_metadata, 'prompt_token_count', 0) or 0,
+                getattr(response.usage_metadata, 'candidates_token_count', 0) or 0,
+                usage_count(response.usage_metadata, 'cached_content_token_count'),
             )
-            logger.error(f"Anthropic API error: {str(e)}")
-            raise
-    
+        return response.text.strip(), usage
+
+    def _parse_gemini_content(self, content: str) -> Dict:
+        if self.structured_output:
+            return self._parse_structured(content)
+        # Gemini отвечает в режиме application/json — ответ без JSON считаем ошибкой
+        result, truncated = json_extract.extract(content)
+        if result is None:
+            raise json.JSONDecodeError("JSON с новостями не найден", content, 0)
+        if truncated:
+            logger.warning("Gemini: ответ оборван, восстановлен до последней завершенной новости")
+        return result
+
     def _query_gemini(self, prompt: str) -> Optional[Dict]:
         """
         Запрос к Google Gemini API.
@@ -950,97 +2012,37 @@ Use web search. Sources: industry publications, press releases. **Translate to R
         """
         if not self.gemini_api_key:
             raise ValueError("Gemini API key is not set")
-        
-        start_time = time.time()
-        input_tokens = 0
-        output_tokens = 0
-        
-        try:
-            import google.generativeai as genai
-            
-            genai.configure(api_key=self.gemini_api_key)
-            
-            try:
-                model = genai.GenerativeModel(self.gemini_model)
-                logger.info(f"Using Gemini model {self.gemini_model}")
-            except Exception as e:
-                logger.warning(f"Error initializing Gemini model {self.gemini_model}: {str(e)}")
-                raise
-            
-            response = model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": self.temperature,
-                    "response_mime_type": "application/json",
-                }
-            )
-            
-            # Извлекаем метрики токенов (если доступны)
-            if hasattr(response, 'usage_metadata'):
-                input_tokens = getattr(response.usage_metadata, 'prompt_token_count', 0) or 0
-                output_tokens = getattr(response.usage_metadata, 'candidates_token_count', 0) or 0
-            
-            content = response.text.strip()
-            # Убираем возможные markdown обертки
-            if content.startswith("```json"):
-                content = content[7:]
-            if content.startswith("```"):
-                content = content[3:]
-            if content.endswith("```"):
-                content = content[:-3]
-            content = content.strip()
-            
-            result = json.loads(content)
-            
-            duration_ms = int((time.time() - start_time) * 1000)
-            logger.info(f"Gemini: {input_tokens} in, {output_tokens} out, {duration_ms}ms")
-            
-            # Трекинг API вызова
-            news_count = len(result.get('news', [])) if result else 0
-            self._track_api_call(
-                provider='gemini',
-                model=self.gemini_model,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                duration_ms=duration_ms,
-                success=True,
-                news_extracted=news_count
-            )
-            
-            return result
-            
-        except ImportError:
-            raise ImportError("Google Generative AI library is not installed. Install it with: pip install google-generativeai")
-        except json.JSONDecodeError as e:
-            duration_ms = int((time.time() - start_time) * 1000)
-            self._track_api_call(
-                provider='gemini',
-                model=self.gemini_model,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                duration_ms=duration_ms,
-                success=False,
-                error_message=f"Invalid JSON: {str(e)}"
-            )
-            logger.error(f"Gemini returned invalid JSON: {str(e)}")
-            raise ValueError(f"Invalid JSON response from Gemini: {str(e)}")
-        except Exception as e:
-            duration_ms = int((time.time() - start_time) * 1000)
-            self._track_api_call(
-                provider='gemini',
-                model=self.gemini_model,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                duration_ms=duration_ms,
-                success=False,
-                error_message=str(e)
-            )
-            logger.error(f"Gemini API error: {str(e)}")
-            raise
-    
+
+        model = self._get_gemini_model()
+        generation_config = self._build_gemini_generation_config()
+        return self._execute_query(
+            'gemini', self.gemini_model,
+            lambda: model.generate_content(prompt, generation_config=generation_config),
+            self._extract_gemini_response,
+            self._parse_gemini_content,
+            estimated_tokens=self.rate_limiter.estimate_tokens(prompt),
+            prompt=prompt,
+        )
+
+    async def _aquery_gemini(self, prompt: str) -> Optional[Dict]:
+        """Асинхронный вариант _query_gemini (generate_content_async)"""
+        if not self.gemini_api_key:
+            raise ValueError("Gemini API key is not set")
+
+        model = self._get_gemini_model()
+        generation_config = self._build_gemini_generation_config()
+        return await self._aexecute_query(
+            'gemini', self.gemini_model,
+            lambda: model.generate_content_async(prompt, generation_config=generation_config),
+            self._extract_gemini_response,
+            self._parse_gemini_content,
+            estimated_tokens=self.rate_limiter.estimate_tokens(prompt),
+            prompt=prompt,
+        )
+
     # Методы _merge_and_summarize и _build_merge_prompt удалены - больше не нужны, так как используем только OpenAI
     
-    def _create_news_post(self, news_item: Dict, resource: NewsResource):
+    def _create_news_post(self, news_item: Dict, resource: NewsResource) -> bool:
         """
         Создает новость из данных, полученных от LLM.
         
@@ -1048,6 +2050,9 @@ Use web search. Sources: industry publications, press releases. **Translate to R
         - LLM возвращает только русский текст (title, summary)
         - source_url всегда берется из resource.url (не из LLM)
         - Переводы будут добавлены при публикации через TranslationService
+        
+        Returns:
+            False, если такая новость уже есть (см. _store_discovered_post)
         """
         # Извлекаем данные
         title_ru = news_item.get('title', 'Без заголовка')
@@ -1059,8 +2064,12 @@ Use web search. Sources: industry publications, press releases. **Translate to R
         # source_url: берём из ответа LLM (ссылка на конкретную статью), иначе URL ресурса
         source_url = news_item.get('source_url') or resource.url
         
+        # Ссылка на конкретную статью — ключ дедупликации (URL ресурса общий для всех его новостей)
+        article_url = source_url if dedup.url_hash(source_url) != dedup.url_hash(resource.url) else None
+        
         # Создаем новость (только русский текст)
-        news_post = NewsPost.objects.create(
+        news_post = self._store_discovered_post(
+            article_url,
             title=title_ru,
             body=summary_ru,
             source_url=source_url,
@@ -1069,12 +2078,46 @@ Use web search. Sources: industry publications, press releases. **Translate to R
             author=self.user,
             pub_date=timezone.now()
         )
+        if news_post is None:
+            return False
         
         # Переводы на другие языки (en, de, pt) будут добавлены позже,
         # когда администратор опубликует новость (изменит статус на 'published')
         
-        news_post.save()
         logger.info(f"Created news post: {news_post.id} - {title_ru}")
+        return True
+    
+    def _store_discovered_post(self, article_url: Optional[str], **fields) -> Optional[NewsPost]:
+        """
+        Создает найденную новость, если такой еще нет (news/dedup.py: хеш URL статьи
+        или отпечаток заголовка). Дубликат не создается; ссылку на статью из него
+        переносим в существующую новость, если там ее не было. Похожая новость
+        (тот же сюжет в другом пересказе) создается в группе представителя (news/near_duplicates.py).
+        
+        Args:
+            article_url: ссылка на конкретную статью (None — ссылки нет, только заголовок)
+        
+        Returns:
+            Созданная новость или None для дубликата
+        """
+        source_url_hash = dedup.url_hash(article_url)
+        fingerprint = dedup.title_fingerprint(fields.get('title'))
+        with self._dedupe_lock:
+            duplicate = dedup.find_duplicate(source_url_hash, fingerprint)
+            if duplicate is None:
+                news_post = NewsPost.objects.create(
+                    source_url_hash=source_url_hash, title_fingerprint=fingerprint, **fields
+                )
+                try:
+                    near_duplicates.index_post(news_post)
+                except Exception as e:
+                    # Новость уже сохранена: без группы ее просто проверят отдельно
+                    logger.error(f"Error indexing news post {news_post.id} for near duplicates: {str(e)}")
+                return news_post
+        
+        dedup.merge_duplicate(duplicate, article_url, source_url_hash)
+        logger.info(f"Duplicate of news post {duplicate.id} skipped: {fields.get('title')}")
+        return None
     
     def _create_no_news_news(self, resource: NewsResource, start_date: date, end_date: date):
         """Создает новость о том, что новостей не найдено"""
@@ -1143,7 +2186,8 @@ Use web search. Sources: industry publications, press releases. **Translate to R
         news_count: int,
         error_count: int,
         is_no_news: bool = False,
-        has_errors: bool = False
+        has_errors: bool = False,
+        searched_until: Optional[date] = None,
     ):
         """
         Обновляет статистику источника после поиска новостей.
@@ -1154,6 +2198,7 @@ Use web search. Sources: industry publications, press releases. **Translate to R
             error_count: Количество ошибок при создании новостей
             is_no_news: Была ли создана запись "новостей не найдено"
             has_errors: Были ли ошибки API при поиске
+            searched_until: Дата, по которую поиск прошел успешно (сдвигает search_watermark)
         """
         try:
             from datetime import timedelta
@@ -1171,6 +2216,13 @@ Use web search. Sources: industry publications, press releases. **Translate to R
             if created:
                 stats.first_search_date = now
             
+            if searched_until and (stats.search_watermark is None or searched_until > stats.search_watermark):
+                stats.search_watermark = searched_until
+            if searched_until and stats.page_fingerprint_pending:
+                # Поиск прошел: проверенное перед ним состояние сайта — база следующей проверки
+                stats.page_fingerprint = stats.page_fingerprint_pending
+                stats.page_fingerprint_pending = {}
+            
             if has_errors or error_count > 0:
                 stats.total_errors += 1
             elif is_no_news:
@@ -1232,6 +2284,9 @@ Use web search. Sources: industry publications, press releases. **Translate to R
             # Пока просто используем ranking_score как приоритет
             stats.priority = int(stats.ranking_score)
             
+            # Когда искать в следующий раз
+            self.schedule.plan(stats, now, news_count, is_no_news, has_errors or error_count > 0)
+            
             stats.save()
             
             logger.debug(f"Updated statistics for resource {resource.id}: "
@@ -1242,118 +2297,380 @@ Use web search. Sources: industry publications, press releases. **Translate to R
             # Не прерываем процесс поиска из-за ошибки статистики
             logger.error(f"Error updating statistics for resource {resource.id}: {str(e)}", exc_info=True)
     
+    def _checkpointed(self, process_target: Callable[[Any], Any], checkpoint: RunCheckpoint):
+        """Передает в checkpoint итог цели: ответивший провайдер и число дубликатов (DiscoveryWorkItem)"""
+        def process(target):
+            outcome = {}
+            token = self._target_outcome_var.set(outcome)
+            try:
+                return process_target(target)
+            finally:
+                self._target_outcome_var.reset(token)
+                checkpoint.note_outcome(target, outcome)
+
+        return process
+
+    def _acheckpointed(self, process_target: Callable[[Any], Awaitable[Any]], checkpoint: RunCheckpoint):
+        """Асинхронный вариант _checkpointed"""
+        async def process(target):
+            outcome = {}
+            token = self._target_outcome_var.set(outcome)
+            try:
+                return await process_target(target)
+            finally:
+                self._target_outcome_var.reset(token)
+                checkpoint.note_outcome(target, outcome)
+
+        return process
+
+    def _note_provider_used(self, provider: str):
+        """Запоминает провайдера, ответившего для текущей цели (DiscoveryWorkItem.provider)"""
+        outcome = self._target_outcome_var.get()
+        if outcome is not None:
+            outcome['provider'] = provider
+
+    def _note_duplicates(self, count: int):
+        """Учитывает дубликаты текущей цели (DiscoveryWorkItem.duplicates → NewsDiscoveryRun.news_duplicates)"""
+        outcome = self._target_outcome_var.get()
+        if outcome is not None and count:
+            outcome['duplicates'] = outcome.get('duplicates', 0) + count
+
+    def _progress_callback(self, status_obj: Optional[NewsDiscoveryStatus]):
+        """Возвращает callback, обновляющий processed_count в NewsDiscoveryStatus"""
+        if not status_obj:
+            return None
+
+        def on_progress(processed_count: int):
+            status_obj.processed_count = processed_count
+            status_obj.save(update_fields=['processed_count', 'updated_at'])
+
+        return on_progress
+
+    def _create_executor(
+        self,
+        method_name: str,
+        provider: str,
+        last_search_date_override: Optional[date],
+        status_obj: Optional[NewsDiscoveryStatus],
+        target_name: str,
+        checkpoint: Optional[RunCheckpoint] = None,
+    ) -> DiscoveryExecutor:
+        """
+        Создает исполнитель прохода по целям согласно SearchConfiguration.execution_mode:
+        пул потоков с синхронными клиентами или asyncio с асинхронными (см. async_discovery).
+        С checkpoint состояние каждой цели пишется в DiscoveryWorkItem.
+        """
+        is_async = self.config.execution_mode == SearchConfiguration.EXECUTION_MODE_ASYNC
+        if is_async:
+            from .async_discovery import AsyncNewsDiscovery
+            handler = getattr(AsyncNewsDiscovery(self), method_name)
+            executor_class = AsyncDiscoveryExecutor
+        else:
+            handler = getattr(self, method_name)
+            executor_class = DiscoveryExecutor
+
+        def process_target(target):
+            return handler(target, provider=provider, last_search_date_override=last_search_date_override)
+
+        hooks = {}
+        if checkpoint is not None:
+            wrap = self._acheckpointed if is_async else self._checkpointed
+            process_target = wrap(process_target, checkpoint)
+            hooks = {'on_start': checkpoint.start, 'on_result': checkpoint.finish}
+
+        return executor_class(
+            process_target=process_target,
+            **hooks,
+            max_workers=self.max_workers,
+            max_retries=self.MAX_RETRIES,
+            on_progress=self._progress_callback(status_obj),
+            target_name=target_name,
+        )
+
     def discover_all_news(
         self,
         status_obj: Optional[NewsDiscoveryStatus] = None,
         resources: Optional[Any] = None,
         last_search_date_override: Optional[date] = None,
+        apply_schedule: Optional[bool] = None,
     ) -> Dict[str, int]:
         """
-        Ищет новости для всех источников по очереди.
-        При ошибке API перемещает источник в конец очереди и повторяет попытку.
-        
+        Ищет новости для всех источников.
+        Источники обрабатываются в пуле из SearchConfiguration.max_workers потоков
+        (1 = последовательно) или, при execution_mode='async', корутинами в event loop.
+        При ошибке API источник повторяется после основного прохода.
+
         Источники типа 'manual' пропускаются - они требуют ручного ввода.
-        
+
         Args:
             status_obj: Объект NewsDiscoveryStatus для отслеживания прогресса (опционально)
-        
+            apply_schedule: брать только источники, которым пора искать (расписание,
+                news/crawl_schedule.py). По умолчанию — только без явного списка resources.
+
         Returns:
-            Dict с статистикой: {'created': int, 'errors': int, 'total_processed': int, 'skipped_manual': int}
+            Dict с статистикой: {'created': int, 'errors': int, 'total_processed': int,
+            'skipped_manual': int, 'skipped_not_due': int}
         """
         # Можно передать подмножество ресурсов (например, фильтр по section/региону с фронтенда).
         # В любом случае источники типа 'manual' пропускаем.
+        if apply_schedule is None:
+            apply_schedule = resources is None
+        skipped_not_due = 0
         if resources is None:
             all_resources = NewsResource.objects.all().order_by('id')
-            resources = list(all_resources.exclude(source_type=NewsResource.SOURCE_TYPE_MANUAL))
+            resources = all_resources.exclude(source_type=NewsResource.SOURCE_TYPE_MANUAL)
             skipped_manual = all_resources.filter(source_type=NewsResource.SOURCE_TYPE_MANUAL).count()
         else:
             # QuerySet поддерживает exclude/order_by; иначе ожидаем Iterable[NewsResource].
             if hasattr(resources, "exclude"):
-                qs = resources.exclude(source_type=NewsResource.SOURCE_TYPE_MANUAL).order_by('id')
-                resources = list(qs)
+                resources = resources.exclude(source_type=NewsResource.SOURCE_TYPE_MANUAL).order_by('id')
             else:
                 resources = [
                     r for r in list(resources)
                     if getattr(r, "source_type", None) != NewsResource.SOURCE_TYPE_MANUAL
                 ]
             skipped_manual = 0
-        
+
+        if apply_schedule:
+            if not hasattr(resources, "filter"):
+                resources = NewsResource.objects.filter(id__in=[r.id for r in resources]).order_by('id')
+            resources, skipped_not_due = self._select_due(resources, last_search_date_override)
+        else:
+            resources = list(resources)
+
         if skipped_manual > 0:
             logger.info(f"Пропущено {skipped_manual} источников типа 'manual' (требуют ручного ввода)")
-        
-        total_created = 0
-        total_errors = 0
-        processed_count = 0
-        
-        # Обновляем статус с общим количеством источников
+
+        # Используем провайдер из status_obj, если указан, иначе 'auto'
+        provider = status_obj.provider if status_obj else 'auto'
+        stats = self._run_discovery_pass(
+            NewsDiscoveryRun.SEARCH_TYPE_RESOURCES, resources, provider, last_search_date_override, status_obj
+        )
+        stats['skipped_manual'] = skipped_manual
+        stats['skipped_not_due'] = skipped_not_due
+        return stats
+
+    def _select_due(self, queryset, last_search_date_override: Optional[date] = None) -> Tuple[List[Any], int]:
+        """
+        Цели полного прохода, которым пора искать (news/crawl_schedule.py).
+        Расписание не применяется, если оно выключено или период поиска задан вручную.
+
+        Returns:
+            Tuple[targets, skipped_not_due]
+        """
+        if not self.schedule.enabled or last_search_date_override:
+            return list(queryset), 0
+        targets = list(queryset.filter(self.schedule.due_filter(timezone.now())))
+        skipped = queryset.count() - len(targets)
+        if skipped:
+            logger.info(f"Пропущено {skipped} целей: время следующего поиска еще не наступило")
+        return targets, skipped
+
+    def _run_discovery_pass(
+        self,
+        search_type: str,
+        targets: List[Any],
+        provider: str,
+        last_search_date_override: Optional[date],
+        status_obj: Optional[NewsDiscoveryStatus],
+    ) -> Dict[str, int]:
+        """
+        Проход по целям в рамках запуска: текущего (start_discovery_run) или нового,
+        который создается и завершается здесь. Прогресс целей — в DiscoveryWorkItem.
+        """
+        # Завершенный запуск (прошлый вызов этого сервиса) не продолжаем
+        owns_run = self.current_run is None or self.current_run.finished_at is not None
+        if owns_run:
+            self.start_discovery_run()
+        checkpoint = RunCheckpoint.begin(
+            self.current_run, search_type, targets, provider, last_search_date_override
+        )
+        self._record_run_plan(checkpoint, targets)
+        try:
+            return self._execute_checkpointed(checkpoint, targets, status_obj)
+        finally:
+            if owns_run:
+                self.finish_discovery_run()
+
+    # ==================== БЮДЖЕТ И ОЦЕНКА СТОИМОСТИ ====================
+
+    def plan_discovery(self, target_field: str, targets: List[Any], provider: str = 'auto') -> Dict[str, Any]:
+        """
+        Оценка прохода без запросов к LLM (news/budget.py): токены и стоимость каждой цели
+        по истории DiscoveryAPICall. Источники с лентой (news/feeds.py) LLM не ищет — в оценку не входят.
+
+        Args:
+            target_field: 'resource' или 'manufacturer'
+
+        Returns:
+            {'provider', 'targets': [TargetEstimate], 'feeds', 'input_tokens', 'output_tokens',
+             'cost_usd', 'budget_usd'}
+        """
+        searched = [target for target in targets if not getattr(target, 'is_feed', False)]
+        if provider == 'auto':
+            providers = self._get_auto_chain()
+        else:
+            providers = [provider]
+        providers = providers or [self.primary_provider]
+        estimates: List[TargetEstimate] = self.cost_estimator.estimate(searched, target_field, providers)
+        return {
+            'provider': providers[0],
+            'targets': estimates,
+            'feeds': len(targets) - len(searched),
+            'input_tokens': sum(estimate.input_tokens for estimate in estimates),
+            'output_tokens': sum(estimate.output_tokens for estimate in estimates),
+            'cost_usd': sum(estimate.cost_usd for estimate in estimates),
+            'budget_usd': self.budget.limit if self.budget.enabled else None,
+        }
+
+    def _record_run_plan(self, checkpoint: RunCheckpoint, targets: List[Any]):
+        """Оценка нового прохода и бюджет — в NewsDiscoveryRun (оценка проходов одного запуска суммируется)"""
+        run = checkpoint.run
+        fields = {}
+        if self.budget.enabled:
+            fields.update(budget_usd=Decimal(str(self.budget.limit)), budget_mode=self.budget.mode)
+        try:
+            plan = self.plan_discovery(checkpoint.target_field, targets, checkpoint.provider)
+            planned = Decimal(str(round(plan['cost_usd'], 4)))
+            fields['planned_cost_usd'] = Coalesce(F('planned_cost_usd'), Decimal('0')) + planned
+            logger.info(f"Оценка прохода run #{run.id}: {len(plan['targets'])} целей, ~${plan['cost_usd']:.4f}"
+                        + (f" (бюджет ${self.budget.limit:.2f}, {self.budget.mode})" if self.budget.enabled else ""))
+        except Exception as e:
+            # Без оценки проход выполняется как обычно
+            logger.error(f"Оценка стоимости прохода не выполнена: {str(e)}")
+        if fields:
+            NewsDiscoveryRun.objects.filter(pk=run.pk).update(**fields)
+            run.refresh_from_db(fields=['planned_cost_usd', 'budget_usd', 'budget_mode'])
+
+    def resume_discovery_run(self, run: NewsDiscoveryRun,
+                             status_obj: Optional[NewsDiscoveryStatus] = None) -> Dict[str, int]:
+        """
+        Продолжает прерванный, отмененный или упавший запуск: обрабатываются только цели,
+        не дошедшие до 'done', с теми же провайдером и периодом поиска.
+
+        Returns:
+            Dict с статистикой прохода по оставшимся целям
+        """
+        if not run.is_resumable:
+            raise ValueError(f"Запуск #{run.id} нельзя продолжить (status={run.status}, search_type={run.search_type!r})")
+        if self.has_pending_batch_jobs(run):
+            # Цели уже отправлены пакетными заданиями: повторная отправка оплатила бы их дважды
+            return self.poll_batch_jobs(run, status_obj)
+
+        checkpoint = RunCheckpoint(run)
+        targets = checkpoint.reopen()
+        logger.info(f"Продолжаю discovery run #{run.id}: осталось целей {len(targets)}")
+        self.flush_api_calls()
+        self.current_run = run
+        self.circuit_breakers.reset()
+        self.hedging.reset()
+        try:
+            return self._execute_checkpointed(checkpoint, targets, status_obj)
+        finally:
+            self.finish_discovery_run()
+
+    def poll_batch_jobs(self, run: NewsDiscoveryRun,
+                        status_obj: Optional[NewsDiscoveryStatus] = None) -> Dict[str, int]:
+        """
+        Проверяет пакетные задания запуска и разбирает результаты завершенных (news/batch_discovery.py).
+        Когда заданий не осталось, запуск завершается.
+
+        Returns:
+            Dict со статистикой разобранных целей и batch_jobs_pending
+        """
+        from .batch_discovery import BatchAPIDiscovery
+        try:
+            return BatchAPIDiscovery(self).poll(run, status_obj)
+        finally:
+            self.finish_discovery_run()
+
+    def _execute_checkpointed(self, checkpoint: RunCheckpoint, targets: List[Any],
+                              status_obj: Optional[NewsDiscoveryStatus]) -> Dict[str, int]:
+        """Выполняет проход по целям с записью чекпоинтов и обновлением NewsDiscoveryStatus"""
+        is_manufacturers = checkpoint.target_field == 'manufacturer'
+
+        # Обновляем статус с общим количеством целей
         if status_obj:
-            status_obj.total_count = len(resources)
+            status_obj.total_count = len(targets)
             status_obj.processed_count = 0
             status_obj.status = 'running'
             status_obj.save()
-        
-        # Обрабатываем источники с повторными попытками при ошибках
-        retry_queue = []
-        max_retries = 1  # Одна повторная попытка
-        
+
+        if not is_manufacturers:
+            # Источники с лентой читаются из нее: проверка изменений и пакеты — только для поиска LLM
+            self._feed_polls = self._poll_feeds([target for target in targets if target.is_feed])
+            searched = [target for target in targets if not target.is_feed]
+            self._unchanged_resources = self._detect_unchanged_resources(
+                searched, checkpoint.last_search_date_override
+            )
+            self._resource_batches = self._plan_resource_batches(
+                [target for target in searched if target.id not in self._unchanged_resources],
+                checkpoint.last_search_date_override,
+            )
+        self._status_obj = status_obj
+        self.budget.start(float(checkpoint.run.estimated_cost_usd or 0))
+        if checkpoint.provider == 'auto':
+            self.router.prefetch(checkpoint.target_field, [target.id for target in targets])
+        self.output_cap.prefetch(checkpoint.target_field, [target.id for target in targets])
+        if self.budget.enabled:
+            self.cost_estimator.prefetch()
+        checkpoint.budget = self.budget
+
+        batch_discovery = None
+        batch_provider = None
+        if self.config.execution_mode == SearchConfiguration.EXECUTION_MODE_BATCH_API:
+            from .batch_discovery import BatchAPIDiscovery
+            batch_discovery = BatchAPIDiscovery(self)
+            batch_provider = batch_discovery.select_provider(checkpoint.provider)
+            if batch_provider is None:
+                logger.warning("Batch API: нет провайдера с пакетными заданиями и ключом, проход — обычным исполнителем")
+
+        executor = self._create_executor(
+            'discover_news_for_manufacturer' if is_manufacturers else 'discover_news_for_resource',
+            provider=checkpoint.provider,
+            last_search_date_override=checkpoint.last_search_date_override,
+            status_obj=status_obj,
+            target_name='Manufacturer' if is_manufacturers else 'Resource',
+            checkpoint=checkpoint,
+        )
+
         try:
-            while resources or retry_queue:
-                if not resources and retry_queue:
-                    # Если основная очередь пуста, но есть источники для повтора
-                    resources = retry_queue
-                    retry_queue = []
-                
-                resource = resources.pop(0)
-                processed_count += 1
-                
-                # Обновляем прогресс
+            if batch_provider:
+                stats = batch_discovery.submit(checkpoint, targets, batch_provider, status_obj)
+            else:
+                stats = executor.run(targets)
+            self.flush_api_calls()
+            if not stats.get('batch_jobs_pending'):
+                checkpoint.complete()
+
+                # Обновляем статус на завершенный
                 if status_obj:
-                    status_obj.processed_count = processed_count
+                    status_obj.status = 'completed'
                     status_obj.save()
-                
-                try:
-                    # Используем провайдер из status_obj, если указан, иначе 'auto'
-                    provider = status_obj.provider if status_obj else 'auto'
-                    created, errors, error_msg = self.discover_news_for_resource(
-                        resource,
-                        provider=provider,
-                        last_search_date_override=last_search_date_override,
-                    )
-                    total_created += created
-                    total_errors += errors
-                    
-                    if error_msg and resource not in retry_queue:
-                        # Если была ошибка API - добавляем в очередь для повтора
-                        retry_queue.append(resource)
-                        logger.info(f"Resource {resource.id} added to retry queue due to API error")
-                    
-                except Exception as e:
-                    logger.error(f"Unexpected error processing resource {resource.id}: {str(e)}")
-                    total_errors += 1
-                    if resource not in retry_queue:
-                        retry_queue.append(resource)
-            
-            # Обновляем дату последнего поиска
-            NewsDiscoveryRun.update_last_search_date(timezone.now().date())
-            
-            # Обновляем статус на завершенный
-            if status_obj:
-                status_obj.status = 'completed'
-                status_obj.save()
-        
+
         except Exception as e:
-            logger.error(f"Critical error in discover_all_news: {str(e)}")
+            method = 'discover_all_manufacturers_news' if is_manufacturers else 'discover_all_news'
+            logger.error(f"Critical error in {method}: {str(e)}")
+            self.flush_api_calls()
+            checkpoint.complete(failed=True)
             if status_obj:
                 status_obj.status = 'error'
                 status_obj.save()
             raise
-        
-        return {
-            'created': total_created,
-            'errors': total_errors,
-            'total_processed': processed_count,
-            'skipped_manual': skipped_manual
-        }
+        finally:
+            self._resource_batches = {}
+            self._unchanged_resources = set()
+            self._feed_polls = {}
+            self._status_obj = None
+            if any(self.router.counters.values()):
+                logger.info(f"Маршрутизация провайдеров: изменен порядок для {self.router.counters['routed']} целей, "
+                            f"исследование — {self.router.counters['explored']}")
+            self.router.clear()
+            self.output_cap.clear()
+            self.cost_estimator.clear()
+
+        return stats
+
     
     # ==================== МЕТОДЫ ДЛЯ ПОИСКА ПО ПРОИЗВОДИТЕЛЯМ ====================
     
@@ -1365,209 +2682,53 @@ Use web search. Sources: industry publications, press releases. **Translate to R
     ) -> Tuple[int, int, Optional[str]]:
         """
         Ищет новости о производителе в интернете.
-        
+
         Args:
             manufacturer: Производитель
-            provider: Провайдер LLM ('auto', 'grok', 'anthropic', 'openai')
-            
+            provider: Провайдер LLM ('auto', 'grok', 'anthropic', 'openai', 'gemini')
+
         Returns:
             Tuple[created_count, error_count, error_message]
         """
+        prompt, last_search_date, today = self._prepare_manufacturer_query(manufacturer, last_search_date_override)
+
+        target_label = f"производителя {manufacturer.id} ({manufacturer.name})"
+        streamed = None
+        try:
+            with self._target_context(manufacturer=manufacturer, window=(last_search_date, today)), \
+                    self._streaming_context(
+                        target_label, lambda item: self._create_manufacturer_news_post(item, manufacturer)
+                    ) as streamed:
+                llm_response, provider_used, llm_error = self._run_provider_chain(prompt, provider, target_label)
+        except ProviderConfigurationError as e:
+            return self._handle_configuration_error('manufacturer', manufacturer, e)
+
+        return self._ingest_response(
+            'manufacturer', manufacturer, provider, llm_response, llm_error, last_search_date, today,
+            streamed=streamed,
+        )
+
+    def _prepare_manufacturer_query(
+        self,
+        manufacturer: Manufacturer,
+        last_search_date_override: Optional[date] = None,
+    ) -> Tuple[str, date, date]:
+        """
+        Готовит запрос для производителя.
+
+        Returns:
+            Tuple[prompt, last_search_date, today]
+        """
         # Получаем период поиска (можно override для текущего запуска)
-        last_search_date = last_search_date_override or NewsDiscoveryRun.get_last_search_date()
+        last_search_date = last_search_date_override or self._get_search_start(
+            ManufacturerStatistics.objects.filter(manufacturer=manufacturer)
+        )
         today = timezone.now().date()
-        
+
         # Формируем промпт для LLM
         prompt = self._build_manufacturer_search_prompt(manufacturer, last_search_date, today)
-        
-        # Получаем ответ от LLM (с учетом выбранного провайдера)
-        llm_response = None
-        llm_error = None
-        provider_used = None
-        errors_chain = []
-        
-        # Если provider='auto' - используем цепочку провайдеров
-        if provider == 'auto':
-            # Пробуем сначала Grok, если включен
-            if self.use_grok and self.grok_api_key:
-                try:
-                    logger.info(f"[Grok] Начинаю обработку производителя {manufacturer.id} ({manufacturer.name})")
-                    llm_response = self._query_grok(prompt)
-                    provider_used = 'Grok'
-                    logger.info(f"[Grok] ✅ Успешно обработал производителя {manufacturer.id} ({manufacturer.name})")
-                except Exception as e:
-                    logger.warning(f"[Grok] ❌ Ошибка для производителя {manufacturer.id}: {str(e)}")
-                    errors_chain.append(f"Grok: {str(e)}")
-                    llm_error = "; ".join(errors_chain)
-            
-            # Если Grok не сработал, пробуем Anthropic (если включен)
-            if not llm_response and self.use_anthropic and self.anthropic_api_key:
-                try:
-                    logger.info(f"[Anthropic] Пробую обработать производителя {manufacturer.id} ({manufacturer.name})")
-                    llm_response = self._query_anthropic(prompt)
-                    provider_used = 'Anthropic'
-                    logger.info(f"[Anthropic] ✅ Успешно обработал производителя {manufacturer.id} ({manufacturer.name})")
-                except Exception as e:
-                    logger.warning(f"[Anthropic] ❌ Ошибка для производителя {manufacturer.id}: {str(e)}")
-                    errors_chain.append(f"Anthropic: {str(e)}")
-                    llm_error = "; ".join(errors_chain)
-            
-            # Если Grok и Anthropic не сработали, пробуем OpenAI как резервный
-            if not llm_response and self.use_openai_fallback and self.openai_api_key:
-                try:
-                    logger.info(f"[OpenAI Fallback] Пробую обработать производителя {manufacturer.id} ({manufacturer.name})")
-                    llm_response = self._query_openai(prompt)
-                    provider_used = 'OpenAI (fallback)'
-                    logger.info(f"[OpenAI Fallback] ✅ Успешно обработал производителя {manufacturer.id} ({manufacturer.name})")
-                except Exception as e:
-                    logger.error(f"[OpenAI Fallback] ❌ Ошибка для производителя {manufacturer.id}: {str(e)}")
-                    errors_chain.append(f"OpenAI fallback: {str(e)}")
-                    llm_error = "; ".join(errors_chain)
-        else:
-            # Используем конкретный провайдер (копируем логику из discover_news_for_resource)
-            if provider == 'grok':
-                if not self.grok_api_key:
-                    error_msg = "Grok API key не настроен"
-                    logger.error(f"❌ {error_msg} для производителя {manufacturer.id}")
-                    self._create_error_manufacturer(manufacturer, error_msg)
-                    return 0, 1, error_msg
-                try:
-                    logger.info(f"[Grok] Начинаю обработку производителя {manufacturer.id} ({manufacturer.name})")
-                    llm_response = self._query_grok(prompt)
-                    provider_used = 'Grok'
-                    logger.info(f"[Grok] ✅ Успешно обработал производителя {manufacturer.id} ({manufacturer.name})")
-                except Exception as e:
-                    error_msg = f"Ошибка Grok: {str(e)}"
-                    logger.error(f"❌ {error_msg} для производителя {manufacturer.id}")
-                    self._create_error_manufacturer(manufacturer, error_msg)
-                    self._update_manufacturer_statistics(
-                        manufacturer=manufacturer,
-                        news_count=0,
-                        error_count=1,
-                        is_no_news=False,
-                        has_errors=True
-                    )
-                    return 0, 1, error_msg
-            
-            elif provider == 'anthropic':
-                if not self.anthropic_api_key:
-                    error_msg = "Anthropic API key не настроен"
-                    logger.error(f"❌ {error_msg} для производителя {manufacturer.id}")
-                    self._create_error_manufacturer(manufacturer, error_msg)
-                    return 0, 1, error_msg
-                try:
-                    logger.info(f"[Anthropic] Начинаю обработку производителя {manufacturer.id} ({manufacturer.name})")
-                    llm_response = self._query_anthropic(prompt)
-                    provider_used = 'Anthropic'
-                    logger.info(f"[Anthropic] ✅ Успешно обработал производителя {manufacturer.id} ({manufacturer.name})")
-                except Exception as e:
-                    error_msg = f"Ошибка Anthropic: {str(e)}"
-                    logger.error(f"❌ {error_msg} для производителя {manufacturer.id}")
-                    self._create_error_manufacturer(manufacturer, error_msg)
-                    self._update_manufacturer_statistics(
-                        manufacturer=manufacturer,
-                        news_count=0,
-                        error_count=1,
-                        is_no_news=False,
-                        has_errors=True
-                    )
-                    return 0, 1, error_msg
-            
-            elif provider == 'openai':
-                if not self.openai_api_key:
-                    error_msg = "OpenAI API key не настроен"
-                    logger.error(f"❌ {error_msg} для производителя {manufacturer.id}")
-                    self._create_error_manufacturer(manufacturer, error_msg)
-                    return 0, 1, error_msg
-                try:
-                    logger.info(f"[OpenAI] Начинаю обработку производителя {manufacturer.id} ({manufacturer.name})")
-                    llm_response = self._query_openai(prompt)
-                    provider_used = 'OpenAI'
-                    logger.info(f"[OpenAI] ✅ Успешно обработал производителя {manufacturer.id} ({manufacturer.name})")
-                except Exception as e:
-                    error_msg = f"Ошибка OpenAI: {str(e)}"
-                    logger.error(f"❌ {error_msg} для производителя {manufacturer.id}")
-                    self._create_error_manufacturer(manufacturer, error_msg)
-                    self._update_manufacturer_statistics(
-                        manufacturer=manufacturer,
-                        news_count=0,
-                        error_count=1,
-                        is_no_news=False,
-                        has_errors=True
-                    )
-                    return 0, 1, error_msg
-            else:
-                error_msg = f"Неизвестный провайдер: {provider}"
-                logger.error(f"❌ {error_msg} для производителя {manufacturer.id}")
-                self._create_error_manufacturer(manufacturer, error_msg)
-                return 0, 1, error_msg
-        
-        # Если ни один провайдер не сработал
-        if not llm_response:
-            if errors_chain:
-                error_msg = f"Ошибка всех провайдеров: {llm_error}"
-            else:
-                error_msg = "Не настроен ни один провайдер LLM (Grok, Anthropic или OpenAI)"
-            logger.error(f"❌ {error_msg} для производителя {manufacturer.id}")
-            self._create_error_manufacturer(manufacturer, error_msg)
-            self._update_manufacturer_statistics(
-                manufacturer=manufacturer,
-                news_count=0,
-                error_count=1,
-                is_no_news=False,
-                has_errors=True
-            )
-            return 0, 1, error_msg
-        
-        # Если LLM не вернул ответ - создаем новость об ошибке
-        if not llm_response:
-            error_msg = f"{provider_used or 'LLM'} не вернул ответ: {llm_error or 'Неизвестная ошибка'}"
-            self._create_error_manufacturer(manufacturer, error_msg)
-            # Обновляем статистику при ошибке
-            self._update_manufacturer_statistics(
-                manufacturer=manufacturer,
-                news_count=0,
-                error_count=1,
-                is_no_news=False,
-                has_errors=True
-            )
-            return 0, 1, error_msg
-        
-        # Обрабатываем ответ от LLM
-        final_news = []
-        if isinstance(llm_response, dict) and 'news' in llm_response:
-            final_news = llm_response['news']
-        
-        # Создаем новости
-        created_count = 0
-        error_count = 0
-        is_no_news = False
-        
-        if not final_news or len(final_news) == 0:
-            # Если новостей нет - создаем новость об этом
-            self._create_no_news_manufacturer(manufacturer, last_search_date, today)
-            created_count = 1
-            is_no_news = True
-        else:
-            for news_item in final_news:
-                try:
-                    self._create_manufacturer_news_post(news_item, manufacturer)
-                    created_count += 1
-                except Exception as e:
-                    logger.error(f"Error creating news post for manufacturer: {str(e)}")
-                    error_count += 1
-        
-        # Обновляем статистику производителя
-        self._update_manufacturer_statistics(
-            manufacturer=manufacturer,
-            news_count=created_count if not is_no_news else 0,
-            error_count=error_count,
-            is_no_news=is_no_news,
-            has_errors=(error_count > 0 or llm_error is not None)
-        )
-        
-        return created_count, error_count, None
-    
+        return prompt, last_search_date, today
+
     def _get_manufacturer_prompt_template(self, has_websites: bool) -> str:
         """
         Возвращает шаблон промпта для производителя.
@@ -1603,15 +2764,20 @@ Use web search. Sources: industry publications, press releases. **Translate to R
         has_websites = len(websites) > 0
         template = self._get_manufacturer_prompt_template(has_websites)
         
-        return template.format(
+        # Формат ответа — в начало промпта (общий префикс для кэша провайдеров)
+        request = template.format(
             manufacturer_name=manufacturer.name,
             start_date=start_date_str,
             end_date=end_date_str,
             websites=", ".join(websites) if websites else '',
-            json_format=templates['json_format']
-        )
+            json_format=''
+        ).strip()
+        limit = self.output_cap.prompt('en')
+        if '{json_format}' not in template:
+            return self._compose_prompt('', request, limit)
+        return self._compose_prompt(templates['json_format'], request, limit)
     
-    def _create_manufacturer_news_post(self, news_item: Dict, manufacturer: Manufacturer):
+    def _create_manufacturer_news_post(self, news_item: Dict, manufacturer: Manufacturer) -> bool:
         """
         Создает новость о производителе из данных, полученных от LLM.
         
@@ -1619,6 +2785,9 @@ Use web search. Sources: industry publications, press releases. **Translate to R
         - LLM возвращает только русский текст (title, summary)
         - source_url всегда берется из website_1 производителя
         - Переводы будут добавлены при публикации
+        
+        Returns:
+            False, если такая новость уже есть (см. _store_discovered_post)
         """
         # Извлекаем данные (только title и summary, без source_url)
         title_ru = news_item.get('title', 'Без заголовка')
@@ -1631,7 +2800,8 @@ Use web search. Sources: industry publications, press releases. **Translate to R
         source_url = manufacturer.website_1 or ''
         
         # Создаем новость (только русский текст)
-        news_post = NewsPost.objects.create(
+        news_post = self._store_discovered_post(
+            None,  # website_1 общий для всех новостей производителя: только отпечаток заголовка
             title=title_ru,
             body=summary_ru,
             source_url=source_url,
@@ -1641,11 +2811,13 @@ Use web search. Sources: industry publications, press releases. **Translate to R
             author=self.user,
             pub_date=timezone.now()
         )
+        if news_post is None:
+            return False
         
         # Переводы будут добавлены при публикации
         
-        news_post.save()
         logger.info(f"Created news post for manufacturer {manufacturer.id}: {news_post.id} - {title_ru}")
+        return True
     
     def _create_no_news_manufacturer(self, manufacturer: Manufacturer, start_date: date, end_date: date):
         """Создает новость о том, что новостей о производителе не найдено"""
@@ -1720,7 +2892,8 @@ Use web search. Sources: industry publications, press releases. **Translate to R
         news_count: int,
         error_count: int,
         is_no_news: bool = False,
-        has_errors: bool = False
+        has_errors: bool = False,
+        searched_until: Optional[date] = None,
     ):
         """
         Обновляет статистику производителя после поиска новостей.
@@ -1731,6 +2904,7 @@ Use web search. Sources: industry publications, press releases. **Translate to R
             error_count: Количество ошибок при создании новостей
             is_no_news: Была ли создана запись "новостей не найдено"
             has_errors: Были ли ошибки API при поиске
+            searched_until: Дата, по которую поиск прошел успешно (сдвигает search_watermark)
         """
         try:
             from datetime import timedelta
@@ -1748,6 +2922,9 @@ Use web search. Sources: industry publications, press releases. **Translate to R
             if created:
                 stats.first_search_date = now
             
+            if searched_until and (stats.search_watermark is None or searched_until > stats.search_watermark):
+                stats.search_watermark = searched_until
+            
             if has_errors or error_count > 0:
                 stats.total_errors += 1
             elif is_no_news:
@@ -1803,6 +2980,9 @@ Use web search. Sources: industry publications, press releases. **Translate to R
             # Обновляем приоритет
             stats.priority = int(stats.ranking_score)
             
+            # Когда искать в следующий раз
+            self.schedule.plan(stats, now, news_count, is_no_news, has_errors or error_count > 0)
+            
             stats.save()
             
             logger.debug(f"Updated statistics for manufacturer {manufacturer.id}: "
@@ -1819,82 +2999,27 @@ Use web search. Sources: industry publications, press releases. **Translate to R
         last_search_date_override: Optional[date] = None,
     ) -> Dict[str, int]:
         """
-        Ищет новости для всех производителей по очереди.
-        При ошибке API перемещает производителя в конец очереди и повторяет попытку.
-        
+        Ищет новости для всех производителей.
+        Производители обрабатываются в пуле из SearchConfiguration.max_workers потоков
+        (1 = последовательно) или, при execution_mode='async', корутинами в event loop.
+        При ошибке API производитель повторяется после основного прохода.
+
+        Берутся только производители, которым пора искать (расписание, news/crawl_schedule.py).
+
         Args:
             status_obj: Объект NewsDiscoveryStatus для отслеживания прогресса (опционально)
-        
+
         Returns:
-            Dict с статистикой: {'created': int, 'errors': int, 'total_processed': int}
+            Dict с статистикой: {'created': int, 'errors': int, 'total_processed': int, 'skipped_not_due': int}
         """
-        manufacturers = list(Manufacturer.objects.all().order_by('id'))
-        total_created = 0
-        total_errors = 0
-        processed_count = 0
-        
-        # Обновляем статус с общим количеством производителей
-        if status_obj:
-            status_obj.total_count = len(manufacturers)
-            status_obj.processed_count = 0
-            status_obj.status = 'running'
-            status_obj.save()
-        
-        # Обрабатываем производителей с повторными попытками при ошибках
-        retry_queue = []
-        max_retries = 1  # Одна повторная попытка
-        
-        try:
-            while manufacturers or retry_queue:
-                if not manufacturers and retry_queue:
-                    # Если основная очередь пуста, но есть производители для повтора
-                    manufacturers = retry_queue
-                    retry_queue = []
-                
-                manufacturer = manufacturers.pop(0)
-                processed_count += 1
-                
-                # Обновляем прогресс
-                if status_obj:
-                    status_obj.processed_count = processed_count
-                    status_obj.save()
-                
-                try:
-                    # Используем провайдер из status_obj, если указан, иначе 'auto'
-                    provider = status_obj.provider if status_obj else 'auto'
-                    created, errors, error_msg = self.discover_news_for_manufacturer(
-                        manufacturer,
-                        provider=provider,
-                        last_search_date_override=last_search_date_override,
-                    )
-                    total_created += created
-                    total_errors += errors
-                    
-                    if error_msg and manufacturer not in retry_queue:
-                        # Если была ошибка API - добавляем в очередь для повтора
-                        retry_queue.append(manufacturer)
-                        logger.info(f"Manufacturer {manufacturer.id} added to retry queue due to API error")
-                    
-                except Exception as e:
-                    logger.error(f"Unexpected error processing manufacturer {manufacturer.id}: {str(e)}")
-                    total_errors += 1
-                    if manufacturer not in retry_queue:
-                        retry_queue.append(manufacturer)
-            
-            # Обновляем статус на завершенный
-            if status_obj:
-                status_obj.status = 'completed'
-                status_obj.save()
-        
-        except Exception as e:
-            logger.error(f"Critical error in discover_all_manufacturers_news: {str(e)}")
-            if status_obj:
-                status_obj.status = 'error'
-                status_obj.save()
-            raise
-        
-        return {
-            'created': total_created,
-            'errors': total_errors,
-            'total_processed': processed_count
-        }
+        manufacturers, skipped_not_due = self._select_due(
+            Manufacturer.objects.all().order_by('id'), last_search_date_override
+        )
+
+        # Используем провайдер из status_obj, если указан, иначе 'auto'
+        provider = status_obj.provider if status_obj else 'auto'
+        stats = self._run_discovery_pass(
+            NewsDiscoveryRun.SEARCH_TYPE_MANUFACTURERS, manufacturers, provider, last_search_date_override, status_obj
+        )
+        stats['skipped_not_due'] = skipped_not_due
+        return stats
@@ -0,0 +1,292 @@
+"""
+RSS/Atom ленты источников: поиск лент, опрос и разбор записей.
+"""
+import hashlib
+import html
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+from email.utils import parsedate_to_datetime
+from html.parser import HTMLParser
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin
+from xml.etree import ElementTree
+
+import requests
+
+from .change_detection import pooled_session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'timeout_seconds': 10,         # Таймаут одного HTTP-запроса
+    'max_workers': 32,             # Параллельных опросов (и размер пула соединений)
+    'max_items_per_poll': 30,      # Записей ленты за один опрос (самые новые)
+    'summarize': True,             # Переводить и пересказывать записи на русский через LLM
+    'summary_batch_size': 10,      # Записей в одном запросе перевода
+    'user_agent': 'Mozilla/5.0 (compatible; HVACNewsBot/1.0)',
+}
+
+# Начало текста записи, которое сохраняется и уходит на перевод (полный текст статьи не нужен)
+MAX_SUMMARY_CHARS = 800
+
+FEED_TYPES = ('application/rss+xml', 'application/atom+xml', 'application/rdf+xml')
+
+_TAG = re.compile(r'<[^>]+>')
+_SPACES = re.compile(r'\s+')
+
+
+class FeedItem(NamedTuple):
+    """Запись ленты; текст — без HTML"""
+    guid: str
+    title: str
+    link: str
+    summary: str
+    published: Optional[datetime]
+
+
+class FeedPoll(NamedTuple):
+    """Результат опроса ленты"""
+    items: List[FeedItem]
+    etag: str
+    last_modified: str
+    not_modified: bool = False
+    error: str = ''
+
+
+def guid_hash(guid: str) -> str:
+    """Ключ записи в индексе просмотренных GUID (FeedEntry.guid_hash)"""
+    return hashlib.sha256(guid.strip().encode('utf-8')).hexdigest()
+
+
+def strip_html(text: str) -> str:
+    """Текст без тегов, HTML-сущностей и лишних пробелов"""
+    return _SPACES.sub(' ', html.unescape(_TAG.sub(' ', text or ''))).strip()
+
+
+class _AlternateLinkParser(HTMLParser):
+    """Собирает href из <link rel="alternate" type="...rss/atom..."> страницы"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'link':
+            return
+        attrs = {name: (value or '') for name, value in attrs}
+        rel = attrs.get('rel', '').lower().split()
+        if 'alternate' in rel and attrs.get('type', '').lower() in FEED_TYPES and attrs.get('href'):
+            self.links.append(attrs['href'].strip())
+
+    def handle_endtag(self, tag):
+        # Ссылки на ленту объявляются в <head>; тело страницы разбирать незачем
+        if tag == 'head':
+            raise _HeadParsed
+
+
+class _HeadParsed(Exception):
+    pass
+
+
+def find_feed_links(page: str, base_url: str) -> List[str]:
+    """Абсолютные URL лент, объявленных на странице, в порядке объявления"""
+    parser = _AlternateLinkParser()
+    try:
+        parser.feed(page)
+        parser.close()
+    except _HeadParsed:
+        pass
+    links = []
+    for href in parser.links:
+        url = urljoin(base_url, html.unescape(href))
+        if url not in links:
+            links.append(url)
+    return links
+
+
+def _local(tag: str) -> str:
+    """Имя тега без пространства имен: {http://www.w3.org/2005/Atom}entry → entry"""
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+def _parse_date(text: str) -> Optional[datetime]:
+    """Дата RSS (RFC 822) или Atom/Dublin Core (ISO 8601), всегда с часовым поясом"""
+    text = (text or '').strip()
+    if not text:
+        return None
+    try:
+        parsed = parsedate_to_datetime(text)
+    except (TypeError, ValueError, IndexError):
+        try:
+            parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed
+
+
+def _entry(element) -> Optional[FeedItem]:
+    """Запись RSS <item> или Atom <entry>"""
+    fields: Dict[str, str] = {}
+    link = ''
+    for child in element:
+        name = _local(child.tag)
+        if name == 'link':
+            href = child.get('href')
+            if href is None:
+                # RSS: ссылка — текст элемента
+                link = link or (child.text or '').strip()
+            elif child.get('rel', 'alternate') == 'alternate' and not link:
+                link = href.strip()
+        elif name not in fields:
+            fields[name] = ''.join(child.itertext()) if len(child) else (child.text or '')
+    title = strip_html(fields.get('title', ''))
+    guid = (fields.get('guid') or fields.get('id') or link or title).strip()
+    if not guid or not (title or link):
+        return None
+    summary = fields.get('description') or fields.get('summary') or fields.get('encoded') or fields.get('content') or ''
+    published = None
+    for name in ('pubDate', 'published', 'updated', 'date', 'issued'):
+        published = _parse_date(fields.get(name, ''))
+        if published:
+            break
+    return FeedItem(guid=guid, title=title, link=link, summary=strip_html(summary), published=published)
+
+
+def parse_feed(body: bytes) -> List[FeedItem]:
+    """
+    Записи ленты RSS 2.0, RSS 1.0 (RDF) или Atom в порядке ленты.
+
+    Raises:
+        ElementTree.ParseError: ответ не XML
+    """
+    root = ElementTree.fromstring(body)
+    items = []
+    for element in root.iter():
+        if _local(element.tag) in ('item', 'entry'):
+            item = _entry(element)
+            if item is not None:
+                items.append(item)
+    return items
+
+
+class FeedPoller:
+    """Условные GET лент источников; настройки — SearchConfiguration.feeds"""
+
+    def __init__(self, settings: Optional[Dict] = None):
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.timeout = float(self.settings['timeout_seconds'])
+        self.max_items = int(self.settings['max_items_per_poll'])
+        self.summarize = bool(self.settings['summarize'])
+        self.summary_batch_size = max(1, int(self.settings['summary_batch_size']))
+
+    def _session(self) -> requests.Session:
+        """Сессия с пулом keep-alive соединений на все потоки опроса"""
+        return pooled_session(int(self.settings['max_workers']), self.settings['user_agent'])
+
+    def poll_url(self, session: requests.Session, url: str, etag: str = '', last_modified: str = '') -> FeedPoll:
+        """Условный GET одной ленты; ошибка сети или разбора — FeedPoll.error"""
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        try:
+            response = session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            return FeedPoll([], etag, last_modified, error=f"Лента {url} недоступна: {str(e)}")
+        if response.status_code == 304:
+            return FeedPoll([], etag, last_modified, not_modified=True)
+        if response.status_code != 200:
+            return FeedPoll([], etag, last_modified, error=f"Лента {url}: HTTP {response.status_code}")
+        try:
+            items = parse_feed(response.content)
+        except ElementTree.ParseError as e:
+            return FeedPoll([], etag, last_modified, error=f"Лента {url} не разобрана: {str(e)}")
+        return FeedPoll(
+            items[:self.max_items],
+            response.headers.get('ETag', ''),
+            response.headers.get('Last-Modified', ''),
+        )
+
+    def poll(self, targets: List[Tuple[int, str, str, str]]) -> Dict[int, FeedPoll]:
+        """
+        Параллельный опрос лент.
+
+        Args:
+            targets: (id источника, URL ленты, прежний ETag, прежний Last-Modified)
+
+        Returns:
+            {id источника: результат опроса}
+        """
+        if not targets:
+            return {}
+        started = time.time()
+        session = self._session()
+        try:
+            workers = max(1, min(int(self.settings['max_workers']), len(targets)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='feed-poll') as pool:
+                polled = list(pool.map(lambda target: self.poll_url(session, *target[1:]), targets))
+        finally:
+            session.close()
+        results = {target[0]: result for target, result in zip(targets, polled)}
+        logger.info(
+            f"Опрос лент: {len(targets)} за {time.time() - started:.1f} с, "
+            f"без изменений: {sum(1 for result in polled if result.not_modified)}, "
+            f"ошибок: {sum(1 for result in polled if result.error)}"
+        )
+        return results
+
+
+class FeedAutodiscovery:
+    """Поиск лент на страницах источников (<link rel="alternate">), параллельно"""
+
+    def __init__(self, settings: Optional[Dict] = None):
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.timeout = float(self.settings['timeout_seconds'])
+
+    def find(self, session: requests.Session, url: str) -> str:
+        """URL первой ленты, объявленной на странице; '' — ленты нет или страница недоступна"""
+        try:
+            response = session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.debug(f"Поиск ленты {url}: {str(e)}")
+            return ''
+        if response.status_code != 200:
+            return ''
+        links = find_feed_links(response.text, response.url or url)
+        return links[0] if links else ''
+
+    def discover(self, resources: List, save: bool = True) -> Dict[int, str]:
+        """
+        Ищет ленты источников; найденные сохраняются в NewsResource.feed_url
+        (найденная ранее лента не стирается, если на странице ее больше нет).
+
+        Returns:
+            {id источника: URL ленты} — только источники с лентой
+        """
+        if not resources:
+            return {}
+        from django.utils import timezone
+        from references.models import NewsResource
+
+        session = pooled_session(int(self.settings['max_workers']), self.settings['user_agent'])
+        try:
+            workers = max(1, min(int(self.settings['max_workers']), len(resources)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='feed-discovery') as pool:
+                found = list(pool.map(lambda resource: self.find(session, resource.url), resources))
+        finally:
+            session.close()
+
+        now = timezone.now()
+        for resource, feed_url in zip(resources, found):
+            resource.feed_discovered_at = now
+            if feed_url:
+                resource.feed_url = feed_url
+        if save:
+            NewsResource.objects.bulk_update(resources, ['feed_url', 'feed_discovered_at'], batch_size=500)
+        return {resource.id: feed_url for resource, feed_url in zip(resources, found) if feed_url}
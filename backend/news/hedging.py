@@ -0,0 +1,75 @@
+"""
+Хеджирование медленных запросов в цепочке провайдеров режима 'auto'.
+"""
+import math
+import threading
+from typing import Dict, List, Optional
+
+from .models import DiscoveryAPICall
+
+DEFAULT_SETTINGS = {
+    'enabled': False,
+    'percentile': 90,             # Перцентиль duration_ms основного провайдера
+    'history': 200,               # Сколько последних успешных вызовов учитывать
+    'min_samples': 20,            # Меньше — используется default_delay_seconds
+    'default_delay_seconds': 30,  # Задержка, пока истории мало (0 = не хеджировать)
+    'min_delay_seconds': 5,       # Нижняя граница задержки
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    ordered = sorted(values)
+    rank = math.ceil(len(ordered) * float(pct) / 100)
+    return ordered[min(len(ordered), max(1, rank)) - 1]
+
+
+class HedgePolicy:
+    """
+    Задержки хеджа по провайдерам для одного запуска; настройки — SearchConfiguration.hedging.
+    Задержка считается по истории один раз и кешируется до reset().
+    """
+
+    def __init__(self, settings: Optional[Dict] = None, timeout_seconds: float = 0):
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.enabled = bool(self.settings['enabled'])
+        self.timeout_seconds = float(timeout_seconds or 0)
+        self._lock = threading.Lock()
+        self._delays: Dict[str, Optional[float]] = {}
+
+    def get_delay(self, provider: str) -> Optional[float]:
+        """
+        Через сколько секунд без ответа provider запускать хедж.
+        None — не хеджировать (выключено, нет истории и default_delay_seconds = 0,
+        или задержка не меньше таймаута запроса).
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            if provider in self._delays:
+                return self._delays[provider]
+        delay = self._compute_delay(provider)
+        with self._lock:
+            self._delays[provider] = delay
+        return delay
+
+    def _compute_delay(self, provider: str) -> Optional[float]:
+        durations = list(
+            DiscoveryAPICall.objects.filter(provider=provider, success=True, batch_api=False)
+            .order_by('-created_at')
+            .values_list('duration_ms', flat=True)[:int(self.settings['history'])]
+        )
+        if len(durations) >= int(self.settings['min_samples']) and durations:
+            delay = percentile(durations, self.settings['percentile']) / 1000
+        else:
+            delay = float(self.settings['default_delay_seconds'] or 0)
+            if not delay:
+                return None
+        delay = max(delay, float(self.settings['min_delay_seconds'] or 0))
+        if self.timeout_seconds and delay >= self.timeout_seconds:
+            return None
+        return delay
+
+    def reset(self):
+        with self._lock:
+            self._delays.clear()
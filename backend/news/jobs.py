@@ -0,0 +1,314 @@
+"""
+Очередь заданий поиска новостей в БД (DiscoveryJob) и их выполнение воркером.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from references.models import NewsResource
+from users.models import User
+from .discovery_service import NewsDiscoveryService
+from .feeds import FeedAutodiscovery
+from .models import DiscoveryJob, NewsDiscoveryRun, NewsDiscoveryStatus, SearchConfiguration
+
+logger = logging.getLogger(__name__)
+
+# Задание без heartbeat дольше этого времени считается брошенным
+STALE_AFTER = timedelta(minutes=10)
+# Как часто воркер подтверждает, что задание выполняется (секунды)
+HEARTBEAT_INTERVAL = 30
+
+
+def get_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_discovery_job(
+    job_type: str,
+    provider: str = 'auto',
+    user: Optional[User] = None,
+    config: Optional[SearchConfiguration] = None,
+    discovery_status: Optional[NewsDiscoveryStatus] = None,
+    resource_ids: Optional[Iterable[int]] = None,
+    last_search_date: Optional[date] = None,
+    discovery_run: Optional[NewsDiscoveryRun] = None,
+    run_after: Optional[datetime] = None,
+    ignore_schedule: bool = False,
+) -> DiscoveryJob:
+    """
+    Ставит задание в очередь и сразу возвращает его.
+
+    Args:
+        resource_ids: для 'resources' — подмножество источников (None = все),
+            для 'resource' — список из одного ID, для 'feed_discovery' — источники для поиска лент
+        last_search_date: override даты начала периода поиска
+        discovery_run: для 'resume' и 'batch_poll' — запуск, который нужно продолжить
+        run_after: не раньше этого времени (по умолчанию — сразу)
+        ignore_schedule: для 'resources' — искать все источники, а не только те,
+            которым пора искать по расписанию (news/crawl_schedule.py)
+    """
+    params = {}
+    if resource_ids is not None:
+        params['resource_ids'] = list(resource_ids)
+    if last_search_date:
+        params['last_search_date'] = last_search_date.isoformat()
+    if ignore_schedule:
+        params['ignore_schedule'] = True
+
+    job = DiscoveryJob.objects.create(
+        job_type=job_type,
+        provider=provider,
+        params=params,
+        user=user if user and user.is_authenticated else None,
+        config=config,
+        discovery_status=discovery_status,
+        discovery_run=discovery_run,
+        run_after=run_after or timezone.now(),
+    )
+    logger.info(f"Discovery job #{job.id} ({job_type}, provider={provider}) поставлено в очередь")
+    return job
+
+
+def claim_next_job(worker_id: str) -> Optional[DiscoveryJob]:
+    """
+    Забирает самое раннее готовое задание. SKIP LOCKED: воркеры не ждут друг друга
+    и не получают одну и ту же строку. Условный UPDATE дополнительно защищает БД
+    без SELECT ... FOR UPDATE (SQLite в разработке).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            DiscoveryJob.objects.select_for_update(skip_locked=True)
+            .filter(status=DiscoveryJob.STATUS_QUEUED, run_after__lte=now)
+            .order_by('run_after', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        claimed = DiscoveryJob.objects.filter(pk=job.pk, status=DiscoveryJob.STATUS_QUEUED).update(
+            status=DiscoveryJob.STATUS_RUNNING,
+            locked_by=worker_id,
+            attempts=F('attempts') + 1,
+            started_at=now,
+            heartbeat_at=now,
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def requeue_stale_jobs(stale_after: timedelta = STALE_AFTER) -> int:
+    """
+    Возвращает в очередь задания, воркер которых перестал присылать heartbeat.
+    Задания, исчерпавшие max_attempts, помечаются ошибкой.
+
+    Returns:
+        Количество заданий, возвращенных в очередь.
+    """
+    now = timezone.now()
+    stale = DiscoveryJob.objects.filter(status=DiscoveryJob.STATUS_RUNNING, heartbeat_at__lt=now - stale_after)
+
+    exhausted_ids = list(stale.filter(attempts__gte=F('max_attempts')).values_list('id', flat=True))
+    if exhausted_ids:
+        DiscoveryJob.objects.filter(id__in=exhausted_ids).update(
+            status=DiscoveryJob.STATUS_FAILED,
+            finished_at=now,
+            locked_by='',
+            error_message='Воркер перестал отвечать, попытки исчерпаны',
+        )
+        NewsDiscoveryStatus.objects.filter(jobs__id__in=exhausted_ids, status='running').update(status='error')
+        # Запуск больше никто не выполняет: помечаем ошибкой, чтобы его можно было продолжить
+        NewsDiscoveryRun.objects.filter(jobs__id__in=exhausted_ids, status=NewsDiscoveryRun.STATUS_RUNNING).update(
+            status=NewsDiscoveryRun.STATUS_FAILED, finished_at=now
+        )
+        logger.warning(f"Discovery jobs {exhausted_ids}: попытки исчерпаны")
+
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=DiscoveryJob.STATUS_QUEUED,
+        locked_by='',
+        heartbeat_at=None,
+    )
+    if requeued:
+        logger.warning(f"Возвращено в очередь зависших discovery jobs: {requeued}")
+    return requeued
+
+
+def can_resume_run(run: NewsDiscoveryRun, stale_after: timedelta = STALE_AFTER) -> bool:
+    """
+    Можно ли поставить продолжение запуска. Запуск в статусе 'running' продолжается, только если
+    его никто не выполняет: нет задания в очереди или с heartbeat свежее stale_after
+    (воркер убит до того, как requeue_stale_jobs исчерпал попытки). Запуск без заданий
+    (manage.py discover_remaining_news) считается брошенным, если его цели не менялись дольше stale_after.
+    """
+    if not run.is_resumable:
+        return False
+    if run.status != NewsDiscoveryRun.STATUS_RUNNING:
+        return True
+
+    fresh = timezone.now() - stale_after
+    if not run.jobs.exists():
+        activity = run.work_items.aggregate(started=Max('started_at'), finished=Max('finished_at'))
+        last_activity = max(filter(None, activity.values()), default=run.started_at)
+        return last_activity is not None and last_activity < fresh
+    return not run.jobs.filter(
+        Q(status=DiscoveryJob.STATUS_QUEUED) | Q(status=DiscoveryJob.STATUS_RUNNING, heartbeat_at__gte=fresh)
+    ).exists()
+
+
+class JobHeartbeat:
+    """Фоновый поток, обновляющий heartbeat_at задания, пока оно выполняется"""
+
+    def __init__(self, job: DiscoveryJob, interval: float = HEARTBEAT_INTERVAL):
+        self.job_id = job.pk
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'discovery-job-{job.pk}-heartbeat', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                DiscoveryJob.objects.filter(pk=self.job_id, status=DiscoveryJob.STATUS_RUNNING).update(
+                    heartbeat_at=timezone.now()
+                )
+        except Exception as e:
+            logger.error(f"Discovery job #{self.job_id}: ошибка heartbeat: {str(e)}")
+        finally:
+            connection.close()
+
+
+def schedule_batch_poll(job: DiscoveryJob, service: NewsDiscoveryService, result: Dict[str, int]):
+    """Проход оставил пакетные задания провайдера: проверить их через poll_interval_seconds"""
+    if not result.get('batch_jobs_pending') or job.discovery_run is None:
+        return
+    delay = timedelta(seconds=float(service.batch_api['poll_interval_seconds']))
+    poll_job = enqueue_discovery_job(
+        DiscoveryJob.JOB_TYPE_BATCH_POLL,
+        provider=job.provider,
+        user=job.user,
+        config=job.config,
+        discovery_status=job.discovery_status,
+        discovery_run=job.discovery_run,
+        run_after=timezone.now() + delay,
+    )
+    logger.info(f"Discovery job #{job.id}: пакетных заданий {result['batch_jobs_pending']}, "
+                f"проверка — job #{poll_job.id} через {delay}")
+
+
+def execute_job(job: DiscoveryJob) -> Dict[str, int]:
+    """Выполняет задание: вызывает NewsDiscoveryService так же, как раньше делал поток админки"""
+    service = NewsDiscoveryService(user=job.user, config=job.config)
+    result = _execute_job(job, service)
+    schedule_batch_poll(job, service, result)
+    return result
+
+
+def _execute_job(job: DiscoveryJob, service: NewsDiscoveryService) -> Dict[str, int]:
+    params = job.params or {}
+    last_search_date = params.get('last_search_date')
+    last_search_date_override = date.fromisoformat(last_search_date) if last_search_date else None
+    resource_ids = params.get('resource_ids')
+
+    if job.job_type == DiscoveryJob.JOB_TYPE_RESUME:
+        if job.discovery_run is None:
+            raise ValueError("Не указан запуск для продолжения")
+        return service.resume_discovery_run(job.discovery_run, status_obj=job.discovery_status)
+
+    if job.job_type == DiscoveryJob.JOB_TYPE_BATCH_POLL:
+        if job.discovery_run is None:
+            raise ValueError("Не указан запуск с пакетными заданиями")
+        return service.poll_batch_jobs(job.discovery_run, status_obj=job.discovery_status)
+
+    if job.job_type in (DiscoveryJob.JOB_TYPE_RESOURCES, DiscoveryJob.JOB_TYPE_MANUFACTURERS):
+        # Повторная попытка после падения воркера: продолжаем тот же запуск
+        if job.discovery_run is not None and job.discovery_run.is_resumable:
+            return service.resume_discovery_run(job.discovery_run, status_obj=job.discovery_status)
+
+        job.discovery_run = service.start_discovery_run()
+        job.save(update_fields=['discovery_run'])
+        try:
+            if job.job_type == DiscoveryJob.JOB_TYPE_MANUFACTURERS:
+                return service.discover_all_manufacturers_news(
+                    status_obj=job.discovery_status,
+                    last_search_date_override=last_search_date_override,
+                )
+            resources = NewsResource.objects.filter(id__in=resource_ids) if resource_ids is not None else None
+            return service.discover_all_news(
+                status_obj=job.discovery_status,
+                resources=resources,
+                last_search_date_override=last_search_date_override,
+                apply_schedule=not params.get('ignore_schedule', False),
+            )
+        finally:
+            service.finish_discovery_run()
+
+    if job.job_type == DiscoveryJob.JOB_TYPE_FEED_DISCOVERY:
+        resources = list(NewsResource.objects.filter(id__in=resource_ids or []).order_by('id'))
+        found = FeedAutodiscovery(service.config.feeds).discover(resources)
+        return {'total_processed': len(resources), 'feeds_found': len(found)}
+
+    if job.job_type == DiscoveryJob.JOB_TYPE_RESOURCE:
+        resource = NewsResource.objects.get(id=resource_ids[0])
+        created, errors, error_msg = service.discover_news_for_resource(
+            resource, provider=job.provider, last_search_date_override=last_search_date_override
+        )
+        if error_msg:
+            raise RuntimeError(error_msg)
+        return {'created': created, 'errors': errors, 'total_processed': 1}
+
+    raise ValueError(f"Неизвестный тип задания: {job.job_type}")
+
+
+def run_job(job: DiscoveryJob, heartbeat_interval: float = HEARTBEAT_INTERVAL) -> DiscoveryJob:
+    """Выполняет забранное задание и сохраняет результат"""
+    logger.info(f"Discovery job #{job.id} ({job.job_type}): старт, попытка {job.attempts}")
+    try:
+        with JobHeartbeat(job, interval=heartbeat_interval):
+            result = execute_job(job)
+    except Exception as e:
+        logger.error(f"Discovery job #{job.id} завершено с ошибкой: {str(e)}")
+        job.status = DiscoveryJob.STATUS_FAILED
+        job.error_message = str(e)
+        if job.discovery_status and job.discovery_status.status == 'running':
+            job.discovery_status.status = 'error'
+            job.discovery_status.save()
+    else:
+        logger.info(f"Discovery job #{job.id} завершено: {result}")
+        job.status = DiscoveryJob.STATUS_COMPLETED
+        job.result = result
+    job.finished_at = timezone.now()
+    job.locked_by = ''
+    job.save(update_fields=['status', 'error_message', 'result', 'finished_at', 'locked_by'])
+    return job
+
+
+def process_next_job(worker_id: Optional[str] = None) -> Optional[DiscoveryJob]:
+    """
+    Один шаг воркера: вернуть зависшие задания в очередь, забрать и выполнить следующее.
+    Returns:
+        Выполненное задание или None, если очередь пуста.
+    """
+    close_old_connections()
+    requeue_stale_jobs()
+    job = claim_next_job(worker_id or get_worker_id())
+    if job is None:
+        return None
+    try:
+        return run_job(job)
+    finally:
+        close_old_connections()
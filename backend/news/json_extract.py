@@ -0,0 +1,206 @@
+"""
+Извлечение JSON с новостями из текста ответа LLM за один проход.
+Оборванный JSON восстанавливается до последнего завершенного элемента массива.
+"""
+import json
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Ключи, по которым JSON в ответе считается ответом на поиск новостей
+# (news — одиночный запрос, results — пакетный, news/batching.py)
+NEWS_KEYS = ('news', 'results')
+
+_STRUCTURAL = re.compile(r'[{}\[\]"]')
+# Строка JSON целиком (с экранированием); не совпадает — строка оборвана
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_KEYED_OBJECT = re.compile(r'\{\s*"(?:%s)"\s*:' % '|'.join(NEWS_KEYS))
+
+_CLOSERS = {'{': '}', '[': ']'}
+
+# (открывающий символ, позиция, объект начинается с ключа из NEWS_KEYS)
+_Frame = Tuple[str, int, bool]
+
+
+def extract(content: str, keys: Sequence[str] = NEWS_KEYS) -> Tuple[Optional[Dict], bool]:
+    """
+    JSON-объект с новостями из текста ответа.
+
+    Returns:
+        (объект или None, восстановлен ли объект из оборванного ответа)
+    """
+    text = content.strip()
+    if text.startswith('{'):
+        # Чистый JSON — самый частый случай, разбирается без сканирования
+        try:
+            parsed = json.loads(text)
+            if isinstance(parsed, dict):
+                return parsed, False
+        except json.JSONDecodeError:
+            pass
+
+    result = _extract_from(text, keys)
+    if result[0] is None:
+        # Текст перед JSON сбил сканер (непарные скобки или кавычки в пояснениях) —
+        # сканируем заново от начала объекта с ключом news/results
+        for match in _KEYED_OBJECT.finditer(text, 1):
+            result = _extract_from(text[match.start():], keys)
+            if result[0] is not None:
+                break
+    return result
+
+
+def _extract_from(text: str, keys: Sequence[str]) -> Tuple[Optional[Dict], bool]:
+    roots, keyed, open_frames, safe_point = _scan(text)
+    for start, end in roots:
+        parsed = _loads(text[start:end], keys)
+        if parsed is not None:
+            return parsed, False
+    # Оборванный ответ восстанавливается раньше вложенных объектов: иначе из пакетного
+    # {"results": {...}} вернулись бы новости только первого домена
+    if open_frames and safe_point is not None:
+        parsed = _recover(text, safe_point, keys)
+        if parsed is not None:
+            return parsed, True
+    for start, end in keyed:
+        parsed = _loads(text[start:end], keys)
+        if parsed is not None:
+            return parsed, False
+    return None, False
+
+
+def _loads(fragment: str, keys: Sequence[str]) -> Optional[Dict]:
+    try:
+        parsed = json.loads(fragment)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(parsed, dict) and any(key in parsed for key in keys):
+        return parsed
+    return None
+
+
+def _scan(text: str) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]], List[_Frame],
+                             Optional[Tuple[int, List[_Frame]]]]:
+    """
+    Один проход по структурным символам.
+
+    Returns:
+        roots: (start, end) завершенных объектов верхнего уровня;
+        keyed: (start, end) завершенных вложенных объектов с ключом news/results;
+        open_frames: незакрытые скобки в конце текста (ответ оборван);
+        safe_point: (позиция, открытые скобки) после последнего завершенного элемента
+            массива — точка, до которой оборванный ответ можно восстановить.
+    """
+    roots: List[Tuple[int, int]] = []
+    keyed: List[Tuple[int, int]] = []
+    stack: List[_Frame] = []
+    safe_point = None
+    pos = 0
+    length = len(text)
+    while pos < length:
+        match = _STRUCTURAL.search(text, pos)
+        if match is None:
+            break
+        i = match.start()
+        char = text[i]
+        pos = i + 1
+        if char == '"':
+            # Кавычки вне JSON (в пояснениях модели) не открывают строку
+            if not stack:
+                continue
+            string = _STRING.match(text, i)
+            if string is None:
+                break
+            pos = string.end()
+        elif char == '{':
+            stack.append(('{', i, _KEYED_OBJECT.match(text, i) is not None))
+        elif char == '[':
+            if stack:
+                stack.append(('[', i, False))
+        elif not stack:
+            continue
+        elif _CLOSERS[stack[-1][0]] != char:
+            # Несогласованные скобки — это был не JSON, начинаем заново
+            stack.clear()
+            safe_point = None
+        else:
+            _, start, is_keyed = stack.pop()
+            if not stack:
+                roots.append((start, pos))
+                safe_point = None
+            else:
+                if is_keyed:
+                    keyed.append((start, pos))
+                if stack[-1][0] == '[':
+                    safe_point = (pos, list(stack))
+    return roots, keyed, stack, safe_point
+
+
+def _recover(text: str, safe_point: Tuple[int, List[_Frame]], keys: Sequence[str]) -> Optional[Dict]:
+    """Закрывает оборванный JSON после последнего завершенного элемента массива"""
+    pos, frames = safe_point
+    closers = ''.join(_CLOSERS[char] for char, _, _ in reversed(frames))
+    # Сначала от внешнего объекта, затем от вложенных news/results (если снаружи был не JSON)
+    for depth, (char, start, is_keyed) in enumerate(frames):
+        if char != '{' or (depth and not is_keyed):
+            continue
+        parsed = _loads(text[start:pos] + closers[:len(frames) - depth], keys)
+        if parsed is not None:
+            return parsed
+    return None
+
+
+_NEWS_KEY_BEFORE = re.compile(r'"news"\s*:\s*\Z')
+
+
+class NewsItemStream:
+    """
+    Инкрементальный разбор потокового ответа: feed() возвращает элементы массива "news",
+    завершенные в очередном фрагменте текста. Строка, оборванная на границе фрагментов,
+    дочитывается со следующим фрагментом.
+    """
+
+    def __init__(self):
+        self._text = ''
+        self._pos = 0
+        # (открывающий символ, позиция, массив — значение ключа "news")
+        self._stack: List[_Frame] = []
+
+    def feed(self, chunk: str) -> List[Dict]:
+        self._text += chunk
+        text = self._text
+        stack = self._stack
+        items: List[Dict] = []
+        while True:
+            match = _STRUCTURAL.search(text, self._pos)
+            if match is None:
+                self._pos = len(text)
+                break
+            i = match.start()
+            char = text[i]
+            if char == '"' and stack:
+                string = _STRING.match(text, i)
+                if string is None:
+                    # Строка еще не пришла целиком
+                    self._pos = i
+                    break
+                self._pos = string.end()
+                continue
+            self._pos = i + 1
+            if char == '{':
+                stack.append(('{', i, False))
+            elif char == '[':
+                if stack:
+                    stack.append(('[', i, _NEWS_KEY_BEFORE.search(text, max(0, i - 64), i) is not None))
+            elif char in '}]' and stack:
+                if _CLOSERS[stack[-1][0]] != char:
+                    stack.clear()
+                    continue
+                opener, start, _ = stack.pop()
+                if opener == '{' and stack and stack[-1][0] == '[' and stack[-1][2]:
+                    try:
+                        item = json.loads(text[start:self._pos])
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(item, dict):
+                        items.append(item)
+        return items
@@ -0,0 +1,236 @@
+"""
+Общий для процесса реестр клиентов LLM SDK с keep-alive пулом HTTP-соединений.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Размер пула по умолчанию; поиск запрашивает больше при большом max_workers
+DEFAULT_POOL_SIZE = 20
+# Сколько секунд держать неиспользуемое соединение открытым
+KEEPALIVE_EXPIRY = 30.0
+
+
+class _ClientEntry:
+    """Клиент SDK и счетчики его использования"""
+
+    def __init__(self, client: Any, provider: str, base_url: Optional[str], timeout: Optional[float],
+                 pool_size: int, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.client = client
+        self.provider = provider
+        self.base_url = base_url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.loop = loop
+        self.is_async = loop is not None
+        self.checkouts = 1
+        self.requests = 0
+
+    def count_request(self, request=None):
+        # Событие httpx 'request': одно на каждый HTTP-запрос, включая повторы SDK
+        self.requests += 1
+
+    async def acount_request(self, request=None):
+        self.count_request(request)
+
+    def to_dict(self) -> Dict:
+        return {
+            'provider': self.provider,
+            'base_url': self.base_url or '',
+            'timeout': self.timeout,
+            'async': self.is_async,
+            'pool_size': self.pool_size,
+            'checkouts': self.checkouts,
+            'requests': self.requests,
+        }
+
+
+class LLMClientRegistry:
+    """
+    Потокобезопасный реестр клиентов SDK.
+
+    Ключ клиента — (тип клиента, провайдер, хэш ключа API, base_url, таймаут).
+    Пул соединений создается на pool_size соединений; если позже запрошен больший
+    pool_size, клиент пересоздается (старый продолжает обслуживать начатые запросы).
+    """
+
+    def __init__(self, default_pool_size: Optional[int] = None):
+        self.default_pool_size = default_pool_size or getattr(settings, 'LLM_CLIENT_POOL_SIZE', DEFAULT_POOL_SIZE)
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple, _ClientEntry] = {}
+        self._gemini_models: Dict[Tuple[str, str], Any] = {}
+        self._gemini_key: Optional[str] = None
+        self.counters = {'created': 0, 'reused': 0, 'resized': 0}
+
+    # ---------- Публичные методы ----------
+
+    def openai(self, api_key: str, base_url: Optional[str] = None, timeout: Optional[float] = None,
+               pool_size: Optional[int] = None, provider: str = 'openai'):
+        """OpenAI-совместимый клиент (OpenAI, xAI через base_url)"""
+        from openai import OpenAI, DefaultHttpxClient
+        return self._get(
+            'openai', provider, api_key, base_url, timeout, pool_size, is_async=False,
+            factory=lambda http_client: OpenAI(**self._client_kwargs(api_key, base_url, timeout), http_client=http_client),
+            http_client_class=DefaultHttpxClient,
+        )
+
+    def async_openai(self, api_key: str, base_url: Optional[str] = None, timeout: Optional[float] = None,
+                     pool_size: Optional[int] = None, provider: str = 'openai'):
+        """Асинхронный OpenAI-совместимый клиент для текущего event loop"""
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        return self._get(
+            'async_openai', provider, api_key, base_url, timeout, pool_size, is_async=True,
+            factory=lambda http_client: AsyncOpenAI(**self._client_kwargs(api_key, base_url, timeout), http_client=http_client),
+            http_client_class=DefaultAsyncHttpxClient,
+        )
+
+    def anthropic(self, api_key: str, base_url: Optional[str] = None, timeout: Optional[float] = None,
+                  pool_size: Optional[int] = None, provider: str = 'anthropic'):
+        from anthropic import Anthropic, DefaultHttpxClient
+        return self._get(
+            'anthropic', provider, api_key, base_url, timeout, pool_size, is_async=False,
+            factory=lambda http_client: Anthropic(**self._client_kwargs(api_key, base_url, timeout), http_client=http_client),
+            http_client_class=DefaultHttpxClient,
+        )
+
+    def async_anthropic(self, api_key: str, base_url: Optional[str] = None, timeout: Optional[float] = None,
+                        pool_size: Optional[int] = None, provider: str = 'anthropic'):
+        """Асинхронный клиент Anthropic для текущего event loop"""
+        from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+        return self._get(
+            'async_anthropic', provider, api_key, base_url, timeout, pool_size, is_async=True,
+            factory=lambda http_client: AsyncAnthropic(**self._client_kwargs(api_key, base_url, timeout), http_client=http_client),
+            http_client_class=DefaultAsyncHttpxClient,
+        )
+
+    def gemini_model(self, api_key: str, model_name: str):
+        """
+        GenerativeModel Gemini. SDK хранит транспорт глобально, поэтому genai.configure
+        вызывается только при смене ключа, а модели кэшируются по имени.
+        """
+        import google.generativeai as genai
+
+        key = (self._key_fingerprint(api_key), model_name)
+        with self._lock:
+            model = self._gemini_models.get(key)
+            if model is not None:
+                self.counters['reused'] += 1
+                return model
+            if self._gemini_key != key[0]:
+                genai.configure(api_key=api_key)
+                self._gemini_key = key[0]
+                self._gemini_models.clear()
+            model = genai.GenerativeModel(model_name)
+            self._gemini_models[key] = model
+            self.counters['created'] += 1
+            return model
+
+    def stats(self) -> Dict:
+        """Счетчики использования пулов: общие и по каждому клиенту"""
+        with self._lock:
+            return {
+                **self.counters,
+                'clients': [entry.to_dict() for entry in self._clients.values()],
+                'gemini_models': len(self._gemini_models),
+            }
+
+    def clear(self):
+        """Закрывает синхронные клиенты и очищает реестр (тесты, смена ключей)"""
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+            self._gemini_models.clear()
+            self._gemini_key = None
+            self.counters = {'created': 0, 'reused': 0, 'resized': 0}
+        for entry in entries:
+            if not entry.is_async:
+                try:
+                    entry.client.close()
+                except Exception as e:
+                    logger.debug(f"Error closing {entry.provider} client: {str(e)}")
+
+    # ---------- Внутренняя логика ----------
+
+    @staticmethod
+    def _key_fingerprint(api_key: str) -> str:
+        # Сам ключ в реестре не храним — только хэш для различения клиентов
+        return hashlib.sha256((api_key or '').encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _client_kwargs(api_key: str, base_url: Optional[str], timeout: Optional[float]) -> Dict:
+        kwargs: Dict[str, Any] = {'api_key': api_key}
+        if base_url:
+            kwargs['base_url'] = base_url
+        if timeout:
+            kwargs['timeout'] = float(timeout)
+        return kwargs
+
+    def _get(self, kind: str, provider: str, api_key: str, base_url: Optional[str], timeout: Optional[float],
+             pool_size: Optional[int], is_async: bool, factory: Callable[[Any], Any], http_client_class) -> Any:
+        pool_size = max(int(pool_size or 0), self.default_pool_size)
+        key: Tuple = (kind, provider, self._key_fingerprint(api_key), base_url or '', float(timeout or 0))
+        if is_async:
+            key += (id(asyncio.get_running_loop()),)
+
+        with self._lock:
+            if is_async:
+                self._drop_closed_loops()
+            entry = self._clients.get(key)
+            if entry is not None and entry.pool_size >= pool_size:
+                entry.checkouts += 1
+                self.counters['reused'] += 1
+                return entry.client
+
+            entry_is_resize = entry is not None
+            loop = asyncio.get_running_loop() if is_async else None
+            new_entry = _ClientEntry(None, provider, base_url, timeout, pool_size, loop)
+            hook = new_entry.acount_request if is_async else new_entry.count_request
+            http_client = http_client_class(
+                limits=self._limits(pool_size),
+                event_hooks={'request': [hook]},
+            )
+            new_entry.client = factory(http_client)
+            self._clients[key] = new_entry
+            if entry_is_resize:
+                self.counters['resized'] += 1
+                logger.info(f"Resized {provider} client pool to {pool_size} connections")
+            else:
+                self.counters['created'] += 1
+            return new_entry.client
+
+    @staticmethod
+    def _limits(pool_size: int):
+        # Класс Limits берем у SDK: он совпадает с версией httpx, которую использует SDK
+        from openai import DEFAULT_CONNECTION_LIMITS
+        limits_class = type(DEFAULT_CONNECTION_LIMITS)
+        return limits_class(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+
+    def _drop_closed_loops(self):
+        """Удаляет асинхронные клиенты завершившихся event loop (вызывается под блокировкой)"""
+        closed = [key for key, entry in self._clients.items() if entry.is_async and entry.loop.is_closed()]
+        for key in closed:
+            del self._clients[key]
+
+
+_registry: Optional[LLMClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_client_registry() -> LLMClientRegistry:
+    """Реестр клиентов, общий для процесса"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = LLMClientRegistry()
+    return _registry
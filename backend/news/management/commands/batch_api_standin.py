@@ -0,0 +1,43 @@
+"""
+Management команда: локальный стенд пакетных API Anthropic и OpenAI (news/batch_api.py).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from news.batch_api import BatchAPIStandIn
+
+
+class Command(BaseCommand):
+    help = 'Запускает локальный стенд пакетных API Anthropic и OpenAI для режима batch_api'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1', help='Адрес (по умолчанию: 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=8765, help='Порт (по умолчанию: 8765)')
+        parser.add_argument('--ready-after', type=int, default=1,
+                            help='Сколько проверок состояния задание остается in_progress (по умолчанию: 1)')
+        parser.add_argument('--response-file', type=str, help='Файл с текстом ответа на каждый запрос')
+
+    def handle(self, *args, **options):
+        response = '{"news": []}'
+        if options['response_file']:
+            try:
+                with open(options['response_file'], encoding='utf-8') as f:
+                    response = f.read()
+            except OSError as e:
+                raise CommandError(f'Не удалось прочитать --response-file: {e}')
+
+        standin = BatchAPIStandIn(
+            responder=lambda provider, params: response,
+            ready_after=options['ready_after'],
+            host=options['host'],
+            port=options['port'],
+        )
+        with standin:
+            self.stdout.write(self.style.SUCCESS(f'Стенд Batch API: {standin.url}'))
+            self.stdout.write(f"batch_api['base_urls'] = {standin.base_urls}")
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                self.stdout.write('Стенд остановлен')
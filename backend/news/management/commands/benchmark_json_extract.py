@@ -0,0 +1,113 @@
+"""
+Management команда для бенчмарка разбора JSON из ответов LLM (news/json_extract.py).
+"""
+import json
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from news import json_extract, response_archive
+from news.models import DiscoveryRawResponse
+
+_MARKDOWN_JSON = r'```(?:json)?\s*(\{.*?\})\s*```'
+_NEWS_OBJECT_JSON = r'\{\s*"news"\s*:\s*\[.*?\]\s*\}'
+_INLINE_NEWS_JSON = r'\{[^{}]*"news"[^{}]*\[.*?\]\s*\}'
+
+
+def legacy_parse(content):
+    """Прежний разбор (самая полная цепочка — как у Anthropic)"""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+    for pattern, group in ((_MARKDOWN_JSON, 1), (_NEWS_OBJECT_JSON, 0), (_INLINE_NEWS_JSON, 0)):
+        json_match = re.search(pattern, content, re.DOTALL)
+        if json_match:
+            try:
+                result = json.loads(json_match.group(group).strip())
+                if result:
+                    return result
+            except json.JSONDecodeError:
+                pass
+    brace_count = 0
+    start_idx = -1
+    for i, char in enumerate(content):
+        if char == '{':
+            if start_idx == -1:
+                start_idx = i
+            brace_count += 1
+        elif char == '}':
+            brace_count -= 1
+            if brace_count == 0 and start_idx != -1:
+                try:
+                    parsed = json.loads(content[start_idx:i+1])
+                    if 'news' in parsed:
+                        return parsed
+                except json.JSONDecodeError:
+                    pass
+                start_idx = -1
+    return {"news": []}
+
+
+def synthetic_corpus(size, seed=42):
+    """Ответы той же формы, что у провайдеров: чистый JSON, JSON в тексте и markdown, обрезанные ответы"""
+    rng = random.Random(seed)
+
+    def news_item(n):
+        return {
+            'title': f'Новинка {n}: чиллер {rng.randint(100, 999)} кВт',
+            'summary': ' '.join(rng.choice(['HVAC', 'компрессор', 'инвертор', '"R32"', 'монтаж', '{серия}'])
+                                for _ in range(rng.randint(40, 120))),
+            'source_url': f'https://example{n}.com/news/{rng.randint(1, 10 ** 6)}',
+        }
+
+    def news_json(count):
+        return json.dumps({'news': [news_item(n) for n in range(count)]}, ensure_ascii=False, indent=2)
+
+    citations = ' '.join(f'[{n}] {{"url": "https://site{n}.com", "title": "cite {n}"}}' for n in range(30))
+    shapes = [
+        lambda: news_json(rng.randint(0, 10)),
+        lambda: f'Я нашел следующие новости:\n```json\n{news_json(rng.randint(1, 10))}\n```\nГотово.',
+        lambda: f'Searching {{site}}... {citations}\n\n{news_json(rng.randint(1, 10))}',
+        lambda: (lambda text: text[:rng.randint(len(text) // 2, len(text) - 5)])(news_json(rng.randint(3, 15))),
+        lambda: 'Новостей за период не найдено. ' + citations,
+    ]
+    return [rng.choice(shapes)() for _ in range(size)]
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк разбора JSON из ответов LLM: однопроходный извлекатель против прежней цепочки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-archive', type=int, default=0, metavar='N',
+                            help='Взять N последних ответов из архива DiscoveryRawResponse')
+        parser.add_argument('--size', type=int, default=500, help='Размер синтетического корпуса (по умолчанию: 500)')
+        parser.add_argument('--repeat', type=int, default=3, help='Повторов корпуса (по умолчанию: 3)')
+
+    def handle(self, *args, **options):
+        if options['from_archive']:
+            archived = DiscoveryRawResponse.objects.order_by('-created_at')[:options['from_archive']]
+            corpus = [response_archive.response_text(response) for response in archived]
+            source = 'архив'
+        else:
+            corpus = synthetic_corpus(options['size'])
+            source = 'синтетический корпус'
+        if not corpus:
+            self.stdout.write('Корпус пуст')
+            return
+
+        total_kb = sum(len(text.encode('utf-8')) for text in corpus) / 1024
+        self.stdout.write(f'{source}: {len(corpus)} ответов, {total_kb:.0f} КБ')
+        for label, parse in (('прежний разбор', legacy_parse),
+                             ('json_extract', lambda text: json_extract.extract(text)[0] or {'news': []})):
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                results = [parse(text) for text in corpus]
+            elapsed = (time.perf_counter() - started) / options['repeat']
+            news = sum(len(result.get('news') or []) for result in results if isinstance(result, dict))
+            self.stdout.write(
+                f'{label:>15}: {elapsed * 1000:8.1f} мс на корпус, '
+                f'{elapsed / len(corpus) * 1e6:7.1f} мкс на ответ, новостей: {news}'
+            )
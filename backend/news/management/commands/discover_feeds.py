@@ -0,0 +1,47 @@
+"""
+Management команда для поиска RSS/Atom лент источников (news/feeds.py).
+"""
+from django.core.management.base import BaseCommand
+
+from news.feeds import FeedAutodiscovery
+from news.models import SearchConfiguration
+from references.models import NewsResource
+
+
+class Command(BaseCommand):
+    help = 'Ищет RSS/Atom ленты на страницах источников новостей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resource', type=int, action='append', help='Только источник с этим ID (можно несколько)')
+        parser.add_argument('--missing', action='store_true', help='Только источники, у которых лента еще не найдена')
+        parser.add_argument('--switch', action='store_true',
+                            help='Перевести источники auto с найденной лентой в source_type = feed')
+        parser.add_argument('--dry-run', action='store_true', help='Только найти ленты, ничего не сохранять')
+
+    def handle(self, *args, **options):
+        resources = NewsResource.objects.exclude(source_type=NewsResource.SOURCE_TYPE_MANUAL).order_by('id')
+        if options['resource']:
+            resources = resources.filter(id__in=options['resource'])
+        if options['missing']:
+            resources = resources.filter(feed_url='')
+        resources = list(resources)
+        if not resources:
+            self.stdout.write('Нет источников для проверки')
+            return
+
+        discovery = FeedAutodiscovery(SearchConfiguration.get_active().feeds)
+        found = discovery.discover(resources, save=not options['dry_run'])
+        for resource in resources:
+            if resource.id in found:
+                self.stdout.write(f'{resource.id} {resource.name}: {found[resource.id]}')
+
+        switched = 0
+        if options['switch'] and not options['dry_run'] and found:
+            # hybrid-источники ищутся по своим инструкциям — их тип не меняем
+            switched = NewsResource.objects.filter(
+                id__in=list(found), source_type=NewsResource.SOURCE_TYPE_AUTO
+            ).update(source_type=NewsResource.SOURCE_TYPE_FEED)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Источников проверено: {len(resources)}, лент найдено: {len(found)}, переведено в feed: {switched}'
+        ))
@@ -0,0 +1,76 @@
+"""
+Management команда — воркер очереди поиска новостей (DiscoveryJob).
+Забирает задания из БД и выполняет их вне веб-процессов gunicorn.
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from news.jobs import get_worker_id, process_next_job
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задания поиска новостей из очереди (DiscoveryJob)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить задания, которые уже в очереди, и выйти',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Пауза между проверками пустой очереди в секундах (по умолчанию: 5)',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=0,
+            help='Выйти после стольких заданий (0 = без ограничения)',
+        )
+        parser.add_argument(
+            '--worker-id',
+            type=str,
+            default='',
+            help='Имя воркера в DiscoveryJob.locked_by (по умолчанию: host:pid)',
+        )
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id'] or get_worker_id()
+        self._stopping = False
+        # SIGTERM (systemctl stop/restart): новое задание не берем, текущее доделываем.
+        # Если процесс убьют раньше, задание вернется в очередь по отсутствию heartbeat.
+        previous_handlers = {
+            signum: signal.signal(signum, self._request_stop) for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            processed = self._run(worker_id, options)
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(f'Discovery worker {worker_id} остановлен, выполнено заданий: {processed}')
+
+    def _run(self, worker_id: str, options) -> int:
+        self.stdout.write(self.style.SUCCESS(f'Discovery worker {worker_id} запущен'))
+        processed = 0
+        while not self._stopping:
+            job = process_next_job(worker_id)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            processed += 1
+            style = self.style.SUCCESS if job.status == job.STATUS_COMPLETED else self.style.ERROR
+            self.stdout.write(style(f'Задание #{job.id} ({job.job_type}): {job.status} {job.result or job.error_message}'))
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+        return processed
+
+    def _request_stop(self, signum, frame):
+        self.stdout.write(self.style.WARNING('Получен сигнал остановки: завершаю после текущего задания'))
+        self._stopping = True
@@ -0,0 +1,41 @@
+"""
+Management команда для индексации существующих новостей в поиске почти-дубликатов.
+Новые новости индексируются при создании; команда нужна для новостей, найденных раньше.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from news import near_duplicates
+from news.models import NewsPost
+
+
+class Command(BaseCommand):
+    help = 'Строит MinHash-индекс новостей и группирует похожие (news/near_duplicates.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=near_duplicates.WINDOW_DAYS,
+            help=f'Индексировать новости за последние N дней (по умолчанию: {near_duplicates.WINDOW_DAYS})',
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        posts = (
+            NewsPost.objects.filter(created_at__gte=since, signature__isnull=True, is_no_news_found=False)
+            .exclude(title__startswith='Ошибка при поиске новостей')
+            .order_by('created_at')
+        )
+        indexed = grouped = 0
+        # Старые новости индексируются первыми и становятся представителями групп
+        for post in posts.iterator(chunk_size=500):
+            if near_duplicates.index_post(post) is not None:
+                grouped += 1
+            indexed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано новостей: {indexed}, отнесено к группам похожих: {grouped}'
+        ))
@@ -0,0 +1,71 @@
+"""
+Management команда для оценки стоимости запуска поиска без запросов к LLM (news/budget.py).
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from news.discovery_service import NewsDiscoveryService
+from references.models import Manufacturer, NewsResource
+
+
+class Command(BaseCommand):
+    help = 'Оценивает токены и стоимость запуска поиска новостей по истории вызовов (без запросов к LLM)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--manufacturers', action='store_true', help='Поиск по производителям (по умолчанию — по источникам)')
+        parser.add_argument('--provider', type=str, default='auto',
+                            help='Провайдер (auto, grok, anthropic, openai, gemini; по умолчанию: auto)')
+        parser.add_argument('--resource', type=int, action='append', help='Только цель с этим ID (можно несколько)')
+        parser.add_argument('--last-search-date', type=str,
+                            help='Начало периода поиска (YYYY-MM-DD): расписание не применяется, как при запуске')
+        parser.add_argument('--details', action='store_true', help='Вывести оценку каждой цели')
+
+    def handle(self, *args, **options):
+        last_search_date = None
+        if options['last_search_date']:
+            try:
+                last_search_date = datetime.strptime(options['last_search_date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Неверный формат даты --last-search-date. Используйте YYYY-MM-DD')
+
+        service = NewsDiscoveryService()
+        if options['manufacturers']:
+            field = 'manufacturer'
+            queryset = Manufacturer.objects.all().order_by('id')
+        else:
+            field = 'resource'
+            queryset = NewsResource.objects.exclude(source_type=NewsResource.SOURCE_TYPE_MANUAL).order_by('id')
+        if options['resource']:
+            targets, skipped_not_due = list(queryset.filter(id__in=options['resource'])), 0
+        else:
+            targets, skipped_not_due = service._select_due(queryset, last_search_date)
+
+        plan = service.plan_discovery(field, targets, options['provider'])
+        if options['details']:
+            names = {target.id: target.name for target in targets}
+            for estimate in sorted(plan['targets'], key=lambda estimate: -estimate.cost_usd):
+                self.stdout.write(
+                    f"{estimate.target_id:>6} {names[estimate.target_id][:40]:<40} "
+                    f"{estimate.input_tokens:>8} in {estimate.output_tokens:>7} out "
+                    f"${estimate.cost_usd:.4f} ({estimate.basis})"
+                )
+
+        bases = {}
+        for estimate in plan['targets']:
+            bases[estimate.basis] = bases.get(estimate.basis, 0) + 1
+        self.stdout.write(
+            f"Целей с поиском LLM: {len(plan['targets'])} (по истории цели: {bases.get('target', 0)}, "
+            f"по среднему: {bases.get('average', 0)}, без истории: {bases.get('default', 0)}), "
+            f"из лент: {plan['feeds']}, пропущено по расписанию: {skipped_not_due}"
+        )
+        self.stdout.write(f"Первый провайдер: {plan['provider']}, токенов: {plan['input_tokens']} in / "
+                          f"{plan['output_tokens']} out")
+        summary = f"Оценка стоимости: ${plan['cost_usd']:.4f}"
+        if plan['budget_usd'] is None:
+            self.stdout.write(self.style.SUCCESS(summary))
+        elif plan['cost_usd'] <= plan['budget_usd']:
+            self.stdout.write(self.style.SUCCESS(f"{summary} — в пределах бюджета ${plan['budget_usd']:.2f}"))
+        else:
+            self.stdout.write(self.style.WARNING(f"{summary} — больше бюджета ${plan['budget_usd']:.2f} "
+                                                 f"({service.budget.mode})"))
@@ -0,0 +1,89 @@
+"""
+Management команда для пересборки новостей из архива сырых ответов LLM
+без запросов к провайдерам.
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from news import response_archive
+from news.discovery_service import NewsDiscoveryService
+from news.models import DiscoveryRawResponse
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает новости из сохраненных ответов LLM без обращения к сети'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--run', type=int, help='Только ответы запуска поиска с этим ID')
+        parser.add_argument('--since', type=str, help='Только ответы, полученные с даты (YYYY-MM-DD)')
+        parser.add_argument('--provider', type=str, help='Только ответы провайдера (grok, anthropic, openai, gemini)')
+        parser.add_argument('--failed', action='store_true', help='Только ответы, которые не удалось разобрать')
+        parser.add_argument('--dry-run', action='store_true', help='Только разобрать и посчитать новости')
+
+    def handle(self, *args, **options):
+        responses = DiscoveryRawResponse.objects.select_related('resource', 'manufacturer').order_by('created_at')
+        if options['run']:
+            responses = responses.filter(api_calls__discovery_run_id=options['run']).distinct()
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Неверный формат даты --since. Используйте YYYY-MM-DD')
+            responses = responses.filter(created_at__date__gte=since)
+        if options['provider']:
+            responses = responses.filter(provider=options['provider'])
+        if options['failed']:
+            responses = responses.filter(parsed=False)
+
+        service = NewsDiscoveryService()
+        # Архив содержит и пакетные, и обычные ответы — разбор без проверки схемы (structured_output)
+        service.structured_output = False
+        stats = {'responses': 0, 'failed': 0, 'news': 0, 'created': 0, 'duplicates': 0, 'errors': 0}
+        for archived in responses.iterator(chunk_size=100):
+            stats['responses'] += 1
+            try:
+                llm_response = service._content_parser(archived.provider)(response_archive.response_text(archived))
+            except Exception as e:
+                stats['failed'] += 1
+                self.stderr.write(f'Ответ #{archived.id} ({archived.provider}) не разобран: {str(e)}')
+                continue
+
+            targets = self._split(service, archived, llm_response)
+            news_count = sum(len(news_items) for _, news_items in targets)
+            stats['news'] += news_count
+            if options['dry_run']:
+                continue
+
+            DiscoveryRawResponse.objects.filter(pk=archived.pk).update(parsed=True, news_count=news_count)
+            for target, news_items in targets:
+                for news_item in news_items:
+                    try:
+                        if archived.manufacturer is None:
+                            created = service._create_news_post(news_item, target)
+                        else:
+                            created = service._create_manufacturer_news_post(news_item, target)
+                    except Exception as e:
+                        stats['errors'] += 1
+                        self.stderr.write(f'Ответ #{archived.id}: ошибка создания новости: {str(e)}')
+                        continue
+                    stats['created' if created else 'duplicates'] += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Ответов: {stats['responses']}, не разобрано: {stats['failed']}, новостей в ответах: {stats['news']}, "
+            f"создано: {stats['created']}, уже были сохранены: {stats['duplicates']}, ошибок: {stats['errors']}"
+        ))
+
+    @staticmethod
+    def _split(service, archived, llm_response):
+        """
+        Новости ответа по целям: [(источник или производитель, новости)].
+        Пакетный ответ (news/batching.py) раскладывается по источникам его записей DiscoveryAPICall.
+        """
+        if not isinstance(llm_response, dict):
+            return []
+        if archived.resource is not None or archived.manufacturer is not None:
+            return [(archived.resource or archived.manufacturer, llm_response.get('news') or [])]
+        resources = [call.resource for call in archived.api_calls.select_related('resource') if call.resource]
+        parts = service._split_batch_response(llm_response, resources)
+        return [(resource, parts[resource.id]['news']) for resource in resources]
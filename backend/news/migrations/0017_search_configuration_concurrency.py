@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0016_add_prompts_to_searchconfiguration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='max_workers',
+            field=models.PositiveIntegerField(default=1, help_text='Количество источников, обрабатываемых параллельно (1 = последовательно)', verbose_name='Max Workers'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='provider_concurrency',
+            field=models.JSONField(blank=True, default=dict, help_text="Лимит одновременных запросов к провайдеру: {'grok': 8, 'anthropic': 2}. Пустой {} = без лимита", verbose_name='Provider Concurrency'),
+        ),
+    ]
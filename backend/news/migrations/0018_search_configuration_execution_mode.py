@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0017_search_configuration_concurrency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='execution_mode',
+            field=models.CharField(choices=[('threads', 'Threads (пул потоков, синхронные клиенты)'), ('async', 'Async (asyncio, асинхронные клиенты)')], default='threads', help_text='Async: запросы через asyncio-клиенты, max_workers = число одновременных запросов (можно десятки)', max_length=20, verbose_name='Execution Mode'),
+        ),
+    ]
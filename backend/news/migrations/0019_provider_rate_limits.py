@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0018_search_configuration_execution_mode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderRateLimitState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Провайдер (grok, anthropic, openai, gemini)', max_length=50, unique=True, verbose_name='Key')),
+                ('request_allowance', models.FloatField(blank=True, help_text='Доступные запросы в bucket (пусто = полный bucket)', null=True, verbose_name='Request Allowance')),
+                ('token_allowance', models.FloatField(blank=True, help_text='Доступные токены в bucket (может быть отрицательным после учета фактического расхода)', null=True, verbose_name='Token Allowance')),
+                ('refilled_at', models.FloatField(blank=True, help_text='Unix-время последнего пополнения bucket', null=True, verbose_name='Refilled At')),
+                ('last_request_at', models.FloatField(blank=True, help_text='Unix-время последнего разрешенного запроса', null=True, verbose_name='Last Request At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+            ],
+            options={
+                'verbose_name': 'Provider Rate Limit State',
+                'verbose_name_plural': 'Provider Rate Limit States',
+            },
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='rate_limit_backend',
+            field=models.CharField(choices=[('local', 'Local (в памяти процесса)'), ('database', 'Database (общий лимит для всех воркеров)')], default='database', help_text='Где хранится состояние лимитов: Database — общий бюджет для всех процессов gunicorn', max_length=20, verbose_name='Rate Limit Backend'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='rate_limits',
+            field=models.JSONField(blank=True, default=dict, help_text="Лимиты по провайдерам: {'grok': {'rpm': 60, 'tpm': 400000}}. rpm — запросов в минуту, tpm — токенов в минуту, 0 или отсутствие ключа = без лимита", verbose_name='Rate Limits'),
+        ),
+        migrations.AlterField(
+            model_name='searchconfiguration',
+            name='delay_between_requests',
+            field=models.FloatField(default=0.5, help_text='Минимальный интервал между запросами к одному провайдеру в секундах', verbose_name='Delay Between Requests (seconds)'),
+        ),
+    ]
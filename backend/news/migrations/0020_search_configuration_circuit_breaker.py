@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0019_provider_rate_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='circuit_breaker',
+            field=models.JSONField(blank=True, default=dict, help_text="Переопределение настроек circuit breaker режима auto: {'window': 10, 'min_calls': 3, 'failure_rate': 0.5, 'slow_call_ratio': 0.8, 'cooldown_seconds': 300, 'enabled': true}", verbose_name='Circuit Breaker'),
+        ),
+    ]
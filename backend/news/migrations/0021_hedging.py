@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0020_search_configuration_circuit_breaker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryapicall',
+            name='is_hedge',
+            field=models.BooleanField(default=False, help_text='Хедж-запрос: отправлен параллельно медленному основному провайдеру', verbose_name='Is Hedge'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='hedging',
+            field=models.JSONField(blank=True, default=dict, help_text="Параллельный запрос к следующему провайдеру, если основной не ответил за перцентиль duration_ms: {'enabled': false, 'percentile': 90, 'history': 200, 'min_samples': 20, 'default_delay_seconds': 30, 'min_delay_seconds': 5}", verbose_name='Hedging'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('news', '0021_hedging'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscoveryJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_type', models.CharField(choices=[('resources', 'Источники'), ('resource', 'Один источник'), ('manufacturers', 'Производители')], help_text='Что искать: источники (все или выбранные), один источник или производители', max_length=20, verbose_name='Job Type')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('completed', 'Завершено'), ('failed', 'Ошибка')], default='queued', max_length=20, verbose_name='Status')),
+                ('provider', models.CharField(default='auto', help_text="Провайдер LLM ('auto' = цепочка)", max_length=20, verbose_name='Provider')),
+                ('params', models.JSONField(blank=True, default=dict, help_text='Параметры запуска: resource_ids, last_search_date (YYYY-MM-DD)', verbose_name='Params')),
+                ('attempts', models.IntegerField(default=0, help_text='Сколько раз задание забирал воркер', verbose_name='Attempts')),
+                ('max_attempts', models.IntegerField(default=3, help_text='После стольких попыток зависшее задание помечается как ошибка', verbose_name='Max Attempts')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, help_text='Задание не выполняется раньше этого времени', verbose_name='Run After')),
+                ('locked_by', models.CharField(blank=True, default='', help_text='Воркер, выполняющий задание (host:pid)', max_length=255, verbose_name='Locked By')),
+                ('heartbeat_at', models.DateTimeField(blank=True, help_text='Последний сигнал воркера; без сигнала задание возвращается в очередь', null=True, verbose_name='Heartbeat At')),
+                ('result', models.JSONField(blank=True, default=dict, help_text='Статистика выполнения: created, errors, total_processed', verbose_name='Result')),
+                ('error_message', models.TextField(blank=True, default='', verbose_name='Error Message')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+                ('config', models.ForeignKey(blank=True, help_text='Пусто = активная конфигурация на момент выполнения', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='discovery_jobs', to='news.searchconfiguration', verbose_name='Search Configuration')),
+                ('discovery_status', models.ForeignKey(blank=True, help_text='Прогресс для индикатора в админке', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='news.newsdiscoverystatus', verbose_name='Discovery Status')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='discovery_jobs', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Discovery Job',
+                'verbose_name_plural': 'Discovery Jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='news_discov_status_3c4b7c_idx')],
+            },
+        ),
+    ]
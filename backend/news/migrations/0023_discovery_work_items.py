@@ -0,0 +1,79 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_existing_run_status(apps, schema_editor):
+    """Старые запуски не продолжаются: завершенные — completed, оборванные — failed"""
+    NewsDiscoveryRun = apps.get_model('news', 'NewsDiscoveryRun')
+    NewsDiscoveryRun.objects.filter(finished_at__isnull=False).update(status='completed')
+    NewsDiscoveryRun.objects.filter(finished_at__isnull=True).update(status='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('references', '0007_add_language_to_newsresource'),
+        ('news', '0022_discovery_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryjob',
+            name='discovery_run',
+            field=models.ForeignKey(blank=True, help_text='Запуск задания: при повторной попытке он продолжается, а не начинается заново', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='news.newsdiscoveryrun', verbose_name='Discovery Run'),
+        ),
+        migrations.AddField(
+            model_name='newsdiscoveryrun',
+            name='params',
+            field=models.JSONField(blank=True, default=dict, help_text='Параметры прохода для продолжения: provider, last_search_date', verbose_name='Params'),
+        ),
+        migrations.AddField(
+            model_name='newsdiscoveryrun',
+            name='search_type',
+            field=models.CharField(blank=True, choices=[('resources', 'Resources'), ('manufacturers', 'Manufacturers')], default='', help_text='Источники или производители (пусто — запуск без списка целей)', max_length=20, verbose_name='Search Type'),
+        ),
+        migrations.AddField(
+            model_name='newsdiscoveryrun',
+            name='status',
+            field=models.CharField(choices=[('running', 'Выполняется'), ('completed', 'Завершен'), ('failed', 'Ошибка'), ('cancelled', 'Отменен')], default='running', help_text='Прерванный (running без воркера), отмененный или упавший запуск можно продолжить', max_length=20, verbose_name='Status'),
+        ),
+        migrations.AlterField(
+            model_name='discoveryjob',
+            name='job_type',
+            field=models.CharField(choices=[('resources', 'Источники'), ('resource', 'Один источник'), ('manufacturers', 'Производители'), ('resume', 'Продолжение запуска')], help_text='Что искать: источники (все или выбранные), один источник, производители или продолжение прерванного запуска', max_length=20, verbose_name='Job Type'),
+        ),
+        migrations.CreateModel(
+            name='DiscoveryWorkItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('in_flight', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Status')),
+                ('attempts', models.IntegerField(default=0, help_text='Сколько раз цель отправлялась в обработку', verbose_name='Attempts')),
+                ('provider', models.CharField(blank=True, default='', help_text='Провайдер, вернувший ответ', max_length=20, verbose_name='Provider')),
+                ('news_created', models.IntegerField(default=0, verbose_name='News Created')),
+                ('errors', models.IntegerField(default=0, verbose_name='Errors')),
+                ('error_message', models.TextField(blank=True, default='', verbose_name='Error Message')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+                ('discovery_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='work_items', to='news.newsdiscoveryrun', verbose_name='Discovery Run')),
+                ('manufacturer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='discovery_work_items', to='references.manufacturer', verbose_name='Manufacturer')),
+                ('resource', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='discovery_work_items', to='references.newsresource', verbose_name='Resource')),
+            ],
+            options={
+                'verbose_name': 'Discovery Work Item',
+                'verbose_name_plural': 'Discovery Work Items',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['discovery_run', 'status'], name='news_discov_discove_88c83a_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='discoveryworkitem',
+            constraint=models.UniqueConstraint(fields=('discovery_run', 'resource'), name='unique_work_item_resource'),
+        ),
+        migrations.AddConstraint(
+            model_name='discoveryworkitem',
+            constraint=models.UniqueConstraint(fields=('discovery_run', 'manufacturer'), name='unique_work_item_manufacturer'),
+        ),
+        migrations.RunPython(set_existing_run_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:28
+
+from django.db import migrations, models
+
+
+def backfill_dedup_keys(apps, schema_editor):
+    """
+    Ключи дедупликации для уже найденных новостей. URL сайтов источников и производителей
+    хеш не получает: такой URL общий для всех новостей сайта, а не ссылка на статью.
+    """
+    from news import dedup
+
+    NewsPost = apps.get_model('news', 'NewsPost')
+    NewsResource = apps.get_model('references', 'NewsResource')
+    Manufacturer = apps.get_model('references', 'Manufacturer')
+
+    site_hashes = {dedup.url_hash(url) for url in NewsResource.objects.values_list('url', flat=True)}
+    for websites in Manufacturer.objects.values_list('website_1', 'website_2', 'website_3'):
+        site_hashes.update(dedup.url_hash(url) for url in websites)
+
+    batch = []
+    posts = NewsPost.objects.filter(is_no_news_found=False).exclude(title__startswith='Ошибка при поиске новостей')
+    for post in posts.only('id', 'title', 'source_url').iterator(chunk_size=500):
+        source_url_hash = dedup.url_hash(post.source_url)
+        post.source_url_hash = '' if source_url_hash in site_hashes else source_url_hash
+        post.title_fingerprint = dedup.title_fingerprint(post.title)
+        batch.append(post)
+        if len(batch) >= 500:
+            NewsPost.objects.bulk_update(batch, ['source_url_hash', 'title_fingerprint'])
+            batch = []
+    if batch:
+        NewsPost.objects.bulk_update(batch, ['source_url_hash', 'title_fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('references', '0008_search_watermark'),
+        ('news', '0023_discovery_work_items'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryworkitem',
+            name='duplicates',
+            field=models.IntegerField(default=0, help_text='Новости из ответа, уже сохраненные ранее (не созданы)', verbose_name='Duplicates'),
+        ),
+        migrations.AddField(
+            model_name='newspost',
+            name='source_url_hash',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='SHA-256 канонического URL статьи (пусто, если ссылки на статью нет)', max_length=64, verbose_name='Source URL Hash'),
+        ),
+        migrations.AddField(
+            model_name='newspost',
+            name='title_fingerprint',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='SHA-256 нормализованного заголовка на момент создания', max_length=64, verbose_name='Title Fingerprint'),
+        ),
+        migrations.RunPython(backfill_dedup_keys, migrations.RunPython.noop),
+    ]
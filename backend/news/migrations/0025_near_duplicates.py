@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0024_news_dedup_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newspost',
+            name='near_duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Представитель группы похожих новостей (тот же сюжет из другого источника)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='near_duplicates', to='news.newspost', verbose_name='Near Duplicate Of'),
+        ),
+        migrations.AddField(
+            model_name='newspost',
+            name='near_duplicate_score',
+            field=models.FloatField(blank=True, help_text='Оценка сходства с новостью группы (0-1)', null=True, verbose_name='Near Duplicate Score'),
+        ),
+        migrations.CreateModel(
+            name='NewsSignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minhash', models.JSONField(verbose_name='MinHash')),
+                ('created_at', models.DateTimeField(db_index=True, verbose_name='Created At')),
+                ('news_post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='signature', to='news.newspost', verbose_name='News Post')),
+            ],
+            options={
+                'verbose_name': 'News Signature',
+                'verbose_name_plural': 'News Signatures',
+            },
+        ),
+        migrations.CreateModel(
+            name='NewsSignatureBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.SmallIntegerField(verbose_name='Band')),
+                ('bucket', models.BigIntegerField(verbose_name='Bucket')),
+                ('signature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='news.newssignature', verbose_name='Signature')),
+            ],
+            options={
+                'verbose_name': 'News Signature Band',
+                'verbose_name_plural': 'News Signature Bands',
+                'indexes': [models.Index(fields=['band', 'bucket'], name='news_newssi_band_2f3631_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('references', '0008_search_watermark'),
+        ('news', '0025_near_duplicates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='response_cache_ttl_hours',
+            field=models.PositiveIntegerField(default=24, help_text='Одинаковый запрос (провайдер, модель, промпт, период) в течение этого времени получает сохраненный ответ без обращения к провайдеру. 0 = не использовать кэш', verbose_name='Response Cache TTL (hours)'),
+        ),
+        migrations.CreateModel(
+            name='DiscoveryRawResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(help_text='SHA-256 от провайдера, модели, промпта и периода поиска', max_length=64, verbose_name='Cache Key')),
+                ('provider', models.CharField(max_length=20, verbose_name='Provider')),
+                ('model', models.CharField(max_length=50, verbose_name='Model')),
+                ('search_start', models.DateField(blank=True, null=True, verbose_name='Search Start')),
+                ('search_end', models.DateField(blank=True, null=True, verbose_name='Search End')),
+                ('content', models.BinaryField(help_text='Текст ответа, сжатый алгоритмом compression', verbose_name='Content')),
+                ('compression', models.CharField(choices=[('zlib', 'zlib')], default='zlib', max_length=10, verbose_name='Compression')),
+                ('raw_size', models.PositiveIntegerField(default=0, help_text='Размер ответа до сжатия, байт', verbose_name='Raw Size')),
+                ('parsed', models.BooleanField(default=False, help_text='Ответ разобран без ошибок; в кэш попадают только такие ответы', verbose_name='Parsed')),
+                ('news_count', models.IntegerField(default=0, verbose_name='News Count')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Created At')),
+                ('manufacturer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='raw_responses', to='references.manufacturer', verbose_name='Manufacturer')),
+                ('resource', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='raw_responses', to='references.newsresource', verbose_name='Resource')),
+            ],
+            options={
+                'verbose_name': 'Discovery Raw Response',
+                'verbose_name_plural': 'Discovery Raw Responses',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='discoveryapicall',
+            name='raw_response',
+            field=models.ForeignKey(blank=True, help_text='Сохраненный ответ провайдера (news/response_archive.py)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='api_calls', to='news.discoveryrawresponse', verbose_name='Raw Response'),
+        ),
+        migrations.AddIndex(
+            model_name='discoveryrawresponse',
+            index=models.Index(fields=['cache_key', '-created_at'], name='news_discov_cache_k_7fd183_idx'),
+        ),
+    ]
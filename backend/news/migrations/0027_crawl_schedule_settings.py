@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0026_raw_response_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='scheduling',
+            field=models.JSONField(blank=True, default=dict, help_text="Переопределение настроек расписания поиска: {'enabled': true, 'base_interval_hours': 24, 'min_interval_hours': 12, 'max_interval_hours': 336, 'backoff_factor': 2, 'promote_news_per_search': 3, 'promote_news_last_30_days': 10, 'due_slack_hours': 6}", verbose_name='Scheduling'),
+        ),
+    ]
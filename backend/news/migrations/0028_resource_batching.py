@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0027_crawl_schedule_settings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryapicall',
+            name='batch_size',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Источников в пакетном запросе: запрос записан долями по источникам, токены и стоимость каждой записи — 1/batch_size запроса', verbose_name='Batch Size'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='batching',
+            field=models.JSONField(blank=True, default=dict, help_text="Пакетные запросы по источникам (только execution_mode = threads): {'enabled': false, 'max_batch_size': 5, 'languages': ['en'], 'max_ranking_score': 20}", verbose_name='Batching'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0028_resource_batching'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsdiscoverystatus',
+            name='streamed_news_count',
+            field=models.IntegerField(default=0, help_text='Новостей, созданных по ходу потоковых ответов LLM (до завершения запроса)', verbose_name='Streamed News Count'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='stream_responses',
+            field=models.BooleanField(default=False, help_text='Получать ответы Grok и Anthropic потоком и создавать каждую новость сразу, как только она пришла целиком (пакетные запросы и режим async — без потока)', verbose_name='Stream Responses'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0029_streaming_responses'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryworkitem',
+            name='unchanged',
+            field=models.BooleanField(default=False, help_text='Сайт не изменился с прошлой проверки — запрос к LLM не выполнялся', verbose_name='Unchanged'),
+        ),
+        migrations.AddField(
+            model_name='newsdiscoveryrun',
+            name='resources_unchanged',
+            field=models.IntegerField(default=0, help_text='Источников без изменений на сайте: запрос к LLM не выполнялся', verbose_name='Resources Unchanged'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='change_detection',
+            field=models.JSONField(blank=True, default=dict, help_text="Проверка изменений сайта перед поиском (news/change_detection.py): {'enabled': false, 'timeout_seconds': 5, 'max_workers': 32, 'check_sitemap': true, 'max_unchanged_days': 14}", verbose_name='Change Detection'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('references', '0011_feeds'),
+        ('news', '0030_change_detection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='feeds',
+            field=models.JSONField(blank=True, default=dict, help_text="Опрос RSS/Atom лент (news/feeds.py): {'timeout_seconds': 10, 'max_workers': 32, 'max_items_per_poll': 30, 'summarize': true, 'summary_batch_size': 10}", verbose_name='Feeds'),
+        ),
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('guid_hash', models.CharField(help_text='SHA-256 от guid/id записи (или ссылки, если guid нет)', max_length=64, verbose_name='GUID Hash')),
+                ('guid', models.TextField(verbose_name='GUID')),
+                ('link', models.URLField(blank=True, max_length=1000, verbose_name='Link')),
+                ('published_at', models.DateTimeField(blank=True, null=True, verbose_name='Published At')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Created At')),
+                ('news_post', models.ForeignKey(blank=True, help_text='Созданная новость; пусто — запись пропущена (старая или дубликат)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='feed_entries', to='news.newspost', verbose_name='News Post')),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='references.newsresource', verbose_name='Resource')),
+            ],
+            options={
+                'verbose_name': 'Feed Entry',
+                'verbose_name_plural': 'Feed Entries',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('resource', 'guid_hash'), name='unique_feed_entry_guid'),
+        ),
+    ]
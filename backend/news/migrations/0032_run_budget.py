@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0031_feeds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsdiscoveryrun',
+            name='budget_mode',
+            field=models.CharField(blank=True, default='', help_text='soft — после бюджета только самый дешевый провайдер, hard — остановка', max_length=10, verbose_name='Budget Mode'),
+        ),
+        migrations.AddField(
+            model_name='newsdiscoveryrun',
+            name='budget_status',
+            field=models.CharField(blank=True, default='', help_text='ok, downgraded — дешевые провайдеры первыми, exhausted — бюджет исчерпан', max_length=20, verbose_name='Budget Status'),
+        ),
+        migrations.AddField(
+            model_name='newsdiscoveryrun',
+            name='budget_usd',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='Бюджет запуска (SearchConfiguration.budget); пусто — без бюджета', max_digits=10, null=True, verbose_name='Budget (USD)'),
+        ),
+        migrations.AddField(
+            model_name='newsdiscoveryrun',
+            name='planned_cost_usd',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='Оценка стоимости прохода по истории перед его началом', max_digits=10, null=True, verbose_name='Planned Cost (USD)'),
+        ),
+        migrations.AddField(
+            model_name='newsdiscoveryrun',
+            name='targets_over_budget',
+            field=models.IntegerField(default=0, help_text='Целей, не начатых из-за исчерпанного бюджета (остались в очереди запуска)', verbose_name='Targets Over Budget'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='budget',
+            field=models.JSONField(blank=True, default=dict, help_text="Бюджет запуска (news/budget.py): {'limit_usd': 0, 'mode': 'soft', 'downgrade_at': 0.8, 'history_days': 30}. limit_usd = 0 — без бюджета; soft — после бюджета только самый дешевый провайдер, hard — новые цели не начинаются", verbose_name='Budget'),
+        ),
+        migrations.AlterField(
+            model_name='newsdiscoveryrun',
+            name='status',
+            field=models.CharField(choices=[('running', 'Выполняется'), ('completed', 'Завершен'), ('failed', 'Ошибка'), ('cancelled', 'Отменен'), ('budget_exhausted', 'Остановлен: бюджет исчерпан')], default='running', help_text='Прерванный (running без воркера), отмененный или упавший запуск можно продолжить', max_length=20, verbose_name='Status'),
+        ),
+    ]
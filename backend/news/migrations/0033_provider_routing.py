@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0032_run_budget'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='routing',
+            field=models.JSONField(blank=True, default=dict, help_text="Порядок провайдеров цели по ее истории (news/routing.py): {'enabled': true, 'history_days': 60, 'min_calls': 3, 'exploration_rate': 0.1, 'latency_half_seconds': 120}", verbose_name='Routing'),
+        ),
+    ]
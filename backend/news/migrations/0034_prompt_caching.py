@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0033_provider_routing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryapicall',
+            name='cache_write_tokens',
+            field=models.IntegerField(default=0, help_text='Входные токены, записанные в кэш промпта — Anthropic (входят в input_tokens)', verbose_name='Cache Write Tokens'),
+        ),
+        migrations.AddField(
+            model_name='discoveryapicall',
+            name='cached_input_tokens',
+            field=models.IntegerField(default=0, help_text='Входные токены, прочитанные из кэша промпта (входят в input_tokens)', verbose_name='Cached Input Tokens'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='anthropic_cache_write_price',
+            field=models.DecimalField(decimal_places=4, default=1.0, help_text='Цена за 1М входных токенов Anthropic, записанных в кэш промпта, в USD', max_digits=10, verbose_name='Anthropic Cache Write Price (per 1M tokens)'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='anthropic_cached_input_price',
+            field=models.DecimalField(decimal_places=4, default=0.08, help_text='Цена за 1М входных токенов Anthropic, прочитанных из кэша промпта, в USD', max_digits=10, verbose_name='Anthropic Cached Input Price (per 1M tokens)'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='gemini_cached_input_price',
+            field=models.DecimalField(decimal_places=4, default=0.0188, help_text='Цена за 1М входных токенов Gemini, прочитанных из кэша промпта, в USD', max_digits=10, verbose_name='Gemini Cached Input Price (per 1M tokens)'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='grok_cached_input_price',
+            field=models.DecimalField(decimal_places=4, default=0.75, help_text='Цена за 1М входных токенов Grok, прочитанных из кэша промпта, в USD', max_digits=10, verbose_name='Grok Cached Input Price (per 1M tokens)'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='openai_cached_input_price',
+            field=models.DecimalField(decimal_places=4, default=1.25, help_text='Цена за 1М входных токенов OpenAI, прочитанных из кэша промпта, в USD', max_digits=10, verbose_name='OpenAI Cached Input Price (per 1M tokens)'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='prompt_caching',
+            field=models.BooleanField(default=True, help_text='Кэширование постоянного начала запроса у провайдеров (news/prompt_cache.py): cache_control у Anthropic, x-grok-conv-id у xAI', verbose_name='Prompt Caching'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0034_prompt_caching'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryapicall',
+            name='parse_failed',
+            field=models.BooleanField(default=False, help_text='Ответ получен, но не разобран как JSON с новостями (или не по схеме)', verbose_name='Parse Failed'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='structured_output',
+            field=models.BooleanField(default=False, help_text='Ответ по JSON-схеме штатным механизмом провайдера (news/structured_output.py): без описания формата в промпте; ответ не по схеме — ошибка провайдера', verbose_name='Structured Output'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0035_structured_output'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryapicall',
+            name='max_output_tokens',
+            field=models.PositiveIntegerField(default=0, help_text='Лимит выходных токенов запроса по max_news_per_resource (news/output_cap.py); 0 — без лимита', verbose_name='Max Output Tokens'),
+        ),
+        migrations.AddField(
+            model_name='discoveryapicall',
+            name='output_tokens_saved',
+            field=models.IntegerField(default=0, help_text='Оценка экономии лимита: средние выходные токены цели в вызовах без лимита минус выходные токены вызова', verbose_name='Output Tokens Saved'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='output_cap',
+            field=models.JSONField(blank=True, default=dict, help_text="Лимит выходных токенов по max_news_per_resource (news/output_cap.py): {'enabled': true, 'tokens_per_item': 300, 'margin': 1.5, 'overhead_tokens': 800, 'min_output_tokens': 1024, 'history_days': 30, 'baseline_days': 180}", verbose_name='Output Cap'),
+        ),
+        migrations.AlterField(
+            model_name='searchconfiguration',
+            name='max_news_per_resource',
+            field=models.IntegerField(default=10, help_text='Максимум новостей с одного источника за один поиск: промпт, лимит выходных токенов, отбрасывание лишних (news/output_cap.py)', verbose_name='Max News Per Resource'),
+        ),
+    ]
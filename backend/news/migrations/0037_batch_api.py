@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0036_output_cap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryapicall',
+            name='batch_api',
+            field=models.BooleanField(default=False, help_text='Запрос из пакетного задания провайдера (DiscoveryBatchJob): цена со скидкой, duration_ms — от отправки задания до получения результатов', verbose_name='Batch API'),
+        ),
+        migrations.AddField(
+            model_name='searchconfiguration',
+            name='batch_api',
+            field=models.JSONField(blank=True, default=dict, help_text="Пакетные задания провайдера (execution_mode = batch_api, news/batch_api.py): {'provider': '', 'max_requests_per_job': 1000, 'poll_interval_seconds': 300, 'price_factor': 0.5, 'base_urls': {}}. provider пусто — первый из цепочки, поддерживающий Batch API", verbose_name='Batch API'),
+        ),
+        migrations.AlterField(
+            model_name='discoveryjob',
+            name='job_type',
+            field=models.CharField(choices=[('resources', 'Источники'), ('resource', 'Один источник'), ('manufacturers', 'Производители'), ('resume', 'Продолжение запуска'), ('batch_poll', 'Результаты пакетных заданий провайдера')], help_text='Что искать: источники (все или выбранные), один источник, производители, продолжение прерванного запуска или результаты пакетных заданий провайдера (batch_poll)', max_length=20, verbose_name='Job Type'),
+        ),
+        migrations.AlterField(
+            model_name='searchconfiguration',
+            name='execution_mode',
+            field=models.CharField(choices=[('threads', 'Threads (пул потоков, синхронные клиенты)'), ('async', 'Async (asyncio, асинхронные клиенты)'), ('batch_api', 'Batch API (пакетные задания OpenAI/Anthropic: дешевле, ответ до 24 ч)')], default='threads', help_text='Async: запросы через asyncio-клиенты, max_workers = число одновременных запросов (можно десятки). Batch API: все запросы прохода — пакетными заданиями провайдера, результаты забирает воркер', max_length=20, verbose_name='Execution Mode'),
+        ),
+        migrations.CreateModel(
+            name='DiscoveryBatchJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=20, verbose_name='Provider')),
+                ('model', models.CharField(max_length=100, verbose_name='Model')),
+                ('external_id', models.CharField(blank=True, default='', help_text='ID пакетного задания у провайдера', max_length=255, verbose_name='External ID')),
+                ('status', models.CharField(choices=[('submitted', 'Отправлено'), ('ended', 'Результаты получены'), ('failed', 'Ошибка')], default='submitted', max_length=20, verbose_name='Status')),
+                ('requests', models.JSONField(default=dict, help_text='Запросы задания: {custom_id: {target_id, prompt, start_date, end_date}}', verbose_name='Requests')),
+                ('request_count', models.IntegerField(default=0, verbose_name='Request Count')),
+                ('succeeded', models.IntegerField(default=0, verbose_name='Succeeded')),
+                ('errored', models.IntegerField(default=0, help_text='Запросов с ошибкой провайдера или без результата', verbose_name='Errored')),
+                ('polls', models.IntegerField(default=0, help_text='Сколько раз воркер проверял задание', verbose_name='Polls')),
+                ('error_message', models.TextField(blank=True, default='', verbose_name='Error Message')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('ended_at', models.DateTimeField(blank=True, null=True, verbose_name='Ended At')),
+                ('discovery_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batch_jobs', to='news.newsdiscoveryrun', verbose_name='Discovery Run')),
+            ],
+            options={
+                'verbose_name': 'Discovery Batch Job',
+                'verbose_name_plural': 'Discovery Batch Jobs',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['discovery_run', 'status'], name='news_discov_discove_9e7296_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0037_batch_api'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='discoveryjob',
+            name='job_type',
+            field=models.CharField(choices=[('resources', 'Источники'), ('resource', 'Один источник'), ('manufacturers', 'Производители'), ('resume', 'Продолжение запуска'), ('batch_poll', 'Результаты пакетных заданий провайдера'), ('feed_discovery', 'Поиск RSS/Atom лент')], help_text='Что искать: источники (все или выбранные), один источник, производители, продолжение прерванного запуска, результаты пакетных заданий провайдера (batch_poll) или поиск RSS/Atom лент источников (feed_discovery)', max_length=20, verbose_name='Job Type'),
+        ),
+    ]
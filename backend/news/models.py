@@ -1,4 +1,7 @@
-from django.db import models
+from datetime import timedelta
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import F
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.core.files.storage import default_storage
@@ -51,6 +54,39 @@ class NewsPost(models.Model):
         default=False,
         help_text=_("Пометка для записей 'новостей не найдено'. Используется для фильтрации и массового удаления на фронтенде.")
     )
+    # Ключи дедупликации найденных новостей (см. news/dedup.py)
+    source_url_hash = models.CharField(
+        _("Source URL Hash"),
+        max_length=64,
+        blank=True,
+        default='',
+        db_index=True,
+        help_text=_("SHA-256 канонического URL статьи (пусто, если ссылки на статью нет)")
+    )
+    title_fingerprint = models.CharField(
+        _("Title Fingerprint"),
+        max_length=64,
+        blank=True,
+        default='',
+        db_index=True,
+        help_text=_("SHA-256 нормализованного заголовка на момент создания")
+    )
+    # Группа похожих новостей (см. news/near_duplicates.py)
+    near_duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='near_duplicates',
+        verbose_name=_("Near Duplicate Of"),
+        help_text=_("Представитель группы похожих новостей (тот же сюжет из другого источника)")
+    )
+    near_duplicate_score = models.FloatField(
+        _("Near Duplicate Score"),
+        null=True,
+        blank=True,
+        help_text=_("Оценка сходства с новостью группы (0-1)")
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -77,6 +113,46 @@ class NewsPost(models.Model):
             self.pub_date <= timezone.now()
         )
 
+
+class NewsSignature(models.Model):
+    """MinHash-сигнатура текста новости для поиска почти-дубликатов"""
+    news_post = models.OneToOneField(
+        NewsPost,
+        on_delete=models.CASCADE,
+        related_name='signature',
+        verbose_name=_("News Post")
+    )
+    minhash = models.JSONField(_("MinHash"))
+    # Копия NewsPost.created_at: окно поиска без join
+    created_at = models.DateTimeField(_("Created At"), db_index=True)
+    
+    class Meta:
+        verbose_name = _("News Signature")
+        verbose_name_plural = _("News Signatures")
+    
+    def __str__(self):
+        return f"Signature of news post {self.news_post_id}"
+
+
+class NewsSignatureBand(models.Model):
+    """LSH-полоса сигнатуры: новости с одинаковым (band, bucket) — кандидаты в почти-дубликаты"""
+    signature = models.ForeignKey(
+        NewsSignature,
+        on_delete=models.CASCADE,
+        related_name='bands',
+        verbose_name=_("Signature")
+    )
+    band = models.SmallIntegerField(_("Band"))
+    bucket = models.BigIntegerField(_("Bucket"))
+    
+    class Meta:
+        verbose_name = _("News Signature Band")
+        verbose_name_plural = _("News Signature Bands")
+        indexes = [
+            models.Index(fields=['band', 'bucket']),
+        ]
+
+
 class NewsMedia(models.Model):
     """
     Модель для хранения медиа-файлов, привязанных к новости.
@@ -175,6 +251,22 @@ class SearchConfiguration(models.Model):
         ('high', 'High (максимальный контекст, дороже)'),
     ]
     
+    RATE_LIMIT_BACKEND_LOCAL = 'local'
+    RATE_LIMIT_BACKEND_DATABASE = 'database'
+    RATE_LIMIT_BACKEND_CHOICES = [
+        (RATE_LIMIT_BACKEND_LOCAL, 'Local (в памяти процесса)'),
+        (RATE_LIMIT_BACKEND_DATABASE, 'Database (общий лимит для всех воркеров)'),
+    ]
+    
+    EXECUTION_MODE_THREADS = 'threads'
+    EXECUTION_MODE_ASYNC = 'async'
+    EXECUTION_MODE_BATCH_API = 'batch_api'
+    EXECUTION_MODE_CHOICES = [
+        (EXECUTION_MODE_THREADS, 'Threads (пул потоков, синхронные клиенты)'),
+        (EXECUTION_MODE_ASYNC, 'Async (asyncio, асинхронные клиенты)'),
+        (EXECUTION_MODE_BATCH_API, 'Batch API (пакетные задания OpenAI/Anthropic: дешевле, ответ до 24 ч)'),
+    ]
+    
     name = models.CharField(
         _("Configuration Name"),
         max_length=100,
@@ -201,6 +293,13 @@ class SearchConfiguration(models.Model):
         blank=True,
         help_text=_("Цепочка резервных провайдеров: ['anthropic', 'gemini', 'openai']")
     )
+    routing = models.JSONField(
+        _("Routing"),
+        default=dict,
+        blank=True,
+        help_text=_("Порядок провайдеров цели по ее истории (news/routing.py): {'enabled': true, 'history_days': 60, "
+                    "'min_calls': 3, 'exploration_rate': 0.1, 'latency_half_seconds': 120}")
+    )
     
     # LLM параметры
     temperature = models.FloatField(
@@ -213,6 +312,25 @@ class SearchConfiguration(models.Model):
         default=120,
         help_text=_("Таймаут запроса к LLM в секундах")
     )
+    stream_responses = models.BooleanField(
+        _("Stream Responses"),
+        default=False,
+        help_text=_("Получать ответы Grok и Anthropic потоком и создавать каждую новость сразу, "
+                    "как только она пришла целиком (пакетные запросы и режим async — без потока)")
+    )
+    
+    prompt_caching = models.BooleanField(
+        _("Prompt Caching"),
+        default=True,
+        help_text=_("Кэширование постоянного начала запроса у провайдеров (news/prompt_cache.py): "
+                    "cache_control у Anthropic, x-grok-conv-id у xAI")
+    )
+    structured_output = models.BooleanField(
+        _("Structured Output"),
+        default=False,
+        help_text=_("Ответ по JSON-схеме штатным механизмом провайдера (news/structured_output.py): "
+                    "без описания формата в промпте; ответ не по схеме — ошибка провайдера")
+    )
     
     # Grok web search параметры
     max_search_results = models.IntegerField(
@@ -258,12 +376,140 @@ class SearchConfiguration(models.Model):
     max_news_per_resource = models.IntegerField(
         _("Max News Per Resource"),
         default=10,
-        help_text=_("Максимум новостей с одного источника за один поиск")
+        help_text=_("Максимум новостей с одного источника за один поиск: промпт, лимит выходных токенов, "
+                    "отбрасывание лишних (news/output_cap.py)")
+    )
+    output_cap = models.JSONField(
+        _("Output Cap"),
+        default=dict,
+        blank=True,
+        help_text=_("Лимит выходных токенов по max_news_per_resource (news/output_cap.py): {'enabled': true, "
+                    "'tokens_per_item': 300, 'margin': 1.5, 'overhead_tokens': 800, 'min_output_tokens': 1024, "
+                    "'history_days': 30, 'baseline_days': 180}")
     )
     delay_between_requests = models.FloatField(
         _("Delay Between Requests (seconds)"),
         default=0.5,
-        help_text=_("Задержка между запросами к API в секундах")
+        help_text=_("Минимальный интервал между запросами к одному провайдеру в секундах")
+    )
+    
+    # Параллельность поиска
+    max_workers = models.PositiveIntegerField(
+        _("Max Workers"),
+        default=1,
+        help_text=_("Количество источников, обрабатываемых параллельно (1 = последовательно)")
+    )
+    provider_concurrency = models.JSONField(
+        _("Provider Concurrency"),
+        default=dict,
+        blank=True,
+        help_text=_("Лимит одновременных запросов к провайдеру: {'grok': 8, 'anthropic': 2}. Пустой {} = без лимита")
+    )
+    execution_mode = models.CharField(
+        _("Execution Mode"),
+        max_length=20,
+        choices=EXECUTION_MODE_CHOICES,
+        default=EXECUTION_MODE_THREADS,
+        help_text=_("Async: запросы через asyncio-клиенты, max_workers = число одновременных запросов (можно десятки). "
+                    "Batch API: все запросы прохода — пакетными заданиями провайдера, результаты забирает воркер")
+    )
+    batch_api = models.JSONField(
+        _("Batch API"),
+        default=dict,
+        blank=True,
+        help_text=_("Пакетные задания провайдера (execution_mode = batch_api, news/batch_api.py): {'provider': '', "
+                    "'max_requests_per_job': 1000, 'poll_interval_seconds': 300, 'price_factor': 0.5, "
+                    "'base_urls': {}}. provider пусто — первый из цепочки, поддерживающий Batch API")
+    )
+    
+    # Ограничение частоты запросов к провайдерам (token bucket)
+    rate_limits = models.JSONField(
+        _("Rate Limits"),
+        default=dict,
+        blank=True,
+        help_text=_("Лимиты по провайдерам: {'grok': {'rpm': 60, 'tpm': 400000}}. rpm — запросов в минуту, "
+                    "tpm — токенов в минуту, 0 или отсутствие ключа = без лимита")
+    )
+    rate_limit_backend = models.CharField(
+        _("Rate Limit Backend"),
+        max_length=20,
+        choices=RATE_LIMIT_BACKEND_CHOICES,
+        default=RATE_LIMIT_BACKEND_DATABASE,
+        help_text=_("Где хранится состояние лимитов: Database — общий бюджет для всех процессов gunicorn")
+    )
+    
+    # Circuit breaker провайдеров в цепочке auto (в пределах одного запуска)
+    circuit_breaker = models.JSONField(
+        _("Circuit Breaker"),
+        default=dict,
+        blank=True,
+        help_text=_("Переопределение настроек circuit breaker режима auto: {'window': 10, 'min_calls': 3, "
+                    "'failure_rate': 0.5, 'slow_call_ratio': 0.8, 'cooldown_seconds': 300, 'enabled': true}")
+    )
+    
+    # Хеджирование медленных запросов в цепочке auto
+    hedging = models.JSONField(
+        _("Hedging"),
+        default=dict,
+        blank=True,
+        help_text=_("Параллельный запрос к следующему провайдеру, если основной не ответил за перцентиль "
+                    "duration_ms: {'enabled': false, 'percentile': 90, 'history': 200, 'min_samples': 20, "
+                    "'default_delay_seconds': 30, 'min_delay_seconds': 5}")
+    )
+    
+    # Адаптивное расписание: полный проход берет только цели, которым пора искать
+    scheduling = models.JSONField(
+        _("Scheduling"),
+        default=dict,
+        blank=True,
+        help_text=_("Переопределение настроек расписания поиска: {'enabled': true, 'base_interval_hours': 24, "
+                    "'min_interval_hours': 12, 'max_interval_hours': 336, 'backoff_factor': 2, "
+                    "'promote_news_per_search': 3, 'promote_news_last_30_days': 10, 'due_slack_hours': 6}")
+    )
+    
+    # Несколько малопродуктивных источников одного языка и раздела — одним запросом
+    batching = models.JSONField(
+        _("Batching"),
+        default=dict,
+        blank=True,
+        help_text=_("Пакетные запросы по источникам (только execution_mode = threads): {'enabled': false, "
+                    "'max_batch_size': 5, 'languages': ['en'], 'max_ranking_score': 20}")
+    )
+    
+    # Условный GET страницы источника перед запросом к LLM
+    change_detection = models.JSONField(
+        _("Change Detection"),
+        default=dict,
+        blank=True,
+        help_text=_("Проверка изменений сайта перед поиском (news/change_detection.py): {'enabled': false, "
+                    "'timeout_seconds': 5, 'max_workers': 32, 'check_sitemap': true, 'max_unchanged_days': 14}")
+    )
+    
+    # Источники с RSS/Atom лентой (source_type = feed) читаются без поиска LLM
+    feeds = models.JSONField(
+        _("Feeds"),
+        default=dict,
+        blank=True,
+        help_text=_("Опрос RSS/Atom лент (news/feeds.py): {'timeout_seconds': 10, 'max_workers': 32, "
+                    "'max_items_per_poll': 30, 'summarize': true, 'summary_batch_size': 10}")
+    )
+    
+    # Ограничение расходов одного запуска
+    budget = models.JSONField(
+        _("Budget"),
+        default=dict,
+        blank=True,
+        help_text=_("Бюджет запуска (news/budget.py): {'limit_usd': 0, 'mode': 'soft', 'downgrade_at': 0.8, "
+                    "'history_days': 30}. limit_usd = 0 — без бюджета; soft — после бюджета только самый "
+                    "дешевый провайдер, hard — новые цели не начинаются")
+    )
+    
+    # Повтор одинакового запроса отвечается из архива сырых ответов
+    response_cache_ttl_hours = models.PositiveIntegerField(
+        _("Response Cache TTL (hours)"),
+        default=24,
+        help_text=_("Одинаковый запрос (провайдер, модель, промпт, период) в течение этого времени "
+                    "получает сохраненный ответ без обращения к провайдеру. 0 = не использовать кэш")
     )
     
     # Тарифы для расчёта стоимости (цена за 1М токенов в USD)
@@ -274,6 +520,13 @@ class SearchConfiguration(models.Model):
         default=3.0,
         help_text=_("Цена за 1М входных токенов Grok в USD")
     )
+    grok_cached_input_price = models.DecimalField(
+        _("Grok Cached Input Price (per 1M tokens)"),
+        max_digits=10,
+        decimal_places=4,
+        default=0.75,
+        help_text=_("Цена за 1М входных токенов Grok, прочитанных из кэша промпта, в USD")
+    )
     grok_output_price = models.DecimalField(
         _("Grok Output Price (per 1M tokens)"),
         max_digits=10,
@@ -288,6 +541,20 @@ class SearchConfiguration(models.Model):
         default=0.80,
         help_text=_("Цена за 1М входных токенов Anthropic в USD")
     )
+    anthropic_cached_input_price = models.DecimalField(
+        _("Anthropic Cached Input Price (per 1M tokens)"),
+        max_digits=10,
+        decimal_places=4,
+        default=0.08,
+        help_text=_("Цена за 1М входных токенов Anthropic, прочитанных из кэша промпта, в USD")
+    )
+    anthropic_cache_write_price = models.DecimalField(
+        _("Anthropic Cache Write Price (per 1M tokens)"),
+        max_digits=10,
+        decimal_places=4,
+        default=1.0,
+        help_text=_("Цена за 1М входных токенов Anthropic, записанных в кэш промпта, в USD")
+    )
     anthropic_output_price = models.DecimalField(
         _("Anthropic Output Price (per 1M tokens)"),
         max_digits=10,
@@ -302,6 +569,13 @@ class SearchConfiguration(models.Model):
         default=0.075,
         help_text=_("Цена за 1М входных токенов Gemini в USD")
     )
+    gemini_cached_input_price = models.DecimalField(
+        _("Gemini Cached Input Price (per 1M tokens)"),
+        max_digits=10,
+        decimal_places=4,
+        default=0.0188,
+        help_text=_("Цена за 1М входных токенов Gemini, прочитанных из кэша промпта, в USD")
+    )
     gemini_output_price = models.DecimalField(
         _("Gemini Output Price (per 1M tokens)"),
         max_digits=10,
@@ -316,6 +590,13 @@ class SearchConfiguration(models.Model):
         default=2.50,
         help_text=_("Цена за 1М входных токенов OpenAI в USD")
     )
+    openai_cached_input_price = models.DecimalField(
+        _("OpenAI Cached Input Price (per 1M tokens)"),
+        max_digits=10,
+        decimal_places=4,
+        default=1.25,
+        help_text=_("Цена за 1М входных токенов OpenAI, прочитанных из кэша промпта, в USD")
+    )
     openai_output_price = models.DecimalField(
         _("OpenAI Output Price (per 1M tokens)"),
         max_digits=10,
@@ -363,10 +644,10 @@ class SearchConfiguration(models.Model):
                 config = cls.objects.create(name="default", is_active=True)
         return config
     
-    def get_price(self, provider: str, token_type: str) -> float:
-        """Возвращает цену за 1М токенов для провайдера"""
-        field_name = f"{provider}_{token_type}_price"
-        return float(getattr(self, field_name, 0))
+    def get_price(self, provider: str, token_type: str, default: float = 0.0) -> float:
+        """Возвращает цену за 1М токенов для провайдера (default — если такой цены нет)"""
+        value = getattr(self, f"{provider}_{token_type}_price", None)
+        return float(value) if value is not None else default
     
     def to_dict(self) -> dict:
         """Возвращает снимок конфигурации как словарь"""
@@ -374,8 +655,12 @@ class SearchConfiguration(models.Model):
             'name': self.name,
             'primary_provider': self.primary_provider,
             'fallback_chain': self.fallback_chain,
+            'routing': self.routing or {},
             'temperature': self.temperature,
             'timeout': self.timeout,
+            'stream_responses': self.stream_responses,
+            'prompt_caching': self.prompt_caching,
+            'structured_output': self.structured_output,
             'max_search_results': self.max_search_results,
             'search_context_size': self.search_context_size,
             'grok_model': self.grok_model,
@@ -383,7 +668,22 @@ class SearchConfiguration(models.Model):
             'gemini_model': self.gemini_model,
             'openai_model': self.openai_model,
             'max_news_per_resource': self.max_news_per_resource,
+            'output_cap': self.output_cap or {},
             'delay_between_requests': self.delay_between_requests,
+            'max_workers': self.max_workers,
+            'provider_concurrency': self.provider_concurrency or {},
+            'execution_mode': self.execution_mode,
+            'batch_api': self.batch_api or {},
+            'rate_limits': self.rate_limits or {},
+            'rate_limit_backend': self.rate_limit_backend,
+            'circuit_breaker': self.circuit_breaker or {},
+            'hedging': self.hedging or {},
+            'scheduling': self.scheduling or {},
+            'batching': self.batching or {},
+            'change_detection': self.change_detection or {},
+            'feeds': self.feeds or {},
+            'budget': self.budget or {},
+            'response_cache_ttl_hours': self.response_cache_ttl_hours,
             'prompts': self.prompts or {},
             'prices': {
                 'grok': {'input': float(self.grok_input_price), 'output': float(self.grok_output_price)},
@@ -398,7 +698,51 @@ class NewsDiscoveryRun(models.Model):
     """
     Модель для отслеживания запусков поиска новостей.
     Хранит историю с полными метриками и снимком конфигурации.
+    Прогресс по каждой цели — в DiscoveryWorkItem (позволяет продолжить прерванный запуск).
     """
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_BUDGET_EXHAUSTED = 'budget_exhausted'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, _('Выполняется')),
+        (STATUS_COMPLETED, _('Завершен')),
+        (STATUS_FAILED, _('Ошибка')),
+        (STATUS_CANCELLED, _('Отменен')),
+        (STATUS_BUDGET_EXHAUSTED, _('Остановлен: бюджет исчерпан')),
+    ]
+    # Период поиска цели без водяного знака (новый источник или производитель)
+    DEFAULT_SEARCH_LOOKBACK = timedelta(days=14)
+    
+    SEARCH_TYPE_RESOURCES = 'resources'
+    SEARCH_TYPE_MANUFACTURERS = 'manufacturers'
+    SEARCH_TYPE_CHOICES = [
+        (SEARCH_TYPE_RESOURCES, _('Resources')),
+        (SEARCH_TYPE_MANUFACTURERS, _('Manufacturers')),
+    ]
+    
+    status = models.CharField(
+        _("Status"),
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_RUNNING,
+        help_text=_("Прерванный (running без воркера), отмененный или упавший запуск можно продолжить")
+    )
+    search_type = models.CharField(
+        _("Search Type"),
+        max_length=20,
+        choices=SEARCH_TYPE_CHOICES,
+        blank=True,
+        default='',
+        help_text=_("Источники или производители (пусто — запуск без списка целей)")
+    )
+    params = models.JSONField(
+        _("Params"),
+        default=dict,
+        blank=True,
+        help_text=_("Параметры прохода для продолжения: provider, last_search_date")
+    )
     last_search_date = models.DateField(
         _("Last Search Date"),
         default=get_today_date,
@@ -459,6 +803,43 @@ class NewsDiscoveryRun(models.Model):
         help_text=_("Статистика по провайдерам: {provider: {requests, input_tokens, output_tokens, cost, errors}}")
     )
     
+    # Бюджет (news/budget.py)
+    planned_cost_usd = models.DecimalField(
+        _("Planned Cost (USD)"),
+        max_digits=10,
+        decimal_places=4,
+        null=True,
+        blank=True,
+        help_text=_("Оценка стоимости прохода по истории перед его началом")
+    )
+    budget_usd = models.DecimalField(
+        _("Budget (USD)"),
+        max_digits=10,
+        decimal_places=4,
+        null=True,
+        blank=True,
+        help_text=_("Бюджет запуска (SearchConfiguration.budget); пусто — без бюджета")
+    )
+    budget_mode = models.CharField(
+        _("Budget Mode"),
+        max_length=10,
+        blank=True,
+        default='',
+        help_text=_("soft — после бюджета только самый дешевый провайдер, hard — остановка")
+    )
+    budget_status = models.CharField(
+        _("Budget Status"),
+        max_length=20,
+        blank=True,
+        default='',
+        help_text=_("ok, downgraded — дешевые провайдеры первыми, exhausted — бюджет исчерпан")
+    )
+    targets_over_budget = models.IntegerField(
+        _("Targets Over Budget"),
+        default=0,
+        help_text=_("Целей, не начатых из-за исчерпанного бюджета (остались в очереди запуска)")
+    )
+    
     # Результаты
     news_found = models.IntegerField(
         _("News Found"),
@@ -480,6 +861,11 @@ class NewsDiscoveryRun(models.Model):
         default=0,
         help_text=_("Количество ресурсов с ошибками")
     )
+    resources_unchanged = models.IntegerField(
+        _("Resources Unchanged"),
+        default=0,
+        help_text=_("Источников без изменений на сайте: запрос к LLM не выполнялся")
+    )
     
     created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
     updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
@@ -524,6 +910,11 @@ class NewsDiscoveryRun(models.Model):
             return last_run.last_search_date
         return timezone.now().date()
     
+    @classmethod
+    def default_search_start(cls):
+        """Начало периода поиска для цели без водяного знака (ни одного успешного поиска)"""
+        return timezone.now().date() - cls.DEFAULT_SEARCH_LOOKBACK
+    
     @classmethod
     def update_last_search_date(cls, date=None):
         """Обновляет дату последнего поиска"""
@@ -533,7 +924,7 @@ class NewsDiscoveryRun(models.Model):
         last_run = cls.objects.first()
         if last_run:
             last_run.last_search_date = date
-            last_run.save()
+            last_run.save(update_fields=['last_search_date', 'updated_at'])
         else:
             cls.objects.create(last_search_date=date)
     
@@ -553,33 +944,91 @@ class NewsDiscoveryRun(models.Model):
     def finish(self):
         """Завершает запуск поиска"""
         self.finished_at = timezone.now()
-        self.save()
+        self.save(update_fields=['finished_at', 'updated_at'])
     
-    def add_api_call(self, provider: str, input_tokens: int, output_tokens: int, 
-                     cost: float, success: bool = True):
-        """Добавляет статистику вызова API"""
-        if provider not in self.provider_stats:
-            self.provider_stats[provider] = {
-                'requests': 0,
-                'input_tokens': 0,
-                'output_tokens': 0,
-                'cost': 0,
-                'errors': 0
-            }
+    @property
+    def is_resumable(self) -> bool:
+        return bool(self.search_type) and self.status != self.STATUS_COMPLETED
+    
+    @staticmethod
+    def _empty_provider_stats() -> dict:
+        return {'requests': 0, 'input_tokens': 0, 'output_tokens': 0, 'cost': 0, 'errors': 0}
+    
+    def apply_stats(self, totals: dict = None, provider_deltas: dict = None, provider_values: dict = None):
+        """
+        Атомарно добавляет статистику к строке запуска (в запуск пишут несколько потоков и процессов).
         
-        stats = self.provider_stats[provider]
-        stats['requests'] += 1
-        stats['input_tokens'] += input_tokens
-        stats['output_tokens'] += output_tokens
-        stats['cost'] += cost
-        if not success:
-            stats['errors'] += 1
+        Args:
+            totals: прибавки к total_requests / total_input_tokens / total_output_tokens /
+                estimated_cost_usd (UPDATE ... SET field = field + delta)
+            provider_deltas: прибавки к provider_stats[provider][key]
+            provider_values: значения provider_stats[provider][key], которые заменяются целиком
+        """
+        totals = {field: value for field, value in (totals or {}).items() if value}
+        if 'estimated_cost_usd' in totals:
+            totals['estimated_cost_usd'] = Decimal(str(round(totals['estimated_cost_usd'], 6)))
         
-        self.total_requests += 1
-        self.total_input_tokens += input_tokens
-        self.total_output_tokens += output_tokens
-        self.estimated_cost_usd = float(self.estimated_cost_usd) + cost
-        self.save()
+        with transaction.atomic():
+            # provider_stats — JSON: читаем под блокировкой строки, чтобы не потерять чужие прибавки
+            provider_stats = (
+                NewsDiscoveryRun.objects.select_for_update()
+                .values_list('provider_stats', flat=True)
+                .get(pk=self.pk)
+            ) or {}
+            for provider, deltas in (provider_deltas or {}).items():
+                stats = provider_stats.setdefault(provider, self._empty_provider_stats())
+                for key, value in deltas.items():
+                    stats[key] = stats.get(key, 0) + value
+            for provider, values in (provider_values or {}).items():
+                provider_stats.setdefault(provider, self._empty_provider_stats()).update(values)
+            
+            NewsDiscoveryRun.objects.filter(pk=self.pk).update(
+                provider_stats=provider_stats,
+                updated_at=timezone.now(),
+                **{field: F(field) + value for field, value in totals.items()},
+            )
+        self.refresh_from_db(fields=['provider_stats', 'total_requests', 'total_input_tokens',
+                                     'total_output_tokens', 'estimated_cost_usd', 'updated_at'])
+    
+    def set_circuit_breaker_states(self, states: dict):
+        """Сохраняет состояние circuit breaker провайдеров: provider_stats[provider]['circuit_breaker']"""
+        self.apply_stats(provider_values={
+            provider: {'circuit_breaker': state} for provider, state in states.items()
+        })
+    
+    def record_hedge_win(self, provider: str):
+        """Хедж-запрос к провайдеру ответил раньше основного: provider_stats[provider]['hedge_wins']"""
+        self.apply_stats(provider_deltas={provider: {'hedge_wins': 1}})
+    
+    @staticmethod
+    def api_call_stats(input_tokens: int, output_tokens: int, cost: float,
+                       success: bool = True, is_hedge: bool = False, requests: int = 1,
+                       cached_input_tokens: int = 0, parse_failed: bool = False,
+                       output_tokens_saved: int = 0) -> dict:
+        """
+        Прибавки к provider_stats[provider] от одного вызова API (хедж-запросы — еще и в hedge_*).
+        requests = 0 — доля пакетного запроса, сам запрос учтен в первой доле.
+        """
+        stats = {'requests': requests, 'input_tokens': input_tokens, 'output_tokens': output_tokens,
+                 'cost': cost, 'errors': (0 if success else 1) * requests}
+        if cached_input_tokens:
+            stats['cached_input_tokens'] = cached_input_tokens
+        if parse_failed:
+            stats['parse_failures'] = requests
+        if output_tokens_saved:
+            stats['output_tokens_saved'] = output_tokens_saved
+        if is_hedge:
+            stats.update(hedge_requests=requests, hedge_cost=cost)
+        return stats
+    
+    def add_api_call(self, provider: str, input_tokens: int, output_tokens: int, 
+                     cost: float, success: bool = True, is_hedge: bool = False):
+        """Добавляет статистику одного вызова API (поиск пишет пачками через APICallBuffer)"""
+        self.apply_stats(
+            totals={'total_requests': 1, 'total_input_tokens': input_tokens,
+                    'total_output_tokens': output_tokens, 'estimated_cost_usd': cost},
+            provider_deltas={provider: self.api_call_stats(input_tokens, output_tokens, cost, success, is_hedge)},
+        )
 
 
 class DiscoveryAPICall(models.Model):
@@ -651,11 +1100,66 @@ class DiscoveryAPICall(models.Model):
         default=''
     )
     
+    cached_input_tokens = models.IntegerField(
+        _("Cached Input Tokens"),
+        default=0,
+        help_text=_("Входные токены, прочитанные из кэша промпта (входят в input_tokens)")
+    )
+    cache_write_tokens = models.IntegerField(
+        _("Cache Write Tokens"),
+        default=0,
+        help_text=_("Входные токены, записанные в кэш промпта — Anthropic (входят в input_tokens)")
+    )
+    
+    parse_failed = models.BooleanField(
+        _("Parse Failed"),
+        default=False,
+        help_text=_("Ответ получен, но не разобран как JSON с новостями (или не по схеме)")
+    )
+    
     news_extracted = models.IntegerField(
         _("News Extracted"),
         default=0,
         help_text=_("Количество новостей, извлечённых из этого запроса")
     )
+    is_hedge = models.BooleanField(
+        _("Is Hedge"),
+        default=False,
+        help_text=_("Хедж-запрос: отправлен параллельно медленному основному провайдеру")
+    )
+    batch_api = models.BooleanField(
+        _("Batch API"),
+        default=False,
+        help_text=_("Запрос из пакетного задания провайдера (DiscoveryBatchJob): цена со скидкой, "
+                    "duration_ms — от отправки задания до получения результатов")
+    )
+    
+    max_output_tokens = models.PositiveIntegerField(
+        _("Max Output Tokens"),
+        default=0,
+        help_text=_("Лимит выходных токенов запроса по max_news_per_resource (news/output_cap.py); 0 — без лимита")
+    )
+    output_tokens_saved = models.IntegerField(
+        _("Output Tokens Saved"),
+        default=0,
+        help_text=_("Оценка экономии лимита: средние выходные токены цели в вызовах без лимита минус выходные токены вызова")
+    )
+    
+    batch_size = models.PositiveSmallIntegerField(
+        _("Batch Size"),
+        default=1,
+        help_text=_("Источников в пакетном запросе: запрос записан долями по источникам, "
+                    "токены и стоимость каждой записи — 1/batch_size запроса")
+    )
+    raw_response = models.ForeignKey(
+        'DiscoveryRawResponse',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='api_calls',
+        verbose_name=_("Raw Response"),
+        help_text=_("Сохраненный ответ провайдера (news/response_archive.py)")
+    )
     
     created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
     
@@ -673,6 +1177,285 @@ class DiscoveryAPICall(models.Model):
         return f"{self.provider}: {target} - {self.news_extracted} news"
 
 
+class DiscoveryRawResponse(models.Model):
+    """
+    Сырой ответ провайдера на запрос поиска, сжатый zlib.
+    По нему новости можно пересобрать без повторного запроса (команда reparse_responses),
+    а одинаковый запрос в пределах SearchConfiguration.response_cache_ttl_hours
+    получает ответ из архива (см. news/response_archive.py).
+    """
+    COMPRESSION_ZLIB = 'zlib'
+    COMPRESSION_CHOICES = [
+        (COMPRESSION_ZLIB, 'zlib'),
+    ]
+    
+    cache_key = models.CharField(
+        _("Cache Key"),
+        max_length=64,
+        help_text=_("SHA-256 от провайдера, модели, промпта и периода поиска")
+    )
+    provider = models.CharField(_("Provider"), max_length=20)
+    model = models.CharField(_("Model"), max_length=50)
+    resource = models.ForeignKey(
+        'references.NewsResource',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='raw_responses',
+        verbose_name=_("Resource")
+    )
+    manufacturer = models.ForeignKey(
+        'references.Manufacturer',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='raw_responses',
+        verbose_name=_("Manufacturer")
+    )
+    search_start = models.DateField(_("Search Start"), null=True, blank=True)
+    search_end = models.DateField(_("Search End"), null=True, blank=True)
+    
+    content = models.BinaryField(_("Content"), help_text=_("Текст ответа, сжатый алгоритмом compression"))
+    compression = models.CharField(
+        _("Compression"),
+        max_length=10,
+        choices=COMPRESSION_CHOICES,
+        default=COMPRESSION_ZLIB
+    )
+    raw_size = models.PositiveIntegerField(_("Raw Size"), default=0, help_text=_("Размер ответа до сжатия, байт"))
+    parsed = models.BooleanField(
+        _("Parsed"),
+        default=False,
+        help_text=_("Ответ разобран без ошибок; в кэш попадают только такие ответы")
+    )
+    news_count = models.IntegerField(_("News Count"), default=0)
+    
+    created_at = models.DateTimeField(_("Created At"), default=timezone.now, db_index=True)
+    
+    class Meta:
+        verbose_name = _("Discovery Raw Response")
+        verbose_name_plural = _("Discovery Raw Responses")
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['cache_key', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.provider}/{self.model}: {self.cache_key[:12]} ({self.created_at:%Y-%m-%d %H:%M})"
+
+
+class FeedEntry(models.Model):
+    """
+    Запись RSS/Atom ленты источника, уже обработанная при опросе (news/feeds.py).
+    Индекс просмотренных GUID: повторный опрос ленты не создает новости и не тратит
+    вызов перевода на записи, которые уже были.
+    """
+    resource = models.ForeignKey(
+        'references.NewsResource',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name=_("Resource")
+    )
+    guid_hash = models.CharField(
+        _("GUID Hash"),
+        max_length=64,
+        help_text=_("SHA-256 от guid/id записи (или ссылки, если guid нет)")
+    )
+    guid = models.TextField(_("GUID"))
+    link = models.URLField(_("Link"), max_length=1000, blank=True)
+    published_at = models.DateTimeField(_("Published At"), null=True, blank=True)
+    news_post = models.ForeignKey(
+        NewsPost,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='feed_entries',
+        verbose_name=_("News Post"),
+        help_text=_("Созданная новость; пусто — запись пропущена (старая или дубликат)")
+    )
+    created_at = models.DateTimeField(_("Created At"), default=timezone.now)
+    
+    class Meta:
+        verbose_name = _("Feed Entry")
+        verbose_name_plural = _("Feed Entries")
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['resource', 'guid_hash'], name='unique_feed_entry_guid'),
+        ]
+    
+    def __str__(self):
+        return f"{self.resource_id}: {self.link or self.guid[:80]}"
+
+
+class DiscoveryWorkItem(models.Model):
+    """
+    Цель запуска поиска (источник или производитель) и ее состояние.
+    По ним прерванный запуск продолжается с того места, где остановился,
+    не запрашивая (и не оплачивая) повторно уже обработанные цели.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_IN_FLIGHT = 'in_flight'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _('Ожидает')),
+        (STATUS_IN_FLIGHT, _('Выполняется')),
+        (STATUS_DONE, _('Готово')),
+        (STATUS_FAILED, _('Ошибка')),
+    ]
+    
+    discovery_run = models.ForeignKey(
+        NewsDiscoveryRun,
+        on_delete=models.CASCADE,
+        related_name='work_items',
+        verbose_name=_("Discovery Run")
+    )
+    resource = models.ForeignKey(
+        'references.NewsResource',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='discovery_work_items',
+        verbose_name=_("Resource")
+    )
+    manufacturer = models.ForeignKey(
+        'references.Manufacturer',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='discovery_work_items',
+        verbose_name=_("Manufacturer")
+    )
+    status = models.CharField(
+        _("Status"),
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING
+    )
+    attempts = models.IntegerField(
+        _("Attempts"),
+        default=0,
+        help_text=_("Сколько раз цель отправлялась в обработку")
+    )
+    provider = models.CharField(
+        _("Provider"),
+        max_length=20,
+        blank=True,
+        default='',
+        help_text=_("Провайдер, вернувший ответ")
+    )
+    news_created = models.IntegerField(
+        _("News Created"),
+        default=0
+    )
+    duplicates = models.IntegerField(
+        _("Duplicates"),
+        default=0,
+        help_text=_("Новости из ответа, уже сохраненные ранее (не созданы)")
+    )
+    unchanged = models.BooleanField(
+        _("Unchanged"),
+        default=False,
+        help_text=_("Сайт не изменился с прошлой проверки — запрос к LLM не выполнялся")
+    )
+    errors = models.IntegerField(
+        _("Errors"),
+        default=0
+    )
+    error_message = models.TextField(
+        _("Error Message"),
+        blank=True,
+        default=''
+    )
+    started_at = models.DateTimeField(_("Started At"), null=True, blank=True)
+    finished_at = models.DateTimeField(_("Finished At"), null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _("Discovery Work Item")
+        verbose_name_plural = _("Discovery Work Items")
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['discovery_run', 'resource'], name='unique_work_item_resource'),
+            models.UniqueConstraint(fields=['discovery_run', 'manufacturer'], name='unique_work_item_manufacturer'),
+        ]
+        indexes = [
+            models.Index(fields=['discovery_run', 'status']),
+        ]
+    
+    def __str__(self):
+        target = self.resource or self.manufacturer
+        return f"Run #{self.discovery_run_id}: {target} ({self.status})"
+
+
+class DiscoveryBatchJob(models.Model):
+    """
+    Пакетное задание провайдера (Batch API OpenAI / Message Batches Anthropic) запуска поиска
+    в режиме execution_mode = batch_api (news/batch_discovery.py). Результаты забирает
+    воркер заданием DiscoveryJob 'batch_poll' и разбирает как обычные ответы.
+    """
+    STATUS_SUBMITTED = 'submitted'
+    STATUS_ENDED = 'ended'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_SUBMITTED, _('Отправлено')),
+        (STATUS_ENDED, _('Результаты получены')),
+        (STATUS_FAILED, _('Ошибка')),
+    ]
+
+    discovery_run = models.ForeignKey(
+        NewsDiscoveryRun,
+        on_delete=models.CASCADE,
+        related_name='batch_jobs',
+        verbose_name=_("Discovery Run")
+    )
+    provider = models.CharField(_("Provider"), max_length=20)
+    model = models.CharField(_("Model"), max_length=100)
+    external_id = models.CharField(
+        _("External ID"),
+        max_length=255,
+        blank=True,
+        default='',
+        help_text=_("ID пакетного задания у провайдера")
+    )
+    status = models.CharField(
+        _("Status"),
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_SUBMITTED
+    )
+    requests = models.JSONField(
+        _("Requests"),
+        default=dict,
+        help_text=_("Запросы задания: {custom_id: {target_id, prompt, start_date, end_date}}")
+    )
+    request_count = models.IntegerField(_("Request Count"), default=0)
+    succeeded = models.IntegerField(_("Succeeded"), default=0)
+    errored = models.IntegerField(
+        _("Errored"),
+        default=0,
+        help_text=_("Запросов с ошибкой провайдера или без результата")
+    )
+    polls = models.IntegerField(
+        _("Polls"),
+        default=0,
+        help_text=_("Сколько раз воркер проверял задание")
+    )
+    error_message = models.TextField(_("Error Message"), blank=True, default='')
+    created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
+    ended_at = models.DateTimeField(_("Ended At"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Discovery Batch Job")
+        verbose_name_plural = _("Discovery Batch Jobs")
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['discovery_run', 'status']),
+        ]
+
+    def __str__(self):
+        return f"Run #{self.discovery_run_id}: {self.provider} {self.external_id} ({self.status})"
+
+
 class NewsDiscoveryStatus(models.Model):
     """
     Модель для отслеживания текущего статуса поиска новостей.
@@ -707,6 +1490,11 @@ class NewsDiscoveryStatus(models.Model):
         default=0,
         help_text=_("Общее количество источников/производителей для обработки")
     )
+    streamed_news_count = models.IntegerField(
+        _("Streamed News Count"),
+        default=0,
+        help_text=_("Новостей, созданных по ходу потоковых ответов LLM (до завершения запроса)")
+    )
     status = models.CharField(
         _("Status"),
         max_length=20,
@@ -763,3 +1551,199 @@ class NewsDiscoveryStatus(models.Model):
             processed_count=0,
             status='running'
         )
+
+
+class ProviderRateLimitState(models.Model):
+    """
+    Состояние token bucket провайдера для общего лимита между процессами
+    (SearchConfiguration.rate_limit_backend = 'database').
+    Строка блокируется SELECT ... FOR UPDATE на время проверки лимита.
+    """
+    key = models.CharField(
+        _("Key"),
+        max_length=50,
+        unique=True,
+        help_text=_("Провайдер (grok, anthropic, openai, gemini)")
+    )
+    request_allowance = models.FloatField(
+        _("Request Allowance"),
+        null=True,
+        blank=True,
+        help_text=_("Доступные запросы в bucket (пусто = полный bucket)")
+    )
+    token_allowance = models.FloatField(
+        _("Token Allowance"),
+        null=True,
+        blank=True,
+        help_text=_("Доступные токены в bucket (может быть отрицательным после учета фактического расхода)")
+    )
+    refilled_at = models.FloatField(
+        _("Refilled At"),
+        null=True,
+        blank=True,
+        help_text=_("Unix-время последнего пополнения bucket")
+    )
+    last_request_at = models.FloatField(
+        _("Last Request At"),
+        null=True,
+        blank=True,
+        help_text=_("Unix-время последнего разрешенного запроса")
+    )
+    updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Provider Rate Limit State")
+        verbose_name_plural = _("Provider Rate Limit States")
+
+    def __str__(self):
+        return f"Rate limit: {self.key}"
+
+
+class DiscoveryJob(models.Model):
+    """
+    Задание на поиск новостей в очереди БД.
+    Админка и API только ставят задание; выполняет его процесс
+    `manage.py discovery_worker` (можно запускать на нескольких серверах).
+    """
+    JOB_TYPE_RESOURCES = 'resources'
+    JOB_TYPE_RESOURCE = 'resource'
+    JOB_TYPE_MANUFACTURERS = 'manufacturers'
+    JOB_TYPE_RESUME = 'resume'
+    JOB_TYPE_BATCH_POLL = 'batch_poll'
+    JOB_TYPE_FEED_DISCOVERY = 'feed_discovery'
+    JOB_TYPE_CHOICES = [
+        (JOB_TYPE_RESOURCES, _('Источники')),
+        (JOB_TYPE_RESOURCE, _('Один источник')),
+        (JOB_TYPE_MANUFACTURERS, _('Производители')),
+        (JOB_TYPE_RESUME, _('Продолжение запуска')),
+        (JOB_TYPE_BATCH_POLL, _('Результаты пакетных заданий провайдера')),
+        (JOB_TYPE_FEED_DISCOVERY, _('Поиск RSS/Atom лент')),
+    ]
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, _('В очереди')),
+        (STATUS_RUNNING, _('Выполняется')),
+        (STATUS_COMPLETED, _('Завершено')),
+        (STATUS_FAILED, _('Ошибка')),
+    ]
+
+    job_type = models.CharField(
+        _("Job Type"),
+        max_length=20,
+        choices=JOB_TYPE_CHOICES,
+        help_text=_("Что искать: источники (все или выбранные), один источник, производители, "
+                    "продолжение прерванного запуска, результаты пакетных заданий провайдера (batch_poll) "
+                    "или поиск RSS/Atom лент источников (feed_discovery)")
+    )
+    status = models.CharField(
+        _("Status"),
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_QUEUED
+    )
+    provider = models.CharField(
+        _("Provider"),
+        max_length=20,
+        default='auto',
+        help_text=_("Провайдер LLM ('auto' = цепочка)")
+    )
+    params = models.JSONField(
+        _("Params"),
+        default=dict,
+        blank=True,
+        help_text=_("Параметры запуска: resource_ids, last_search_date (YYYY-MM-DD)")
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='discovery_jobs',
+        verbose_name=_("User")
+    )
+    config = models.ForeignKey(
+        SearchConfiguration,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='discovery_jobs',
+        verbose_name=_("Search Configuration"),
+        help_text=_("Пусто = активная конфигурация на момент выполнения")
+    )
+    discovery_status = models.ForeignKey(
+        NewsDiscoveryStatus,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name=_("Discovery Status"),
+        help_text=_("Прогресс для индикатора в админке")
+    )
+    discovery_run = models.ForeignKey(
+        NewsDiscoveryRun,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name=_("Discovery Run"),
+        help_text=_("Запуск задания: при повторной попытке он продолжается, а не начинается заново")
+    )
+
+    attempts = models.IntegerField(
+        _("Attempts"),
+        default=0,
+        help_text=_("Сколько раз задание забирал воркер")
+    )
+    max_attempts = models.IntegerField(
+        _("Max Attempts"),
+        default=3,
+        help_text=_("После стольких попыток зависшее задание помечается как ошибка")
+    )
+    run_after = models.DateTimeField(
+        _("Run After"),
+        default=timezone.now,
+        help_text=_("Задание не выполняется раньше этого времени")
+    )
+    locked_by = models.CharField(
+        _("Locked By"),
+        max_length=255,
+        blank=True,
+        default='',
+        help_text=_("Воркер, выполняющий задание (host:pid)")
+    )
+    heartbeat_at = models.DateTimeField(
+        _("Heartbeat At"),
+        null=True,
+        blank=True,
+        help_text=_("Последний сигнал воркера; без сигнала задание возвращается в очередь")
+    )
+    result = models.JSONField(
+        _("Result"),
+        default=dict,
+        blank=True,
+        help_text=_("Статистика выполнения: created, errors, total_processed")
+    )
+    error_message = models.TextField(
+        _("Error Message"),
+        blank=True,
+        default=''
+    )
+
+    created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
+    started_at = models.DateTimeField(_("Started At"), null=True, blank=True)
+    finished_at = models.DateTimeField(_("Finished At"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Discovery Job")
+        verbose_name_plural = _("Discovery Jobs")
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"Job #{self.pk}: {self.get_job_type_display()} ({self.status})"
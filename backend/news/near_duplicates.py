@@ -0,0 +1,146 @@
+"""
+Поиск почти-дубликатов среди найденных новостей (MinHash + LSH).
+"""
+import hashlib
+import logging
+import random
+import re
+from datetime import timedelta
+from typing import Iterable, List, Optional, Set, Tuple
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import NewsPost, NewsSignature, NewsSignatureBand
+
+logger = logging.getLogger(__name__)
+
+# Сравниваем с новостями за этот период
+WINDOW_DAYS = 90
+# Размер сигнатуры = BANDS * ROWS_PER_BAND; порог срабатывания LSH ≈ (1 / BANDS) ** (1 / ROWS_PER_BAND)
+BANDS = 20
+ROWS_PER_BAND = 3
+NUM_PERM = BANDS * ROWS_PER_BAND
+# Оценка сходства Жаккара, начиная с которой новости считаются одной историей
+SIMILARITY_THRESHOLD = 0.4
+# Основа слова — первые STEM_LENGTH букв (грубый стемминг для русского и английского)
+STEM_LENGTH = 5
+# Тексты с меньшим числом основ не индексируются: сходство на них случайно
+MIN_FEATURES = 4
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(20240601)  # Фиксированное зерно: сигнатуры должны совпадать между процессами
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)
+]
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+STOP_WORDS = frozenset("""
+    и в во на с со по для о об от к ко из за что это как а но же у до при его ее их его она они оно
+    также так уже еще был была были будет будут который которая которые которых этот эта эти этого
+    новый новая новые компания компании года году год свой свою своих все всех более около после
+    the a an and or of to in on for with by at from is are was were be as that this its new
+""".split())
+
+
+def extract_features(text: str) -> Set[str]:
+    """Множество основ значимых слов: нижний регистр, ё → е, без стоп-слов и коротких слов"""
+    features = set()
+    for word in _WORD_RE.findall((text or '').lower().replace('ё', 'е')):
+        if word in STOP_WORDS or (len(word) < 3 and not word.isdigit()):
+            continue
+        features.add(word[:STEM_LENGTH])
+    return features
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=4).digest(), 'big')
+
+
+def minhash(features: Iterable[str]) -> List[int]:
+    """MinHash-сигнатура множества (NUM_PERM значений)"""
+    hashes = [_feature_hash(feature) for feature in features]
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def band_buckets(signature: List[int]) -> List[int]:
+    """Ключи LSH-полос: хеш ROWS_PER_BAND соседних значений сигнатуры"""
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(','.join(map(str, rows)).encode('ascii'), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'big', signed=True))
+    return buckets
+
+
+def similarity(first: List[int], second: List[int]) -> float:
+    """Оценка сходства Жаккара по двум сигнатурам"""
+    return sum(1 for a, b in zip(first, second) if a == b) / NUM_PERM
+
+
+def news_text(post: NewsPost) -> str:
+    return f"{post.title}\n{post.body}"
+
+
+def find_similar(signature: List[int], buckets: List[int],
+                 exclude_post_id: Optional[int] = None) -> Optional[Tuple[NewsSignature, float]]:
+    """
+    Самая похожая новость за WINDOW_DAYS дней.
+
+    Returns:
+        (сигнатура найденной новости, оценка сходства) или None
+    """
+    since = timezone.now() - timedelta(days=WINDOW_DAYS)
+    condition = Q()
+    for band, bucket in enumerate(buckets):
+        condition |= Q(band=band, bucket=bucket)
+    candidate_ids = (
+        NewsSignatureBand.objects.filter(condition, signature__created_at__gte=since)
+        .values_list('signature_id', flat=True)
+        .distinct()
+    )
+    candidates = NewsSignature.objects.filter(id__in=list(candidate_ids)).select_related('news_post')
+    if exclude_post_id:
+        candidates = candidates.exclude(news_post_id=exclude_post_id)
+
+    best = None
+    for candidate in candidates:
+        score = similarity(signature, candidate.minhash)
+        if score >= SIMILARITY_THRESHOLD and (best is None or score > best[1]):
+            best = (candidate, score)
+    return best
+
+
+def index_post(post: NewsPost) -> Optional[NewsPost]:
+    """
+    Индексирует новость и относит ее к группе похожей новости, если такая есть.
+
+    Returns:
+        Представитель группы или None, если похожих новостей нет (или текст слишком короткий).
+    """
+    features = extract_features(news_text(post))
+    if len(features) < MIN_FEATURES:
+        return None
+
+    signature = minhash(features)
+    buckets = band_buckets(signature)
+    match = find_similar(signature, buckets, exclude_post_id=post.pk)
+
+    stored = NewsSignature.objects.create(news_post=post, minhash=signature, created_at=post.created_at)
+    NewsSignatureBand.objects.bulk_create([
+        NewsSignatureBand(signature=stored, band=band, bucket=bucket) for band, bucket in enumerate(buckets)
+    ])
+    if match is None:
+        return None
+
+    similar, score = match
+    representative = similar.news_post.near_duplicate_of or similar.news_post
+    NewsPost.objects.filter(pk=post.pk).update(near_duplicate_of=representative, near_duplicate_score=round(score, 3))
+    post.near_duplicate_of = representative
+    post.near_duplicate_score = round(score, 3)
+    logger.info(f"News post {post.pk} похожа на {representative.pk} (сходство {score:.2f})")
+    return representative
@@ -0,0 +1,139 @@
+"""
+Лимит новостей и выходных токенов одного поиска (max_news_per_resource).
+"""
+import math
+import threading
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import Avg, Sum
+from django.utils import timezone
+
+from .models import DiscoveryAPICall
+
+DEFAULT_SETTINGS = {
+    'enabled': True,
+    'tokens_per_item': 300,        # Выходных токенов на новость без истории провайдера
+    'margin': 1.5,                 # Запас к оценке токенов новостей
+    'overhead_tokens': 800,        # Рассуждения, обертка JSON, ответ без новостей
+    'min_output_tokens': 1024,
+    'history_days': 30,            # Период истории DiscoveryAPICall для токенов на новость
+    'baseline_days': 180,          # Период истории вызовов без лимита (оценка экономии)
+}
+
+# Лимит Anthropic в запросе поиска (был единственным лимитом выходных токенов)
+ANTHROPIC_MAX_TOKENS = 4000
+
+NEWS_LIMIT_PROMPTS = {
+    'ru': "Верни не более {max_news} самых важных новостей.",
+    'en': "Return at most {max_news} most important news items.",
+}
+
+BATCH_NEWS_LIMIT_PROMPTS = {
+    'ru': "Для каждого сайта верни не более {max_news} самых важных новостей.",
+    'en': "For each website return at most {max_news} most important news items.",
+}
+
+
+class OutputCap:
+    """Лимит новостей и выходных токенов поиска; настройки — SearchConfiguration.output_cap"""
+
+    def __init__(self, max_news: int, settings: Optional[Dict] = None):
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.max_news = max(0, int(max_news or 0))
+        self.enabled = bool(self.settings['enabled']) and self.max_news > 0
+        self._tokens_per_item: Optional[Dict[str, float]] = None
+        self._baselines: Dict[Tuple[str, int], Optional[float]] = {}
+        self._lock = threading.Lock()
+
+    def prompt(self, language: str, batch: bool = False) -> str:
+        """Строка лимита для промпта (пустая, если лимит выключен)"""
+        if not self.enabled:
+            return ''
+        templates = BATCH_NEWS_LIMIT_PROMPTS if batch else NEWS_LIMIT_PROMPTS
+        return templates.get(language, templates['en']).format(max_news=self.max_news)
+
+    def _load_tokens_per_item(self):
+        since = timezone.now() - timedelta(days=float(self.settings['history_days']))
+        rows = (
+            DiscoveryAPICall.objects
+            .filter(created_at__gte=since, success=True, news_extracted__gt=0)
+            .values('provider')
+            .annotate(output=Sum('output_tokens'), news=Sum('news_extracted'))
+            .order_by()
+        )
+        self._tokens_per_item = {row['provider']: row['output'] / row['news'] for row in rows if row['news']}
+
+    def tokens_per_item(self, provider: str) -> float:
+        """Выходных токенов на новость по истории провайдера"""
+        with self._lock:
+            if self._tokens_per_item is None:
+                self._load_tokens_per_item()
+            per_item = self._tokens_per_item.get(provider)
+        return per_item or float(self.settings['tokens_per_item'])
+
+    def max_output_tokens(self, provider: str, targets: int = 1) -> Optional[int]:
+        """Лимит выходных токенов запроса к провайдеру; None — без лимита"""
+        if not self.enabled:
+            return None
+        news_tokens = self.max_news * self.tokens_per_item(provider) * float(self.settings['margin']) * max(1, targets)
+        return max(int(self.settings['min_output_tokens']), math.ceil(news_tokens + int(self.settings['overhead_tokens'])))
+
+    def truncate(self, news: List) -> int:
+        """Оставляет в списке (на месте) не больше max_news новостей; возвращает число отброшенных"""
+        if not self.enabled or len(news) <= self.max_news:
+            return 0
+        dropped = len(news) - self.max_news
+        del news[self.max_news:]
+        return dropped
+
+    def prefetch(self, field: str, target_ids: Iterable[int]):
+        """
+        Токены на новость по провайдерам и средние выходные токены целей прохода в вызовах
+        без лимита — до начала прохода (в асинхронном режиме запросы к БД из event loop недоступны).
+
+        Args:
+            field: 'resource' или 'manufacturer'
+        """
+        target_ids = list(target_ids)
+        if not self.enabled or not target_ids:
+            return
+        with self._lock:
+            if self._tokens_per_item is None:
+                self._load_tokens_per_item()
+        since = timezone.now() - timedelta(days=float(self.settings['baseline_days']))
+        baselines: Dict[Tuple[str, int], Optional[float]] = {(field, target_id): None for target_id in target_ids}
+        for start in range(0, len(target_ids), 500):
+            rows = (
+                DiscoveryAPICall.objects
+                .filter(max_output_tokens=0, created_at__gte=since, success=True, batch_size=1,
+                        **{f'{field}__in': target_ids[start:start + 500]})
+                .values(field)
+                .annotate(output=Avg('output_tokens'))
+                .order_by()
+            )
+            for row in rows:
+                baselines[(field, row[field])] = row['output']
+        with self._lock:
+            self._baselines.update(baselines)
+
+    def clear(self):
+        """Конец прохода: история — заново в следующем"""
+        with self._lock:
+            self._tokens_per_item = None
+            self._baselines.clear()
+
+    def tokens_saved(self, field: Optional[str], target_id: Optional[int], output_tokens: int) -> int:
+        """Оценка сэкономленных выходных токенов вызова по истории цели без лимита"""
+        if not self.enabled or field is None or target_id is None:
+            return 0
+        key = (field, target_id)
+        with self._lock:
+            known = key in self._baselines
+        if not known:
+            self.prefetch(field, [target_id])
+        with self._lock:
+            baseline = self._baselines.get(key)
+        if baseline is None:
+            return 0
+        return max(0, round(baseline) - output_tokens)
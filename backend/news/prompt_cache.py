@@ -0,0 +1,49 @@
+"""
+Кэширование префикса промпта у провайдеров и учет кэшированных токенов.
+"""
+import hashlib
+from typing import Any, Dict, List, NamedTuple, Union
+
+
+class TokenUsage(NamedTuple):
+    """Токены одного вызова"""
+    input_tokens: int              # Все входные токены, включая кэшированные
+    output_tokens: int
+    cached_input_tokens: int = 0   # Прочитаны из кэша (дешевле обычных)
+    cache_write_tokens: int = 0    # Записаны в кэш (Anthropic, дороже обычных)
+
+    @property
+    def uncached_input_tokens(self) -> int:
+        return max(0, self.input_tokens - self.cached_input_tokens - self.cache_write_tokens)
+
+
+def usage_count(obj: Any, *path: str) -> int:
+    """Число токенов по пути атрибутов usage; нет атрибута или не число — 0"""
+    for name in path:
+        obj = getattr(obj, name, None)
+        if obj is None:
+            return 0
+    return obj if isinstance(obj, int) and not isinstance(obj, bool) else 0
+
+
+def call_cost(config, provider: str, usage: TokenUsage) -> float:
+    """Стоимость вызова в USD: кэшированные токены — по своей цене (нет цены — как обычные)"""
+    input_price = config.get_price(provider, 'input')
+    return (
+        usage.uncached_input_tokens * input_price
+        + usage.cached_input_tokens * config.get_price(provider, 'cached_input', input_price)
+        + usage.cache_write_tokens * config.get_price(provider, 'cache_write', input_price)
+        + usage.output_tokens * config.get_price(provider, 'output')
+    ) / 1_000_000
+
+
+def anthropic_system(system_prompt: str, enabled: bool) -> Union[str, List[Dict]]:
+    """Системный промпт Anthropic: с кэшированием — блок с cache_control"""
+    if not enabled or not system_prompt:
+        return system_prompt
+    return [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+
+
+def prefix_key(*parts: str) -> str:
+    """Короткий ключ постоянной части запроса (x-grok-conv-id)"""
+    return hashlib.sha256('\x00'.join(parts).encode('utf-8')).hexdigest()[:32]
@@ -0,0 +1,241 @@
+"""
+Ограничение частоты запросов к провайдерам LLM (token bucket по rpm и tpm).
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import ProviderRateLimitState, SearchConfiguration
+
+logger = logging.getLogger(__name__)
+
+# Оценка ответа модели до запроса (уточняется после ответа)
+DEFAULT_OUTPUT_TOKENS_ESTIMATE = 1000
+# Максимальный шаг ожидания: лимиты могли измениться, состояние — обновиться другим процессом
+MAX_WAIT_STEP = 5.0
+
+
+class ProviderLimits:
+    """Лимиты одного провайдера"""
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, min_interval: float = 0):
+        self.rpm = float(rpm or 0)
+        self.tpm = float(tpm or 0)
+        self.min_interval = float(min_interval or 0)
+
+    @property
+    def is_unlimited(self) -> bool:
+        return not (self.rpm or self.tpm or self.min_interval)
+
+
+class TokenBucket:
+    """
+    Состояние bucket провайдера и логика списания.
+    Одинаково для обоих backend: 'database' загружает его из строки ProviderRateLimitState.
+    """
+
+    def __init__(self, request_allowance: Optional[float] = None, token_allowance: Optional[float] = None,
+                 refilled_at: Optional[float] = None, last_request_at: Optional[float] = None):
+        self.request_allowance = request_allowance
+        self.token_allowance = token_allowance
+        self.refilled_at = refilled_at
+        self.last_request_at = last_request_at
+
+    def refill(self, limits: ProviderLimits, now: float):
+        elapsed = max(0.0, now - self.refilled_at) if self.refilled_at is not None else 0.0
+        # None = полный bucket (первый запрос или лимит только что включили)
+        if limits.rpm:
+            current = limits.rpm if self.request_allowance is None else self.request_allowance
+            self.request_allowance = min(limits.rpm, current + elapsed * limits.rpm / 60)
+        if limits.tpm:
+            current = limits.tpm if self.token_allowance is None else self.token_allowance
+            self.token_allowance = min(limits.tpm, current + elapsed * limits.tpm / 60)
+        self.refilled_at = now
+
+    def take(self, limits: ProviderLimits, tokens: float, now: float) -> float:
+        """
+        Списывает один запрос и tokens токенов.
+        Returns:
+            0, если запрос разрешен, иначе сколько секунд подождать (ничего не списывается).
+        """
+        self.refill(limits, now)
+
+        wait = 0.0
+        if limits.min_interval and self.last_request_at is not None:
+            wait = max(wait, self.last_request_at + limits.min_interval - now)
+        if limits.rpm and self.request_allowance < 1:
+            wait = max(wait, (1 - self.request_allowance) * 60 / limits.rpm)
+        if limits.tpm:
+            # Запрос больше всего bucket иначе не прошел бы никогда
+            tokens = min(tokens, limits.tpm)
+            if self.token_allowance < tokens:
+                wait = max(wait, (tokens - self.token_allowance) * 60 / limits.tpm)
+        if wait > 0:
+            return wait
+
+        if limits.rpm:
+            self.request_allowance -= 1
+        if limits.tpm:
+            self.token_allowance -= tokens
+        self.last_request_at = now
+        return 0.0
+
+
+class LocalRateLimitBackend:
+    """Состояние в памяти процесса: общий лимит для всех потоков одного воркера"""
+
+    _buckets: Dict[str, TokenBucket] = {}
+    _lock = threading.Lock()
+
+    def try_acquire(self, key: str, limits: ProviderLimits, tokens: float) -> float:
+        with self._lock:
+            bucket = self._buckets.setdefault(key, TokenBucket())
+            return bucket.take(limits, tokens, time.time())
+
+    def adjust_tokens(self, key: str, limits: ProviderLimits, delta: float):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None and bucket.token_allowance is not None:
+                bucket.token_allowance -= delta
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._buckets.clear()
+
+
+class DatabaseRateLimitBackend:
+    """Состояние в ProviderRateLimitState: общий лимит для всех процессов, работающих с одной БД"""
+
+    def try_acquire(self, key: str, limits: ProviderLimits, tokens: float) -> float:
+        with transaction.atomic():
+            state = self._lock_state(key)
+            bucket = TokenBucket(state.request_allowance, state.token_allowance,
+                                 state.refilled_at, state.last_request_at)
+            wait = bucket.take(limits, tokens, time.time())
+            state.request_allowance = bucket.request_allowance
+            state.token_allowance = bucket.token_allowance
+            state.refilled_at = bucket.refilled_at
+            state.last_request_at = bucket.last_request_at
+            state.save(update_fields=['request_allowance', 'token_allowance', 'refilled_at',
+                                      'last_request_at', 'updated_at'])
+        return wait
+
+    def adjust_tokens(self, key: str, limits: ProviderLimits, delta: float):
+        ProviderRateLimitState.objects.filter(key=key, token_allowance__isnull=False).update(
+            token_allowance=F('token_allowance') - delta
+        )
+
+    @staticmethod
+    def _lock_state(key: str) -> ProviderRateLimitState:
+        try:
+            return ProviderRateLimitState.objects.select_for_update().get(key=key)
+        except ProviderRateLimitState.DoesNotExist:
+            pass
+        try:
+            with transaction.atomic():
+                ProviderRateLimitState.objects.create(key=key)
+        except IntegrityError:
+            # Строку одновременно создал другой процесс
+            pass
+        return ProviderRateLimitState.objects.select_for_update().get(key=key)
+
+
+class RateReservation:
+    """Резерв, выданный acquire(): после ответа передается в settle()"""
+
+    def __init__(self, key: str, limits: ProviderLimits, estimated_tokens: int, waited: float = 0):
+        self.key = key
+        self.limits = limits
+        self.estimated_tokens = estimated_tokens
+        self.waited = waited
+
+
+class RateLimiter:
+    """
+    Лимитер запросов к провайдерам для конкретной SearchConfiguration.
+
+    Использование:
+        reservation = limiter.acquire('grok', limiter.estimate_tokens(prompt))
+        ...запрос...
+        limiter.settle(reservation, input_tokens + output_tokens)
+    """
+
+    BACKENDS = {
+        SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL: LocalRateLimitBackend,
+        SearchConfiguration.RATE_LIMIT_BACKEND_DATABASE: DatabaseRateLimitBackend,
+    }
+
+    def __init__(self, config: SearchConfiguration):
+        self.limits = {
+            provider: ProviderLimits(
+                rpm=(values or {}).get('rpm'),
+                tpm=(values or {}).get('tpm'),
+            )
+            for provider, values in (config.rate_limits or {}).items()
+        }
+        self.min_interval = float(config.delay_between_requests or 0)
+        backend_class = self.BACKENDS.get(config.rate_limit_backend, DatabaseRateLimitBackend)
+        self.backend = backend_class()
+
+    def get_limits(self, provider: str) -> ProviderLimits:
+        limits = self.limits.get(provider) or ProviderLimits()
+        return ProviderLimits(limits.rpm, limits.tpm, self.min_interval)
+
+    @staticmethod
+    def estimate_tokens(prompt: str, output_tokens: int = DEFAULT_OUTPUT_TOKENS_ESTIMATE) -> int:
+        """Грубая оценка: ~4 символа на токен промпта плюс ожидаемый ответ"""
+        return len(prompt or '') // 4 + output_tokens
+
+    def acquire(self, provider: str, estimated_tokens: int = 0) -> RateReservation:
+        """Ждет, пока лимиты провайдера позволят запрос, и резервирует его"""
+        limits = self.get_limits(provider)
+        reservation = RateReservation(provider, limits, estimated_tokens)
+        if limits.is_unlimited:
+            return reservation
+
+        while True:
+            wait = self.backend.try_acquire(provider, limits, estimated_tokens)
+            if wait <= 0:
+                break
+            reservation.waited += min(wait, MAX_WAIT_STEP)
+            time.sleep(min(wait, MAX_WAIT_STEP))
+        if reservation.waited:
+            logger.info(f"Rate limit {provider}: ожидание {reservation.waited:.1f}s")
+        return reservation
+
+    async def aacquire(self, provider: str, estimated_tokens: int = 0) -> RateReservation:
+        """Асинхронный вариант acquire(): ожидание не блокирует event loop"""
+        limits = self.get_limits(provider)
+        reservation = RateReservation(provider, limits, estimated_tokens)
+        if limits.is_unlimited:
+            return reservation
+
+        try_acquire = sync_to_async(self.backend.try_acquire)
+        while True:
+            wait = await try_acquire(provider, limits, estimated_tokens)
+            if wait <= 0:
+                break
+            reservation.waited += min(wait, MAX_WAIT_STEP)
+            await asyncio.sleep(min(wait, MAX_WAIT_STEP))
+        if reservation.waited:
+            logger.info(f"Rate limit {provider}: ожидание {reservation.waited:.1f}s")
+        return reservation
+
+    def settle(self, reservation: RateReservation, actual_tokens: int):
+        """Корректирует bucket токенов на разницу между фактическим расходом и оценкой"""
+        if not reservation.limits.tpm:
+            return
+        delta = actual_tokens - min(reservation.estimated_tokens, reservation.limits.tpm)
+        if delta:
+            self.backend.adjust_tokens(reservation.key, reservation.limits, delta)
+
+    async def asettle(self, reservation: RateReservation, actual_tokens: int):
+        if reservation.limits.tpm:
+            await sync_to_async(self.settle)(reservation, actual_tokens)
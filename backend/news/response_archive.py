@@ -0,0 +1,82 @@
+"""
+Архив сырых ответов LLM при поиске новостей и повтор ответов из архива.
+"""
+import hashlib
+import json
+import zlib
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.utils import timezone
+
+from .models import DiscoveryRawResponse
+
+# Уровень zlib: ответы — несколько КБ текста, выше 6 выигрыш в размере незаметен
+COMPRESSION_LEVEL = 6
+
+SearchWindow = Tuple[Optional[date], Optional[date]]
+
+
+def cache_key(provider: str, model: str, prompt: str, window: SearchWindow) -> str:
+    """SHA-256 от провайдера, модели, промпта и периода поиска"""
+    start, end = window
+    payload = json.dumps(
+        [provider, model, prompt, start.isoformat() if start else None, end.isoformat() if end else None],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def compress(content: str) -> bytes:
+    return zlib.compress(content.encode('utf-8'), COMPRESSION_LEVEL)
+
+
+def decompress(data: bytes, compression: str = DiscoveryRawResponse.COMPRESSION_ZLIB) -> str:
+    if compression != DiscoveryRawResponse.COMPRESSION_ZLIB:
+        raise ValueError(f"Неизвестный алгоритм сжатия: {compression}")
+    return zlib.decompress(bytes(data)).decode('utf-8')
+
+
+def response_text(response: DiscoveryRawResponse) -> str:
+    """Текст сохраненного ответа"""
+    return decompress(response.content, response.compression)
+
+
+def store(provider: str, model: str, prompt: str, content: str, window: SearchWindow,
+          resource=None, manufacturer=None, parsed: bool = False, news_count: int = 0) -> DiscoveryRawResponse:
+    """Сохраняет ответ провайдера в архив"""
+    start, end = window
+    return DiscoveryRawResponse.objects.create(
+        cache_key=cache_key(provider, model, prompt, window),
+        provider=provider,
+        model=model,
+        resource=resource,
+        manufacturer=manufacturer,
+        search_start=start,
+        search_end=end,
+        content=compress(content),
+        raw_size=len(content.encode('utf-8')),
+        parsed=parsed,
+        news_count=news_count,
+    )
+
+
+def find_cached(candidates: List[Tuple[str, str]], prompt: str, window: SearchWindow,
+                ttl_hours: int) -> Optional[DiscoveryRawResponse]:
+    """
+    Свежий разобранный ответ на такой же запрос.
+
+    Args:
+        candidates: (провайдер, модель) в порядке предпочтения — при нескольких
+            подходящих ответах возвращается ответ первого провайдера
+        ttl_hours: срок жизни ответа в кэше; 0 — кэш не используется
+    """
+    if not ttl_hours or not candidates:
+        return None
+    keys: Dict[str, int] = {
+        cache_key(provider, model, prompt, window): position
+        for position, (provider, model) in enumerate(candidates)
+    }
+    since = timezone.now() - timedelta(hours=ttl_hours)
+    found = DiscoveryRawResponse.objects.filter(cache_key__in=list(keys), parsed=True, created_at__gte=since)
+    return min(found, key=lambda response: (keys[response.cache_key], -response.created_at.timestamp()), default=None)
@@ -0,0 +1,154 @@
+"""
+Порядок провайдеров для каждой цели по ее истории вызовов.
+"""
+import logging
+import random
+import threading
+from datetime import timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from .models import DiscoveryAPICall
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'enabled': True,
+    'history_days': 60,             # Период истории DiscoveryAPICall
+    'min_calls': 3,                 # Вызовов провайдера по цели, чтобы учитывать его историю
+    'exploration_rate': 0.1,        # Доля поисков, где первым идет случайный другой провайдер
+    'latency_half_seconds': 120,    # Средняя задержка, при которой оценка уменьшается вдвое
+}
+
+# Нижняя граница стоимости вызова: провайдер с нулевой ценой не получает бесконечную оценку
+MIN_CALL_COST_USD = 0.0001
+
+
+class ProviderHistory(NamedTuple):
+    """История вызовов одного провайдера по одной цели"""
+    calls: int
+    successes: int
+    news: int
+    cost_usd: float
+    avg_duration_ms: float
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.calls if self.calls else 0.0
+
+    @property
+    def cost_per_call(self) -> float:
+        return self.cost_usd / self.calls if self.calls else 0.0
+
+
+class ProviderRouter:
+    """Порядок провайдеров цепочки 'auto' для цели; настройки — SearchConfiguration.routing"""
+
+    def __init__(self, settings: Optional[Dict] = None, rng: Optional[random.Random] = None):
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.enabled = bool(self.settings['enabled'])
+        self.min_calls = max(1, int(self.settings['min_calls']))
+        self.exploration_rate = float(self.settings['exploration_rate'])
+        self.latency_half_ms = float(self.settings['latency_half_seconds']) * 1000
+        self.rng = rng or random.Random()
+        self._history: Dict[Tuple[str, int], Dict[str, ProviderHistory]] = {}
+        self._lock = threading.Lock()
+        self.counters = {'routed': 0, 'explored': 0}
+
+    def prefetch(self, field: str, target_ids: Iterable[int]):
+        """
+        История всех целей прохода одним запросом (до начала прохода: в асинхронном
+        режиме order() вызывается из event loop, где запросы к БД недоступны).
+
+        Args:
+            field: 'resource' или 'manufacturer'
+        """
+        target_ids = list(target_ids)
+        if not self.enabled or not target_ids:
+            return
+        history: Dict[Tuple[str, int], Dict[str, ProviderHistory]] = {(field, target_id): {} for target_id in target_ids}
+        since = timezone.now() - timedelta(days=float(self.settings['history_days']))
+        for start in range(0, len(target_ids), 500):
+            rows = (
+                DiscoveryAPICall.objects
+                .filter(created_at__gte=since, **{f'{field}__in': target_ids[start:start + 500]})
+                .values(field, 'provider')
+                .annotate(
+                    calls=Count('id'),
+                    successes=Count('id', filter=Q(success=True)),
+                    news=Sum('news_extracted'),
+                    cost=Sum('cost_usd'),
+                    # Пакетные задания (news/batch_api.py) ждут часами — в задержку не входят
+                    duration=Avg('duration_ms', filter=Q(batch_api=False)),
+                )
+                .order_by()
+            )
+            for row in rows:
+                history[(field, row[field])][row['provider']] = ProviderHistory(
+                    row['calls'], row['successes'], row['news'] or 0, float(row['cost'] or 0), float(row['duration'] or 0),
+                )
+        with self._lock:
+            self._history.update(history)
+
+    def clear(self):
+        """Конец прохода: история и счетчики — заново в следующем"""
+        with self._lock:
+            self._history.clear()
+            self.counters = {'routed': 0, 'explored': 0}
+
+    def history(self, field: str, target_id: int) -> Dict[str, ProviderHistory]:
+        """История цели по провайдерам (не загруженная заранее — отдельным запросом)"""
+        key = (field, target_id)
+        with self._lock:
+            cached = self._history.get(key)
+        if cached is None:
+            self.prefetch(field, [target_id])
+            with self._lock:
+                cached = self._history.get(key, {})
+        return cached
+
+    def score(self, history: ProviderHistory) -> float:
+        """Новостей на доллар с учетом доли успешных вызовов и задержки"""
+        cost = max(history.cost_usd, MIN_CALL_COST_USD * history.calls)
+        latency_factor = 1 + history.avg_duration_ms / self.latency_half_ms if self.latency_half_ms > 0 else 1
+        return history.success_rate * history.news / cost / latency_factor
+
+    def rank(self, chain: List[str], history: Dict[str, ProviderHistory]) -> List[str]:
+        """Порядок провайдеров по истории цели, без исследования"""
+        proven, unknown, empty = [], [], []
+        for provider in chain:
+            provider_history = history.get(provider)
+            if provider_history is None or provider_history.calls < self.min_calls:
+                unknown.append(provider)
+            elif provider_history.news > 0:
+                proven.append(provider)
+            else:
+                empty.append(provider)
+        proven.sort(key=lambda provider: -self.score(history[provider]))
+        empty.sort(key=lambda provider: (-history[provider].success_rate, history[provider].cost_per_call))
+        return proven + unknown + empty
+
+    def order(self, chain: List[str], field: Optional[str], target_id: Optional[int]) -> List[str]:
+        """
+        Цепочка для цели: по истории, иногда — со случайным провайдером первым.
+        Без цели (пакетный запрос) или с одним провайдером — цепочка без изменений.
+        """
+        if not self.enabled or len(chain) < 2 or field is None or target_id is None:
+            return chain
+        history = self.history(field, target_id)
+        ordered = self.rank(chain, history)
+        # Без истории цепочка и так не выучена — исследовать нечего
+        learned = any(provider_history.calls >= self.min_calls for provider_history in history.values())
+        if learned and self.exploration_rate > 0 and self.rng.random() < self.exploration_rate:
+            explored = self.rng.choice(ordered[1:])
+            ordered = [explored] + [provider for provider in ordered if provider != explored]
+            with self._lock:
+                self.counters['explored'] += 1
+            logger.debug(f"Маршрутизация {field} #{target_id}: исследуем {explored}")
+        elif ordered[0] != chain[0]:
+            with self._lock:
+                self.counters['routed'] += 1
+            logger.debug(f"Маршрутизация {field} #{target_id}: {' → '.join(ordered)}")
+        return ordered
@@ -39,9 +39,9 @@ class NewsPostSerializer(serializers.ModelSerializer):
             'id', 'title', 'title_ru', 'title_en', 'title_de', 'title_pt',
             'body', 'body_ru', 'body_en', 'body_de', 'body_pt',
             'pub_date', 'status', 'source_language', 'source_url', 'created_at', 'updated_at', 'author', 'media',
-            'is_no_news_found', 'manufacturer'
+            'is_no_news_found', 'manufacturer', 'near_duplicate_of', 'near_duplicate_score'
         )
-        read_only_fields = ('id', 'created_at', 'updated_at', 'author', 'title_ru', 'title_en', 'title_de', 'title_pt', 'body_ru', 'body_en', 'body_de', 'body_pt', 'is_no_news_found', 'manufacturer')
+        read_only_fields = ('id', 'created_at', 'updated_at', 'author', 'title_ru', 'title_en', 'title_de', 'title_pt', 'body_ru', 'body_en', 'body_de', 'body_pt', 'is_no_news_found', 'manufacturer', 'near_duplicate_of', 'near_duplicate_score')
     
     def _get_translation_field(self, obj, field_name, lang_code):
         """Безопасно получает значение поля перевода или None"""
@@ -278,14 +278,17 @@ class SearchConfigurationSerializer(serializers.ModelSerializer):
         model = SearchConfiguration
         fields = (
             'id', 'name', 'is_active',
-            'primary_provider', 'fallback_chain',
-            'temperature', 'timeout', 'max_news_per_resource', 'delay_between_requests',
+            'primary_provider', 'fallback_chain', 'routing',
+            'temperature', 'timeout', 'max_news_per_resource', 'output_cap', 'delay_between_requests',
+            'execution_mode', 'batch_api', 'max_workers', 'provider_concurrency',
+            'rate_limits', 'rate_limit_backend', 'circuit_breaker', 'hedging',
             'max_search_results', 'search_context_size',
             'grok_model', 'anthropic_model', 'gemini_model', 'openai_model',
-            'grok_input_price', 'grok_output_price',
-            'anthropic_input_price', 'anthropic_output_price',
-            'gemini_input_price', 'gemini_output_price',
-            'openai_input_price', 'openai_output_price',
+            'grok_input_price', 'grok_cached_input_price', 'grok_output_price',
+            'anthropic_input_price', 'anthropic_cached_input_price', 'anthropic_cache_write_price',
+            'anthropic_output_price',
+            'gemini_input_price', 'gemini_cached_input_price', 'gemini_output_price',
+            'openai_input_price', 'openai_cached_input_price', 'openai_output_price',
             'prompts',
             'created_at', 'updated_at'
         )
@@ -312,9 +315,10 @@ class DiscoveryAPICallSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'discovery_run', 'resource', 'resource_name', 
             'manufacturer', 'manufacturer_name',
-            'provider', 'model', 'input_tokens', 'output_tokens',
+            'provider', 'model', 'input_tokens', 'cached_input_tokens', 'cache_write_tokens', 'output_tokens',
             'cost_usd', 'duration_ms', 'success', 'error_message',
-            'news_extracted', 'created_at'
+            'parse_failed', 'is_hedge', 'batch_api', 'news_extracted', 'max_output_tokens', 'output_tokens_saved',
+            'created_at'
         )
         read_only_fields = fields
     
@@ -334,7 +338,7 @@ class NewsDiscoveryRunSerializer(serializers.ModelSerializer):
     class Meta:
         model = NewsDiscoveryRun
         fields = (
-            'id', 'last_search_date', 'config_snapshot',
+            'id', 'status', 'search_type', 'params', 'last_search_date', 'config_snapshot',
             'started_at', 'finished_at', 'duration_display',
             'total_requests', 'total_input_tokens', 'total_output_tokens',
             'estimated_cost_usd',
@@ -364,7 +368,7 @@ class NewsDiscoveryRunListSerializer(serializers.ModelSerializer):
     class Meta:
         model = NewsDiscoveryRun
         fields = (
-            'id', 'last_search_date', 'config_name',
+            'id', 'status', 'search_type', 'last_search_date', 'config_name',
             'started_at', 'finished_at', 'duration_display',
             'total_requests', 'estimated_cost_usd',
             'news_found', 'resources_processed', 'resources_failed',
@@ -0,0 +1,103 @@
+"""
+Потоковые ответы LLM: новости создаются по мере получения ответа.
+"""
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StreamedNews:
+    """Новости цели, созданные по ходу потокового ответа; потокобезопасно"""
+
+    def __init__(self, create: Callable[[Dict], bool], label: str,
+                 on_created: Optional[Callable[[], None]] = None, limit: Optional[int] = None):
+        """
+        Args:
+            create: создание новости цели (False — дубликат), как _create_news_post
+            label: описание цели для лога
+            on_created: вызывается после каждой созданной новости (счетчик в NewsDiscoveryStatus)
+            limit: не больше новостей из потока (max_news_per_resource, news/output_cap.py)
+        """
+        self._create = create
+        self._label = label
+        self._on_created = on_created
+        self._limit = limit
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._closed = False
+        self.provider: Optional[str] = None
+        self.items: List[Dict] = []
+        # Итог по ключу новости: True — создана, False — дубликат, исключение — ошибка
+        self._outcomes: Dict[str, object] = {}
+
+    @staticmethod
+    def key(news_item: Dict) -> str:
+        return json.dumps(news_item, sort_keys=True, ensure_ascii=False)
+
+    def accept(self, provider: str, news_item: Dict):
+        """Новость из потока провайдера: создается сразу, если поток этого провайдера принят"""
+        with self._lock:
+            if self._closed:
+                return
+            if self.provider is None:
+                self.provider = provider
+                logger.info(f"{self._label}: первая новость из потока {provider} "
+                            f"через {time.time() - self._started_at:.1f} с")
+            if provider != self.provider:
+                return
+            key = self.key(news_item)
+            if key in self._outcomes or (self._limit is not None and len(self.items) >= self._limit):
+                return
+            self.items.append(news_item)
+            self._outcomes[key] = outcome = self._run_create(news_item)
+        if outcome is True and self._on_created:
+            try:
+                self._on_created()
+            except Exception as e:
+                logger.error(f"Не удалось обновить счетчик потоковых новостей: {str(e)}")
+
+    def _run_create(self, news_item: Dict) -> object:
+        try:
+            return bool(self._create(news_item))
+        except Exception as e:
+            logger.error(f"Error creating streamed news post: {str(e)}")
+            return e
+
+    def close(self):
+        """Ответ цепочки получен: запоздавшие новости хедж-запросов больше не принимаются"""
+        with self._lock:
+            self._closed = True
+
+    def create(self, news_item: Dict) -> bool:
+        """
+        Создание новости при разборе итогового ответа: новость из потока повторно не создается,
+        возвращается ее итог (ошибка пробрасывается, как при обычном создании).
+        """
+        with self._lock:
+            outcome = self._outcomes.get(self.key(news_item))
+        if outcome is None:
+            return self._create(news_item)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def unreported(self, news_items: List[Dict]) -> Dict[str, int]:
+        """
+        Итоги новостей из потока, которых нет в итоговом ответе news_items (ответил
+        другой провайдер): {'created': ..., 'duplicates': ..., 'errors': ...}
+        """
+        final_keys = {self.key(news_item) for news_item in news_items if isinstance(news_item, dict)}
+        counts = {'created': 0, 'duplicates': 0, 'errors': 0}
+        with self._lock:
+            for key, outcome in self._outcomes.items():
+                if key in final_keys:
+                    continue
+                if isinstance(outcome, Exception):
+                    counts['errors'] += 1
+                else:
+                    counts['created' if outcome else 'duplicates'] += 1
+        return counts
@@ -0,0 +1,104 @@
+"""
+Структурированный ответ провайдеров по JSON-схеме списка новостей.
+"""
+import copy
+import json
+from typing import Dict, List
+
+SCHEMA_NAME = 'news_list'
+ANTHROPIC_TOOL_NAME = 'record_news'
+
+NEWS_ITEM_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'title': {'type': 'string', 'description': 'Заголовок новости на русском'},
+        'summary': {
+            'type': 'string',
+            'description': 'Текст новости на русском, 1 абзац. Пиши напрямую, как журналист, от третьего лица',
+        },
+        'source_url': {'type': 'string', 'description': 'Ссылка на статью; пустая строка, если ссылки нет'},
+    },
+    'required': ['title', 'summary', 'source_url'],
+    'additionalProperties': False,
+}
+
+NEWS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'news': {
+            'type': 'array',
+            'items': NEWS_ITEM_SCHEMA,
+            'description': 'Найденные новости; пустой список, если новостей нет',
+        },
+    },
+    'required': ['news'],
+    'additionalProperties': False,
+}
+
+
+def batch_schema(domains: List[str]) -> Dict:
+    """Схема пакетного ответа {"results": {"<домен>": {"news": [...]}}} для доменов пакета"""
+    return {
+        'type': 'object',
+        'properties': {
+            'results': {
+                'type': 'object',
+                'properties': {domain: NEWS_SCHEMA for domain in domains},
+                'required': list(domains),
+                'additionalProperties': False,
+            },
+        },
+        'required': ['results'],
+        'additionalProperties': False,
+    }
+
+
+def responses_text_format(schema: Dict) -> Dict:
+    """Параметр text Responses API"""
+    return {'format': {'type': 'json_schema', 'name': SCHEMA_NAME, 'schema': schema, 'strict': True}}
+
+
+def chat_response_format(schema: Dict) -> Dict:
+    """Параметр response_format Chat Completions"""
+    return {'type': 'json_schema', 'json_schema': {'name': SCHEMA_NAME, 'schema': schema, 'strict': True}}
+
+
+def gemini_schema(schema: Dict) -> Dict:
+    """Схема для response_schema Gemini: без additionalProperties (не поддерживается)"""
+    schema = copy.deepcopy(schema)
+
+    def strip(node):
+        if isinstance(node, dict):
+            node.pop('additionalProperties', None)
+            for value in node.values():
+                strip(value)
+        elif isinstance(node, list):
+            for value in node:
+                strip(value)
+
+    strip(schema)
+    return schema
+
+
+def anthropic_tool(schema: Dict) -> Dict:
+    """Инструмент Anthropic, аргументы которого — ответ по схеме"""
+    return {
+        'name': ANTHROPIC_TOOL_NAME,
+        'description': 'Сохраняет найденные новости. Вызови один раз после поиска со всеми найденными '
+                       'новостями (пустой список, если новостей нет).',
+        'input_schema': schema,
+    }
+
+
+def parse(content: str, key: str = 'news') -> Dict:
+    """
+    Разбор ответа по схеме: JSON-объект с ключом key (news — список, results — объект).
+
+    Raises:
+        json.JSONDecodeError: ответ не JSON или не соответствует схеме
+    """
+    result = json.loads(content)
+    expected = list if key == 'news' else dict
+    if not isinstance(result, dict) or not isinstance(result.get(key), expected):
+        raise json.JSONDecodeError(f"Ответ не соответствует схеме: нет '{key}'", content, 0)
+    return result
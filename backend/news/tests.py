@@ -1,11 +1,12 @@
+import json
 import os
 import shutil
 import tempfile
 import zipfile
-from io import BytesIO
+from io import BytesIO, StringIO
 from unittest.mock import patch, MagicMock
 from PIL import Image
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.core.files import File
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
@@ -21,8 +22,13 @@ class NewsImportTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(email='test@news.com', password='password')
         self.temp_dir = tempfile.mkdtemp()
+        self.media_root = tempfile.mkdtemp()
+        self.media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_settings.enable()
         
     def tearDown(self):
+        self.media_settings.disable()
+        shutil.rmtree(self.media_root)
         shutil.rmtree(self.temp_dir)
 
     def test_import_service(self):
@@ -401,6 +407,14 @@ class MediaUploadTest(TestCase):
             email='user@test.com',
             password='password'
         )
+        # Загруженные файлы пишутся во временный MEDIA_ROOT, а не в backend/media
+        self.media_root = tempfile.mkdtemp()
+        self.media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_settings.enable()
+    
+    def tearDown(self):
+        self.media_settings.disable()
+        shutil.rmtree(self.media_root)
     
     def create_test_image(self, size=(100, 100), format='PNG'):
         """Создает тестовое изображение"""
@@ -916,3 +930,2323 @@ class NewsPostTranslationTest(TestCase):
         
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('source_language', response.data)
+
+
+class DiscoveryConcurrencyTest(TestCase):
+    """Тесты параллельного выполнения поиска новостей"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .models import SearchConfiguration
+        self.config = SearchConfiguration.objects.create(name='test', is_active=True, max_workers=4)
+        self.resources = [
+            NewsResource.objects.create(name=f'Source {i}', url=f'https://source{i}.example.com')
+            for i in range(6)
+        ]
+
+    def test_executor_runs_targets_in_parallel(self):
+        """Пул потоков действительно выполняет цели одновременно"""
+        import threading
+        from .discovery_executor import DiscoveryExecutor
+
+        barrier = threading.Barrier(3, timeout=5)
+
+        def process(target):
+            barrier.wait()  # Пройдет только если 3 цели выполняются одновременно
+            return 1, 0, None
+
+        targets = [MagicMock(id=i) for i in range(3)]
+        stats = DiscoveryExecutor(process, max_workers=3).run(targets)
+        self.assertEqual(stats, {'created': 3, 'errors': 0, 'total_processed': 3})
+
+    def test_executor_retries_failed_targets_once(self):
+        """Цели с ошибкой API повторяются один раз после основного прохода"""
+        from .discovery_executor import DiscoveryExecutor
+
+        calls = []
+        progress = []
+
+        def process(target):
+            calls.append(target.id)
+            if target.id == 1:
+                return 0, 1, 'API error'
+            return 1, 0, None
+
+        targets = [MagicMock(id=i) for i in range(3)]
+        stats = DiscoveryExecutor(process, max_workers=2, max_retries=1, on_progress=progress.append).run(targets)
+
+        self.assertEqual(calls.count(1), 2)
+        self.assertEqual(stats['total_processed'], 4)
+        self.assertEqual(stats['errors'], 2)
+        self.assertEqual(progress, [1, 2, 3, 4])
+
+    def test_discover_all_news_updates_status(self):
+        """discover_all_news обрабатывает все источники и обновляет NewsDiscoveryStatus"""
+        from .discovery_service import NewsDiscoveryService
+        from .models import NewsDiscoveryStatus
+
+        status_obj = NewsDiscoveryStatus.create_new_status(0, search_type='resources')
+        service = NewsDiscoveryService(config=self.config)
+        with patch.object(service, 'discover_news_for_resource', return_value=(2, 0, None)) as mocked:
+            stats = service.discover_all_news(status_obj=status_obj)
+
+        self.assertEqual(mocked.call_count, len(self.resources))
+        self.assertEqual(stats['created'], 2 * len(self.resources))
+        status_obj.refresh_from_db()
+        self.assertEqual(status_obj.status, 'completed')
+        self.assertEqual(status_obj.processed_count, len(self.resources))
+        self.assertEqual(status_obj.total_count, len(self.resources))
+
+    def test_provider_concurrency_cap(self):
+        """provider_concurrency ограничивает одновременные запросы к провайдеру"""
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from .discovery_service import NewsDiscoveryService
+
+        self.config.provider_concurrency = {'grok': 2}
+        service = NewsDiscoveryService(config=self.config)
+
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def fake_grok(prompt, domain=None):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.05)
+            with lock:
+                state['active'] -= 1
+            return {'news': []}
+
+        with patch.object(service, '_query_grok', side_effect=fake_grok):
+            with ThreadPoolExecutor(max_workers=6) as pool:
+                list(pool.map(lambda _: service._call_provider('grok', 'prompt'), range(6)))
+
+        self.assertEqual(state['peak'], 2)
+
+    def test_auto_chain_falls_back_to_next_provider(self):
+        """В режиме auto при ошибке Grok используется следующий провайдер"""
+        from .discovery_service import NewsDiscoveryService
+
+        service = NewsDiscoveryService(config=self.config)
+        service.grok_api_key = 'key'
+        service.anthropic_api_key = 'key'
+        service.provider_chain = ['grok', 'anthropic']
+
+        with patch.object(service, '_query_grok', side_effect=Exception('timeout')), \
+                patch.object(service, '_query_anthropic', return_value={'news': [{'title': 'T', 'summary': 'S'}]}):
+            created, errors, error_msg = service.discover_news_for_resource(self.resources[0])
+
+        self.assertEqual((created, errors, error_msg), (1, 0, None))
+        self.assertTrue(NewsPost.objects.filter(title='T').exists())
+
+
+class AsyncDiscoveryTest(TestCase):
+    """Тесты асинхронного пути поиска (execution_mode='async')"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .models import SearchConfiguration
+        self.config = SearchConfiguration.objects.create(
+            name='test', is_active=True, max_workers=3,
+            execution_mode=SearchConfiguration.EXECUTION_MODE_ASYNC,
+            primary_provider='grok', fallback_chain=['grok'], delay_between_requests=0,
+        )
+        self.resources = [
+            NewsResource.objects.create(name=f'Source {i}', url=f'https://source{i}.example.com')
+            for i in range(5)
+        ]
+        from .llm_clients import get_client_registry
+        get_client_registry().clear()
+
+    def test_async_executor_limits_concurrency_and_retries(self):
+        """Не более max_workers корутин одновременно, цели с ошибкой повторяются один раз"""
+        import asyncio
+        from .discovery_executor import AsyncDiscoveryExecutor
+
+        state = {'active': 0, 'peak': 0}
+        calls = []
+
+        async def process(target):
+            calls.append(target.id)
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+            await asyncio.sleep(0.01)
+            state['active'] -= 1
+            if target.id == 0:
+                raise RuntimeError('timeout')
+            return 1, 0, None
+
+        progress = []
+        targets = [MagicMock(id=i) for i in range(6)]
+        stats = AsyncDiscoveryExecutor(process, max_workers=3, on_progress=progress.append).run(targets)
+
+        self.assertEqual(state['peak'], 3)
+        self.assertEqual(calls.count(0), 2)
+        self.assertEqual(stats, {'created': 5, 'errors': 2, 'total_processed': 7})
+        self.assertEqual(progress, list(range(1, 8)))
+
+    def test_discover_all_news_uses_async_clients(self):
+        """В режиме async запросы идут через AsyncOpenAI, новости и вызовы API сохраняются"""
+        from unittest.mock import AsyncMock
+        from .discovery_service import NewsDiscoveryService
+        from .models import DiscoveryAPICall
+
+        service = NewsDiscoveryService(config=self.config)
+        service.grok_api_key = 'key'
+        service.start_discovery_run()
+
+        async def fake_create(**kwargs):
+            domain = kwargs['tools'][0]['allowed_domains'][0]
+            return MagicMock(
+                output_text=json.dumps({'news': [{'title': f'News {domain}', 'summary': 'S'}]}),
+                usage=MagicMock(input_tokens=100, output_tokens=50),
+            )
+
+        with patch('openai.AsyncOpenAI') as async_client, patch('openai.OpenAI') as sync_client:
+            async_client.return_value.responses.create = AsyncMock(side_effect=fake_create)
+            stats = service.discover_all_news()
+
+        sync_client.assert_not_called()
+        self.assertEqual(stats['created'], len(self.resources))
+        self.assertEqual(stats['errors'], 0)
+        self.assertTrue(NewsPost.objects.filter(title='News source3.example.com').exists())
+        calls = DiscoveryAPICall.objects.filter(discovery_run=service.current_run, provider='grok')
+        self.assertEqual(calls.count(), len(self.resources))
+        self.assertEqual(
+            set(calls.values_list('resource_id', flat=True)),
+            {r.id for r in self.resources},
+        )
+
+
+class LLMClientRegistryTest(TestCase):
+    """Тесты общего реестра клиентов LLM"""
+
+    def test_clients_are_reused_per_key(self):
+        """Один клиент на (провайдер, ключ, base_url, таймаут), пул расширяется по запросу"""
+        from .llm_clients import LLMClientRegistry
+
+        registry = LLMClientRegistry(default_pool_size=4)
+        first = registry.openai('key', timeout=30)
+        self.assertIs(registry.openai('key', timeout=30), first)
+        self.assertIsNot(registry.openai('key', timeout=60), first)
+        self.assertIsNot(registry.openai('key', base_url='https://api.x.ai/v1', timeout=30, provider='grok'), first)
+        self.assertIsNot(registry.openai('other-key', timeout=30), first)
+
+        resized = registry.openai('key', timeout=30, pool_size=16)
+        self.assertIsNot(resized, first)
+        self.assertIs(registry.openai('key', timeout=30, pool_size=8), resized)
+
+        stats = registry.stats()
+        self.assertEqual(stats['created'], 4)
+        self.assertEqual(stats['reused'], 2)
+        self.assertEqual(stats['resized'], 1)
+        self.assertEqual(len(stats['clients']), 4)
+        self.assertNotIn('key', json.dumps(stats['clients']))
+
+    def test_async_clients_are_bound_to_event_loop(self):
+        """Асинхронный клиент переиспользуется внутри event loop и пересоздается в новом"""
+        import asyncio
+        from .llm_clients import LLMClientRegistry
+
+        registry = LLMClientRegistry()
+
+        async def get_twice():
+            return registry.async_anthropic('key'), registry.async_anthropic('key')
+
+        first, second = asyncio.run(get_twice())
+        self.assertIs(first, second)
+        third, _ = asyncio.run(get_twice())
+        self.assertIsNot(third, first)
+        # Клиент закрытого цикла удален из реестра
+        self.assertEqual(len(registry.stats()['clients']), 1)
+
+    def test_discovery_and_translation_share_registry(self):
+        """Поиск и перевод берут клиентов из одного реестра"""
+        from .discovery_service import NewsDiscoveryService
+        from .llm_clients import get_client_registry
+        from .translation_service import TranslationService
+
+        registry = get_client_registry()
+        registry.clear()
+        service = NewsDiscoveryService()
+        self.assertIs(service.clients, registry)
+
+        with patch.object(registry, 'openai') as openai_client:
+            openai_client.return_value.chat.completions.create.return_value = MagicMock(
+                choices=[MagicMock(message=MagicMock(content='Hallo'))]
+            )
+            translator = TranslationService()
+            translator.api_key = 'key'
+            self.assertEqual(translator._translate_openai('Привет', 'ru', 'de'), 'Hallo')
+        openai_client.assert_called_once_with('key', timeout=30.0)
+
+
+class RateLimiterTest(TestCase):
+    """Тесты ограничения частоты запросов к провайдерам"""
+
+    def setUp(self):
+        from .rate_limiter import LocalRateLimitBackend
+        LocalRateLimitBackend.reset()
+
+    def test_token_bucket_limits(self):
+        """rpm, tpm и минимальный интервал считаются в token bucket"""
+        from .rate_limiter import ProviderLimits, TokenBucket
+
+        bucket = TokenBucket()
+        limits = ProviderLimits(rpm=2, tpm=1000)
+        self.assertEqual(bucket.take(limits, 100, now=1000.0), 0)
+        self.assertEqual(bucket.take(limits, 100, now=1000.0), 0)
+        # Запросы кончились: один запрос восстанавливается за 30 секунд
+        self.assertAlmostEqual(bucket.take(limits, 100, now=1000.0), 30.0)
+        self.assertEqual(bucket.take(limits, 100, now=1030.0), 0)
+
+        bucket = TokenBucket()
+        limits = ProviderLimits(tpm=600)
+        self.assertEqual(bucket.take(limits, 500, now=0.0), 0)
+        self.assertAlmostEqual(bucket.take(limits, 500, now=0.0), 40.0)
+        # Запрос больше bucket ограничивается размером bucket
+        self.assertAlmostEqual(bucket.take(limits, 10_000, now=100.0), 0)
+
+        bucket = TokenBucket()
+        limits = ProviderLimits(min_interval=0.5)
+        self.assertEqual(bucket.take(limits, 0, now=10.0), 0)
+        self.assertAlmostEqual(bucket.take(limits, 0, now=10.2), 0.3)
+
+    def test_database_backend_shares_budget_between_limiters(self):
+        """Backend 'database' — общий бюджет для разных процессов (экземпляров лимитера)"""
+        from .models import ProviderRateLimitState, SearchConfiguration
+        from .rate_limiter import RateLimiter
+
+        config = SearchConfiguration.objects.create(
+            name='limits', rate_limits={'grok': {'rpm': 2}}, delay_between_requests=0,
+            rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_DATABASE,
+        )
+        first, second = RateLimiter(config), RateLimiter(config)
+        first.acquire('grok')
+        second.acquire('grok')
+
+        with patch('news.rate_limiter.time.sleep') as sleep:
+            sleep.side_effect = RuntimeError('would wait')
+            with self.assertRaises(RuntimeError):
+                first.acquire('grok')
+        self.assertAlmostEqual(sleep.call_args[0][0], 5.0)  # шаг ожидания ограничен MAX_WAIT_STEP
+        self.assertLess(ProviderRateLimitState.objects.get(key='grok').request_allowance, 1)
+
+        # Провайдер без лимитов не трогает БД
+        first.acquire('anthropic')
+        self.assertFalse(ProviderRateLimitState.objects.filter(key='anthropic').exists())
+
+    def test_query_reserves_and_settles_tokens(self):
+        """_query_* резервирует оценку токенов и корректирует ее по фактическому расходу"""
+        from .discovery_service import NewsDiscoveryService
+        from .models import SearchConfiguration
+
+        config = SearchConfiguration.objects.create(
+            name='limits', rate_limits={'grok': {'tpm': 100000}}, delay_between_requests=0,
+            rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL,
+        )
+        service = NewsDiscoveryService(config=config)
+        service.grok_api_key = 'key'
+        response = MagicMock(output_text='{"news": []}', usage=MagicMock(input_tokens=3000, output_tokens=500))
+
+        with patch.object(service.clients, 'openai') as client, \
+                patch.object(service.rate_limiter, 'settle', wraps=service.rate_limiter.settle) as settle:
+            client.return_value.responses.create.return_value = response
+            service._query_grok('prompt ' * 100)
+
+        reservation, actual = settle.call_args[0]
+        self.assertEqual(reservation.estimated_tokens, service.rate_limiter.estimate_tokens('prompt ' * 100))
+        self.assertEqual(actual, 3500)
+        bucket = service.rate_limiter.backend._buckets['grok']
+        self.assertAlmostEqual(bucket.token_allowance, 100000 - 3500, delta=50)
+
+
+class CircuitBreakerTest(TestCase):
+    """Тесты circuit breaker провайдеров"""
+
+    def test_state_transitions(self):
+        """closed → open по доле ошибок, пропуск на время cooldown, half_open → closed по пробному успеху"""
+        from .circuit_breaker import CircuitBreakerSet
+
+        now = [0.0]
+        breakers = CircuitBreakerSet(
+            {'window': 4, 'min_calls': 3, 'failure_rate': 0.5, 'cooldown_seconds': 60},
+            timeout_seconds=100, clock=lambda: now[0],
+        )
+        breakers.record('grok', True, 1000)
+        breakers.record('grok', False, 1000)
+        self.assertEqual(breakers.get('grok').state, 'closed')
+        # Медленный ответ (> 80% таймаута) тоже считается ошибкой
+        self.assertTrue(breakers.record('grok', True, 90_000))
+        self.assertEqual(breakers.get('grok').state, 'open')
+
+        self.assertFalse(breakers.allow('grok'))
+        now[0] = 61
+        self.assertTrue(breakers.allow('grok'))   # пробный вызов
+        self.assertFalse(breakers.allow('grok'))  # второй параллельный — нет
+        breakers.record('grok', True, 1000)
+        self.assertEqual(breakers.get('grok').state, 'closed')
+
+        state = breakers.snapshot()['grok']
+        self.assertEqual((state['calls'], state['failures'], state['slow_calls']), (4, 1, 1))
+        self.assertEqual((state['skipped'], state['times_opened']), (2, 1))
+
+    def test_auto_chain_skips_tripped_provider(self):
+        """После серии ошибок Grok пропускается, состояние видно в provider_stats запуска"""
+        from references.models import NewsResource
+        from .discovery_service import NewsDiscoveryService
+        from .models import SearchConfiguration
+
+        config = SearchConfiguration.objects.create(
+            name='breaker', is_active=True, delay_between_requests=0,
+            primary_provider='grok', fallback_chain=['grok', 'anthropic'],
+            circuit_breaker={'min_calls': 3},
+        )
+        resources = [
+            NewsResource.objects.create(name=f'Source {i}', url=f'https://source{i}.example.com')
+            for i in range(6)
+        ]
+        service = NewsDiscoveryService(config=config)
+        service.grok_api_key = 'key'
+        service.anthropic_api_key = 'key'
+        run = service.start_discovery_run()
+
+        anthropic_response = MagicMock(
+            content=[MagicMock(type='text', text='{"news": []}')],
+            usage=MagicMock(input_tokens=10, output_tokens=5),
+        )
+        with patch.object(service.clients, 'openai') as grok_client, \
+                patch.object(service.clients, 'anthropic') as anthropic_client:
+            grok_client.return_value.responses.create.side_effect = Exception('timeout')
+            anthropic_client.return_value.messages.create.return_value = anthropic_response
+            stats = service.discover_all_news()
+
+        self.assertEqual(grok_client.return_value.responses.create.call_count, 3)
+        self.assertEqual(anthropic_client.return_value.messages.create.call_count, len(resources))
+        self.assertEqual(stats['errors'], 0)
+
+        service.finish_discovery_run()
+        run.refresh_from_db()
+        grok_state = run.provider_stats['grok']['circuit_breaker']
+        self.assertEqual(grok_state['state'], 'open')
+        self.assertEqual(grok_state['skipped'], 3)
+        self.assertEqual(run.provider_stats['grok']['errors'], 3)
+        self.assertEqual(run.provider_stats['anthropic']['circuit_breaker']['state'], 'closed')
+
+
+class HedgingTest(TestCase):
+    """Тесты хеджирования запросов в цепочке auto"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .models import SearchConfiguration
+        self.config = SearchConfiguration.objects.create(
+            name='hedging', is_active=True, delay_between_requests=0,
+            primary_provider='grok', fallback_chain=['grok', 'anthropic'],
+            hedging={'enabled': True, 'default_delay_seconds': 0.05, 'min_delay_seconds': 0},
+        )
+        self.resource = NewsResource.objects.create(name='Source', url='https://source.example.com')
+
+    def _make_service(self):
+        from .discovery_service import NewsDiscoveryService
+        service = NewsDiscoveryService(config=self.config)
+        service.grok_api_key = 'key'
+        service.anthropic_api_key = 'key'
+        service.start_discovery_run()
+        return service
+
+    def test_delay_is_percentile_of_duration_history(self):
+        """Задержка — перцентиль успешных вызовов провайдера; без истории — default_delay_seconds"""
+        from .hedging import HedgePolicy
+        from .models import DiscoveryAPICall, NewsDiscoveryRun
+
+        run = NewsDiscoveryRun.start_new_run(self.config)
+        for seconds in range(1, 21):
+            DiscoveryAPICall.objects.create(discovery_run=run, provider='grok', model='m',
+                                            duration_ms=seconds * 1000)
+        DiscoveryAPICall.objects.create(discovery_run=run, provider='grok', model='m',
+                                        duration_ms=119_000, success=False)
+
+        policy = HedgePolicy({'enabled': True, 'percentile': 90, 'min_samples': 20}, timeout_seconds=120)
+        self.assertEqual(policy.get_delay('grok'), 18.0)
+        self.assertEqual(policy.get_delay('anthropic'), 30.0)
+        self.assertIsNone(HedgePolicy({'enabled': True}, timeout_seconds=20).get_delay('anthropic'))
+        self.assertIsNone(HedgePolicy({}, timeout_seconds=120).get_delay('grok'))
+
+    def test_slow_primary_is_hedged_by_next_provider(self):
+        """Grok не ответил за задержку — ответ Anthropic, хедж-запрос помечен is_hedge"""
+        import threading
+        from .models import DiscoveryAPICall
+
+        service = self._make_service()
+        release_grok = threading.Event()
+        calls = []
+
+        def slow_grok(prompt, domain=None):
+            calls.append(('grok', service._hedge_var.get(), service.current_resource))
+            release_grok.wait(5)
+            return {'news': [{'title': 'Grok news', 'summary': 'S'}]}
+
+        def fast_anthropic(prompt):
+            calls.append(('anthropic', service._hedge_var.get(), service.current_resource))
+            return {'news': [{'title': 'Hedged news', 'summary': 'S'}]}
+
+        try:
+            with patch.object(service, '_query_grok', side_effect=slow_grok), \
+                    patch.object(service, '_query_anthropic', side_effect=fast_anthropic):
+                created, errors, error_message = service.discover_news_for_resource(self.resource)
+        finally:
+            release_grok.set()
+
+        self.assertEqual((created, errors), (1, 0))
+        self.assertTrue(NewsPost.objects.filter(title='Hedged news').exists())
+        self.assertFalse(NewsPost.objects.filter(title='Grok news').exists())
+        # Хедж-запрос выполняется с контекстом источника и флагом is_hedge
+        self.assertEqual(calls, [('grok', False, self.resource), ('anthropic', True, self.resource)])
+
+        with service._target_context(resource=self.resource):
+            token = service._hedge_var.set(True)
+            service._track_api_call('anthropic', 'claude', 200, 100, 100, True)
+            service._hedge_var.reset(token)
+        service.flush_api_calls()
+        self.assertTrue(DiscoveryAPICall.objects.get(provider='anthropic').is_hedge)
+
+        run = service.current_run
+        run.refresh_from_db()
+        anthropic_stats = run.provider_stats['anthropic']
+        self.assertEqual((anthropic_stats['hedge_requests'], anthropic_stats['hedge_wins']), (1, 1))
+        self.assertGreater(anthropic_stats['hedge_cost'], 0)
+
+    def test_flush_waits_for_losing_hedge_call(self):
+        """Вызов проигравшего запроса учитывается в запуске: flush_api_calls его дожидается"""
+        import threading
+        from .models import DiscoveryAPICall
+
+        service = self._make_service()
+        release_grok = threading.Event()
+
+        def slow_grok(prompt, domain=None):
+            release_grok.wait(5)
+            # Как _track_api_call, но без запросов к БД из потока (SQLite в тестах)
+            service._get_api_call_buffer().add(
+                DiscoveryAPICall(discovery_run=service.current_run, provider='grok', model='grok-4')
+            )
+            return {'news': [{'title': 'Grok news', 'summary': 'S'}]}
+
+        def fast_anthropic(prompt):
+            return {'news': [{'title': 'Hedged news', 'summary': 'S'}]}
+
+        with patch.object(service, '_query_grok', side_effect=slow_grok), \
+                patch.object(service, '_query_anthropic', side_effect=fast_anthropic):
+            llm_response, provider_used, hedged = service._call_with_hedge(
+                'grok', 'anthropic', 0.05, 'prompt', None, 'ресурса', [],
+            )
+        self.assertEqual((provider_used, hedged), ('anthropic', True))
+        self.assertEqual(len(service._hedge_losers), 1)
+
+        threading.Timer(0.2, release_grok.set).start()
+        service.flush_api_calls()
+        self.assertEqual(service._hedge_losers, set())
+        self.assertEqual(DiscoveryAPICall.objects.filter(discovery_run=service.current_run, provider='grok').count(), 1)
+
+    def test_async_hedge_cancels_slow_primary(self):
+        """В режиме async проигравший запрос отменяется, не дожидаясь ответа"""
+        import asyncio
+        import time
+        from asgiref.sync import async_to_sync
+        from .async_discovery import AsyncNewsDiscovery
+
+        service = self._make_service()
+        cancelled = []
+
+        async def slow_grok(prompt, domain=None):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append('grok')
+                raise
+
+        async def fast_anthropic(prompt):
+            return {'news': [{'title': 'Hedged news', 'summary': 'S'}]}
+
+        started = time.time()
+        with patch.object(service, '_aquery_grok', side_effect=slow_grok), \
+                patch.object(service, '_aquery_anthropic', side_effect=fast_anthropic):
+            llm_response, provider_used, llm_error = async_to_sync(
+                AsyncNewsDiscovery(service)._run_provider_chain
+            )('prompt', 'auto', 'ресурса', domain='source.example.com')
+
+        self.assertLess(time.time() - started, 5)
+        self.assertEqual(provider_used, 'anthropic')
+        self.assertEqual(llm_response['news'][0]['title'], 'Hedged news')
+        self.assertEqual(cancelled, ['grok'])
+        self.assertIsNone(llm_error)
+
+
+class DiscoveryJobTest(TestCase):
+    """Тесты очереди заданий поиска (DiscoveryJob, discovery_worker)"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        self.admin = User.objects.create_user(email='admin@test.com', password='password', is_staff=True)
+        self.resource = NewsResource.objects.create(name='Source', url='https://source.example.com')
+
+    def test_claim_takes_each_ready_job_once(self):
+        """Задание забирает один воркер; отложенное (run_after в будущем) не забирается"""
+        from datetime import timedelta
+        from .jobs import claim_next_job, enqueue_discovery_job
+        from .models import DiscoveryJob
+
+        job = enqueue_discovery_job(DiscoveryJob.JOB_TYPE_RESOURCE, resource_ids=[self.resource.id])
+        delayed = enqueue_discovery_job(DiscoveryJob.JOB_TYPE_MANUFACTURERS)
+        delayed.run_after = timezone.now() + timedelta(hours=1)
+        delayed.save()
+
+        claimed = claim_next_job('node-1:100')
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual((claimed.status, claimed.attempts, claimed.locked_by), ('running', 1, 'node-1:100'))
+        self.assertIsNone(claim_next_job('node-2:200'))
+
+    def test_stale_jobs_are_requeued_or_failed(self):
+        """Задание без heartbeat возвращается в очередь; после max_attempts — ошибка"""
+        from datetime import timedelta
+        from .jobs import enqueue_discovery_job, requeue_stale_jobs
+        from .models import DiscoveryJob, NewsDiscoveryRun, NewsDiscoveryStatus
+
+        old = timezone.now() - timedelta(hours=1)
+        status_obj = NewsDiscoveryStatus.create_new_status(10)
+        run = NewsDiscoveryRun.start_new_run()
+        retry = enqueue_discovery_job(DiscoveryJob.JOB_TYPE_RESOURCES)
+        exhausted = enqueue_discovery_job(
+            DiscoveryJob.JOB_TYPE_RESOURCES, discovery_status=status_obj, discovery_run=run,
+        )
+        DiscoveryJob.objects.filter(id=retry.id).update(status='running', attempts=1, heartbeat_at=old)
+        DiscoveryJob.objects.filter(id=exhausted.id).update(status='running', attempts=3, heartbeat_at=old)
+
+        self.assertEqual(requeue_stale_jobs(), 1)
+        retry.refresh_from_db()
+        exhausted.refresh_from_db()
+        status_obj.refresh_from_db()
+        self.assertEqual((retry.status, retry.locked_by), ('queued', ''))
+        self.assertEqual(exhausted.status, 'failed')
+        self.assertEqual(status_obj.status, 'error')
+        run.refresh_from_db()
+        self.assertEqual(run.status, NewsDiscoveryRun.STATUS_FAILED)
+        self.assertIsNotNone(run.finished_at)
+
+    def test_worker_runs_job_and_stores_result(self):
+        """discovery_worker --once выполняет задание через NewsDiscoveryService"""
+        from io import StringIO
+        from django.core.management import call_command
+        from .jobs import enqueue_discovery_job
+        from .models import DiscoveryJob, NewsDiscoveryStatus
+
+        status_obj = NewsDiscoveryStatus.create_new_status(1)
+        job = enqueue_discovery_job(
+            DiscoveryJob.JOB_TYPE_RESOURCES, user=self.admin, discovery_status=status_obj,
+            resource_ids=[self.resource.id], last_search_date=timezone.now().date(),
+        )
+        failing = enqueue_discovery_job(DiscoveryJob.JOB_TYPE_MANUFACTURERS)
+
+        stats = {'created': 2, 'errors': 0, 'total_processed': 1, 'skipped_manual': 0}
+        with patch('news.jobs.NewsDiscoveryService.discover_all_news', return_value=stats) as discover_all, \
+                patch('news.jobs.NewsDiscoveryService.discover_all_manufacturers_news',
+                      side_effect=RuntimeError('boom')):
+            call_command('discovery_worker', '--once', stdout=StringIO())
+
+        kwargs = discover_all.call_args.kwargs
+        self.assertEqual(list(kwargs['resources']), [self.resource])
+        self.assertEqual(kwargs['status_obj'], status_obj)
+        self.assertEqual(kwargs['last_search_date_override'], timezone.now().date())
+
+        job.refresh_from_db()
+        failing.refresh_from_db()
+        self.assertEqual((job.status, job.result), ('completed', stats))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual((failing.status, failing.error_message), ('failed', 'boom'))
+
+    def test_api_discover_news_enqueues_job(self):
+        """POST /api/references/resources/<id>/discover_news/ только ставит задание"""
+        from .models import DiscoveryJob
+
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        with patch('news.jobs.NewsDiscoveryService') as service_class:
+            response = client.post(
+                f'/api/references/resources/{self.resource.id}/discover_news/', {'provider': 'grok'}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        service_class.assert_not_called()
+        job = DiscoveryJob.objects.get(id=response.data['job_id'])
+        self.assertEqual((job.job_type, job.status, job.provider), ('resource', 'queued', 'grok'))
+        self.assertEqual(job.params, {'resource_ids': [self.resource.id]})
+        self.assertEqual(job.user, self.admin)
+
+
+class DiscoveryCheckpointTest(TestCase):
+    """Тесты чекпоинтов запуска поиска (DiscoveryWorkItem) и продолжения запуска"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .models import SearchConfiguration
+        self.config = SearchConfiguration.objects.create(name='test', is_active=True, max_workers=2)
+        self.resources = [
+            NewsResource.objects.create(name=f'Source {i}', url=f'https://source{i}.example.com')
+            for i in range(4)
+        ]
+
+    def _service(self, handler):
+        from .discovery_service import NewsDiscoveryService
+        service = NewsDiscoveryService(config=self.config)
+        service.discover_news_for_resource = handler
+        return service
+
+    def test_work_items_record_progress(self):
+        """Каждая цель получает work item с итогом, числом попыток и провайдером"""
+        from .models import NewsDiscoveryRun
+
+        def handler(resource, provider, last_search_date_override):
+            if resource == self.resources[1]:
+                return 0, 1, 'API error'
+            service._note_provider_used('grok')
+            return 2, 0, None
+
+        service = self._service(handler)
+        service.discover_all_news(resources=self.resources)
+
+        run = NewsDiscoveryRun.objects.get()
+        items = {item.resource_id: item for item in run.work_items.all()}
+        self.assertEqual(run.status, 'completed')
+        self.assertEqual(run.search_type, 'resources')
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual((run.news_found, run.resources_processed, run.resources_failed), (6, 4, 1))
+        self.assertEqual(run.last_search_date, timezone.now().date())
+        self.assertEqual(
+            [(items[r.id].status, items[r.id].provider) for r in self.resources],
+            [('done', 'grok'), ('failed', ''), ('done', 'grok'), ('done', 'grok')],
+        )
+        self.assertEqual(items[self.resources[1].id].attempts, 2)
+        self.assertEqual(items[self.resources[1].id].error_message, 'API error')
+
+    def test_resume_processes_only_unfinished_targets(self):
+        """Продолжение пропускает 'done', повторяет 'failed' и оборванные 'in_flight'"""
+        from datetime import date
+        from .checkpoints import RunCheckpoint
+        from .models import NewsDiscoveryRun
+
+        run = NewsDiscoveryRun.start_new_run(self.config)
+        RunCheckpoint.begin(run, 'resources', self.resources, 'grok', date(2025, 1, 1))
+        for resource, item_status in zip(self.resources, ['done', 'in_flight', 'failed']):
+            run.work_items.filter(resource=resource).update(status=item_status, news_created=1)
+        NewsDiscoveryRun.objects.filter(pk=run.pk).update(status='failed')
+        run.refresh_from_db()
+
+        calls = []
+
+        def handler(resource, provider, last_search_date_override):
+            calls.append((resource.id, provider, last_search_date_override))
+            return 1, 0, None
+
+        stats = self._service(handler).resume_discovery_run(run)
+
+        self.assertEqual(
+            sorted(calls), [(r.id, 'grok', date(2025, 1, 1)) for r in self.resources[1:]]
+        )
+        self.assertEqual(stats['total_processed'], 3)
+        run.refresh_from_db()
+        self.assertEqual((run.status, run.news_found, run.resources_processed), ('completed', 4, 4))
+        self.assertFalse(run.is_resumable)
+        self.assertFalse(run.work_items.exclude(status='done').exists())
+
+    def test_cancelled_run_keeps_pending_targets(self):
+        """После отмены необработанные цели остаются 'pending', запуск можно продолжить"""
+        from .models import NewsDiscoveryRun
+
+        self.config.max_workers = 1
+        self.config.save()
+
+        def handler(resource, provider, last_search_date_override):
+            NewsDiscoveryRun.objects.update(status='cancelled')
+            return 1, 0, None
+
+        with patch('news.checkpoints.CANCEL_CHECK_INTERVAL', 0):
+            stats = self._service(handler).discover_all_news(resources=self.resources)
+
+        self.assertEqual(stats['total_processed'], 1)
+        run = NewsDiscoveryRun.objects.get()
+        self.assertEqual(run.status, 'cancelled')
+        self.assertTrue(run.is_resumable)
+        self.assertEqual(run.work_items.filter(status='pending').count(), 3)
+
+    def test_api_resume_enqueues_job(self):
+        """POST /api/discovery-runs/<id>/resume/ ставит задание 'resume' для воркера"""
+        from .checkpoints import RunCheckpoint
+        from .jobs import execute_job
+        from .models import DiscoveryJob, NewsDiscoveryRun
+
+        admin = User.objects.create_user(email='admin@test.com', password='password', is_staff=True)
+        run = NewsDiscoveryRun.start_new_run(self.config)
+        RunCheckpoint.begin(run, 'resources', self.resources, 'auto')
+        client = APIClient()
+        client.force_authenticate(user=admin)
+
+        self.assertEqual(client.post(f'/api/discovery-runs/{run.id}/resume/').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(client.post(f'/api/discovery-runs/{run.id}/cancel/').status_code, status.HTTP_200_OK)
+        response = client.post(f'/api/discovery-runs/{run.id}/resume/')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = DiscoveryJob.objects.get(id=response.data['job_id'])
+        self.assertEqual((job.job_type, job.discovery_run), ('resume', run))
+        with patch('news.jobs.NewsDiscoveryService.resume_discovery_run', return_value={}) as resume:
+            execute_job(job)
+        self.assertEqual(resume.call_args.args[0], run)
+
+    def test_resume_running_run_without_live_job(self):
+        """Запуск 'running', чей воркер перестал присылать heartbeat, можно продолжить; с живым заданием — нет"""
+        from datetime import timedelta
+        from .checkpoints import RunCheckpoint
+        from .jobs import can_resume_run, enqueue_discovery_job
+        from .models import DiscoveryJob, NewsDiscoveryRun
+
+        admin = User.objects.create_user(email='admin@test.com', password='password', is_staff=True)
+        run = NewsDiscoveryRun.start_new_run(self.config)
+        RunCheckpoint.begin(run, 'resources', self.resources, 'auto')
+        job = enqueue_discovery_job(DiscoveryJob.JOB_TYPE_RESOURCES, discovery_run=run)
+        DiscoveryJob.objects.filter(id=job.id).update(status='running', attempts=1, heartbeat_at=timezone.now())
+        client = APIClient()
+        client.force_authenticate(user=admin)
+
+        self.assertFalse(can_resume_run(run))
+        self.assertEqual(client.post(f'/api/discovery-runs/{run.id}/resume/').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+        DiscoveryJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertTrue(can_resume_run(run))
+        response = client.post(f'/api/discovery-runs/{run.id}/resume/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        # Продолжение уже в очереди — второе не ставится
+        self.assertFalse(can_resume_run(run))
+
+        # Запуск без заданий (manage.py discover_remaining_news) продолжается, когда его цели давно не менялись
+        inline_run = NewsDiscoveryRun.start_new_run(self.config)
+        RunCheckpoint.begin(inline_run, 'resources', self.resources, 'auto')
+        self.assertFalse(can_resume_run(inline_run))
+        NewsDiscoveryRun.objects.filter(id=inline_run.id).update(started_at=timezone.now() - timedelta(hours=1))
+        inline_run.refresh_from_db()
+        self.assertTrue(can_resume_run(inline_run))
+
+
+class APICallBufferTest(TestCase):
+    """Тесты пакетной записи вызовов API (APICallBuffer)"""
+
+    def setUp(self):
+        from .models import NewsDiscoveryRun
+        self.run = NewsDiscoveryRun.start_new_run()
+
+    def _call(self, provider='grok', success=True, is_hedge=False):
+        from .models import DiscoveryAPICall
+        return DiscoveryAPICall(
+            discovery_run=self.run, provider=provider, model='m', input_tokens=100, output_tokens=50,
+            cost_usd=0.25, duration_ms=10, success=success, is_hedge=is_hedge,
+        )
+
+    def test_calls_are_written_on_flush(self):
+        """Вызовы копятся в памяти и записываются одной пачкой с агрегатами запуска"""
+        from .api_call_buffer import APICallBuffer
+
+        buffer = APICallBuffer(self.run, batch_size=10, flush_interval=60)
+        buffer.add(self._call())
+        buffer.add(self._call(success=False))
+        buffer.add(self._call('anthropic', is_hedge=True))
+        buffer.record_hedge_win('anthropic')
+        self.assertFalse(self.run.api_calls.exists())
+
+        buffer.flush()
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.api_calls.count(), 3)
+        self.assertEqual((self.run.total_requests, self.run.total_input_tokens, self.run.total_output_tokens),
+                         (3, 300, 150))
+        self.assertEqual(float(self.run.estimated_cost_usd), 0.75)
+        self.assertEqual((self.run.provider_stats['grok']['requests'], self.run.provider_stats['grok']['errors']),
+                         (2, 1))
+        anthropic = self.run.provider_stats['anthropic']
+        self.assertEqual((anthropic['hedge_requests'], anthropic['hedge_wins'], anthropic['hedge_cost']),
+                         (1, 1, 0.25))
+
+        buffer.add(self._call())
+        buffer.flush()
+        self.run.refresh_from_db()
+        self.assertEqual((self.run.total_requests, self.run.provider_stats['grok']['requests']), (4, 3))
+
+    def test_flushes_by_batch_size(self):
+        """Буфер сбрасывается сам, когда набралось batch_size вызовов"""
+        from .api_call_buffer import APICallBuffer
+
+        buffer = APICallBuffer(self.run, batch_size=2, flush_interval=60)
+        buffer.add(self._call())
+        self.assertEqual(self.run.api_calls.count(), 0)
+        buffer.add(self._call())
+        self.assertEqual(self.run.api_calls.count(), 2)
+
+    def test_workers_sharing_run_do_not_lose_updates(self):
+        """Буферы разных воркеров с устаревшими копиями запуска только прибавляют свои дельты"""
+        from .api_call_buffer import APICallBuffer
+        from .models import NewsDiscoveryRun
+
+        first = APICallBuffer(NewsDiscoveryRun.objects.get(pk=self.run.pk), flush_interval=60)
+        second = APICallBuffer(NewsDiscoveryRun.objects.get(pk=self.run.pk), flush_interval=60)
+        first.add(self._call('grok'))
+        second.add(self._call('grok'))
+        second.add(self._call('openai'))
+        first.flush()
+        second.flush()
+        first.run.set_circuit_breaker_states({'grok': {'state': 'closed'}})
+
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.total_requests, 3)
+        self.assertEqual(self.run.provider_stats['grok']['requests'], 2)
+        self.assertEqual(self.run.provider_stats['grok']['circuit_breaker'], {'state': 'closed'})
+        self.assertEqual(self.run.provider_stats['openai']['requests'], 1)
+
+
+class SearchWatermarkTest(TestCase):
+    """Тесты периода поиска по водяному знаку цели (search_watermark)"""
+
+    def setUp(self):
+        from datetime import date
+        from references.models import NewsResource, NewsResourceStatistics
+        from .models import NewsDiscoveryRun, SearchConfiguration
+        self.config = SearchConfiguration.objects.create(name='test', is_active=True)
+        NewsDiscoveryRun.objects.create(last_search_date=date(2025, 1, 1))
+        self.searched = NewsResource.objects.create(name='Searched', url='https://searched.example.com')
+        self.fresh = NewsResource.objects.create(name='Fresh', url='https://fresh.example.com')
+        NewsResourceStatistics.objects.create(resource=self.searched, search_watermark=date(2025, 3, 1))
+
+    def test_period_starts_at_target_watermark(self):
+        """Источник ищется с даты своего последнего успешного поиска, новый — за DEFAULT_SEARCH_LOOKBACK"""
+        from datetime import date, timedelta
+        from .discovery_service import NewsDiscoveryService
+        from .models import NewsDiscoveryRun
+
+        service = NewsDiscoveryService(config=self.config)
+        self.assertEqual(service._prepare_resource_query(self.searched)[2], date(2025, 3, 1))
+        self.assertEqual(service._prepare_resource_query(self.fresh)[2],
+                         timezone.now().date() - timedelta(days=14))
+        # Старая дата прошлых запусков на период цели без знака не влияет
+        NewsDiscoveryRun.start_new_run(self.config)
+        self.assertEqual(service._prepare_resource_query(self.fresh)[2], NewsDiscoveryRun.default_search_start())
+        self.assertEqual(service._prepare_resource_query(self.searched, date(2024, 6, 1))[2], date(2024, 6, 1))
+
+    def test_prompt_contains_target_window(self):
+        """Промпты ru и en запрашивают период от водяного знака цели до сегодня"""
+        from .discovery_service import NewsDiscoveryService
+
+        service = NewsDiscoveryService(config=self.config)
+        today = timezone.now().date()
+        self.searched.language = 'ru'
+        prompt = service._prepare_resource_query(self.searched)[0]
+        self.assertIn(f"с 01.03.2025 по {today.strftime('%d.%m.%Y')}", prompt)
+        self.searched.language = 'en'
+        prompt = service._prepare_resource_query(self.searched)[0]
+        self.assertIn(f"from 2025-03-01 to {today.isoformat()}", prompt)
+        self.assertNotIn('2 weeks', prompt)
+
+    def test_watermark_advances_only_on_success(self):
+        """Успешный поиск сдвигает знак на сегодня, ошибка провайдера — нет"""
+        from datetime import date
+        from references.models import NewsResourceStatistics
+        from .discovery_service import NewsDiscoveryService
+
+        service = NewsDiscoveryService(config=self.config)
+        today = timezone.now().date()
+        service._ingest_response('resource', self.searched, 'grok', None, 'timeout', date(2025, 3, 1), today)
+        self.assertEqual(NewsResourceStatistics.objects.get(resource=self.searched).search_watermark, date(2025, 3, 1))
+
+        service._ingest_response('resource', self.searched, 'grok', {'news': []}, None, date(2025, 3, 1), today)
+        self.assertEqual(NewsResourceStatistics.objects.get(resource=self.searched).search_watermark, today)
+
+
+class NewsDedupTest(TestCase):
+    """Тесты дедупликации найденных новостей (news/dedup.py)"""
+
+    def setUp(self):
+        from references.models import Manufacturer, NewsResource
+        from .models import SearchConfiguration
+        self.config = SearchConfiguration.objects.create(name='test', is_active=True, max_workers=1)
+        self.resource = NewsResource.objects.create(name='Source', url='https://source.example.com/news/')
+        self.manufacturer = Manufacturer.objects.create(name='Maker', website_1='https://maker.example.com')
+
+    def test_canonical_url_hash(self):
+        """Трекинговые параметры, www, регистр хоста и слеш не меняют хеш; главная страница хеша не получает"""
+        from .dedup import title_fingerprint, url_hash
+
+        self.assertEqual(
+            url_hash('http://WWW.Example.com/news/1/?utm_source=x&b=2&a=1#top'),
+            url_hash('https://example.com/news/1?a=1&b=2'),
+        )
+        self.assertNotEqual(url_hash('https://example.com/news/1'), url_hash('https://example.com/news/2'))
+        self.assertEqual(url_hash('https://example.com/'), '')
+        self.assertEqual(title_fingerprint('Новый чиллер: запуск!'), title_fingerprint('новый  ЧИЛЛЕР — запуск'))
+        self.assertEqual(title_fingerprint('Новости'), '')
+
+    def test_duplicates_are_skipped_and_merged(self):
+        """Повтор по URL статьи или заголовку не создает новость; ссылка на статью переносится"""
+        from .discovery_service import NewsDiscoveryService
+
+        service = NewsDiscoveryService(config=self.config)
+        self.assertTrue(service._create_manufacturer_news_post({'title': 'Новый чиллер Maker X', 'summary': 'S'},
+                                                               self.manufacturer))
+        # Та же новость от источника: по заголовку — дубликат, ссылка на статью переносится
+        self.assertFalse(service._create_news_post(
+            {'title': 'Новый чиллер Maker X!', 'summary': 'S', 'source_url': 'https://source.example.com/news/1'},
+            self.resource,
+        ))
+        # Другой заголовок, но та же статья
+        self.assertFalse(service._create_news_post(
+            {'title': 'Maker X: обзор', 'summary': 'S', 'source_url': 'https://source.example.com/news/1?utm_medium=rss'},
+            self.resource,
+        ))
+        # Без ссылки на статью (URL ресурса) сравнивается только заголовок
+        self.assertTrue(service._create_news_post(
+            {'title': 'Выставка климатической техники', 'summary': 'S'}, self.resource,
+        ))
+
+        self.assertEqual(NewsPost.objects.count(), 2)
+        merged = NewsPost.objects.get(manufacturer=self.manufacturer)
+        self.assertEqual(merged.source_url, 'https://source.example.com/news/1')
+        self.assertEqual(NewsPost.objects.get(title='Выставка климатической техники').source_url_hash, '')
+
+    def test_run_counts_duplicates(self):
+        """Дубликаты не считаются созданными и попадают в NewsDiscoveryRun.news_duplicates"""
+        from .discovery_service import NewsDiscoveryService
+        from .models import NewsDiscoveryRun
+
+        response = {'news': [
+            {'title': 'Новый чиллер Maker X', 'summary': 'S', 'source_url': 'https://source.example.com/news/1'},
+            {'title': 'Новый чиллер Maker X', 'summary': 'S', 'source_url': 'https://source.example.com/news/1'},
+        ]}
+        service = NewsDiscoveryService(config=self.config)
+        with patch.object(service, '_run_provider_chain', return_value=(response, 'grok', None)):
+            first = service.discover_all_news(resources=[self.resource])
+            second = service.discover_all_news(resources=[self.resource])
+
+        self.assertEqual((first['created'], second['created']), (1, 0))
+        runs = list(NewsDiscoveryRun.objects.filter(search_type='resources').order_by('id'))
+        self.assertEqual([run.news_duplicates for run in runs], [1, 2])
+        self.assertEqual(NewsPost.objects.filter(is_no_news_found=False).count(), 1)
+
+
+class NearDuplicateTest(TestCase):
+    """Тесты групп похожих новостей (news/near_duplicates.py)"""
+
+    DAIKIN_1 = ('Daikin представила новый чиллер EWAD-TZ с инверторными компрессорами',
+                'Компания Daikin Europe выпустила чиллер EWAD-TZ мощностью до 2 МВт с винтовыми инверторными '
+                'компрессорами и хладагентом R1234ze. Сезонная эффективность SEER достигает 6,2, модель '
+                'предназначена для офисных зданий и дата-центров.')
+    DAIKIN_2 = ('Daikin выпустила инверторный чиллер EWAD-TZ на хладагенте R1234ze',
+                'Daikin Europe анонсировала серию чиллеров EWAD-TZ холодопроизводительностью до 2 МВт. Винтовые '
+                'компрессоры с инвертором обеспечивают SEER до 6,2; оборудование рассчитано на дата-центры '
+                'и офисные здания.')
+    DAIKIN_3 = ('Чиллер Daikin EWAD-TZ: инверторные винтовые компрессоры и R1234ze',
+                'Daikin Europe представила чиллеры EWAD-TZ до 2 МВт с инверторными винтовыми компрессорами. '
+                'SEER до 6,2, хладагент R1234ze, применение — дата-центры и офисы.')
+    MITSUBISHI = ('Mitsubishi Electric открыла завод тепловых насосов в Турции',
+                  'Mitsubishi Electric запустила производство тепловых насосов воздух-вода Ecodan в Манисе. '
+                  'Мощность завода — 100 тысяч единиц в год, продукция пойдет на европейский рынок.')
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .models import SearchConfiguration
+        self.config = SearchConfiguration.objects.create(name='test', is_active=True)
+        self.resources = [
+            NewsResource.objects.create(name=f'Source {i}', url=f'https://source{i}.example.com')
+            for i in range(4)
+        ]
+
+    def _create(self, service, resource, story):
+        title, summary = story
+        service._create_news_post({'title': title, 'summary': summary}, resource)
+        return NewsPost.objects.get(title=title)
+
+    def test_paraphrases_are_grouped_under_representative(self):
+        """Пересказы одного сюжета из разных источников попадают в группу первой новости"""
+        from .discovery_service import NewsDiscoveryService
+
+        service = NewsDiscoveryService(config=self.config)
+        first = self._create(service, self.resources[0], self.DAIKIN_1)
+        second = self._create(service, self.resources[1], self.DAIKIN_2)
+        third = self._create(service, self.resources[2], self.DAIKIN_3)
+        other = self._create(service, self.resources[3], self.MITSUBISHI)
+
+        self.assertIsNone(first.near_duplicate_of)
+        self.assertEqual(second.near_duplicate_of, first)
+        self.assertGreaterEqual(second.near_duplicate_score, 0.4)
+        self.assertEqual(third.near_duplicate_of, first)
+        self.assertIsNone(other.near_duplicate_of)
+        self.assertEqual(set(first.near_duplicates.all()), {second, third})
+
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user(email='a@test.com', password='p', is_staff=True))
+        response = client.get('/api/news/', {'near_duplicates': 'false'})
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual({item['id'] for item in results}, {first.id, other.id})
+
+    def test_lookup_is_index_only(self):
+        """Проверка новости — два индексных запроса, независимо от числа новостей за период"""
+        from .near_duplicates import band_buckets, extract_features, find_similar, index_post, minhash
+
+        for i in range(30):
+            index_post(NewsPost.objects.create(
+                title=f'Новость номер {i} о вентиляции склада {i * 7}',
+                body=f'Проект {i}: приточная установка {i * 13} м3/ч для склада в городе {i * 3}.',
+            ))
+        similar = NewsPost.objects.create(title=self.DAIKIN_2[0], body=self.DAIKIN_2[1])
+        index_post(similar)
+        signature = minhash(extract_features('\n'.join(self.DAIKIN_1)))
+        with self.assertNumQueries(2):
+            match, score = find_similar(signature, band_buckets(signature))
+        self.assertEqual(match.news_post, similar)
+
+    def test_command_indexes_existing_posts(self):
+        """index_near_duplicates группирует новости, созданные до появления индекса"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        first = NewsPost.objects.create(title=self.DAIKIN_1[0], body=self.DAIKIN_1[1])
+        second = NewsPost.objects.create(title=self.DAIKIN_2[0], body=self.DAIKIN_2[1])
+        call_command('index_near_duplicates', stdout=StringIO())
+
+        second.refresh_from_db()
+        self.assertEqual(second.near_duplicate_of, first)
+        self.assertTrue(hasattr(first, 'signature'))
+
+
+class ResponseArchiveTest(TestCase):
+    """Тесты архива сырых ответов LLM (news/response_archive.py)"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .models import SearchConfiguration
+        self.config = SearchConfiguration.objects.create(
+            name='test', is_active=True, max_workers=1, primary_provider='grok', fallback_chain=['grok'],
+            delay_between_requests=0, rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL,
+        )
+        self.resource = NewsResource.objects.create(name='Source', url='https://source.example.com')
+        from .llm_clients import get_client_registry
+        get_client_registry().clear()
+
+    def _service(self):
+        from .discovery_service import NewsDiscoveryService
+        service = NewsDiscoveryService(config=self.config)
+        service.grok_api_key = 'key'
+        return service
+
+    def _grok_response(self, title='Новый чиллер Maker X'):
+        return MagicMock(
+            output_text=json.dumps({'news': [{'title': title, 'summary': 'S'}]}, ensure_ascii=False),
+            usage=MagicMock(input_tokens=100, output_tokens=50),
+        )
+
+    def test_response_is_archived_and_linked(self):
+        """Ответ сохраняется сжатым с периодом поиска и связывается с DiscoveryAPICall"""
+        from datetime import date
+        from .models import DiscoveryAPICall, DiscoveryRawResponse
+        from .response_archive import response_text
+
+        service = self._service()
+        service.start_discovery_run()
+        with patch.object(service.clients, 'openai') as client:
+            client.return_value.responses.create.return_value = self._grok_response()
+            service.discover_news_for_resource(self.resource, last_search_date_override=date(2026, 1, 1))
+        service.flush_api_calls()
+
+        archived = DiscoveryRawResponse.objects.get()
+        self.assertEqual((archived.provider, archived.resource), ('grok', self.resource))
+        self.assertEqual(archived.search_start, date(2026, 1, 1))
+        self.assertTrue(archived.parsed)
+        self.assertEqual(archived.news_count, 1)
+        self.assertIn('Новый чиллер Maker X', response_text(archived))
+        self.assertLess(len(archived.content), archived.raw_size + 20)
+        self.assertEqual(DiscoveryAPICall.objects.get().raw_response, archived)
+
+    def test_repeated_request_is_served_from_archive(self):
+        """Одинаковый запрос в пределах TTL не идет к провайдеру; при TTL = 0 кэш выключен"""
+        from datetime import date
+
+        service = self._service()
+        with patch.object(service.clients, 'openai') as client:
+            client.return_value.responses.create.return_value = self._grok_response()
+            service.discover_news_for_resource(self.resource, last_search_date_override=date(2026, 1, 1))
+            service.discover_news_for_resource(self.resource, last_search_date_override=date(2026, 1, 1))
+            self.assertEqual(client.return_value.responses.create.call_count, 1)
+
+            # Другой период — другой ключ
+            service.discover_news_for_resource(self.resource, last_search_date_override=date(2026, 1, 2))
+            self.assertEqual(client.return_value.responses.create.call_count, 2)
+
+            self.config.response_cache_ttl_hours = 0
+            service.discover_news_for_resource(self.resource, last_search_date_override=date(2026, 1, 1))
+            self.assertEqual(client.return_value.responses.create.call_count, 3)
+
+    def test_reparse_rebuilds_posts_without_network(self):
+        """reparse_responses создает новости из архива, повторный запуск находит только дубликаты"""
+        from datetime import date
+        from django.core.management import call_command
+        from . import response_archive
+        from .discovery_service import NewsDiscoveryService
+        from .models import DiscoveryRawResponse
+
+        content = 'Вот что нашлось:\n```json\n{"news": [{"title": "Выставка климатической техники", "summary": "S"}]}\n```'
+        response_archive.store('grok', 'grok-4-1-fast', 'prompt', content, (date(2026, 1, 1), date(2026, 1, 15)),
+                               resource=self.resource)
+
+        out = StringIO()
+        with patch.object(NewsDiscoveryService, '_call_provider') as call_provider:
+            call_command('reparse_responses', '--failed', stdout=out)
+            call_command('reparse_responses', stdout=out)
+        call_provider.assert_not_called()
+
+        self.assertEqual(NewsPost.objects.filter(title='Выставка климатической техники').count(), 1)
+        self.assertEqual(DiscoveryRawResponse.objects.get().news_count, 1)
+        self.assertIn('создано: 0, уже были сохранены: 1', out.getvalue())
+
+
+class CrawlScheduleTest(TestCase):
+    """Тесты адаптивного расписания поиска (news/crawl_schedule.py)"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .models import SearchConfiguration
+        self.config = SearchConfiguration.objects.create(name='test', is_active=True, max_workers=1)
+        self.resources = [
+            NewsResource.objects.create(name=f'Source {i}', url=f'https://source{i}.example.com')
+            for i in range(3)
+        ]
+
+    def test_backoff_and_promotion(self):
+        """Поиски без новостей удваивают интервал до предела, новости возвращают базовый, много новостей — минимальный"""
+        from datetime import timedelta
+        from references.models import NewsResourceStatistics
+        from .crawl_schedule import CrawlSchedule
+
+        schedule = CrawlSchedule({'max_interval_hours': 100})
+        stats = NewsResourceStatistics(resource=self.resources[0])
+        intervals = [schedule.interval(stats, 0, True, False) for _ in range(3)]
+        self.assertEqual(intervals, [timedelta(hours=48), timedelta(hours=96), timedelta(hours=100)])
+        # Ошибка провайдеров: о цели ничего не узнали, серия не меняется
+        self.assertEqual(schedule.interval(stats, 0, False, True), timedelta(hours=12))
+        self.assertEqual(stats.empty_search_streak, 3)
+
+        self.assertEqual(schedule.interval(stats, 1, False, False), timedelta(hours=24))
+        self.assertEqual(stats.empty_search_streak, 0)
+        self.assertEqual(schedule.interval(stats, 5, False, False), timedelta(hours=12))
+
+    def test_full_pass_picks_only_due_targets(self):
+        """Полный проход пропускает цели, которым рано искать; явный период поиска расписание не учитывает"""
+        from datetime import date, timedelta
+        from references.models import NewsResourceStatistics
+        from .discovery_service import NewsDiscoveryService
+
+        NewsResourceStatistics.objects.create(
+            resource=self.resources[0], next_search_at=timezone.now() + timedelta(days=3)
+        )
+        service = NewsDiscoveryService(config=self.config)
+        with patch.object(service, '_run_provider_chain', return_value=({'news': []}, 'grok', None)) as chain:
+            first = service.discover_all_news()
+            self.assertEqual((first['total_processed'], first['skipped_not_due']), (2, 1))
+
+            stats = NewsResourceStatistics.objects.get(resource=self.resources[1])
+            self.assertEqual(stats.empty_search_streak, 1)
+            self.assertAlmostEqual(
+                (stats.next_search_at - timezone.now()).total_seconds(), 48 * 3600, delta=60
+            )
+
+            second = service.discover_all_news()
+            self.assertEqual((second['total_processed'], second['skipped_not_due']), (0, 3))
+
+            forced = service.discover_all_news(last_search_date_override=date(2026, 1, 1))
+            self.assertEqual((forced['total_processed'], forced['skipped_not_due']), (3, 0))
+        self.assertEqual(chain.call_count, 5)
+
+    def test_section_job_respects_schedule_unless_ignored(self):
+        """Задание по выбранным источникам учитывает расписание так же, как полный проход; ignore_schedule — нет"""
+        from datetime import timedelta
+        from references.models import NewsResourceStatistics
+        from .jobs import enqueue_discovery_job, execute_job
+        from .models import DiscoveryJob
+
+        NewsResourceStatistics.objects.create(
+            resource=self.resources[0], next_search_at=timezone.now() + timedelta(days=3)
+        )
+        ids = [resource.id for resource in self.resources[:2]]
+        scheduled = enqueue_discovery_job(DiscoveryJob.JOB_TYPE_RESOURCES, config=self.config, resource_ids=ids)
+        forced = enqueue_discovery_job(
+            DiscoveryJob.JOB_TYPE_RESOURCES, config=self.config, resource_ids=ids, ignore_schedule=True,
+        )
+        self.assertEqual(forced.params, {'resource_ids': ids, 'ignore_schedule': True})
+
+        with patch('news.discovery_service.NewsDiscoveryService._run_provider_chain',
+                   return_value=({'news': []}, 'grok', None)):
+            first = execute_job(scheduled)
+            second = execute_job(forced)
+        self.assertEqual((first['total_processed'], first['skipped_not_due']), (1, 1))
+        self.assertEqual((second['total_processed'], second['skipped_not_due']), (2, 0))
+
+
+class ResourceBatchingTest(TestCase):
+    """Тесты пакетных запросов по нескольким источникам (news/batching.py)"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .models import SearchConfiguration
+        self.config = SearchConfiguration.objects.create(
+            name='test', is_active=True, max_workers=1, primary_provider='grok', fallback_chain=['grok'],
+            delay_between_requests=0, rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL,
+            batching={'enabled': True, 'max_batch_size': 3},
+        )
+        self.resources = [
+            NewsResource.objects.create(name=f'Small {i}', url=f'https://small{i}.example.com', language='en',
+                                        section='Europe')
+            for i in range(3)
+        ]
+        from .llm_clients import get_client_registry
+        get_client_registry().clear()
+
+    def test_plan_groups_low_yield_resources_of_one_language_and_section(self):
+        """В пакет попадают малопродуктивные источники одного языка и раздела без своих инструкций"""
+        from references.models import NewsResource, NewsResourceStatistics
+        from .discovery_service import NewsDiscoveryService
+
+        extra = [
+            NewsResource.objects.create(name='Small 3', url='https://small3.example.com', language='en', section='Europe'),
+            NewsResource.objects.create(name='Russian', url='https://ru.example.com', language='ru', section='Europe'),
+            NewsResource.objects.create(name='Custom', url='https://custom.example.com', language='en',
+                                        section='Europe', custom_search_instructions='Search the blog'),
+            NewsResource.objects.create(name='Big', url='https://big.example.com', language='en', section='Europe'),
+            NewsResource.objects.create(name='Asia', url='https://asia.example.com', language='en', section='Asia'),
+        ]
+        NewsResourceStatistics.objects.create(resource=extra[3], ranking_score=80)
+
+        service = NewsDiscoveryService(config=self.config)
+        batches = service._plan_resource_batches(self.resources + extra)
+
+        self.assertEqual(set(batches), {r.id for r in self.resources})
+        self.assertEqual(len({id(batch) for batch in batches.values()}), 1)
+        self.assertEqual(batches[self.resources[0].id].domains,
+                         ['small0.example.com', 'small1.example.com', 'small2.example.com'])
+
+    def test_batched_pass_fans_out_news_and_splits_cost(self):
+        """Один запрос на пакет: новости раскладываются по источникам, стоимость — долями"""
+        from .discovery_service import NewsDiscoveryService
+        from .models import DiscoveryAPICall
+
+        service = NewsDiscoveryService(config=self.config)
+        service.grok_api_key = 'key'
+        response = MagicMock(
+            output_text=json.dumps({'results': {
+                'small0.example.com': {'news': [{'title': 'Новый чиллер Small 0', 'summary': 'S'}]},
+                'small1.example.com': {'news': [{'title': 'Выставка Small 1', 'summary': 'S'},
+                                                {'title': 'Завод Small 1', 'summary': 'S'}]},
+            }}, ensure_ascii=False),
+            usage=MagicMock(input_tokens=1000, output_tokens=301),
+        )
+        with patch.object(service.clients, 'openai') as client:
+            client.return_value.responses.create.return_value = response
+            stats = service.discover_all_news()
+
+        create = client.return_value.responses.create
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(create.call_args.kwargs['tools'][0]['allowed_domains'],
+                         ['small0.example.com', 'small1.example.com', 'small2.example.com'])
+        self.assertEqual(stats['total_processed'], 3)
+        self.assertEqual(NewsPost.objects.filter(title='Новый чиллер Small 0').get().source_url,
+                         'https://small0.example.com')
+        self.assertEqual(NewsPost.objects.filter(title__contains='Small 1').count(), 2)
+        self.assertTrue(NewsPost.objects.filter(is_no_news_found=True, source_url='https://small2.example.com').exists())
+
+        calls = DiscoveryAPICall.objects.filter(discovery_run=service.current_run).order_by('resource_id')
+        self.assertEqual([call.news_extracted for call in calls], [1, 2, 0])
+        self.assertEqual({call.batch_size for call in calls}, {3})
+        self.assertEqual(sum(call.input_tokens for call in calls), 1000)
+        self.assertEqual(sum(call.output_tokens for call in calls), 301)
+        run = service.current_run
+        run.refresh_from_db()
+        self.assertEqual((run.total_requests, run.total_input_tokens), (1, 1000))
+        self.assertEqual(run.provider_stats['grok']['requests'], 1)
+
+
+class JSONExtractTest(TestCase):
+    """Тесты однопроходного извлечения JSON из ответов LLM (news/json_extract.py)"""
+
+    def test_extracts_json_from_text_and_markdown(self):
+        """JSON находится в пояснениях и markdown, скобки и кавычки внутри строк не мешают"""
+        from . import json_extract
+
+        content = (
+            'I searched {site} and found "two" items:\n```json\n'
+            '{"news": [{"title": "Chiller {X} \\"R32\\"", "summary": "a}b", "source_url": "https://a.com/1"}]}\n```'
+        )
+        result, truncated = json_extract.extract(content)
+        self.assertFalse(truncated)
+        self.assertEqual(result['news'][0]['title'], 'Chiller {X} "R32"')
+
+        # Непарная кавычка в пояснении перед JSON
+        result, _ = json_extract.extract('Note: 5" duct {see "below {"news": [{"title": "T"}]} end')
+        self.assertEqual(result, {'news': [{'title': 'T'}]})
+
+        self.assertEqual(json_extract.extract('Новостей не найдено {period}.'), (None, False))
+
+    def test_recovers_truncated_arrays(self):
+        """Ответ, оборванный по max_tokens, восстанавливается до последней завершенной новости"""
+        from . import json_extract
+
+        result, truncated = json_extract.extract(
+            '```json\n{"news": [{"title": "A", "tags": ["x"]}, {"title": "B"}, {"title": "C", "summary": "обре'
+        )
+        self.assertTrue(truncated)
+        self.assertEqual([item['title'] for item in result['news']], ['A', 'B'])
+
+        # Пакетный ответ: восстанавливаются все домены, а не только первый вложенный объект
+        result, truncated = json_extract.extract(
+            '{"results": {"a.com": {"news": [{"title": "A"}]}, "b.com": {"news": [{"title": "B"}, {"title": '
+        )
+        self.assertTrue(truncated)
+        self.assertEqual(result, {'results': {'a.com': {'news': [{'title': 'A'}]}, 'b.com': {'news': [{'title': 'B'}]}}})
+
+        self.assertEqual(json_extract.extract('{"news": [{"title": "A'), (None, False))
+
+    def test_provider_parsers_use_extractor(self):
+        """Парсеры провайдеров разбирают оборванный ответ; Gemini без JSON — ошибка разбора"""
+        from .discovery_service import NewsDiscoveryService
+
+        service = NewsDiscoveryService()
+        content = 'Here:\n{"news": [{"title": "A"}, {"title": "B", "summ'
+        for parse in (service._parse_grok_content, service._parse_anthropic_content, service._parse_openai_content):
+            self.assertEqual(parse(content), {'news': [{'title': 'A'}]})
+        self.assertEqual(service._parse_anthropic_content('Ничего не найдено'), {'news': []})
+        with self.assertRaises(json.JSONDecodeError):
+            service._parse_gemini_content('not json')
+
+    def test_benchmark_command(self):
+        """Бенчмарк на синтетическом корпусе сравнивает оба разбора"""
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('benchmark_json_extract', size=20, repeat=1, stdout=out)
+        self.assertIn('прежний разбор', out.getvalue())
+        self.assertIn('json_extract', out.getvalue())
+
+
+class StreamingResponseTest(TestCase):
+    """Тесты потоковых ответов с созданием новостей по ходу ответа (news/streaming.py)"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .models import SearchConfiguration
+        self.config = SearchConfiguration.objects.create(
+            name='test', is_active=True, max_workers=1, primary_provider='grok', fallback_chain=['grok'],
+            delay_between_requests=0, rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL,
+            stream_responses=True,
+        )
+        self.resource = NewsResource.objects.create(name='Source', url='https://source.example.com')
+        from .llm_clients import get_client_registry
+        get_client_registry().clear()
+
+    def _service(self):
+        from .discovery_service import NewsDiscoveryService
+        service = NewsDiscoveryService(config=self.config)
+        service.grok_api_key = 'key'
+        return service
+
+    @staticmethod
+    def _events(text, on_chunk=None, fail_after=None):
+        """События потока Responses API: text частями по 7 символов, затем response.completed"""
+        from contextlib import contextmanager
+
+        @contextmanager
+        def stream(**request):
+            def events():
+                for position in range(0, len(text), 7):
+                    if fail_after is not None and position >= fail_after:
+                        raise TimeoutError('read timeout')
+                    yield MagicMock(type='response.output_text.delta', delta=text[position:position + 7])
+                    if on_chunk:
+                        on_chunk(position)
+                yield MagicMock(type='response.completed',
+                                response=MagicMock(output_text=text, usage=MagicMock(input_tokens=100, output_tokens=50)))
+            yield events()
+        return stream
+
+    def test_incremental_parser_emits_completed_items(self):
+        """Элементы массива news выдаются по мере завершения, строки рвутся на границе фрагментов"""
+        from .json_extract import NewsItemStream
+
+        text = 'Вот: ```json\n{"news": [{"title": "A \\"q\\" {x}", "tags": ["t"]}, {"title": "B"}, {"title": "C", "su'
+        stream = NewsItemStream()
+        emitted = []
+        for position in range(0, len(text), 3):
+            emitted.append([item['title'] for item in stream.feed(text[position:position + 3])])
+        self.assertEqual([titles for titles in emitted if titles], [['A "q" {x}'], ['B']])
+
+    def test_posts_are_created_while_response_streams(self):
+        """Новость сохраняется до конца ответа; итоговый разбор не создает ее повторно"""
+        from datetime import date
+        from .models import NewsDiscoveryStatus, NewsPost
+
+        text = json.dumps({'news': [{'title': f'Новость {n}', 'summary': 'S' * 40,
+                                     'source_url': f'https://source.example.com/{n}'} for n in range(3)]},
+                          ensure_ascii=False)
+        seen = []
+        service = self._service()
+        service._status_obj = NewsDiscoveryStatus.objects.create(total_count=1)
+        with patch.object(service.clients, 'openai') as client:
+            client.return_value.responses.create.side_effect = self._events(
+                text, on_chunk=lambda position: seen.append(NewsPost.objects.count())
+            )
+            created, errors, _ = service.discover_news_for_resource(
+                self.resource, last_search_date_override=date(2026, 1, 1)
+            )
+        self.assertEqual((created, errors), (3, 0))
+        self.assertEqual(NewsPost.objects.count(), 3)
+        # Первая новость появилась в середине ответа
+        self.assertGreater(seen.count(1), 0)
+        self.assertEqual(NewsDiscoveryStatus.objects.get().streamed_news_count, 3)
+        self.assertTrue(client.return_value.responses.create.call_args.kwargs['stream'])
+
+    def test_late_failure_keeps_streamed_posts(self):
+        """Обрыв в конце ответа: полученные новости остаются, период поиска не сдвигается"""
+        from datetime import date
+        from references.models import NewsResourceStatistics
+        from .models import DiscoveryRawResponse, NewsPost
+
+        text = json.dumps({'news': [{'title': f'Новость {n}', 'summary': 'S'} for n in range(3)]}, ensure_ascii=False)
+        service = self._service()
+        with patch.object(service.clients, 'openai') as client:
+            client.return_value.responses.create.side_effect = self._events(text, fail_after=len(text) - 20)
+            created, errors, _ = service.discover_news_for_resource(
+                self.resource, last_search_date_override=date(2026, 1, 1)
+            )
+        self.assertEqual(created, 2)
+        self.assertEqual(NewsPost.objects.filter(is_no_news_found=False).count(), 2)
+        self.assertFalse(NewsPost.objects.filter(title__startswith='Ошибка').exists())
+        stats = NewsResourceStatistics.objects.get(resource=self.resource)
+        self.assertIsNone(stats.search_watermark)
+        # Полученная часть ответа сохранена в архив как неразобранная
+        self.assertFalse(DiscoveryRawResponse.objects.get().parsed)
+
+
+class ChangeDetectionTest(TestCase):
+    """Тесты проверки изменений сайта перед запросом к LLM (news/change_detection.py)"""
+
+    @staticmethod
+    def _response(status_code=200, body=b'', headers=None):
+        return MagicMock(status_code=status_code, content=body, headers=headers or {}, text=body.decode())
+
+    def test_conditional_get_and_link_fingerprint(self):
+        """Первая проверка — неизвестно; 304 или тот же набор ссылок — без изменений; новая ссылка — изменения"""
+        from .change_detection import ChangeDetector
+
+        detector = ChangeDetector({'enabled': True, 'check_sitemap': False})
+        session = MagicMock()
+        page = b'<a href="/news/1">1</a><span>visitors: 100</span>'
+        session.get.return_value = self._response(body=page, headers={'ETag': '"v1"'})
+        changed, fingerprint = detector.check_url(session, 'https://site.example.com', None)
+        self.assertIsNone(changed)
+        self.assertEqual(fingerprint['etag'], '"v1"')
+
+        session.get.return_value = self._response(304)
+        self.assertEqual(detector.check_url(session, 'https://site.example.com', fingerprint), (False, fingerprint))
+        self.assertEqual(session.get.call_args.kwargs['headers'], {'If-None-Match': '"v1"'})
+
+        # Счетчик на странице изменился, ссылки — нет
+        session.get.return_value = self._response(body=page.replace(b'100', b'101'))
+        self.assertFalse(detector.check_url(session, 'https://site.example.com', fingerprint)[0])
+
+        session.get.return_value = self._response(body=page + b'<a href="/news/2">2</a>')
+        self.assertTrue(detector.check_url(session, 'https://site.example.com', fingerprint)[0])
+
+    def test_unchanged_resource_skips_llm_call(self):
+        """Сайт и sitemap не изменились: LLM не вызывается, итог «без изменений» в запуске и статистике"""
+        from references.models import NewsResource, NewsResourceStatistics
+        from .change_detection import ChangeDetector
+        from .discovery_service import NewsDiscoveryService
+        from .models import DiscoveryWorkItem, SearchConfiguration
+
+        config = SearchConfiguration.objects.create(
+            name='test', is_active=True, max_workers=1, primary_provider='grok', fallback_chain=['grok'],
+            delay_between_requests=0, rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL,
+            change_detection={'enabled': True},
+        )
+        unchanged = NewsResource.objects.create(name='Quiet', url='https://quiet.example.com')
+        fresh = NewsResource.objects.create(name='New', url='https://new.example.com')
+        NewsResourceStatistics.objects.create(
+            resource=unchanged, last_search_date=timezone.now(),
+            page_fingerprint={'page': {'etag': '"v1"', 'sha256': 'x'}, 'sitemap_url': 'https://quiet.example.com/sitemap.xml',
+                              'sitemap': {'last_modified': 'Mon, 05 Jan 2026 10:00:00 GMT', 'sha256': 'y'}},
+        )
+
+        def get(url, headers=None, timeout=None):
+            if 'quiet' in url:
+                return self._response(304)
+            if url.endswith('robots.txt'):
+                return self._response(404)
+            return self._response(body=b'<a href="/a">a</a>')
+
+        session = MagicMock()
+        session.get.side_effect = get
+        session.head.return_value = self._response(404)
+        service = NewsDiscoveryService(config=config)
+        service.grok_api_key = 'key'
+        with patch.object(ChangeDetector, '_session', return_value=session), \
+                patch.object(service, '_query_grok', return_value={'news': [{'title': 'T', 'summary': 'S'}]}) as grok:
+            service.discover_all_news(resources=NewsResource.objects.all())
+
+        self.assertEqual(grok.call_count, 1)
+        self.assertIn('new.example.com', grok.call_args.args[0])
+        item = DiscoveryWorkItem.objects.get(resource=unchanged)
+        self.assertTrue(item.unchanged)
+        self.assertEqual(item.discovery_run.resources_unchanged, 1)
+        stats = NewsResourceStatistics.objects.get(resource=unchanged)
+        self.assertEqual(stats.total_unchanged, 1)
+        # Пропуск не сдвигает период поиска: LLM за него не спрашивали
+        self.assertIsNone(stats.search_watermark)
+        # Отпечаток нового источника сохранен после успешного поиска для следующего прохода
+        fresh_stats = NewsResourceStatistics.objects.get(resource=fresh)
+        self.assertEqual(fresh_stats.page_fingerprint['sitemap_url'], '')
+        self.assertTrue(fresh_stats.page_fingerprint['page']['sha256'])
+        self.assertEqual(fresh_stats.page_fingerprint_pending, {})
+
+    def test_failed_search_keeps_previous_fingerprint(self):
+        """Сайт изменился, но поиск упал: следующий проход снова спрашивает LLM за прежний период"""
+        from datetime import date
+        from references.models import NewsResource, NewsResourceStatistics
+        from .change_detection import ChangeDetector
+        from .discovery_service import NewsDiscoveryService
+        from .models import SearchConfiguration
+
+        config = SearchConfiguration.objects.create(
+            name='test', is_active=True, max_workers=1, primary_provider='grok', fallback_chain=['grok'],
+            delay_between_requests=0, rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL,
+            change_detection={'enabled': True, 'check_sitemap': False},
+        )
+        resource = NewsResource.objects.create(name='Site', url='https://site.example.com')
+        NewsResourceStatistics.objects.create(
+            resource=resource, last_search_date=timezone.now(), search_watermark=date(2026, 10, 1),
+            page_fingerprint={'page': {'etag': '', 'last_modified': '', 'sha256': 'old'}},
+        )
+        session = MagicMock()
+        session.get.return_value = self._response(body=b'<a href="/news/new">new</a>')
+        windows = []
+
+        def run(grok_result):
+            service = NewsDiscoveryService(config=config)
+            service.grok_api_key = 'key'
+
+            def query_grok(prompt, domain=None):
+                windows.append(service.current_search_window[0])
+                if isinstance(grok_result, Exception):
+                    raise grok_result
+                return grok_result
+
+            with patch.object(ChangeDetector, '_session', return_value=session), \
+                    patch.object(service, '_query_grok', side_effect=query_grok):
+                service.discover_all_news(resources=[resource])
+
+        run(RuntimeError('provider down'))
+        stats = NewsResourceStatistics.objects.get(resource=resource)
+        self.assertEqual(stats.page_fingerprint['page']['sha256'], 'old')
+        self.assertEqual(stats.search_watermark, date(2026, 10, 1))
+
+        # Страница та же, что при упавшем поиске: сравнивается с отпечатком успешного поиска
+        windows.clear()
+        run({'news': []})
+        self.assertEqual(windows, [date(2026, 10, 1)])
+        stats = NewsResourceStatistics.objects.get(resource=resource)
+        self.assertNotEqual(stats.page_fingerprint['page']['sha256'], 'old')
+        self.assertEqual(stats.search_watermark, timezone.now().date())
+
+
+class FeedIngestionTest(TestCase):
+    """Тесты новостей из RSS/Atom лент без поиска LLM (news/feeds.py)"""
+
+    RSS = b'''<?xml version="1.0"?>
+<rss version="2.0"><channel><title>HVAC Weekly</title>
+<item><title>New &lt;b&gt;chiller&lt;/b&gt; line</title><link>https://feed.example.com/news/2</link>
+<guid>news-2</guid><description>&lt;p&gt;Launch of a 500 kW chiller.&lt;/p&gt;</description>
+<pubDate>Mon, 12 Oct 2026 10:00:00 GMT</pubDate></item>
+<item><title>Heat pump award</title><link>https://feed.example.com/news/1</link>
+<guid>news-1</guid><description>Award.</description><pubDate>Fri, 09 Oct 2026 10:00:00 GMT</pubDate></item>
+<item><title>Old story</title><link>https://feed.example.com/news/0</link>
+<guid>news-0</guid><pubDate>Mon, 05 Jan 2026 10:00:00 GMT</pubDate></item>
+</channel></rss>'''
+
+    def test_parse_feed_and_autodiscovery(self):
+        """RSS и Atom разбираются без HTML в тексте; лента находится по <link rel="alternate"> в <head>"""
+        from .feeds import find_feed_links, parse_feed
+
+        items = parse_feed(self.RSS)
+        self.assertEqual([item.guid for item in items], ['news-2', 'news-1', 'news-0'])
+        self.assertEqual(items[0].title, 'New chiller line')
+        self.assertEqual(items[0].summary, 'Launch of a 500 kW chiller.')
+        self.assertEqual(items[0].published.year, 2026)
+
+        atom = parse_feed(b'''<feed xmlns="http://www.w3.org/2005/Atom"><title>F</title>
+<entry><id>tag:site,2026:1</id><title>Atom item</title><link rel="alternate" href="https://a.example.com/1"/>
+<summary>Text</summary><updated>2026-10-10T08:00:00Z</updated></entry></feed>''')
+        self.assertEqual(atom[0].guid, 'tag:site,2026:1')
+        self.assertEqual(atom[0].link, 'https://a.example.com/1')
+
+        page = ('<html><head><link rel="stylesheet" href="/s.css">'
+                '<link rel="alternate" type="application/rss+xml" href="/feed/"></head>'
+                '<body><link rel="alternate" type="application/atom+xml" href="/other"></body></html>')
+        self.assertEqual(find_feed_links(page, 'https://site.example.com/news/'), ['https://site.example.com/feed/'])
+
+    def test_admin_feed_discovery_is_queued(self):
+        """Действие админки только ставит задание feed_discovery; ленты ищет воркер"""
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+        from references.models import NewsResource
+        from .feeds import FeedAutodiscovery
+        from .jobs import run_job
+        from .models import DiscoveryJob, SearchConfiguration
+
+        SearchConfiguration.objects.create(name='test', is_active=True)
+        admin_user = User.objects.create_user(email='admin@test.com', password='password', is_staff=True)
+        resource = NewsResource.objects.create(name='Site', url='https://site.example.com')
+        model_admin = site._registry[NewsResource]
+        request = RequestFactory().post('/')
+        request.user = admin_user
+
+        with patch.object(FeedAutodiscovery, 'discover') as discover, \
+                patch.object(model_admin, 'message_user'):
+            model_admin.discover_feeds_for_selected(request, NewsResource.objects.filter(id=resource.id))
+            discover.assert_not_called()
+            job = DiscoveryJob.objects.get(job_type=DiscoveryJob.JOB_TYPE_FEED_DISCOVERY)
+            self.assertEqual((job.status, job.params, job.user), ('queued', {'resource_ids': [resource.id]}, admin_user))
+
+            discover.return_value = {resource.id: 'https://site.example.com/feed/'}
+            run_job(job, heartbeat_interval=60)
+        self.assertEqual(discover.call_args.args[0], [resource])
+        self.assertEqual((job.status, job.result), ('completed', {'total_processed': 1, 'feeds_found': 1}))
+
+    def test_feed_resource_ingested_without_llm_search(self):
+        """Лента опрашивается условным GET, новые записи — черновики после перевода, повторы и старые пропускаются"""
+        from datetime import date
+        from references.models import NewsResource, NewsResourceStatistics
+        from .discovery_service import NewsDiscoveryService
+        from .feeds import FeedPoller
+        from .models import DiscoveryWorkItem, FeedEntry, SearchConfiguration
+        from .translation_service import TranslationService
+
+        config = SearchConfiguration.objects.create(
+            name='test', is_active=True, max_workers=1, primary_provider='grok', fallback_chain=['grok'],
+            delay_between_requests=0, rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL,
+        )
+        resource = NewsResource.objects.create(
+            name='Feed', url='https://feed.example.com', source_type=NewsResource.SOURCE_TYPE_FEED,
+            feed_url='https://feed.example.com/rss', language='en',
+        )
+        NewsResourceStatistics.objects.create(resource=resource, search_watermark=date(2026, 10, 1))
+
+        session = MagicMock()
+        session.get.return_value = MagicMock(status_code=200, content=self.RSS, headers={'ETag': '"f1"'})
+
+        def summarize(items, source_lang):
+            return [{'title': f"RU {item['title']}", 'summary': f"RU {item['summary']}"} for item in items]
+
+        service = NewsDiscoveryService(config=config)
+        with patch.object(FeedPoller, '_session', return_value=session), \
+                patch.object(TranslationService, 'summarize_news_items', side_effect=summarize) as summarizer, \
+                patch.object(service, '_query_grok') as grok:
+            service.discover_all_news(resources=NewsResource.objects.all())
+
+        grok.assert_not_called()
+        # Одна пачка перевода на обе новые записи; старая запись в перевод не попала
+        self.assertEqual(summarizer.call_count, 1)
+        self.assertEqual(len(summarizer.call_args.args[0]), 2)
+        posts = NewsPost.objects.filter(status='draft', is_no_news_found=False).order_by('id')
+        self.assertEqual([post.title for post in posts], ['RU Heat pump award', 'RU New chiller line'])
+        self.assertEqual(posts[1].source_url, 'https://feed.example.com/news/2')
+        self.assertEqual(FeedEntry.objects.filter(resource=resource).count(), 3)
+        self.assertEqual(FeedEntry.objects.filter(resource=resource, news_post__isnull=True).count(), 1)
+        self.assertEqual(DiscoveryWorkItem.objects.get(resource=resource).provider, 'feed')
+        stats = NewsResourceStatistics.objects.get(resource=resource)
+        self.assertEqual(stats.feed_etag, '"f1"')
+        self.assertEqual(stats.total_news_found, 2)
+
+        # Повторный опрос: 304 по ETag, новостей и переводов нет
+        session.get.return_value = MagicMock(status_code=304, content=b'', headers={})
+        with patch.object(FeedPoller, '_session', return_value=session), \
+                patch.object(TranslationService, 'summarize_news_items', side_effect=summarize) as summarizer:
+            created, errors, _ = NewsDiscoveryService(config=config).discover_news_for_resource(resource)
+        self.assertEqual((created, errors), (0, 0))
+        summarizer.assert_not_called()
+        self.assertEqual(session.get.call_args.kwargs['headers'], {'If-None-Match': '"f1"'})
+        self.assertEqual(NewsPost.objects.filter(is_no_news_found=False).count(), 2)
+
+    def test_failed_item_resets_feed_validators(self):
+        """Если запись не сохранилась, ETag не запоминается и следующий опрос обрабатывает ее снова"""
+        from datetime import date
+        from references.models import NewsResource, NewsResourceStatistics
+        from .discovery_service import NewsDiscoveryService
+        from .feeds import FeedPoller
+        from .models import SearchConfiguration
+        from .translation_service import TranslationService
+
+        config = SearchConfiguration.objects.create(
+            name='test', is_active=True, max_workers=1, primary_provider='grok', fallback_chain=['grok'],
+            delay_between_requests=0, rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL,
+        )
+        resource = NewsResource.objects.create(
+            name='Feed', url='https://feed.example.com', source_type=NewsResource.SOURCE_TYPE_FEED,
+            feed_url='https://feed.example.com/rss', language='en',
+        )
+        NewsResourceStatistics.objects.create(
+            resource=resource, search_watermark=date(2026, 10, 1), feed_etag='"f0"',
+        )
+
+        session = MagicMock()
+        session.get.return_value = MagicMock(status_code=200, content=self.RSS, headers={'ETag': '"f1"'})
+
+        def summarize(items, source_lang):
+            return [{'title': f"RU {item['title']}", 'summary': f"RU {item['summary']}"} for item in items]
+
+        service = NewsDiscoveryService(config=config)
+        with patch.object(FeedPoller, '_session', return_value=session), \
+                patch.object(TranslationService, 'summarize_news_items', side_effect=summarize), \
+                patch.object(service, '_store_discovered_post', side_effect=RuntimeError('db')):
+            created, errors, _ = service.discover_news_for_resource(resource)
+        self.assertEqual((created, errors), (0, 2))
+        stats = NewsResourceStatistics.objects.get(resource=resource)
+        self.assertEqual((stats.feed_etag, stats.feed_last_modified), ('', ''))
+        self.assertIsNotNone(stats.feed_polled_at)
+
+        # Следующий опрос — безусловный GET, записи сохраняются
+        with patch.object(FeedPoller, '_session', return_value=session), \
+                patch.object(TranslationService, 'summarize_news_items', side_effect=summarize):
+            created, errors, _ = NewsDiscoveryService(config=config).discover_news_for_resource(resource)
+        self.assertEqual((created, errors), (2, 0))
+        self.assertEqual(session.get.call_args.kwargs['headers'], {})
+        self.assertEqual(NewsResourceStatistics.objects.get(resource=resource).feed_etag, '"f1"')
+
+
+class RunBudgetTest(TestCase):
+    """Тесты оценки стоимости и бюджета запуска (news/budget.py)"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .models import SearchConfiguration
+
+        self.config = SearchConfiguration.objects.create(
+            name='test', is_active=True, max_workers=1, primary_provider='grok', fallback_chain=['grok', 'anthropic'],
+            delay_between_requests=0, rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL,
+            grok_input_price=3, grok_output_price=15, anthropic_input_price=1, anthropic_output_price=5,
+        )
+        self.resources = [
+            NewsResource.objects.create(name=f'Source {n}', url=f'https://s{n}.example.com') for n in range(3)
+        ]
+
+    def test_estimate_from_history(self):
+        """Цель с историей — средние токены ее поиска за запуск; без истории — среднее по целям; дешевые первыми"""
+        from .budget import CostEstimator, RunBudget
+        from .models import DiscoveryAPICall, NewsDiscoveryRun
+
+        for run_tokens in ((1000, 500), (3000, 1500)):
+            run = NewsDiscoveryRun.objects.create()
+            # Два вызова за запуск (fallback): стоимость поиска — их сумма
+            for provider in ('grok', 'anthropic'):
+                DiscoveryAPICall.objects.create(
+                    discovery_run=run, resource=self.resources[0], provider=provider, model='m',
+                    input_tokens=run_tokens[0], output_tokens=run_tokens[1], cost_usd=0, duration_ms=1,
+                )
+
+        estimator = CostEstimator(self.config)
+        estimates = estimator.estimate(self.resources[:2], 'resource', ['grok', 'anthropic'])
+        self.assertEqual(estimates[0].basis, 'target')
+        self.assertEqual((estimates[0].input_tokens, estimates[0].output_tokens), (4000, 2000))
+        # Текущие цены: grok 2000 in / 1000 out + anthropic столько же
+        self.assertAlmostEqual(estimates[0].cost_usd, (2000 * 3 + 1000 * 15 + 2000 * 1 + 1000 * 5) / 1e6)
+        self.assertEqual(estimates[1].basis, 'average')
+        self.assertAlmostEqual(estimates[1].cost_usd, estimates[0].cost_usd)
+        self.assertEqual(CostEstimator(self.config).estimate(self.resources[:1], 'manufacturer', ['grok'])[0].basis,
+                         'default')
+
+        budget = RunBudget({'limit_usd': 1, 'downgrade_at': 0.5})
+        budget.start()
+        self.assertEqual(budget.providers(['grok', 'anthropic'], estimator.cheapest_first), ['grok', 'anthropic'])
+        self.assertEqual(budget.spend(0.6), 'downgraded')
+        self.assertEqual(budget.providers(['grok', 'anthropic'], estimator.cheapest_first), ['anthropic', 'grok'])
+        self.assertFalse(budget.allows_hedging)
+        self.assertEqual(budget.spend(0.5), 'exhausted')
+        self.assertEqual(budget.providers(['grok', 'anthropic'], estimator.cheapest_first), ['anthropic'])
+        self.assertTrue(budget.allows_new_target)
+
+    def test_downgraded_budget_in_async_mode(self):
+        """Режим async: при бюджете на исходе дешевый провайдер выбирается без запросов к БД из event loop"""
+        from decimal import Decimal
+        from references.models import NewsResource
+        from .discovery_service import NewsDiscoveryService
+        from .models import DiscoveryAPICall, NewsDiscoveryRun, SearchConfiguration
+
+        DiscoveryAPICall.objects.bulk_create([
+            DiscoveryAPICall(discovery_run=NewsDiscoveryRun.objects.create(), resource=self.resources[0],
+                             provider=provider, model='m', input_tokens=1000, output_tokens=500,
+                             cost_usd=0, duration_ms=1)
+            for provider in ('grok', 'anthropic')
+        ])
+        self.config.execution_mode = SearchConfiguration.EXECUTION_MODE_ASYNC
+        self.config.budget = {'limit_usd': 1, 'downgrade_at': 0.5}
+        self.config.save()
+        service = NewsDiscoveryService(config=self.config)
+        service.grok_api_key = 'key'
+        service.anthropic_api_key = 'key'
+        service.start_discovery_run()
+        service.current_run.estimated_cost_usd = Decimal('0.6')
+        service.current_run.save(update_fields=['estimated_cost_usd'])
+
+        async def anthropic(prompt, domains=None):
+            return {'news': []}
+
+        with patch.object(service, '_aquery_grok') as grok, \
+                patch.object(service, '_aquery_anthropic', side_effect=anthropic) as anthropic_query:
+            stats = service.discover_all_news(resources=NewsResource.objects.all())
+        service.finish_discovery_run()
+
+        self.assertEqual(stats['errors'], 0)
+        self.assertEqual(anthropic_query.call_count, len(self.resources))
+        grok.assert_not_called()
+        self.assertEqual(NewsDiscoveryRun.objects.get(pk=service.current_run.pk).budget_status, 'downgraded')
+
+    def test_hard_budget_stops_run(self):
+        """Жесткий бюджет исчерпан: новые цели не начинаются, запуск остановлен и может быть продолжен"""
+        from references.models import NewsResource
+        from .discovery_service import NewsDiscoveryService
+        from .models import DiscoveryWorkItem, NewsDiscoveryRun
+
+        self.config.budget = {'limit_usd': 0.01, 'mode': 'hard'}
+        self.config.save()
+        service = NewsDiscoveryService(config=self.config)
+        service.grok_api_key = 'key'
+        service.anthropic_api_key = ''
+
+        def query(prompt, domain=None):
+            # 1000 in / 1000 out у Grok — $0.018, больше бюджета
+            service._track_api_call('grok', 'grok-4', 1000, 1000, 10, True, news_extracted=1)
+            return {'news': [{'title': f'News for {domain}', 'summary': 'S'}]}
+
+        with patch.object(service, '_query_grok', side_effect=query) as grok:
+            service.discover_all_news(resources=NewsResource.objects.all())
+
+        self.assertEqual(grok.call_count, 1)
+        run = NewsDiscoveryRun.objects.get(pk=service.current_run.pk)
+        self.assertEqual(run.status, NewsDiscoveryRun.STATUS_BUDGET_EXHAUSTED)
+        self.assertEqual(run.budget_status, 'exhausted')
+        self.assertEqual(run.targets_over_budget, 2)
+        self.assertEqual(run.budget_mode, 'hard')
+        self.assertEqual(float(run.budget_usd), 0.01)
+        # Без истории: 3000 in / 1500 out по цене Grok на каждую из трех целей
+        self.assertAlmostEqual(float(run.planned_cost_usd), 3 * (3000 * 3 + 1500 * 15) / 1e6, places=4)
+        self.assertEqual(run.work_items.filter(status=DiscoveryWorkItem.STATUS_PENDING).count(), 2)
+        self.assertTrue(run.is_resumable)
+
+
+class ProviderRoutingTest(TestCase):
+    """Тесты цепочки провайдеров и порядка по истории цели (news/routing.py)"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .models import SearchConfiguration
+
+        self.config = SearchConfiguration.objects.create(
+            name='test', is_active=True, max_workers=1, primary_provider='grok',
+            fallback_chain=['grok', 'anthropic'], routing={'exploration_rate': 0},
+            delay_between_requests=0, rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL,
+        )
+        self.resources = [
+            NewsResource.objects.create(name=f'Source {n}', url=f'https://s{n}.example.com') for n in range(2)
+        ]
+
+    def _service(self):
+        from .discovery_service import NewsDiscoveryService
+
+        service = NewsDiscoveryService(config=self.config)
+        service.grok_api_key = service.anthropic_api_key = service.openai_api_key = service.gemini_api_key = 'key'
+        return service
+
+    def test_auto_chain_follows_configuration(self):
+        """Цепочка — primary_provider и fallback_chain в сохраненном порядке, включая Gemini"""
+        self.config.primary_provider = 'anthropic'
+        self.config.fallback_chain = ['gemini', 'grok', 'anthropic']
+        self.config.save()
+        service = self._service()
+        self.assertEqual(service._get_auto_chain(), ['anthropic', 'gemini', 'grok'])
+
+        with patch.object(service, '_query_anthropic', side_effect=Exception('timeout')), \
+                patch.object(service, '_query_gemini', return_value={'news': [{'title': 'G', 'summary': 'S'}]}), \
+                patch.object(service, '_query_grok') as grok:
+            created, errors, error_msg = service.discover_news_for_resource(self.resources[0])
+
+        self.assertEqual((created, errors), (1, 0))
+        grok.assert_not_called()
+
+    def test_routes_by_target_history(self):
+        """Для цели, где Grok отвечает пустым списком, а Anthropic находит новости, Anthropic идет первым"""
+        from .models import DiscoveryAPICall, NewsDiscoveryRun
+
+        run = NewsDiscoveryRun.objects.create()
+        for provider, news in (('grok', 0), ('anthropic', 2)):
+            DiscoveryAPICall.objects.bulk_create([
+                DiscoveryAPICall(discovery_run=run, resource=self.resources[0], provider=provider, model='m',
+                                 cost_usd=0.01, duration_ms=1000, news_extracted=news)
+                for _ in range(3)
+            ])
+
+        service = self._service()
+        queried = {}
+
+        def query(name):
+            def send(prompt, domain=None):
+                queried.setdefault(name, []).append(service.current_resource.id)
+                return {'news': [{'title': 'A', 'summary': 'S'}]} if name == 'anthropic' else {'news': []}
+            return send
+
+        with patch.object(service, '_query_grok', side_effect=query('grok')), \
+                patch.object(service, '_query_anthropic', side_effect=query('anthropic')):
+            service.discover_all_news()
+
+        # Источник с историей — сразу Anthropic; без истории — по цепочке, Grok
+        self.assertEqual(queried, {'anthropic': [self.resources[0].id], 'grok': [self.resources[1].id]})
+
+    def test_rank_and_exploration(self):
+        """Оценка: новостей на доллар с учетом задержки; исследование ставит первым другого провайдера"""
+        import random
+        from .routing import ProviderHistory, ProviderRouter
+
+        history = {
+            'grok': ProviderHistory(calls=4, successes=4, news=4, cost_usd=0.04, avg_duration_ms=1000),
+            'anthropic': ProviderHistory(calls=4, successes=4, news=4, cost_usd=0.02, avg_duration_ms=1000),
+            'openai': ProviderHistory(calls=4, successes=2, news=0, cost_usd=0.01, avg_duration_ms=1000),
+        }
+        router = ProviderRouter({'exploration_rate': 0})
+        self.assertEqual(router.rank(['openai', 'grok', 'gemini', 'anthropic'], history),
+                         ['anthropic', 'grok', 'gemini', 'openai'])
+
+        router = ProviderRouter({'exploration_rate': 1}, rng=random.Random(0))
+        router._history[('resource', 1)] = history
+        ordered = router.order(['grok', 'anthropic', 'openai'], 'resource', 1)
+        self.assertNotEqual(ordered[0], 'anthropic')
+        self.assertEqual(sorted(ordered), ['anthropic', 'grok', 'openai'])
+        self.assertEqual(router.counters['explored'], 1)
+
+
+class PromptCachingTest(TestCase):
+    """Тесты постоянного начала промпта и учета кэшированных токенов (news/prompt_cache.py)"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .models import SearchConfiguration
+
+        self.config = SearchConfiguration.objects.create(
+            name='test', is_active=True, max_workers=1, primary_provider='anthropic', fallback_chain=['anthropic'],
+            delay_between_requests=0, rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL,
+            anthropic_input_price=1, anthropic_cached_input_price='0.1',
+            anthropic_cache_write_price='1.25', anthropic_output_price=5,
+        )
+        self.resources = [
+            NewsResource.objects.create(name=f'Source {n}', url=f'https://s{n}.example.com', language='ru')
+            for n in range(2)
+        ]
+
+    def test_prompts_share_static_prefix(self):
+        """Формат ответа — в начале промпта, источник и период — в конце"""
+        from datetime import date
+        from .discovery_service import NewsDiscoveryService
+
+        service = NewsDiscoveryService(config=self.config)
+        json_format = service._get_prompt_templates('ru')['json_format']
+        prompts = [
+            service._build_search_prompt(resource, date(2026, 1, 1), date(2026, 1, 14)) for resource in self.resources
+        ]
+        for resource, prompt in zip(self.resources, prompts):
+            self.assertTrue(prompt.startswith(json_format))
+            self.assertGreater(prompt.index(resource.url), len(json_format))
+
+        request = service._build_anthropic_request(prompts[0])
+        self.assertEqual(request['system'][0]['cache_control'], {'type': 'ephemeral'})
+        self.assertTrue(request['messages'][0]['content'].startswith(json_format))
+        grok_headers = [service._build_grok_request(prompt)['extra_headers']['x-grok-conv-id'] for prompt in prompts]
+        self.assertEqual(grok_headers[0], grok_headers[1])
+
+        self.config.prompt_caching = False
+        service = NewsDiscoveryService(config=self.config)
+        self.assertIsInstance(service._build_anthropic_request(prompts[0])['system'], str)
+        self.assertNotIn('extra_headers', service._build_grok_request(prompts[0]))
+
+    def test_cached_tokens_recorded_and_priced(self):
+        """Кэшированные токены Anthropic пишутся в DiscoveryAPICall и считаются по своей цене"""
+        from .discovery_service import NewsDiscoveryService
+        from .models import DiscoveryAPICall
+
+        service = NewsDiscoveryService(config=self.config)
+        service.anthropic_api_key = 'key'
+        service.start_discovery_run()
+        response = MagicMock(
+            content=[MagicMock(type='text', text='{"news": [{"title": "T", "summary": "S"}]}')],
+            usage=MagicMock(input_tokens=200, output_tokens=100,
+                            cache_read_input_tokens=3000, cache_creation_input_tokens=1000),
+        )
+        with patch.object(service.clients, 'anthropic') as client:
+            client.return_value.messages.create.return_value = response
+            service.discover_news_for_resource(self.resources[0])
+        service.finish_discovery_run()
+
+        call = DiscoveryAPICall.objects.get()
+        self.assertEqual((call.input_tokens, call.cached_input_tokens, call.cache_write_tokens), (4200, 3000, 1000))
+        # 200 × $1 + 3000 × $0.1 + 1000 × $1.25 + 100 × $5 за 1М токенов
+        self.assertAlmostEqual(float(call.cost_usd), (200 + 300 + 1250 + 500) / 1e6)
+        service.current_run.refresh_from_db()
+        self.assertEqual(service.current_run.provider_stats['anthropic']['cached_input_tokens'], 3000)
+
+
+class StructuredOutputTest(TestCase):
+    """Тесты ответа по JSON-схеме (news/structured_output.py)"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .models import SearchConfiguration
+
+        self.config = SearchConfiguration.objects.create(
+            name='test', is_active=True, max_workers=1, primary_provider='grok', fallback_chain=['grok', 'anthropic'],
+            delay_between_requests=0, rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL,
+            structured_output=True, routing={'enabled': False},
+        )
+        self.resource = NewsResource.objects.create(name='Source', url='https://source.example.com', language='ru')
+
+    def test_schema_passed_instead_of_format_prose(self):
+        """Формат ответа не пишется в промпт, схема передается параметром провайдера"""
+        from datetime import date
+        from . import structured_output
+        from .discovery_service import NewsDiscoveryService
+
+        service = NewsDiscoveryService(config=self.config)
+        json_format = service._get_prompt_templates('ru')['json_format']
+        prompt = service._build_search_prompt(self.resource, date(2026, 1, 1), date(2026, 1, 14))
+        self.assertNotIn(json_format, prompt)
+        self.assertIn(self.resource.url, prompt)
+
+        self.assertEqual(service._build_grok_request(prompt)['text']['format']['schema'], structured_output.NEWS_SCHEMA)
+        self.assertEqual(service._build_openai_request(prompt)['response_format']['type'], 'json_schema')
+        self.assertNotIn('additionalProperties', str(service._build_gemini_generation_config()['response_schema']))
+        anthropic_request = service._build_anthropic_request(prompt)
+        self.assertEqual(anthropic_request['tools'][-1]['name'], structured_output.ANTHROPIC_TOOL_NAME)
+        self.assertNotIn('ФОРМАТ ОТВЕТА', anthropic_request['messages'][0]['content'])
+
+        token = service._batch_var.set([self.resource])
+        try:
+            schema = service._build_grok_request(prompt)['text']['format']['schema']
+        finally:
+            service._batch_var.reset(token)
+        self.assertEqual(schema['properties']['results']['required'], ['source.example.com'])
+
+    def test_prose_answer_is_parse_failure(self):
+        """Ответ прозой — ошибка разбора провайдера, цепочка переходит к Anthropic с ответом инструментом"""
+        from .discovery_service import NewsDiscoveryService
+        from .models import DiscoveryAPICall
+
+        service = NewsDiscoveryService(config=self.config)
+        service.grok_api_key = 'key'
+        service.anthropic_api_key = 'key'
+        service.start_discovery_run()
+        grok_response = MagicMock(output_text='Новостей не найдено.', usage=MagicMock(input_tokens=10, output_tokens=5))
+        tool_use = MagicMock(type='tool_use', input={'news': [{'title': 'T', 'summary': 'S', 'source_url': ''}]})
+        tool_use.name = 'record_news'
+        anthropic_response = MagicMock(content=[tool_use], usage=MagicMock(input_tokens=10, output_tokens=5))
+        with patch.object(service.clients, 'openai') as grok_client, \
+                patch.object(service.clients, 'anthropic') as anthropic_client:
+            grok_client.return_value.responses.create.return_value = grok_response
+            anthropic_client.return_value.messages.create.return_value = anthropic_response
+            service.discover_news_for_resource(self.resource)
+        service.finish_discovery_run()
+
+        grok_call = DiscoveryAPICall.objects.get(provider='grok')
+        self.assertFalse(grok_call.success)
+        self.assertTrue(grok_call.parse_failed)
+        anthropic_call = DiscoveryAPICall.objects.get(provider='anthropic')
+        self.assertTrue(anthropic_call.success)
+        self.assertFalse(anthropic_call.parse_failed)
+        self.assertEqual(anthropic_call.news_extracted, 1)
+        service.current_run.refresh_from_db()
+        self.assertEqual(service.current_run.provider_stats['grok']['parse_failures'], 1)
+
+
+class OutputCapTest(TestCase):
+    """Тесты лимита новостей и выходных токенов поиска (news/output_cap.py)"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .models import SearchConfiguration
+
+        self.config = SearchConfiguration.objects.create(
+            name='test', is_active=True, max_workers=1, primary_provider='grok', fallback_chain=['grok'],
+            delay_between_requests=0, rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL,
+            max_news_per_resource=2,
+            output_cap={'tokens_per_item': 100, 'margin': 1, 'overhead_tokens': 200, 'min_output_tokens': 0},
+        )
+        self.resource = NewsResource.objects.create(name='Source', url='https://source.example.com', language='ru')
+
+    def test_limit_in_prompt_and_requests(self):
+        """Лимит новостей — в промпте, лимит выходных токенов — по истории токенов на новость"""
+        from datetime import date
+        from .discovery_service import NewsDiscoveryService
+        from .models import DiscoveryAPICall, NewsDiscoveryRun
+
+        service = NewsDiscoveryService(config=self.config)
+        prompt = service._build_search_prompt(self.resource, date(2026, 1, 1), date(2026, 1, 14))
+        self.assertIn('не более 2 самых важных новостей', prompt)
+        # Без истории: 2 × 100 + 200
+        self.assertEqual(service._build_grok_request(prompt)['max_output_tokens'], 400)
+        self.assertEqual(service._build_anthropic_request(prompt)['max_tokens'], 400)
+        token = service._batch_var.set([self.resource, self.resource])
+        try:
+            self.assertEqual(service._build_openai_request(prompt)['max_completion_tokens'], 600)
+        finally:
+            service._batch_var.reset(token)
+
+        DiscoveryAPICall.objects.create(
+            discovery_run=NewsDiscoveryRun.objects.create(), resource=self.resource, provider='gemini', model='m',
+            input_tokens=1000, output_tokens=1000, news_extracted=4, cost_usd=0, duration_ms=1,
+        )
+        service = NewsDiscoveryService(config=self.config)
+        # По истории Gemini: 250 токенов на новость
+        self.assertEqual(service._build_gemini_generation_config()['max_output_tokens'], 700)
+
+        self.config.max_news_per_resource = 0
+        service = NewsDiscoveryService(config=self.config)
+        self.assertNotIn('max_output_tokens', service._build_grok_request(prompt))
+        self.assertEqual(service._build_anthropic_request(prompt)['max_tokens'], 4000)
+
+    def test_extra_news_dropped_and_savings_recorded(self):
+        """Новости сверх лимита отбрасываются; экономия — от средних выходных токенов цели без лимита"""
+        from .discovery_service import NewsDiscoveryService
+        from .models import DiscoveryAPICall, NewsDiscoveryRun, NewsPost
+
+        DiscoveryAPICall.objects.create(
+            discovery_run=NewsDiscoveryRun.objects.create(), resource=self.resource, provider='grok', model='m',
+            input_tokens=1000, output_tokens=3000, news_extracted=0, cost_usd=0, duration_ms=1,
+        )
+        service = NewsDiscoveryService(config=self.config)
+        service.grok_api_key = 'key'
+        service.start_discovery_run()
+        news = [{'title': f'T{n}', 'summary': f'S{n}', 'source_url': f'https://source.example.com/{n}'} for n in range(4)]
+        response = MagicMock(output_text=json.dumps({'news': news}), usage=MagicMock(input_tokens=100, output_tokens=500))
+        with patch.object(service.clients, 'openai') as client:
+            client.return_value.responses.create.return_value = response
+            created, errors, _ = service.discover_news_for_resource(self.resource)
+        service.finish_discovery_run()
+
+        self.assertEqual((created, errors), (2, 0))
+        self.assertEqual(NewsPost.objects.filter(source_url__startswith='https://source.example.com/').count(), 2)
+        call = DiscoveryAPICall.objects.get(discovery_run=service.current_run)
+        self.assertEqual((call.news_extracted, call.max_output_tokens, call.output_tokens_saved), (2, 400, 2500))
+        service.current_run.refresh_from_db()
+        stats = service.current_run.provider_stats['grok']
+        self.assertEqual((stats['news_dropped'], stats['output_tokens_saved']), (2, 2500))
+
+
+class BatchAPIModeTest(TestCase):
+    """Тесты режима пакетных заданий провайдера (news/batch_discovery.py) на локальном стенде"""
+
+    def setUp(self):
+        from references.models import NewsResource
+        from .batch_api import BatchAPIStandIn
+
+        def responder(provider, params):
+            # Промпт содержит URL источника: новость — со ссылкой на его домен
+            text = json.dumps(params['messages'])
+            domain = 'one.example.com' if 'one.example.com' in text else 'two.example.com'
+            return json.dumps({'news': [{'title': f'News {domain}', 'summary': f'Summary {provider}',
+                                         'source_url': f'https://{domain}/{provider}'}]})
+
+        self.standin = BatchAPIStandIn(responder=responder, ready_after=1).start()
+        self.addCleanup(self.standin.stop)
+        self.resources = [
+            NewsResource.objects.create(name='One', url='https://one.example.com', language='ru'),
+            NewsResource.objects.create(name='Two', url='https://two.example.com', language='ru'),
+        ]
+
+    def _config(self, provider):
+        from .models import SearchConfiguration
+
+        return SearchConfiguration.objects.create(
+            name='test', is_active=True, max_workers=1, primary_provider=provider, fallback_chain=[provider],
+            delay_between_requests=0, rate_limit_backend=SearchConfiguration.RATE_LIMIT_BACKEND_LOCAL,
+            execution_mode=SearchConfiguration.EXECUTION_MODE_BATCH_API,
+            batch_api={'base_urls': self.standin.base_urls, 'max_requests_per_job': 1, 'price_factor': 0.5},
+            anthropic_input_price=1, anthropic_output_price=5,
+        )
+
+    def test_submit_then_poll_ingests_results(self):
+        """Проход отправляет задания; результаты разбираются обычным путем со скидкой на цену"""
+        from .discovery_service import NewsDiscoveryService
+        from .models import DiscoveryAPICall, DiscoveryBatchJob, NewsDiscoveryRun, NewsDiscoveryStatus, NewsPost
+
+        service = NewsDiscoveryService(config=self._config('anthropic'))
+        service.anthropic_api_key = 'key'
+        status_obj = NewsDiscoveryStatus.objects.create(status='running', search_type='resources', provider='auto')
+        stats = service.discover_all_news(status_obj=status_obj, resources=self.resources)
+
+        self.assertEqual((stats['batch_requests'], stats['batch_jobs_pending']), (2, 2))
+        run = NewsDiscoveryRun.objects.get()
+        self.assertIsNone(run.finished_at)
+        self.assertEqual(run.work_items.filter(status='in_flight').count(), 2)
+        self.assertFalse(DiscoveryAPICall.objects.exists())
+
+        # Первая проверка: задания еще выполняются
+        self.assertEqual(service.poll_batch_jobs(run, status_obj)['batch_jobs_pending'], 2)
+        self.assertEqual(NewsPost.objects.count(), 0)
+
+        stats = service.poll_batch_jobs(run, status_obj)
+        self.assertEqual((stats['batch_jobs_pending'], stats['created'], stats['errors']), (0, 2, 0))
+        self.assertEqual(set(NewsPost.objects.values_list('source_url', flat=True)),
+                         {'https://one.example.com/anthropic', 'https://two.example.com/anthropic'})
+        run.refresh_from_db()
+        self.assertEqual((run.status, run.news_found), ('completed', 2))
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual(run.work_items.filter(status='done', provider='anthropic').count(), 2)
+        call = DiscoveryAPICall.objects.get(resource=self.resources[0])
+        self.assertTrue(call.batch_api)
+        self.assertEqual(call.news_extracted, 1)
+        # (1000 × $1 + 200 × $5) / 1M × price_factor 0.5
+        self.assertAlmostEqual(float(call.cost_usd), 0.001)
+        self.assertEqual(list(DiscoveryBatchJob.objects.values_list('status', 'succeeded')), [('ended', 1)] * 2)
+        status_obj.refresh_from_db()
+        self.assertEqual(status_obj.status, 'completed')
+
+    def test_worker_schedules_batch_poll(self):
+        """Задание воркера с пакетным проходом ставит 'batch_poll', который завершает запуск"""
+        from django.test import override_settings
+        from .jobs import enqueue_discovery_job, execute_job
+        from .models import DiscoveryJob, NewsPost
+
+        config = self._config('openai')
+        with override_settings(TRANSLATION_API_KEY='key'):
+            job = enqueue_discovery_job(DiscoveryJob.JOB_TYPE_RESOURCES, config=config,
+                                        resource_ids=[resource.id for resource in self.resources])
+            self.assertEqual(execute_job(job)['batch_jobs_pending'], 2)
+            poll_job = DiscoveryJob.objects.get(job_type=DiscoveryJob.JOB_TYPE_BATCH_POLL)
+            self.assertEqual(poll_job.discovery_run, job.discovery_run)
+            self.assertGreater(poll_job.run_after, timezone.now())
+
+            self.assertEqual(execute_job(poll_job)['batch_jobs_pending'], 2)
+            self.assertEqual(DiscoveryJob.objects.filter(job_type=DiscoveryJob.JOB_TYPE_BATCH_POLL).count(), 2)
+            next_job = DiscoveryJob.objects.filter(job_type=DiscoveryJob.JOB_TYPE_BATCH_POLL).latest('id')
+            self.assertEqual(execute_job(next_job)['created'], 2)
+
+        self.assertEqual(DiscoveryJob.objects.filter(job_type=DiscoveryJob.JOB_TYPE_BATCH_POLL).count(), 2)
+        job.discovery_run.refresh_from_db()
+        self.assertEqual(job.discovery_run.status, 'completed')
+        self.assertEqual(NewsPost.objects.filter(source_url__endswith='/openai').count(), 2)
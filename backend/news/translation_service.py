@@ -5,9 +5,10 @@
 import json
 import logging
 import re
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
+from .llm_clients import get_client_registry
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +31,25 @@ class TranslationService:
         self.api_key = getattr(settings, 'TRANSLATION_API_KEY', '')
         self.model = getattr(settings, 'TRANSLATION_MODEL', 'gpt-4o-mini')
         self.enabled = getattr(settings, 'TRANSLATION_ENABLED', True)
+        self._rate_limiter = None
+    
+    def _get_rate_limiter(self):
+        """Лимитер провайдера из активной SearchConfiguration (общий бюджет с поиском новостей)"""
+        if self._rate_limiter is None:
+            from .models import SearchConfiguration
+            from .rate_limiter import RateLimiter
+            self._rate_limiter = RateLimiter(SearchConfiguration.get_active())
+        return self._rate_limiter
+    
+    def _create_chat_completion(self, client, prompt: str, max_tokens: int, **kwargs):
+        """Chat Completions с учетом лимитов rpm/tpm провайдера перевода"""
+        limiter = self._get_rate_limiter()
+        reservation = limiter.acquire(self.provider, limiter.estimate_tokens(prompt, output_tokens=max_tokens))
+        response = client.chat.completions.create(max_tokens=max_tokens, **kwargs)
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            limiter.settle(reservation, (usage.prompt_tokens or 0) + (usage.completion_tokens or 0))
+        return response
     
     def translate(self, text: str, source_lang: str, target_lang: str) -> Optional[str]:
         """
@@ -70,10 +90,9 @@ class TranslationService:
     def _translate_openai(self, text: str, source_lang: str, target_lang: str) -> Optional[str]:
         """Перевод через OpenAI API"""
         try:
-            from openai import OpenAI
-            
             # Явный таймаут: иначе запрос может "зависнуть" и привести к убийству воркера gunicorn.
-            client = OpenAI(api_key=self.api_key, timeout=30.0)
+            # Клиент общий для процесса (llm_clients) — соединение переиспользуется между переводами.
+            client = get_client_registry().openai(self.api_key, timeout=30.0)
             
             source_name = self.LANGUAGE_MAP.get(source_lang, source_lang)
             target_name = self.LANGUAGE_MAP.get(target_lang, target_lang)
@@ -85,7 +104,9 @@ Return only the translated text without any explanations or additional comments.
 Text to translate:
 {text}"""
             
-            response = client.chat.completions.create(
+            response = self._create_chat_completion(
+                client,
+                prompt,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are a professional translator. Translate accurately while preserving all formatting."},
@@ -122,10 +143,8 @@ Text to translate:
             return {}
 
         try:
-            from openai import OpenAI
-
             # Один запрос может быть тяжелее; даем больше времени, но все равно ограничиваем.
-            client = OpenAI(api_key=self.api_key, timeout=60.0)
+            client = get_client_registry().openai(self.api_key, timeout=60.0)
 
             source_name = self.LANGUAGE_MAP.get(source_lang, source_lang)
             targets = [
@@ -163,7 +182,9 @@ News body:
 {body}
 """
 
-            response = client.chat.completions.create(
+            response = self._create_chat_completion(
+                client,
+                prompt,
                 model=self.model,
                 messages=[
                     {
@@ -210,6 +231,70 @@ News body:
             logger.error(f"OpenAI bulk translation error: {str(e)}", exc_info=True)
             return None
     
+    def summarize_news_items(self, items: List[Dict[str, str]], source_lang: str) -> Optional[List[Dict[str, str]]]:
+        """
+        Перевод и пересказ записей RSS/Atom ленты (news/feeds.py) на русский одним запросом.
+        На входе только заголовок и начало текста записи — без веб-поиска и страниц статей.
+
+        Args:
+            items: [{'title': ..., 'summary': ...}]
+            source_lang: язык источника
+
+        Returns:
+            [{'title': ..., 'summary': ...}] в том же порядке или None (перевод недоступен или не удался)
+        """
+        if not items or not self.enabled or not self.api_key or self.provider != 'openai':
+            return None
+
+        try:
+            client = get_client_registry().openai(self.api_key, timeout=60.0)
+            source_name = self.LANGUAGE_MAP.get(source_lang, source_lang)
+            payload = json.dumps(
+                [{"id": n, "title": item.get("title", ""), "summary": item.get("summary", "")} for n, item in enumerate(items)],
+                ensure_ascii=False,
+            )
+            prompt = f"""Below are HVAC industry news items from an RSS feed ({source_name}).
+For each item write a Russian title and a one-paragraph Russian summary (journalistic style, third person).
+Use only the facts given; do not invent details.
+
+Return STRICTLY JSON only, no comments, no markdown fences:
+{{"items": [{{"id": 0, "title": "...", "summary": "..."}}]}}
+
+Items:
+{payload}
+"""
+            response = self._create_chat_completion(
+                client,
+                prompt,
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": "You are a news editor and translator. Output JSON only."},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.2,
+                max_tokens=300 * len(items) + 100,
+                response_format={"type": "json_object"},
+            )
+            parsed = json.loads((response.choices[0].message.content or "").strip())
+            by_id = {
+                item.get("id"): item for item in parsed.get("items") or []
+                if isinstance(item, dict) and (item.get("title") or "").strip()
+            }
+            out = []
+            for n, item in enumerate(items):
+                summarized = by_id.get(n)
+                if summarized is None:
+                    out.append(dict(item))
+                    continue
+                out.append({
+                    "title": summarized["title"].strip(),
+                    "summary": (summarized.get("summary") or "").strip() or item.get("summary", ""),
+                })
+            return out
+        except Exception as e:
+            logger.error(f"OpenAI feed summarization error: {str(e)}", exc_info=True)
+            return None
+
     def _translate_anthropic(self, text: str, source_lang: str, target_lang: str) -> Optional[str]:
         """Перевод через Anthropic API (Claude)"""
         # TODO: Реализовать при необходимости
@@ -8,7 +8,7 @@ from django.utils import timezone
 from django.conf import settings
 from django.db.models import Sum, Avg, Count
 from decimal import Decimal
-from .models import NewsPost, Comment, MediaUpload, SearchConfiguration, NewsDiscoveryRun, DiscoveryAPICall
+from .models import NewsPost, Comment, MediaUpload, SearchConfiguration, NewsDiscoveryRun, DiscoveryAPICall, DiscoveryJob
 from .serializers import (
     NewsPostSerializer, NewsPostWriteSerializer, CommentSerializer, MediaUploadSerializer,
     SearchConfigurationSerializer, SearchConfigurationListSerializer,
@@ -16,6 +16,8 @@ from .serializers import (
     DiscoveryAPICallSerializer, DiscoveryStatsSerializer
 )
 from .translation_service import TranslationService
+from .llm_clients import get_client_registry
+from .jobs import can_resume_run, enqueue_discovery_job
 
 logger = logging.getLogger(__name__)
 
@@ -31,11 +33,11 @@ def get_default_prompts() -> dict:
         },
         'search_prompts': {
             'ru': {
-                'main': 'Найди все свежие новости на сайте {url} ({name}) за последние 2 недели.\n\nИспользуй веб-поиск. Ищи все статьи, публикации, пресс-релизы, новости на сайте. Для каждой найденной новости верни заголовок, текст новости (1 абзац) и ссылку на источник.',
+                'main': 'Найди все новости, опубликованные на сайте {url} ({name}) с {start_date} по {end_date}.\n\nИспользуй веб-поиск. Ищи все статьи, публикации, пресс-релизы, новости на сайте. Для каждой найденной новости верни заголовок, текст новости (1 абзац) и ссылку на источник.',
                 'json_format': 'Верни ответ СТРОГО в JSON формате:\n\n{{\n  "news": [\n    {{\n      "title": "Заголовок новости",\n      "summary": "Текст новости (1 абзац). Пиши напрямую, как журналист, от третьего лица.",\n      "source_url": "https://example.com/news/article"\n    }}\n  ]\n}}\n\nЕсли новостей не найдено: {{"news": []}}\n\nВерни ТОЛЬКО JSON, без комментариев.'
             },
             'en': {
-                'main': 'Find all recent news on website {url} ({name}) from the last 2 weeks.\n\nUse web search. Look for all articles, publications, press releases, news on the website. For each news item, provide title, summary (1 paragraph) and source link.\n\n**IMPORTANT: Translate all news to Russian. Return only Russian text.**',
+                'main': 'Find all news published on website {url} ({name}) from {start_date} to {end_date}.\n\nUse web search. Look for all articles, publications, press releases, news on the website. For each news item, provide title, summary (1 paragraph) and source link.\n\n**IMPORTANT: Translate all news to Russian. Return only Russian text.**',
                 'json_format': 'Return STRICTLY in JSON format:\n\n{{\n  "news": [\n    {{\n      "title": "Заголовок новости на русском",\n      "summary": "Текст новости на русском (1 абзац). Пиши напрямую, как журналист, от третьего лица.",\n      "source_url": "https://example.com/news/article"\n    }}\n  ]\n}}\n\nIf no news found: {{"news": []}}\n\nReturn ONLY JSON in Russian, no comments.'
             },
             'es': {
@@ -76,7 +78,7 @@ class NewsPostViewSet(viewsets.ModelViewSet):
         """
         Админы видят все новости (включая будущие, черновики и запланированные).
         Обычные пользователи видят только опубликованные новости (status=published и pub_date <= now).
-        Поддерживает фильтрацию по is_no_news_found через query parameter.
+        Поддерживает фильтрацию по is_no_news_found и near_duplicates через query parameters.
         """
         queryset = NewsPost.objects.select_related('author').prefetch_related('media').all()
         
@@ -94,6 +96,11 @@ class NewsPostViewSet(viewsets.ModelViewSet):
             is_no_news_found_bool = is_no_news_found.lower() in ('true', '1', 'yes')
             queryset = queryset.filter(is_no_news_found=is_no_news_found_bool)
         
+        # near_duplicates=false — только представители групп похожих новостей
+        near_duplicates = self.request.query_params.get('near_duplicates', None)
+        if near_duplicates is not None and near_duplicates.lower() in ('false', '0', 'no'):
+            queryset = queryset.filter(near_duplicate_of__isnull=True)
+        
         return queryset
     
     def get_permissions(self):
@@ -492,6 +499,24 @@ class NewsDiscoveryRunViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = DiscoveryAPICallSerializer(calls, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Отменить выполняющийся запуск: необработанные цели останутся для продолжения"""
+        run = self.get_object()
+        if run.status != NewsDiscoveryRun.STATUS_RUNNING:
+            return Response({'detail': f'Run is {run.status}'}, status=status.HTTP_400_BAD_REQUEST)
+        NewsDiscoveryRun.objects.filter(pk=run.pk).update(status=NewsDiscoveryRun.STATUS_CANCELLED)
+        return Response({'id': run.id, 'status': NewsDiscoveryRun.STATUS_CANCELLED})
+    
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        """Продолжить прерванный запуск с необработанных целей (задание для discovery_worker)"""
+        run = self.get_object()
+        if not can_resume_run(run):
+            return Response({'detail': f'Run is {run.status}'}, status=status.HTTP_400_BAD_REQUEST)
+        job = enqueue_discovery_job(DiscoveryJob.JOB_TYPE_RESUME, user=request.user, discovery_run=run)
+        return Response({'id': run.id, 'job_id': job.id}, status=status.HTTP_202_ACCEPTED)
+    
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Получить агрегированную статистику по всем запускам"""
@@ -541,10 +566,14 @@ class NewsDiscoveryRunViewSet(viewsets.ReadOnlyModelViewSet):
                             'input_tokens': 0,
                             'output_tokens': 0,
                             'cost': 0,
-                            'errors': 0
+                            'errors': 0,
+                            'parse_failures': 0
                         }
-                    for key in ['requests', 'input_tokens', 'output_tokens', 'cost', 'errors']:
+                    for key in ['requests', 'input_tokens', 'output_tokens', 'cost', 'errors', 'parse_failures']:
                         provider_breakdown[provider][key] += stats.get(key, 0)
+        # Доля ответов, не разобранных как JSON с новостями (news/structured_output.py)
+        for stats in provider_breakdown.values():
+            stats['parse_failure_rate'] = stats['parse_failures'] / stats['requests'] if stats['requests'] else 0
         
         result = {
             'total_runs': total_runs,
@@ -561,6 +590,11 @@ class NewsDiscoveryRunViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = DiscoveryStatsSerializer(result)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def client_pools(self, request):
+        """Счетчики пулов клиентов LLM текущего процесса (см. news/llm_clients.py)"""
+        return Response(get_client_registry().stats())
+
     @action(detail=False, methods=['get'])
     def latest(self, request):
         """Получить последний запуск"""
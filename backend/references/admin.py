@@ -16,7 +16,7 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from modeltranslation.admin import TranslationAdmin
 from .models import Manufacturer, Brand, NewsResource, NewsResourceStatistics, ManufacturerStatistics
-from news.models import NewsDiscoveryRun, NewsDiscoveryStatus, SearchConfiguration
+from news.models import DiscoveryJob, NewsDiscoveryRun, NewsDiscoveryStatus, SearchConfiguration
 
 logger = logging.getLogger(__name__)
 
@@ -144,8 +144,8 @@ class ManufacturerAdmin(TranslationAdmin):
     is_active_display.admin_order_field = 'statistics__is_active'
     
     def discover_manufacturers_news(self, request):
-        """Запускает поиск новостей для всех производителей"""
-        from news.discovery_service import NewsDiscoveryService
+        """Ставит в очередь поиск новостей для всех производителей (выполняет discovery_worker)"""
+        from news.jobs import enqueue_discovery_job
         
         # Аутентификация через JWT или session
         user = authenticate_jwt_request(request)
@@ -185,55 +185,29 @@ class ManufacturerAdmin(TranslationAdmin):
             manufacturer_count = Manufacturer.objects.count()
             status_obj = NewsDiscoveryStatus.create_new_status(manufacturer_count, search_type='manufacturers', provider=provider)
             
-            # Если это AJAX запрос - запускаем поиск в фоне
+            # Поиск выполняет discovery_worker; веб только ставит задание
+            job = enqueue_discovery_job(
+                DiscoveryJob.JOB_TYPE_MANUFACTURERS,
+                provider=provider,
+                user=request.user,
+                discovery_status=status_obj,
+                last_search_date=last_search_date_override,
+            )
+            
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                import threading
-                
-                def run_discovery():
-                    try:
-                        service = NewsDiscoveryService(user=request.user)
-                        service.discover_all_manufacturers_news(
-                            status_obj=status_obj,
-                            last_search_date_override=last_search_date_override,
-                        )
-                    except Exception as e:
-                        logger.error(f"Error during manufacturers news discovery: {str(e)}")
-                        status_obj.status = 'error'
-                        status_obj.save()
-                
-                thread = threading.Thread(target=run_discovery)
-                thread.daemon = True
-                thread.start()
-                
                 return JsonResponse({
                     'status': 'running',
+                    'job_id': job.id,
                     'processed': 0,
                     'total': manufacturer_count,
                     'percent': 0
                 })
             
-            # Если это обычный POST - запускаем синхронно
-            try:
-                service = NewsDiscoveryService(user=request.user)
-                stats = service.discover_all_manufacturers_news(
-                    status_obj=status_obj,
-                    last_search_date_override=last_search_date_override,
-                )
-                
-                self.message_user(
-                    request,
-                    _('Поиск новостей по производителям завершен. Создано новостей: {}, ошибок: {}, обработано производителей: {}').format(
-                        stats['created'], stats['errors'], stats['total_processed']
-                    ),
-                    level=messages.SUCCESS
-                )
-            except Exception as e:
-                logger.error(f"Error during manufacturers news discovery: {str(e)}")
-                self.message_user(
-                    request,
-                    _('Ошибка при поиске новостей по производителям: {}').format(str(e)),
-                    level=messages.ERROR
-                )
+            self.message_user(
+                request,
+                _('Поиск новостей по производителям поставлен в очередь (задание #{})').format(job.id),
+                level=messages.SUCCESS
+            )
             
             from django.shortcuts import redirect
             return redirect(request.path)
@@ -241,6 +215,7 @@ class ManufacturerAdmin(TranslationAdmin):
         # GET запрос - показываем страницу подтверждения
         from django.shortcuts import render
         last_search_date = NewsDiscoveryRun.get_last_search_date()
+        search_start = NewsDiscoveryRun.default_search_start()
         today = timezone.now().date()
         manufacturer_count = Manufacturer.objects.count()
         
@@ -248,6 +223,7 @@ class ManufacturerAdmin(TranslationAdmin):
             'title': _('Поиск новостей по производителям'),
             'opts': self.model._meta,
             'last_search_date': last_search_date,
+            'search_start': search_start,
             'today': today,
             'manufacturer_count': manufacturer_count,
         }
@@ -267,6 +243,7 @@ class ManufacturerAdmin(TranslationAdmin):
             return JsonResponse({
                 'processed': status_obj.processed_count,
                 'total': status_obj.total_count,
+                'streamed_news': status_obj.streamed_news_count,
                 'status': status_obj.status,
                 'percent': status_obj.get_progress_percent()
             })
@@ -274,6 +251,7 @@ class ManufacturerAdmin(TranslationAdmin):
             return JsonResponse({
                 'processed': 0,
                 'total': 0,
+                'streamed_news': 0,
                 'status': 'none',
                 'percent': 0
             })
@@ -292,12 +270,10 @@ class ManufacturerAdmin(TranslationAdmin):
         last_status = NewsDiscoveryStatus.objects.order_by('-created_at').first()
         last_discovery_date = last_status.created_at if last_status else None
         
-        last_run = NewsDiscoveryRun.objects.first()
-        period_start = None
-        if last_run:
-            period_start = timezone.make_aware(
-                datetime.combine(last_run.last_search_date, datetime.min.time())
-            )
+        # Период целей без водяного знака; у остальных он начинается с их search_watermark
+        period_start = timezone.make_aware(
+            datetime.combine(NewsDiscoveryRun.default_search_start(), datetime.min.time())
+        )
         
         period_end = timezone.now()
         total_manufacturers = Manufacturer.objects.count()
@@ -322,16 +298,18 @@ class NewsResourceAdmin(TranslationAdmin):
     search_fields = ('name', 'url', 'description', 'section')
     list_filter = ('language', 'source_type', 'section', 'statistics__is_active', 'statistics__error_rate')
     list_per_page = 50
-    actions = ['delete_selected', 'mark_as_manual', 'mark_as_auto', 'mark_as_hybrid', 'discover_selected_resources']
+    actions = ['delete_selected', 'mark_as_manual', 'mark_as_auto', 'mark_as_hybrid', 'mark_as_feed',
+               'discover_feeds_for_selected', 'discover_selected_resources']
     ordering = ['-statistics__ranking_score', 'name']
     fieldsets = (
         (_('Основная информация'), {
             'fields': ('name', 'url', 'section', 'description')
         }),
         (_('Настройки поиска'), {
-            'fields': ('source_type', 'language', 'custom_search_instructions'),
+            'fields': ('source_type', 'language', 'custom_search_instructions', 'feed_url', 'feed_discovered_at'),
             'description': _('Источники типа "Ручной ввод" пропускаются при автоматическом поиске. '
                            'Для источников типа "Гибридный" используются кастомные инструкции. '
+                           'Источники типа "RSS/Atom лента" читаются из feed_url без поиска LLM. '
                            'Язык источника определяет язык промпта для LLM.')
         }),
         (_('Служебная информация'), {
@@ -350,11 +328,13 @@ class NewsResourceAdmin(TranslationAdmin):
             'auto': '#28a745',  # зеленый
             'manual': '#dc3545',  # красный
             'hybrid': '#ffc107',  # желтый
+            'feed': '#17a2b8',  # голубой
         }
         icons = {
             'auto': '🤖',
             'manual': '✋',
             'hybrid': '⚙️',
+            'feed': '📡',
         }
         color = colors.get(obj.source_type, '#6c757d')
         icon = icons.get(obj.source_type, '')
@@ -411,10 +391,25 @@ class NewsResourceAdmin(TranslationAdmin):
         updated = queryset.update(source_type='hybrid')
         self.message_user(request, f'{updated} источников помечены как "Гибридный"')
     
+    @admin.action(description=_('Пометить как "RSS/Atom лента" (только с найденной лентой)'))
+    def mark_as_feed(self, request, queryset):
+        updated = queryset.exclude(feed_url='').update(source_type=NewsResource.SOURCE_TYPE_FEED)
+        skipped = queryset.filter(feed_url='').count()
+        self.message_user(request, f'{updated} источников помечены как "RSS/Atom лента", без ленты пропущено: {skipped}')
+    
+    @admin.action(description=_('Найти RSS/Atom ленты на страницах выбранных источников'))
+    def discover_feeds_for_selected(self, request, queryset):
+        """Ставит в очередь поиск лент: страницы источников загружает discovery_worker, а не веб-процесс"""
+        from news.jobs import enqueue_discovery_job
+        
+        resource_ids = list(queryset.values_list('id', flat=True))
+        job = enqueue_discovery_job(DiscoveryJob.JOB_TYPE_FEED_DISCOVERY, user=request.user, resource_ids=resource_ids)
+        self.message_user(request, f'Поиск лент для {len(resource_ids)} источников поставлен в очередь (задание #{job.id})')
+    
     @admin.action(description=_('Запустить поиск новостей для выбранных источников'))
     def discover_selected_resources(self, request, queryset):
-        """Запускает поиск новостей для выбранных источников"""
-        from news.discovery_service import NewsDiscoveryService
+        """Ставит в очередь поиск новостей для выбранных источников"""
+        from news.jobs import enqueue_discovery_job
         
         # Получаем выбранный провайдер из POST запроса (может быть передан через action_form)
         provider = request.POST.get('provider', 'auto')
@@ -440,43 +435,22 @@ class NewsResourceAdmin(TranslationAdmin):
             provider=provider
         )
         
-        # Запускаем поиск в фоне
-        import threading
-        
-        def run_discovery():
-            try:
-                service = NewsDiscoveryService(user=request.user)
-                # Обрабатываем только выбранные источники
-                for resource_id in resource_ids:
-                    try:
-                        resource = NewsResource.objects.get(id=resource_id)
-                        service.discover_news_for_resource(resource, provider=provider)
-                        # Обновляем прогресс
-                        status_obj.processed_count += 1
-                        status_obj.save()
-                    except NewsResource.DoesNotExist:
-                        continue
-                    except Exception as e:
-                        logger.error(f"Error processing resource {resource_id}: {str(e)}")
-                        status_obj.processed_count += 1
-                        status_obj.save()
-                
-                status_obj.status = 'completed'
-                status_obj.save()
-            except Exception as e:
-                logger.error(f"Error during selected resources discovery: {str(e)}")
-                status_obj.status = 'error'
-                status_obj.save()
-        
-        thread = threading.Thread(target=run_discovery)
-        thread.daemon = True
-        thread.start()
+        # Поиск выполняет discovery_worker (провайдер берется из status_obj)
+        job = enqueue_discovery_job(
+            DiscoveryJob.JOB_TYPE_RESOURCES,
+            provider=provider,
+            user=request.user,
+            discovery_status=status_obj,
+            resource_ids=resource_ids,
+            ignore_schedule=True,
+        )
         
         provider_display = dict(NewsDiscoveryStatus._meta.get_field('provider').choices).get(provider, provider)
         self.message_user(
             request,
-            _('Поиск новостей запущен для {} источников. Провайдер: {}').format(
+            _('Поиск новостей поставлен в очередь для {} источников (задание #{}). Провайдер: {}').format(
                 len(resource_ids),
+                job.id,
                 provider_display
             ),
             level=messages.SUCCESS
@@ -516,8 +490,8 @@ class NewsResourceAdmin(TranslationAdmin):
         return my_urls + urls
     
     def discover_news(self, request):
-        """Запускает поиск новостей для всех источников"""
-        from news.discovery_service import NewsDiscoveryService
+        """Ставит в очередь поиск новостей для всех источников (выполняет discovery_worker)"""
+        from news.jobs import enqueue_discovery_job
         
         # Аутентификация через JWT или session
         user = authenticate_jwt_request(request)
@@ -579,6 +553,9 @@ class NewsResourceAdmin(TranslationAdmin):
             sections = [s.strip() for s in sections if s and s.strip()]
             if 'all' in sections:
                 sections = []
+            # Расписание (news/crawl_schedule.py) применяется и к выбранным секциям;
+            # искать все источники, даже если им рано, — только по явному флагу
+            ignore_schedule = request.POST.get('ignore_schedule') in ('1', 'true', 'on')
 
             resources_qs = NewsResource.objects.exclude(source_type=NewsResource.SOURCE_TYPE_MANUAL)
             if sections:
@@ -595,61 +572,33 @@ class NewsResourceAdmin(TranslationAdmin):
                 provider=status_provider,
             )
             
-            # Если это AJAX запрос - запускаем поиск в фоне и возвращаем статус
+            # Поиск выполняет discovery_worker; веб только ставит задание.
+            # Без фильтра по секциям список источников берется при выполнении.
+            job = enqueue_discovery_job(
+                DiscoveryJob.JOB_TYPE_RESOURCES,
+                provider=status_provider,
+                user=request.user,
+                config=selected_config,
+                discovery_status=status_obj,
+                resource_ids=resources_qs.values_list('id', flat=True) if sections else None,
+                last_search_date=last_search_date_override,
+                ignore_schedule=ignore_schedule,
+            )
+            
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                import threading
-                resources_list = list(resources_qs.order_by('id'))
-                
-                def run_discovery():
-                    try:
-                        service = NewsDiscoveryService(user=request.user, config=selected_config)
-                        service.discover_all_news(
-                            status_obj=status_obj,
-                            resources=resources_list,
-                            last_search_date_override=last_search_date_override,
-                        )
-                    except Exception as e:
-                        logger.error(f"Error during news discovery: {str(e)}")
-                        status_obj.status = 'error'
-                        status_obj.save()
-                
-                # Запускаем поиск в отдельном потоке
-                thread = threading.Thread(target=run_discovery)
-                thread.daemon = True
-                thread.start()
-                
-                # Возвращаем начальный статус
                 return JsonResponse({
                     'status': 'running',
+                    'job_id': job.id,
                     'processed': 0,
                     'total': resource_count,
                     'percent': 0
                 })
             
-            # Если это обычный POST - запускаем синхронно (для совместимости)
-            try:
-                service = NewsDiscoveryService(user=request.user, config=selected_config)
-                resources_list = list(resources_qs.order_by('id'))
-                stats = service.discover_all_news(
-                    status_obj=status_obj,
-                    resources=resources_list,
-                    last_search_date_override=last_search_date_override,
-                )
-                
-                self.message_user(
-                    request,
-                    _('Поиск новостей завершен. Создано новостей: {}, ошибок: {}, обработано источников: {}').format(
-                        stats['created'], stats['errors'], stats['total_processed']
-                    ),
-                    level=messages.SUCCESS
-                )
-            except Exception as e:
-                logger.error(f"Error during news discovery: {str(e)}")
-                self.message_user(
-                    request,
-                    _('Ошибка при поиске новостей: {}').format(str(e)),
-                    level=messages.ERROR
-                )
+            self.message_user(
+                request,
+                _('Поиск новостей поставлен в очередь (задание #{})').format(job.id),
+                level=messages.SUCCESS
+            )
             
             from django.shortcuts import redirect
             return redirect(request.path)
@@ -657,6 +606,7 @@ class NewsResourceAdmin(TranslationAdmin):
         # GET запрос - показываем страницу подтверждения
         from django.shortcuts import render
         last_search_date = NewsDiscoveryRun.get_last_search_date()
+        search_start = NewsDiscoveryRun.default_search_start()
         today = timezone.now().date()
         resource_count = NewsResource.objects.exclude(source_type=NewsResource.SOURCE_TYPE_MANUAL).count()
         
@@ -664,14 +614,15 @@ class NewsResourceAdmin(TranslationAdmin):
             'title': _('Поиск новостей'),
             'opts': self.model._meta,
             'last_search_date': last_search_date,
+            'search_start': search_start,
             'today': today,
             'resource_count': resource_count,
         }
         return render(request, 'admin/discover_news.html', context)
     
     def discover_single_resource(self, request, resource_id):
-        """Запускает поиск новостей для одного источника"""
-        from news.discovery_service import NewsDiscoveryService
+        """Ставит в очередь поиск новостей для одного источника"""
+        from news.jobs import enqueue_discovery_job
         
         # Аутентификация через JWT или session
         user = authenticate_jwt_request(request)
@@ -718,56 +669,28 @@ class NewsResourceAdmin(TranslationAdmin):
             if provider not in ['auto', 'grok', 'anthropic', 'openai']:
                 provider = 'auto'
             
-            # Если это AJAX запрос - запускаем поиск в фоне
+            job = enqueue_discovery_job(
+                DiscoveryJob.JOB_TYPE_RESOURCE,
+                provider=provider,
+                user=request.user,
+                resource_ids=[resource.id],
+            )
+            
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                import threading
-                
-                def run_discovery():
-                    try:
-                        service = NewsDiscoveryService(user=request.user)
-                        created, errors, error_msg = service.discover_news_for_resource(resource, provider=provider)
-                        logger.info(f"Discovery completed for resource {resource_id}: created={created}, errors={errors}")
-                    except Exception as e:
-                        logger.error(f"Error during single resource discovery: {str(e)}")
-                
-                thread = threading.Thread(target=run_discovery)
-                thread.daemon = True
-                thread.start()
-                
                 return JsonResponse({
                     'status': 'running',
+                    'job_id': job.id,
                     'resource_id': resource_id,
                     'resource_name': resource.name,
                     'provider': provider,
-                    'message': _('Поиск новостей запущен для источника "{}"').format(resource.name)
+                    'message': _('Поиск новостей поставлен в очередь для источника "{}"').format(resource.name)
                 })
             
-            # Если это обычный POST - запускаем синхронно
-            try:
-                service = NewsDiscoveryService(user=request.user)
-                created, errors, error_msg = service.discover_news_for_resource(resource, provider=provider)
-                
-                if error_msg:
-                    self.message_user(
-                        request,
-                        _('Ошибка при поиске новостей для источника "{}": {}').format(resource.name, error_msg),
-                        level=messages.ERROR
-                    )
-                else:
-                    self.message_user(
-                        request,
-                        _('Поиск новостей завершен для источника "{}". Создано: {}, ошибок: {}').format(
-                            resource.name, created, errors
-                        ),
-                        level=messages.SUCCESS
-                    )
-            except Exception as e:
-                logger.error(f"Error during single resource discovery: {str(e)}")
-                self.message_user(
-                    request,
-                    _('Ошибка при поиске новостей: {}').format(str(e)),
-                    level=messages.ERROR
-                )
+            self.message_user(
+                request,
+                _('Поиск новостей для источника "{}" поставлен в очередь (задание #{})').format(resource.name, job.id),
+                level=messages.SUCCESS
+            )
             
             from django.shortcuts import redirect
             return redirect('admin:references_newsresource_change', resource_id)
@@ -803,6 +726,7 @@ class NewsResourceAdmin(TranslationAdmin):
             return JsonResponse({
                 'processed': status_obj.processed_count,
                 'total': status_obj.total_count,
+                'streamed_news': status_obj.streamed_news_count,
                 'status': status_obj.status,
                 'percent': status_obj.get_progress_percent()
             })
@@ -810,6 +734,7 @@ class NewsResourceAdmin(TranslationAdmin):
             return JsonResponse({
                 'processed': 0,
                 'total': 0,
+                'streamed_news': 0,
                 'status': 'none',
                 'percent': 0
             })
@@ -833,18 +758,10 @@ class NewsResourceAdmin(TranslationAdmin):
         last_status = NewsDiscoveryStatus.objects.order_by('-created_at').first()
         last_discovery_date = last_status.created_at if last_status else None
         
-        # Последний успешный запуск - берем last_search_date из NewsDiscoveryRun
-        last_run = NewsDiscoveryRun.objects.first()
-        period_start = None
-        if last_run and last_run.last_search_date:
-            try:
-                # Преобразуем date в datetime для начала дня
-                period_start = timezone.make_aware(
-                    datetime.combine(last_run.last_search_date, datetime.min.time())
-                )
-            except (AttributeError, TypeError) as e:
-                logger.warning(f"Error creating period_start from last_run: {str(e)}")
-                period_start = None
+        # Период целей без водяного знака; у остальных он начинается с их search_watermark
+        period_start = timezone.make_aware(
+            datetime.combine(NewsDiscoveryRun.default_search_start(), datetime.min.time())
+        )
         
         # Текущая дата и время
         period_end = timezone.now()
@@ -960,9 +877,11 @@ class ManufacturerStatisticsAdmin(admin.ModelAdmin):
         'ranking_score',
         'news_last_30_days',
         'is_active',
-        'last_search_date'
+        'last_search_date',
+        'next_search_at'
     )
     list_filter = ('is_active', 'created_at', 'last_search_date')
+    actions = ['search_in_next_run']
     search_fields = ('manufacturer__name', 'manufacturer__region')
     readonly_fields = (
         'manufacturer',
@@ -982,11 +901,19 @@ class ManufacturerStatisticsAdmin(admin.ModelAdmin):
         'last_search_date',
         'last_news_date',
         'first_search_date',
+        'search_watermark',
+        'next_search_at',
+        'empty_search_streak',
         'created_at',
         'updated_at'
     )
     ordering = ['-ranking_score', '-total_news_found']
     
+    @admin.action(description=_('Искать в ближайший проход'))
+    def search_in_next_run(self, request, queryset):
+        updated = queryset.update(next_search_at=None)
+        self.message_user(request, f'Будут найдены в ближайший проход: {updated}')
+    
     def manufacturer_name(self, obj):
         return obj.manufacturer.name
     manufacturer_name.short_description = _('Производитель')
@@ -1030,9 +957,16 @@ class ManufacturerStatisticsAdmin(admin.ModelAdmin):
                 'first_search_date',
                 'last_search_date',
                 'last_news_date',
+                'search_watermark',
             ),
             'classes': ('collapse',)
         }),
+        (_('Расписание поиска'), {
+            'fields': (
+                'next_search_at',
+                'empty_search_streak',
+            )
+        }),
         (_('Системные'), {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -1051,9 +985,11 @@ class NewsResourceStatisticsAdmin(admin.ModelAdmin):
         'ranking_score',
         'news_last_30_days',
         'is_active',
-        'last_search_date'
+        'last_search_date',
+        'next_search_at'
     )
     list_filter = ('is_active', 'created_at', 'last_search_date')
+    actions = ['search_in_next_run']
     search_fields = ('resource__name', 'resource__url')
     readonly_fields = (
         'resource',
@@ -1073,11 +1009,26 @@ class NewsResourceStatisticsAdmin(admin.ModelAdmin):
         'last_search_date',
         'last_news_date',
         'first_search_date',
+        'search_watermark',
+        'next_search_at',
+        'empty_search_streak',
+        'page_checked_at',
+        'total_unchanged',
+        'page_fingerprint',
+        'page_fingerprint_pending',
+        'feed_polled_at',
+        'feed_etag',
+        'feed_last_modified',
         'created_at',
         'updated_at'
     )
     ordering = ['-ranking_score', '-total_news_found']
     
+    @admin.action(description=_('Искать в ближайший проход'))
+    def search_in_next_run(self, request, queryset):
+        updated = queryset.update(next_search_at=None)
+        self.message_user(request, f'Будут найдены в ближайший проход: {updated}')
+    
     def resource_name(self, obj):
         return obj.resource.name
     resource_name.short_description = _('Источник')
@@ -1121,6 +1072,30 @@ class NewsResourceStatisticsAdmin(admin.ModelAdmin):
                 'first_search_date',
                 'last_search_date',
                 'last_news_date',
+                'search_watermark',
+            ),
+            'classes': ('collapse',)
+        }),
+        (_('Расписание поиска'), {
+            'fields': (
+                'next_search_at',
+                'empty_search_streak',
+            )
+        }),
+        (_('Проверка изменений сайта'), {
+            'fields': (
+                'page_checked_at',
+                'total_unchanged',
+                'page_fingerprint',
+                'page_fingerprint_pending',
+            ),
+            'classes': ('collapse',)
+        }),
+        (_('RSS/Atom лента'), {
+            'fields': (
+                'feed_polled_at',
+                'feed_etag',
+                'feed_last_modified',
             ),
             'classes': ('collapse',)
         }),
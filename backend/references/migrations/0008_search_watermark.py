@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('references', '0007_add_language_to_newsresource'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='manufacturerstatistics',
+            name='search_watermark',
+            field=models.DateField(blank=True, help_text='Дата, по которую поиск прошел успешно: следующий поиск начнется с нее', null=True, verbose_name='Search Watermark'),
+        ),
+        migrations.AddField(
+            model_name='newsresourcestatistics',
+            name='search_watermark',
+            field=models.DateField(blank=True, help_text='Дата, по которую поиск прошел успешно: следующий поиск начнется с нее', null=True, verbose_name='Search Watermark'),
+        ),
+    ]
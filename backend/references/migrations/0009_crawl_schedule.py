@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('references', '0008_search_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='manufacturerstatistics',
+            name='empty_search_streak',
+            field=models.PositiveIntegerField(default=0, help_text='Поисков подряд без новых новостей: каждый удваивает интервал до следующего поиска', verbose_name='Empty Search Streak'),
+        ),
+        migrations.AddField(
+            model_name='manufacturerstatistics',
+            name='next_search_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Когда искать в следующий раз (news/crawl_schedule.py); пусто = в ближайший проход', null=True, verbose_name='Next Search At'),
+        ),
+        migrations.AddField(
+            model_name='newsresourcestatistics',
+            name='empty_search_streak',
+            field=models.PositiveIntegerField(default=0, help_text='Поисков подряд без новых новостей: каждый удваивает интервал до следующего поиска', verbose_name='Empty Search Streak'),
+        ),
+        migrations.AddField(
+            model_name='newsresourcestatistics',
+            name='next_search_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Когда искать в следующий раз (news/crawl_schedule.py); пусто = в ближайший проход', null=True, verbose_name='Next Search At'),
+        ),
+    ]
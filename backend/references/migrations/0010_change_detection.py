@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('references', '0009_crawl_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsresourcestatistics',
+            name='page_checked_at',
+            field=models.DateTimeField(blank=True, help_text='Когда страница источника проверялась на изменения', null=True, verbose_name='Page Checked At'),
+        ),
+        migrations.AddField(
+            model_name='newsresourcestatistics',
+            name='page_fingerprint',
+            field=models.JSONField(blank=True, default=dict, help_text='ETag, Last-Modified и хеш ссылок страницы и sitemap источника (news/change_detection.py)', verbose_name='Page Fingerprint'),
+        ),
+        migrations.AddField(
+            model_name='newsresourcestatistics',
+            name='total_unchanged',
+            field=models.IntegerField(default=0, help_text='Всего раз поиск пропущен: сайт не изменился с прошлой проверки', verbose_name='Total Unchanged'),
+        ),
+    ]
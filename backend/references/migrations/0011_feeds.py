@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('references', '0010_change_detection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsresource',
+            name='feed_discovered_at',
+            field=models.DateTimeField(blank=True, help_text='Когда страница источника последний раз проверялась на наличие ленты', null=True, verbose_name='Feed Discovered At'),
+        ),
+        migrations.AddField(
+            model_name='newsresource',
+            name='feed_url',
+            field=models.URLField(blank=True, help_text='RSS/Atom лента источника, найденная по <link rel="alternate"> на его странице (команда discover_feeds) или указанная вручную', verbose_name='Feed URL'),
+        ),
+        migrations.AddField(
+            model_name='newsresourcestatistics',
+            name='feed_etag',
+            field=models.CharField(blank=True, help_text='ETag ленты с прошлого опроса (условный GET, news/feeds.py)', max_length=255, verbose_name='Feed ETag'),
+        ),
+        migrations.AddField(
+            model_name='newsresourcestatistics',
+            name='feed_last_modified',
+            field=models.CharField(blank=True, help_text='Last-Modified ленты с прошлого опроса', max_length=64, verbose_name='Feed Last-Modified'),
+        ),
+        migrations.AddField(
+            model_name='newsresourcestatistics',
+            name='feed_polled_at',
+            field=models.DateTimeField(blank=True, help_text='Когда лента источника опрашивалась последний раз', null=True, verbose_name='Feed Polled At'),
+        ),
+        migrations.AlterField(
+            model_name='newsresource',
+            name='source_type',
+            field=models.CharField(choices=[('auto', 'Автоматический поиск'), ('manual', 'Ручной ввод'), ('hybrid', 'Гибридный (с кастомными инструкциями)'), ('feed', 'RSS/Atom лента (без поиска LLM)')], default='auto', help_text='Тип источника: auto - автоматический поиск LLM, manual - только ручной ввод, hybrid - автопоиск с кастомными инструкциями, feed - новости из RSS/Atom ленты (feed_url) без поиска LLM', max_length=20, verbose_name='Source Type'),
+        ),
+    ]
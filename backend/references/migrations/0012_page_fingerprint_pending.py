@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('references', '0011_feeds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsresourcestatistics',
+            name='page_fingerprint_pending',
+            field=models.JSONField(blank=True, default=dict, help_text='Отпечаток последней проверки: становится page_fingerprint, только когда поиск прошел успешно', verbose_name='Pending Page Fingerprint'),
+        ),
+        migrations.AlterField(
+            model_name='newsresourcestatistics',
+            name='page_fingerprint',
+            field=models.JSONField(blank=True, default=dict, help_text='ETag, Last-Modified и хеш ссылок страницы и sitemap источника на момент последнего успешного поиска (news/change_detection.py)', verbose_name='Page Fingerprint'),
+        ),
+    ]
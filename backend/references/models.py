@@ -44,10 +44,12 @@ class NewsResource(models.Model):
     SOURCE_TYPE_AUTO = 'auto'
     SOURCE_TYPE_MANUAL = 'manual'
     SOURCE_TYPE_HYBRID = 'hybrid'
+    SOURCE_TYPE_FEED = 'feed'
     SOURCE_TYPE_CHOICES = [
         (SOURCE_TYPE_AUTO, _('Автоматический поиск')),
         (SOURCE_TYPE_MANUAL, _('Ручной ввод')),
         (SOURCE_TYPE_HYBRID, _('Гибридный (с кастомными инструкциями)')),
+        (SOURCE_TYPE_FEED, _('RSS/Atom лента (без поиска LLM)')),
     ]
     
     name = models.CharField(_("Resource Name"), max_length=255)
@@ -62,7 +64,20 @@ class NewsResource(models.Model):
         max_length=20,
         choices=SOURCE_TYPE_CHOICES,
         default=SOURCE_TYPE_AUTO,
-        help_text=_("Тип источника: auto - автоматический поиск LLM, manual - только ручной ввод, hybrid - автопоиск с кастомными инструкциями")
+        help_text=_("Тип источника: auto - автоматический поиск LLM, manual - только ручной ввод, hybrid - автопоиск с кастомными инструкциями, "
+                    "feed - новости из RSS/Atom ленты (feed_url) без поиска LLM")
+    )
+    feed_url = models.URLField(
+        _("Feed URL"),
+        blank=True,
+        help_text=_("RSS/Atom лента источника, найденная по <link rel=\"alternate\"> на его странице "
+                    "(команда discover_feeds) или указанная вручную")
+    )
+    feed_discovered_at = models.DateTimeField(
+        _("Feed Discovered At"),
+        null=True,
+        blank=True,
+        help_text=_("Когда страница источника последний раз проверялась на наличие ленты")
     )
     language = models.CharField(
         _("Language"),
@@ -112,7 +127,12 @@ class NewsResource(models.Model):
     @property
     def is_auto_searchable(self) -> bool:
         """Можно ли искать новости автоматически"""
-        return self.source_type in [self.SOURCE_TYPE_AUTO, self.SOURCE_TYPE_HYBRID]
+        return self.source_type in [self.SOURCE_TYPE_AUTO, self.SOURCE_TYPE_HYBRID, self.SOURCE_TYPE_FEED]
+    
+    @property
+    def is_feed(self) -> bool:
+        """Новости берутся из RSS/Atom ленты, без поиска LLM"""
+        return self.source_type == self.SOURCE_TYPE_FEED and bool(self.feed_url)
     
     @property
     def requires_manual_input(self) -> bool:
@@ -173,6 +193,66 @@ class NewsResourceStatistics(models.Model):
         blank=True,
         help_text=_("Дата и время первого поиска")
     )
+    search_watermark = models.DateField(
+        _("Search Watermark"),
+        null=True,
+        blank=True,
+        help_text=_("Дата, по которую поиск прошел успешно: следующий поиск начнется с нее")
+    )
+    next_search_at = models.DateTimeField(
+        _("Next Search At"),
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text=_("Когда искать в следующий раз (news/crawl_schedule.py); пусто = в ближайший проход")
+    )
+    empty_search_streak = models.PositiveIntegerField(
+        _("Empty Search Streak"),
+        default=0,
+        help_text=_("Поисков подряд без новых новостей: каждый удваивает интервал до следующего поиска")
+    )
+    page_fingerprint = models.JSONField(
+        _("Page Fingerprint"),
+        default=dict,
+        blank=True,
+        help_text=_("ETag, Last-Modified и хеш ссылок страницы и sitemap источника на момент последнего "
+                    "успешного поиска (news/change_detection.py)")
+    )
+    page_fingerprint_pending = models.JSONField(
+        _("Pending Page Fingerprint"),
+        default=dict,
+        blank=True,
+        help_text=_("Отпечаток последней проверки: становится page_fingerprint, только когда поиск прошел успешно")
+    )
+    page_checked_at = models.DateTimeField(
+        _("Page Checked At"),
+        null=True,
+        blank=True,
+        help_text=_("Когда страница источника проверялась на изменения")
+    )
+    total_unchanged = models.IntegerField(
+        _("Total Unchanged"),
+        default=0,
+        help_text=_("Всего раз поиск пропущен: сайт не изменился с прошлой проверки")
+    )
+    feed_etag = models.CharField(
+        _("Feed ETag"),
+        max_length=255,
+        blank=True,
+        help_text=_("ETag ленты с прошлого опроса (условный GET, news/feeds.py)")
+    )
+    feed_last_modified = models.CharField(
+        _("Feed Last-Modified"),
+        max_length=64,
+        blank=True,
+        help_text=_("Last-Modified ленты с прошлого опроса")
+    )
+    feed_polled_at = models.DateTimeField(
+        _("Feed Polled At"),
+        null=True,
+        blank=True,
+        help_text=_("Когда лента источника опрашивалась последний раз")
+    )
     
     # Процентные метрики
     success_rate = models.FloatField(
@@ -328,6 +408,24 @@ class ManufacturerStatistics(models.Model):
         blank=True,
         help_text=_("Дата и время первого поиска")
     )
+    search_watermark = models.DateField(
+        _("Search Watermark"),
+        null=True,
+        blank=True,
+        help_text=_("Дата, по которую поиск прошел успешно: следующий поиск начнется с нее")
+    )
+    next_search_at = models.DateTimeField(
+        _("Next Search At"),
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text=_("Когда искать в следующий раз (news/crawl_schedule.py); пусто = в ближайший проход")
+    )
+    empty_search_streak = models.PositiveIntegerField(
+        _("Empty Search Streak"),
+        default=0,
+        help_text=_("Поисков подряд без новых новостей: каждый удваивает интервал до следующего поиска")
+    )
     
     # Процентные метрики
     success_rate = models.FloatField(
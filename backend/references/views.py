@@ -353,8 +353,8 @@ class NewsResourceViewSet(viewsets.ModelViewSet):
         Параметры POST:
         - provider (string, опционально): ID провайдера ('auto', 'grok', 'anthropic', 'openai')
         """
-        from news.discovery_service import NewsDiscoveryService
-        from news.models import NewsDiscoveryStatus
+        from news.jobs import enqueue_discovery_job
+        from news.models import DiscoveryJob
         
         resource = self.get_object()
         
@@ -369,27 +369,21 @@ class NewsResourceViewSet(viewsets.ModelViewSet):
         if provider not in ['auto', 'grok', 'anthropic', 'openai']:
             provider = 'auto'
         
-        # Запускаем поиск в фоне
-        import threading
-        
-        def run_discovery():
-            try:
-                service = NewsDiscoveryService(user=request.user)
-                created, errors, error_msg = service.discover_news_for_resource(resource, provider=provider)
-                logger.info(f"Discovery completed for resource {resource.id}: created={created}, errors={errors}, provider={provider}")
-            except Exception as e:
-                logger.error(f"Error during single resource discovery: {str(e)}")
-        
-        thread = threading.Thread(target=run_discovery)
-        thread.daemon = True
-        thread.start()
+        # Поиск выполняет discovery_worker; здесь только ставим задание
+        job = enqueue_discovery_job(
+            DiscoveryJob.JOB_TYPE_RESOURCE,
+            provider=provider,
+            user=request.user,
+            resource_ids=[resource.id],
+        )
         
         return Response({
             'status': 'running',
+            'job_id': job.id,
             'resource_id': resource.id,
             'resource_name': resource.name,
             'provider': provider,
-            'message': f'Поиск новостей запущен для источника "{resource.name}"'
+            'message': f'Поиск новостей поставлен в очередь для источника "{resource.name}"'
         })
     
     def get_queryset(self):
@@ -424,7 +418,7 @@ class NewsResourceViewSet(viewsets.ModelViewSet):
         
         # Фильтр по типу источника
         source_type = self.request.query_params.get('source_type', None)
-        if source_type in ['auto', 'manual', 'hybrid']:
+        if source_type in ['auto', 'manual', 'hybrid', 'feed']:
             queryset = queryset.filter(source_type=source_type)
         
         # Фильтр по автоматически обрабатываемым источникам
@@ -483,6 +477,7 @@ class NewsResourceViewSet(viewsets.ModelViewSet):
         auto_sources = NewsResource.objects.filter(source_type='auto').count()
         manual_sources = NewsResource.objects.filter(source_type='manual').count()
         hybrid_sources = NewsResource.objects.filter(source_type='hybrid').count()
+        feed_sources = NewsResource.objects.filter(source_type='feed').count()
         
         return Response({
             'overview': {
@@ -495,7 +490,8 @@ class NewsResourceViewSet(viewsets.ModelViewSet):
                 'auto': auto_sources,
                 'manual': manual_sources,
                 'hybrid': hybrid_sources,
-                'auto_searchable': auto_sources + hybrid_sources,  # Всего для автопоиска
+                'feed': feed_sources,
+                'auto_searchable': auto_sources + hybrid_sources + feed_sources,  # Всего для автопоиска
             },
             'aggregated': {
                 'total_news_found': total_news_all,
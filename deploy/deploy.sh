@@ -62,6 +62,7 @@ HVAC_ENV=prod python manage.py migrate --noinput
 HVAC_ENV=prod python manage.py collectstatic --noinput
 
 systemctl restart gunicorn
+systemctl restart discovery-worker
 systemctl reload nginx
 EOF
 
@@ -53,6 +53,10 @@ echo "==> Создание systemd сервиса Gunicorn"
 "${SCP_CMD[@]}" deploy/gunicorn.service "$REMOTE:/etc/systemd/system/gunicorn.service"
 remote_run "systemctl daemon-reload && systemctl enable gunicorn"
 
+echo "==> Создание systemd сервиса воркера поиска новостей"
+"${SCP_CMD[@]}" deploy/discovery-worker.service "$REMOTE:/etc/systemd/system/discovery-worker.service"
+remote_run "systemctl daemon-reload && systemctl enable discovery-worker"
+
 echo "==> Проверка конфигурации Nginx"
 remote_run "nginx -t"
 
@@ -156,6 +156,11 @@ export default function NewsDiscoveryProgress({ onComplete, onError }: NewsDisco
             <span className="font-semibold">{status.percent}%</span>
           </div>
           <Progress value={status.percent} className="h-2" />
+          {status.status === 'running' && !!status.streamed_news && (
+            <p className="text-xs text-muted-foreground">
+              Новостей получено по ходу ответов: {status.streamed_news}
+            </p>
+          )}
         </div>
 
         {/* Сообщение об ошибке */}
@@ -37,6 +37,7 @@ import {
   Hand,
   Cog,
   Sparkles,
+  Rss,
   Trash2,
   Loader2
 } from 'lucide-react';
@@ -101,7 +102,8 @@ export default function ResourceDetailDialog({
     url: '',
     section: '',
     description: '',
-    source_type: 'auto' as 'auto' | 'manual' | 'hybrid',
+    source_type: 'auto' as 'auto' | 'manual' | 'hybrid' | 'feed',
+    feed_url: '',
     language: 'en',
     custom_search_instructions: '',
     internal_notes: '',
@@ -126,6 +128,7 @@ export default function ResourceDetailDialog({
         section: data.section || '',
         description: data.description || '',
         source_type: data.source_type || 'auto',
+        feed_url: data.feed_url || '',
         language: data.language || 'en',
         custom_search_instructions: data.custom_search_instructions || '',
         internal_notes: data.internal_notes || '',
@@ -150,6 +153,7 @@ export default function ResourceDetailDialog({
         section: formData.section,
         description: formData.description,
         source_type: formData.source_type,
+        feed_url: formData.feed_url,
         language: formData.language,
         custom_search_instructions: formData.custom_search_instructions,
         internal_notes: formData.internal_notes,
@@ -192,6 +196,7 @@ export default function ResourceDetailDialog({
       case 'auto': return <Zap className="w-4 h-4" />;
       case 'manual': return <Hand className="w-4 h-4" />;
       case 'hybrid': return <Cog className="w-4 h-4" />;
+      case 'feed': return <Rss className="w-4 h-4" />;
       default: return <Globe className="w-4 h-4" />;
     }
   };
@@ -201,6 +206,7 @@ export default function ResourceDetailDialog({
       case 'auto': return 'text-green-600 dark:text-green-400 bg-green-50 dark:bg-green-950/20';
       case 'manual': return 'text-red-600 dark:text-red-400 bg-red-50 dark:bg-red-950/20';
       case 'hybrid': return 'text-amber-600 dark:text-amber-400 bg-amber-50 dark:bg-amber-950/20';
+      case 'feed': return 'text-blue-600 dark:text-blue-400 bg-blue-50 dark:bg-blue-950/20';
       default: return 'text-gray-600 dark:text-gray-400 bg-gray-50 dark:bg-gray-950/20';
     }
   };
@@ -402,7 +408,8 @@ export default function ResourceDetailDialog({
                     {getSourceTypeIcon(resource.source_type || 'auto')}
                     <span className="ml-1">
                       {resource.source_type === 'auto' ? 'Автоматический' : 
-                       resource.source_type === 'manual' ? 'Ручной' : 'Гибридный'}
+                       resource.source_type === 'manual' ? 'Ручной' :
+                       resource.source_type === 'feed' ? 'RSS/Atom лента' : 'Гибридный'}
                     </span>
                   </Badge>
                 </div>
@@ -640,9 +647,60 @@ export default function ResourceDetailDialog({
                         </div>
                       </div>
                     </Card>
+
+                    {/* RSS/Atom лента */}
+                    <Card 
+                      className={`p-4 cursor-pointer transition-all border-2 ${
+                        formData.source_type === 'feed' 
+                          ? 'border-blue-500 bg-blue-50/50 dark:bg-blue-950/20' 
+                          : 'border-transparent hover:border-muted-foreground/20'
+                      }`}
+                      onClick={() => handleFieldChange('source_type', 'feed')}
+                    >
+                      <div className="flex items-start gap-3">
+                        <div className={`w-10 h-10 rounded-full flex items-center justify-center flex-shrink-0 ${
+                          formData.source_type === 'feed' 
+                            ? 'bg-blue-500' 
+                            : 'bg-muted'
+                        }`}>
+                          {formData.source_type === 'feed' ? (
+                            <CheckCircle2 className="w-5 h-5 text-white" />
+                          ) : (
+                            <Rss className="w-5 h-5 text-muted-foreground" />
+                          )}
+                        </div>
+                        <div className="flex-1">
+                          <div className="flex items-center gap-2 font-medium">
+                            <Rss className="w-4 h-4 text-blue-600" />
+                            RSS/Atom лента
+                          </div>
+                          <p className="text-sm text-muted-foreground mt-1">
+                            Новости берутся из ленты сайта, без поиска LLM
+                          </p>
+                        </div>
+                      </div>
+                    </Card>
                   </div>
                 </div>
 
+                {/* Адрес ленты - показываем только для feed */}
+                {formData.source_type === 'feed' && (
+                  <div>
+                    <Label htmlFor="feed_url">Адрес RSS/Atom ленты</Label>
+                    <Input
+                      id="feed_url"
+                      value={formData.feed_url}
+                      onChange={(e) => handleFieldChange('feed_url', e.target.value)}
+                      placeholder="https://example.com/feed/"
+                      className="mt-2"
+                    />
+                    <p className="text-xs text-muted-foreground mt-2">
+                      Без адреса ленты источник ищется через LLM, как автоматический.
+                      Ленту можно найти командой discover_feeds или действием в админке.
+                    </p>
+                  </div>
+                )}
+
                 {/* Язык источника */}
                 <div>
                   <Label htmlFor="language">Язык источника</Label>
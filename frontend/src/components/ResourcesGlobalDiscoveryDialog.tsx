@@ -42,9 +42,11 @@ export default function ResourcesGlobalDiscoveryDialog({
   });
   const [searchStartTime, setSearchStartTime] = useState<Date | null>(null);
 
-  // Отфильтруем только источники с типом auto или hybrid
-  const searchableResources = resources.filter(
-    (r) => r.source_type === 'auto' || r.source_type === 'hybrid'
+  // Отфильтруем только источники с автоматическим поиском (auto, hybrid, feed)
+  const searchableResources = resources.filter((r) =>
+    r.is_auto_searchable !== undefined
+      ? r.is_auto_searchable
+      : r.source_type === 'auto' || r.source_type === 'hybrid' || r.source_type === 'feed'
   );
 
   const handleStartSearch = async () => {
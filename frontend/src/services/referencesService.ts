@@ -46,9 +46,10 @@ export interface Resource {
   statistics?: ResourceStatistics;
   is_problematic?: boolean; // Источник с error_rate >= 30%
   // Настройки поиска
-  source_type?: 'auto' | 'manual' | 'hybrid';
+  source_type?: 'auto' | 'manual' | 'hybrid' | 'feed';
   language?: string;
   custom_search_instructions?: string;
+  feed_url?: string; // RSS/Atom лента (для source_type = 'feed')
   internal_notes?: string;
   is_auto_searchable?: boolean;
   requires_manual_input?: boolean;
@@ -169,6 +170,7 @@ export interface NewsDiscoveryStatus {
   processed: number;
   total: number;
   percent: number;
+  streamed_news?: number;
   created?: number;
   errors?: number;
   total_processed?: number;
@@ -201,6 +203,7 @@ export interface ManufacturerNewsDiscoveryStatus {
   processed: number;
   total: number;
   percent: number;
+  streamed_news?: number;
   created?: number;
   errors?: number;
   total_processed?: number;
@@ -238,9 +241,10 @@ export interface ResourceCreateData {
   description?: string;
   section?: string;
   // Настройки поиска
-  source_type?: 'auto' | 'manual' | 'hybrid';
+  source_type?: 'auto' | 'manual' | 'hybrid' | 'feed';
   language?: string;
   custom_search_instructions?: string;
+  feed_url?: string; // RSS/Atom лента (для source_type = 'feed')
   internal_notes?: string;
   is_auto_searchable?: boolean;
   requires_manual_input?: boolean;
@@ -349,7 +353,7 @@ const referencesService = {
   },
 
   // Запустить автоматический поиск новостей
-  startNewsDiscovery: async (params?: { configId?: number; sections?: string[]; lastSearchDate?: string }): Promise<NewsDiscoveryStatus> => {
+  startNewsDiscovery: async (params?: { configId?: number; sections?: string[]; lastSearchDate?: string; ignoreSchedule?: boolean }): Promise<NewsDiscoveryStatus> => {
     const token = localStorage.getItem('access_token');
     const language = localStorage.getItem('language') || 'ru';
     
@@ -368,6 +372,10 @@ const referencesService = {
         formData.append('sections', section);
       }
     }
+    // Искать все источники, а не только те, которым пора по расписанию
+    if (params?.ignoreSchedule) {
+      formData.append('ignore_schedule', 'true');
+    }
     
     const response = await axios.post(url, formData, {
       headers: {
@@ -599,6 +607,9 @@ const referencesService = {
     if (data.source_type) {
       formData.append('source_type', data.source_type);
     }
+    if (data.feed_url !== undefined) {
+      formData.append('feed_url', data.feed_url);
+    }
     if (data.language) {
       formData.append('language', data.language);
     }
@@ -633,6 +644,9 @@ const referencesService = {
     if (data.source_type) {
       formData.append('source_type', data.source_type);
     }
+    if (data.feed_url !== undefined) {
+      formData.append('feed_url', data.feed_url);
+    }
     if (data.language) {
       formData.append('language', data.language);
     }
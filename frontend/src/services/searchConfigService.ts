@@ -70,12 +70,17 @@ export interface SearchConfiguration {
   
   // Тарифы (USD за 1M токенов)
   grok_input_price: number;
+  grok_cached_input_price: number;
   grok_output_price: number;
   anthropic_input_price: number;
+  anthropic_cached_input_price: number;
+  anthropic_cache_write_price: number;
   anthropic_output_price: number;
   gemini_input_price: number;
+  gemini_cached_input_price: number;
   gemini_output_price: number;
   openai_input_price: number;
+  openai_cached_input_price: number;
   openai_output_price: number;
   
   // Промпты
@@ -144,6 +149,9 @@ export interface NewsDiscoveryRun {
       output_tokens: number;
       cost: number;
       errors: number;
+      parse_failures?: number;
+      news_dropped?: number;
+      output_tokens_saved?: number;
     }
   };
   
@@ -193,6 +201,8 @@ export interface DiscoveryStats {
       output_tokens: number;
       cost: number;
       errors: number;
+      parse_failures: number;
+      parse_failure_rate: number;
     }
   };
 }
@@ -210,14 +220,20 @@ export interface DiscoveryAPICall {
   model: string;
   
   input_tokens: number;
+  cached_input_tokens: number;
+  cache_write_tokens: number;
   output_tokens: number;
   cost_usd: string;
   
   duration_ms: number;
   success: boolean;
   error_message: string;
+  parse_failed: boolean;
+  batch_api: boolean;
   
   news_extracted: number;
+  max_output_tokens: number;
+  output_tokens_saved: number;
   
   created_at: string;
 }